@@ -31,6 +31,8 @@ import docx
 import re
 import logging
 
+from HumeAiTwilio.embeddings import get_embedding_service, model_available
+
 # Module logger
 logger = logging.getLogger(__name__)
 
@@ -40,18 +42,27 @@ client = chromadb.PersistentClient(path="./agent_knowledge_db")
 # Initialize an embedding function with graceful fallback.
 # Loading sentence-transformers can fail on low-memory machines (OSError related to paging file).
 # Strategy:
-# 1. Try to load a local SentenceTransformer embedding.
+# 1. Use the process-wide SentenceTransformer (HumeAiTwilio/embeddings.py), loaded on first
+#    encode rather than at import, shared with KnowledgeManager and cached per text.
 # 2. If it fails, and OPENAI_API_KEY is set, fall back to OpenAI embeddings.
 # 3. Otherwise, create/get collections without an embedding function (use existing collections as-is).
 sentence_transformer_ef = None
 openai_ef = None
 
+
+class SharedEmbeddingFunction(embedding_functions.EmbeddingFunction):
+    """ChromaDB embedding function over the shared, lazily loaded model"""
+
+    def __call__(self, input):
+        return get_embedding_service().encode(list(input)).tolist()
+
+
 try:
     try:
-        sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-        logger.info("✅ Loaded SentenceTransformer embedding function")
+        if not model_available():
+            raise ImportError("sentence-transformers is not installed")
+        sentence_transformer_ef = SharedEmbeddingFunction()
+        logger.info("✅ Using shared SentenceTransformer embedding function (loads on first use)")
     except Exception as e:
         # Likely an OSError due to insufficient virtual memory/paging file when loading weights
         logger.warning(f"⚠️ Failed to load SentenceTransformer embedding: {e}")
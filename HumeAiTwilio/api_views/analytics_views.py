@@ -9,6 +9,7 @@ New APIs for conversation analytics:
 5. /api/analytics/tone-trends/ - Sentiment over time
 6. /api/call/<call_id>/explainability/ - Detailed call analysis
 7. /api/analytics/risk-flags/ - Flagged content audit
+8. /api/analytics/recompute/ - Recompute analytics for historical calls (dry-run diff or queued run)
 """
 
 from rest_framework.decorators import api_view, permission_classes
@@ -16,8 +17,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.db.models import Count, Avg, Q, F
+from django.db.models.functions import TruncDate
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 import logging
 
 from HumeAiTwilio.models import (
@@ -391,6 +393,17 @@ def tone_trends(request):
             reverse=True
         )
         
+        # Per-day top emotions: mean of the calls' emotion vectors (NumPy, no JSON parsing)
+        from HumeAiTwilio.services.analytics_processor import AnalyticsProcessor
+        daily_emotions = AnalyticsProcessor.top_emotions_by_day(
+            ConversationLog.objects.filter(
+                call__clarifies_analytics__in=analytics_query,
+                emotion_vector__isnull=False
+            ).annotate(
+                day=TruncDate('call__clarifies_analytics__analyzed_at')
+            ).values_list('day', 'emotion_vector')
+        )
+        
         # Format for frontend LineChart
         results = []
         for day_data in daily_sentiment:
@@ -400,7 +413,7 @@ def tone_trends(request):
                 'positive_count': day_data['call_count'] if day_data['avg_sentiment'] > 0 else 0,
                 'negative_count': day_data['call_count'] if day_data['avg_sentiment'] < 0 else 0,
                 'neutral_count': day_data['call_count'] if day_data['avg_sentiment'] == 0 else 0,
-                'top_emotions': {}  # Can add emotion breakdown per day later
+                'top_emotions': daily_emotions.get(str(day_data['day']), {})
             })
         
         return Response(results)  # Return array directly
@@ -603,5 +616,74 @@ def risk_flags_audit(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+RECOMPUTE_DRY_RUN_MAX = 2000  # calls diffed per dry-run request
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def recompute_analytics(request):
+    """
+    POST /api/analytics/recompute/
+    
+    Body:
+    - date_from / date_to: Call dates (YYYY-MM-DD, default last 30 days)
+    - agent_id: Filter by agent
+    - dry_run: true (default) returns the per-call diff for up to `limit` calls
+      (default 500, at most RECOMPUTE_DRY_RUN_MAX) without writing; false queues
+      the recompute as a Celery task
+    
+    Only the requesting user's completed calls are recomputed.
+    """
+    from HumeAiTwilio.services.reprocessing import recompute_analytics as run_recompute, select_calls
+    from HumeAiTwilio.tasks import recompute_call_analytics
+    
+    try:
+        data = request.data
+        try:
+            date_from = _parse_date(data.get('date_from')) or (timezone.now() - timedelta(days=30)).date()
+            date_to = _parse_date(data.get('date_to')) or timezone.now().date()
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'date_from / date_to must be YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        agent_id = data.get('agent_id')
+        dry_run = str(data.get('dry_run', True)).lower() not in ('false', '0', 'no')
+        try:
+            limit = int(data.get('limit', 500))
+            if limit < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'error': 'limit must be a positive integer'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, RECOMPUTE_DRY_RUN_MAX)
+        
+        calls = select_calls(date_from, date_to, agent_id, user_id=request.user.id)
+        
+        if dry_run:
+            sample = list(calls.order_by('pk').values_list('pk', flat=True)[:limit])
+            report = run_recompute(TwilioCall.objects.filter(pk__in=sample), workers=1, dry_run=True)
+            return Response({'success': True, **report})
+        
+        task = recompute_call_analytics.delay(str(date_from), str(date_to), agent_id, request.user.id)
+        logger.info(f"♻️ Queued analytics recompute {task.id} for user {request.user.id}")
+        return Response({
+            'success': True,
+            'task_id': task.id,
+            'calls': calls.count(),
+            'date_from': str(date_from),
+            'date_to': str(date_to),
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    except Exception as e:
+        logger.error(f"Error recomputing analytics: {e}", exc_info=True)
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
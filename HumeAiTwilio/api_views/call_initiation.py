@@ -16,6 +16,8 @@ from django.views.decorators.http import require_http_methods
 from decouple import config
 from twilio.rest import Client
 
+from HumeAiTwilio.hume_pool import get_hume_session_pool
+
 logger = logging.getLogger(__name__)
 
 # ═══════════════════════════════════════════════════════════
@@ -473,6 +475,9 @@ def initiate_call(request):
         logger.info(f"📞 Initiating call to {phone_number} with agent {agent_id}")
         logger.info(f"🔊 Using voice provider: {VOICE_PROVIDER}")
         
+        # 🔥 Open the HumeAI session while the phone rings (consumer takes it on answer)
+        get_hume_session_pool().prewarm(final_config_id)
+        
         # ✅ FIX 1: UNIFIED CALL INITIATION - Works for both providers
         call = None
         call_sid = None
@@ -921,9 +926,9 @@ def get_call_data(request, call_sid):
                     })
                 
                 # Extract emotions if available
-                if hasattr(log, 'emotion_scores') and log.emotion_scores:
+                if log.emotion_vector or log.emotion_scores:
                     try:
-                        emotion_data = json.loads(log.emotion_scores) if isinstance(log.emotion_scores, str) else log.emotion_scores
+                        emotion_data = log.emotion_dict
                         if emotion_data:
                             emotions.append({
                                 'timestamp': log.timestamp.isoformat() if log.timestamp else None,
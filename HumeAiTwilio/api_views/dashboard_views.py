@@ -176,7 +176,7 @@ def get_all_active_calls(request):
                     transcript_data.append({
                         'role': log.role,
                         'message': log.message,
-                        'emotion_scores': log.emotion_scores or {},
+                        'emotion_scores': log.emotion_dict,
                         'sentiment': log.sentiment,
                         'confidence': log.confidence,
                         'timestamp': log.timestamp.isoformat()
@@ -391,7 +391,7 @@ def get_active_inbound_calls(request):
                 transcript_data.append({
                     'role': log.role,
                     'message': log.message,
-                    'emotion_scores': log.emotion_scores or {},
+                    'emotion_scores': log.emotion_dict,
                     'sentiment': log.sentiment,
                     'confidence': log.confidence,
                     'timestamp': log.timestamp.isoformat()
@@ -508,7 +508,7 @@ def get_inbound_call_history(request):
             transcript_data = [{
                 'role': log.role,
                 'message': log.message,
-                'emotion_scores': log.emotion_scores,
+                'emotion_scores': log.emotion_dict,
                 'sentiment': log.sentiment,
                 'timestamp': log.timestamp.isoformat()
             } for log in transcript]
@@ -804,7 +804,7 @@ def get_outbound_call_history(request):
             transcript_data = [{
                 'role': log.role,
                 'message': log.message,
-                'emotion_scores': log.emotion_scores,
+                'emotion_scores': log.emotion_dict,
                 'sentiment': log.sentiment,
                 'timestamp': log.timestamp.isoformat()
             } for log in transcript]
@@ -1213,7 +1213,7 @@ def get_live_call_updates(request):
                 transcript_data.append({
                     'role': log.role,
                     'message': log.message,
-                    'emotion_scores': log.emotion_scores or {},
+                    'emotion_scores': log.emotion_dict,
                     'sentiment': log.sentiment,
                     'confidence': log.confidence,
                     'timestamp': log.timestamp.isoformat()
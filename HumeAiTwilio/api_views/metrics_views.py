@@ -0,0 +1,73 @@
+"""
+⏱️ Live call latency metrics API
+
+1. /api/hume-twilio/metrics/turn-latency/ - Process-wide turn latency, event loop lag and
+   time-to-first-greeting histograms plus HumeAI session pool hit rate
+   (?output=prometheus for Prometheus text format, ?call_sid=... for one call's summary)
+   The histograms mix every tenant's calls in this worker: staff (operators) only.
+   ?call_sid= is open to the call's owner.
+"""
+
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+import logging
+
+from HumeAiTwilio.hume_pool import get_hume_session_pool
+from HumeAiTwilio.metrics import greeting_registry, latency_registry, loop_lag_registry
+from HumeAiTwilio.models import TwilioCall
+
+logger = logging.getLogger(__name__)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def turn_latency_metrics(request):
+    """
+    GET /api/hume-twilio/metrics/turn-latency/
+    
+    Query params:
+    - output: 'json' (default) or 'prometheus'
+    - call_sid: Return the stored per-call summary (own calls only) instead of the live histograms
+    
+    Histograms cover turns completed by this worker process since it started,
+    for every tenant, so they are restricted to staff users.
+    """
+    try:
+        call_sid = request.GET.get('call_sid')
+        if call_sid:
+            call = TwilioCall.objects.filter(
+                call_sid=call_sid,
+                user=request.user
+            ).only('call_sid', 'call_metrics').first()
+            if not call:
+                return Response({'success': False, 'error': 'Call not found'}, status=status.HTTP_404_NOT_FOUND)
+            return Response({'success': True, 'call_sid': call.call_sid, 'call_metrics': call.call_metrics})
+        
+        # Process-wide histograms mix every tenant's calls: operators only
+        if not IsAdminUser().has_permission(request, None):
+            return Response({'success': False, 'error': 'Staff access required'}, status=status.HTTP_403_FORBIDDEN)
+        
+        if request.GET.get('output') == 'prometheus':
+            pool = get_hume_session_pool().stats()
+            text = (latency_registry.prometheus() + loop_lag_registry.prometheus()
+                    + greeting_registry.prometheus()
+                    + '# HELP hume_pool_lookups_total HumeAI session pool lookups by result\n'
+                    + '# TYPE hume_pool_lookups_total counter\n'
+                    + f'hume_pool_lookups_total{{result="hit"}} {pool["hits"]}\n'
+                    + f'hume_pool_lookups_total{{result="miss"}} {pool["misses"]}\n')
+            return HttpResponse(text, content_type='text/plain; version=0.0.4')
+        
+        return Response({
+            'success': True,
+            'histograms': latency_registry.snapshot(),
+            'event_loop_lag': loop_lag_registry.snapshot(),
+            'time_to_first_greeting': greeting_registry.snapshot(),
+            'hume_pool': get_hume_session_pool().stats(),
+        })
+    
+    except Exception as e:
+        logger.error(f"❌ Turn latency metrics error: {e}")
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,50 @@
+"""
+HumeAiTwilio Audio Package
+
+Per-call streaming DSP stages used by the realtime consumers.
+- resampler.py: Stateful polyphase resampler (NumPy, audioop fallback)
+- g711.py: Table-driven µ-law codec (bit-exact with audioop)
+- pipeline.py: Fused Twilio/Vonage ↔ HumeAI conversion pipelines
+- agc.py: Streaming automatic gain control with soft limiter
+- playout.py: Real-time paced outbound frame scheduler (barge-in flush)
+- vad.py: Energy + zero-crossing voice activity detection with hangover
+- timestretch.py: Streaming WSOLA speaking-rate change (pitch preserved)
+- executor.py: Inline / thread / process execution of the per-call stages
+"""
+
+from .resampler import StreamingResampler, design_polyphase_filter, float_to_pcm16
+from .g711 import ULAW_DECODE_TABLE, ULAW_ENCODE_TABLE, ulaw_decode, ulaw_encode
+from .agc import AutomaticGainControl
+from .pipeline import (
+    MulawInboundPipeline, MulawOutboundPipeline, LinearInboundPipeline, LinearOutboundPipeline,
+    twilio_inbound_pipeline, twilio_outbound_pipeline, vonage_inbound_pipeline, vonage_outbound_pipeline,
+)
+from .playout import PlayoutScheduler
+from .vad import VoiceActivityDetector
+from .timestretch import TimeStretcher
+from .executor import DSPExecutor, DSPSession, get_dsp_executor
+
+__all__ = [
+    'StreamingResampler',
+    'design_polyphase_filter',
+    'float_to_pcm16',
+    'ULAW_DECODE_TABLE',
+    'ULAW_ENCODE_TABLE',
+    'ulaw_decode',
+    'ulaw_encode',
+    'MulawInboundPipeline',
+    'MulawOutboundPipeline',
+    'LinearInboundPipeline',
+    'AutomaticGainControl',
+    'PlayoutScheduler',
+    'VoiceActivityDetector',
+    'LinearOutboundPipeline',
+    'TimeStretcher',
+    'twilio_inbound_pipeline',
+    'twilio_outbound_pipeline',
+    'vonage_inbound_pipeline',
+    'vonage_outbound_pipeline',
+    'DSPExecutor',
+    'DSPSession',
+    'get_dsp_executor',
+]
@@ -0,0 +1,352 @@
+"""
+DSP execution modes for the realtime consumers
+Keeps resampling / AGC / VAD / codec work off the asyncio loop when needed
+
+- inline:  run on the event loop (lowest per-frame cost, fine for a few calls)
+- thread:  shared ThreadPoolExecutor (NumPy kernels release the GIL)
+- process: sticky worker processes; each call's stage lives in one worker and
+           frames travel through a per-session shared-memory block, only a
+           small header goes over the pipe
+
+Selected with settings.AUDIO_DSP_MODE / AUDIO_DSP_WORKERS.
+"""
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+logger = logging.getLogger(__name__)
+
+MODES = ('inline', 'thread', 'process')
+SLOT_BYTES = 64 * 1024  # per-direction shared-memory slot; larger payloads go inline over the pipe
+
+
+def _as_output(result):
+    """Stage outputs may be views on reused buffers - hand callers their own copy"""
+    return bytes(result) if isinstance(result, memoryview) else result
+
+
+def _encode(data):
+    if isinstance(data, str):
+        return data.encode('ascii'), True
+    return data, False
+
+
+class _PassthroughStage:
+    """Stand-in when a call's stage cannot be built anywhere: audio goes through untouched"""
+
+    last_event = None
+
+    def process(self, data):
+        return data
+
+    def process_b64(self, data):
+        return data
+
+    def reset(self):
+        pass
+
+    def metrics(self):
+        return {}
+
+
+class DSPSession:
+    """One per-call stage (e.g. Twilio inbound pipeline) bound to an execution mode"""
+
+    def __init__(self, executor, factory):
+        self.executor = executor
+        self.factory = factory
+        self.last_event = None
+        self._lock = None
+        self.stage = None if executor.mode == 'process' else factory()
+
+    def _serial(self):
+        # One frame in flight per session keeps stage state ordered in thread/process modes
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _call(self, op: str, data=None):
+        if self.executor.mode == 'inline':
+            return self._run_local(op, data)
+        async with self._serial():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor.thread_pool, self._run_local, op, data)
+
+    def _run_local(self, op, data):
+        method = getattr(self.stage, op)
+        result = method() if data is None else method(data)
+        self.last_event = getattr(self.stage, 'last_event', None)
+        return _as_output(result)
+
+    async def process(self, data):
+        """Raw bytes in → bytes out"""
+        return await self._call('process', data)
+
+    async def process_b64(self, data: str) -> str:
+        """Base64 in → base64 out (decode/encode happen where the stage runs)"""
+        return await self._call('process_b64', data)
+
+    async def reset(self):
+        """Drop the stage's carried state (outbound stages, after a barge-in flush)"""
+        await self._call('reset')
+
+    async def metrics(self) -> dict:
+        return await self._call('metrics')
+
+    async def close(self):
+        self.stage = None
+
+
+class _ProcessSession(DSPSession):
+    """Session whose stage lives in a worker process"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, executor, factory):
+        super().__init__(executor, factory)
+        self.session_id = next(self._ids)
+        self.worker = executor._pick_worker()
+        self.shm = shared_memory.SharedMemory(create=True, size=2 * SLOT_BYTES)
+        self.worker.send(('open', self.session_id, factory, self.shm.name))
+        self.closed = False
+        self.local = False  # the worker could not build the stage: it runs inline here instead
+
+    async def _call(self, op: str, data=None):
+        if not self.local:
+            async with self._serial():
+                if not self.local:
+                    return await self._run_remote(op, data)
+        return self._run_local(op, data)
+
+    async def _run_remote(self, op, data):
+        if self.closed:
+            raise RuntimeError("DSP session is closed")
+        payload, is_text = _encode(data) if data is not None else (None, False)
+        inline = None
+        length = 0
+        if payload is not None:
+            length = len(payload)
+            if length <= SLOT_BYTES:
+                self.shm.buf[:length] = payload
+            else:
+                inline = bytes(payload)
+
+        status, result, event = await self.worker.request(
+            ('call', self.session_id, op, length, is_text, inline)
+        )
+        if status == 'open_error':
+            logger.error(f"❌ DSP worker could not open session {self.session_id} ({result}), running it inline")
+            try:
+                self.stage = self.factory()
+            except Exception as e:
+                logger.error(f"❌ DSP session {self.session_id} could not be built inline either "
+                             f"({type(e).__name__}: {e}), passing audio through unprocessed")
+                self.stage = _PassthroughStage()
+            self.local = True
+            return self._run_local(op, data)
+        if status == 'error':
+            raise RuntimeError(f"DSP worker error: {result}")
+        self.last_event = event
+        if status == 'shm':
+            out = bytes(self.shm.buf[SLOT_BYTES:SLOT_BYTES + result[0]])
+            return out.decode('ascii') if result[1] else out
+        return result
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.worker.send(('close', self.session_id))
+        except Exception:
+            pass
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        self.worker.sessions -= 1
+
+
+def _worker_main(conn):
+    """Worker process loop: owns stages for the sessions routed to it"""
+    stages = {}
+    failed = {}  # session_id -> why its stage could not be built
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        kind = message[0]
+        if kind == 'stop':
+            break
+        if kind == 'open':
+            _, session_id, factory, shm_name = message
+            try:
+                stages[session_id] = (factory(), shared_memory.SharedMemory(name=shm_name))
+            except Exception as e:
+                # keep serving the other sessions; this one's first call is told to fall back
+                failed[session_id] = f"{type(e).__name__}: {e}"
+        elif kind == 'close':
+            failed.pop(message[1], None)
+            stage = stages.pop(message[1], None)
+            if stage:
+                stage[1].close()
+        elif kind == 'call':
+            _, request_id, session_id, op, length, is_text, inline = message
+            if session_id in failed:
+                conn.send((request_id, 'open_error', failed[session_id], None))
+                continue
+            try:
+                stage, shm = stages[session_id]
+                method = getattr(stage, op)
+                if length or inline is not None:
+                    data = inline if inline is not None else bytes(shm.buf[:length])
+                    result = method(data.decode('ascii') if is_text else data)
+                else:
+                    result = method()
+                result = _as_output(result)
+                event = getattr(stage, 'last_event', None)
+                encoded, text = _encode(result) if isinstance(result, (bytes, str)) else (None, False)
+                if encoded is not None and len(encoded) <= SLOT_BYTES:
+                    shm.buf[SLOT_BYTES:SLOT_BYTES + len(encoded)] = encoded
+                    conn.send((request_id, 'shm', (len(encoded), text), event))
+                else:
+                    conn.send((request_id, 'ok', result, event))
+            except Exception as e:
+                conn.send((request_id, 'error', f"{type(e).__name__}: {e}", None))
+    for _, shm in stages.values():
+        shm.close()
+
+
+class _Worker:
+    """Parent-side handle for one DSP worker process"""
+
+    def __init__(self, context, index: int):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), daemon=True,
+                                       name=f'audio-dsp-{index}')
+        self.process.start()
+        child.close()
+        self.sessions = 0
+        self._stopping = False
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        self._ids = itertools.count(1)
+        # Replies are read on a thread and handed back to the waiting loop
+        self._reader = threading.Thread(target=self._read_replies, daemon=True, name=f'audio-dsp-{index}-reader')
+        self._reader.start()
+
+    def send(self, message):
+        with self._send_lock:
+            self.conn.send(message)
+
+    def request(self, message):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request_id = next(self._ids)
+        self._pending[request_id] = future
+        self.send((message[0], request_id) + message[1:])
+        return future
+
+    def _read_replies(self):
+        while True:
+            try:
+                request_id, status, result, event = self.conn.recv()
+            except (EOFError, OSError):
+                if not self._stopping:
+                    logger.error(f"❌ Audio DSP worker {self.process.name} exited")
+                break
+            future = self._pending.pop(request_id, None)
+            if future is not None and not future.done():
+                future.get_loop().call_soon_threadsafe(
+                    lambda f=future, r=(status, result, event): f.done() or f.set_result(r)
+                )
+        # Worker gone: fail whatever was still waiting instead of hanging those calls
+        for future in list(self._pending.values()):
+            future.get_loop().call_soon_threadsafe(
+                lambda f=future: f.done() or f.set_result(('error', 'worker exited', None))
+            )
+        self._pending.clear()
+
+    def stop(self):
+        self._stopping = True
+        try:
+            self.send(('stop',))
+        except Exception:
+            pass
+        self.process.join(timeout=2)
+
+
+class DSPExecutor:
+    """
+    Factory for per-call DSP sessions in the configured execution mode.
+
+    Usage:
+        executor = get_dsp_executor()
+        inbound = executor.session(twilio_inbound_pipeline)
+        linear_b64 = await inbound.process_b64(mulaw_b64)
+    """
+
+    def __init__(self, mode: str = 'inline', workers: int = 2):
+        if mode not in MODES:
+            raise ValueError(f"Unknown DSP mode: {mode} (expected one of {MODES})")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self._thread_pool = None
+        self._processes = []
+        self._lock = threading.Lock()
+
+    @property
+    def thread_pool(self):
+        if self._thread_pool is None:
+            with self._lock:
+                if self._thread_pool is None:
+                    self._thread_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='audio-dsp')
+        return self._thread_pool
+
+    def _pick_worker(self) -> _Worker:
+        with self._lock:
+            if not self._processes:
+                # spawn: workers only import the audio package, never inherit Django/loop state
+                context = multiprocessing.get_context('spawn')
+                self._processes = [_Worker(context, i) for i in range(self.workers)]
+                logger.info(f"🧵 Started {self.workers} audio DSP worker processes")
+            worker = min(self._processes, key=lambda w: w.sessions)
+            worker.sessions += 1
+            return worker
+
+    def session(self, factory) -> DSPSession:
+        """Create a per-call stage; ``factory`` must be a module-level function (or a partial of one) in process mode"""
+        if self.mode == 'process':
+            return _ProcessSession(self, factory)
+        return DSPSession(self, factory)
+
+    def shutdown(self):
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False)
+            self._thread_pool = None
+        for worker in self._processes:
+            worker.stop()
+        self._processes = []
+
+
+_default_executor = None
+
+
+def get_dsp_executor() -> DSPExecutor:
+    """Process-wide executor built from settings.AUDIO_DSP_MODE / AUDIO_DSP_WORKERS"""
+    global _default_executor
+    if _default_executor is None:
+        from django.conf import settings
+        _default_executor = DSPExecutor(
+            mode=getattr(settings, 'AUDIO_DSP_MODE', 'inline'),
+            workers=getattr(settings, 'AUDIO_DSP_WORKERS', 2),
+        )
+        logger.info(f"🎛️ Audio DSP mode: {_default_executor.mode} ({_default_executor.workers} workers)")
+    return _default_executor
@@ -0,0 +1,50 @@
+"""
+Table-driven G.711 µ-law codec
+Bit-exact with audioop.ulaw2lin / audioop.lin2ulaw, but vectorised with NumPy
+and without audioop (removed from the standard library in Python 3.13)
+
+- ULAW_DECODE_TABLE: 256 entries, µ-law byte → int16
+- ULAW_ENCODE_TABLE: 65536 entries, int16 (viewed as uint16) → µ-law byte
+"""
+
+import numpy as np
+
+ULAW_BIAS = 0x84
+ULAW_CLIP = 8159  # 14-bit magnitude limit used by the encoder
+
+
+def _build_decode_table():
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + ULAW_BIAS) << exponent) - ULAW_BIAS
+    return np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+def _build_encode_table():
+    pcm = np.arange(65536, dtype=np.int32).astype(np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(pcm), ULAW_CLIP) + (ULAW_BIAS >> 2)
+
+    segment_ends = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+    segment = np.searchsorted(segment_ends, magnitude, side='left')
+
+    shifted = np.right_shift(magnitude, np.minimum(segment, 7) + 1) & 0x0F
+    code = np.where(segment >= 8, 0x7F, (segment << 4) | shifted)
+    return (code ^ mask).astype(np.uint8)
+
+
+ULAW_DECODE_TABLE = _build_decode_table()
+ULAW_ENCODE_TABLE = _build_encode_table()
+
+
+def ulaw_decode(data) -> np.ndarray:
+    """µ-law bytes (or memoryview) → int16 samples"""
+    return ULAW_DECODE_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def ulaw_encode(samples) -> bytes:
+    """int16 samples (array, bytes or memoryview) → µ-law bytes"""
+    if not isinstance(samples, np.ndarray):
+        samples = np.frombuffer(samples, dtype='<i2')
+    return ULAW_ENCODE_TABLE[samples.astype(np.int16, copy=False).view(np.uint16)].tobytes()
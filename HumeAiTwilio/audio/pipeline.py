@@ -0,0 +1,264 @@
+"""
+Fused Twilio ↔ HumeAI audio pipelines
+One pass per direction instead of chained audioop calls with a base64 round-trip
+between each step
+
+Inbound  (Twilio → HumeAI): base64 µ-law 8kHz → decode (one table lookup) → VAD → AGC
+                            → stateful resample → base64 linear16 48kHz
+Inbound  (Vonage → HumeAI): linear16 16kHz → VAD → AGC → stateful resample → linear16 48kHz
+Outbound (HumeAI → Twilio): linear16 48kHz → stateful resample → [WSOLA speed] → µ-law table → 8kHz
+Outbound (HumeAI → Vonage): linear16 48kHz → stateful resample → [WSOLA speed] → linear16 16kHz
+
+The ``*_pipeline()`` factories build the per-call stages the consumers use; they
+are plain module-level functions so a DSP worker process can build them too.
+"""
+
+import base64
+
+import numpy as np
+
+from .agc import AutomaticGainControl
+from .g711 import ULAW_DECODE_TABLE, ULAW_ENCODE_TABLE
+from .resampler import StreamingResampler
+from .timestretch import TimeStretcher
+from .vad import VoiceActivityDetector
+
+
+def _to_pcm16(samples, out):
+    """Round and saturate float samples into a preallocated int16 buffer"""
+    np.rint(samples, out=samples)
+    np.maximum(samples, -32768, out=samples)
+    np.minimum(samples, 32767, out=samples)
+    out[:] = samples
+    return out
+
+
+class _InboundStages:
+    """Shared VAD/AGC reporting for the caller-side pipelines"""
+
+    agc = None
+    vad = None
+
+    @property
+    def last_event(self):
+        """VAD event ('onset' / 'offset' / None) for the last processed frame"""
+        return self.vad.last_event if self.vad is not None else None
+
+    def metrics(self) -> dict:
+        return {
+            'agc': self.agc.metrics() if self.agc is not None else None,
+            'vad': self.vad.metrics() if self.vad is not None else None,
+        }
+
+
+class MulawInboundPipeline(_InboundStages):
+    """
+    Caller audio: µ-law 8kHz → boosted linear16 at HumeAI's input rate.
+
+    A fixed pre-gain is folded into a float32 copy of the µ-law decode table, so
+    decode and gain are a single ``np.take`` into a preallocated buffer. Optional
+    ``vad`` and ``agc`` stages run on the 8kHz samples before resampling (VAD
+    first, so it sees the caller's real level rather than the AGC output).
+    """
+
+    def __init__(self, output_rate: int = 48000, gain: float = 1.0, input_rate: int = 8000,
+                 agc=None, vad=None):
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.gain = gain
+        self.agc = agc
+        self.vad = vad
+        self.resampler = StreamingResampler(input_rate, output_rate)
+        self._table = ULAW_DECODE_TABLE.astype(np.float32) * np.float32(gain)
+        self._decoded = np.empty(160, dtype=np.float32)
+        self._pcm = np.empty(960, dtype='<i2')
+        self.frames_processed = 0
+
+    def process(self, mulaw) -> memoryview:
+        """µ-law bytes/memoryview → little-endian int16 PCM (view on a reused buffer)"""
+        codes = np.frombuffer(mulaw, dtype=np.uint8)
+        if len(codes) > len(self._decoded):
+            self._decoded = np.empty(len(codes), dtype=np.float32)
+        decoded = self._decoded[:len(codes)]
+        np.take(self._table, codes, out=decoded)
+        if self.vad is not None:
+            self.vad.process(decoded)
+        if self.agc is not None:
+            self.agc.process(decoded)
+
+        resampled = self.resampler.process_float(decoded)
+        if len(resampled) > len(self._pcm):
+            self._pcm = np.empty(len(resampled), dtype='<i2')
+
+        self.frames_processed += 1
+        return memoryview(_to_pcm16(resampled, self._pcm[:len(resampled)])).cast('B')
+
+    def process_b64(self, mulaw_b64: str) -> str:
+        """Twilio media payload → HumeAI audio_input payload"""
+        if not mulaw_b64:
+            return ""
+        mulaw = base64.b64decode(mulaw_b64)
+        if not mulaw:
+            return ""
+        return base64.b64encode(self.process(mulaw)).decode('ascii')
+
+
+class LinearInboundPipeline(_InboundStages):
+    """
+    Caller audio already in linear16 (Vonage 16kHz) → VAD → AGC → HumeAI's input rate.
+    """
+
+    def __init__(self, input_rate: int = 16000, output_rate: int = 48000, agc=None, vad=None):
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.agc = agc
+        self.vad = vad
+        self.resampler = StreamingResampler(input_rate, output_rate)
+        self._samples = np.empty(320, dtype=np.float32)
+        self._pcm = np.empty(960, dtype='<i2')
+        self.frames_processed = 0
+
+    def process(self, pcm) -> memoryview:
+        """int16 PCM bytes/memoryview → int16 PCM (view on a reused buffer)"""
+        if len(pcm) % 2:
+            pcm = pcm[:-1]
+        raw = np.frombuffer(pcm, dtype='<i2')
+        if len(raw) > len(self._samples):
+            self._samples = np.empty(len(raw), dtype=np.float32)
+        samples = self._samples[:len(raw)]
+        samples[:] = raw
+        if self.vad is not None:
+            self.vad.process(samples)
+        if self.agc is not None:
+            self.agc.process(samples)
+
+        resampled = self.resampler.process_float(samples)
+        if len(resampled) > len(self._pcm):
+            self._pcm = np.empty(len(resampled), dtype='<i2')
+
+        self.frames_processed += 1
+        return memoryview(_to_pcm16(resampled, self._pcm[:len(resampled)])).cast('B')
+
+    def process_b64(self, linear_b64: str) -> str:
+        """Base64 linear16 in → base64 linear16 out"""
+        if not linear_b64:
+            return ""
+        pcm = base64.b64decode(linear_b64)
+        if not pcm:
+            return ""
+        return base64.b64encode(self.process(pcm)).decode('ascii')
+
+
+class MulawOutboundPipeline:
+    """
+    Agent audio: linear16 at HumeAI's output rate → µ-law 8kHz for Twilio.
+
+    ``speed`` != 1.0 adds a WSOLA time-stretch at the telco rate (after the
+    downsample, so it runs on 6x fewer samples).
+    """
+
+    def __init__(self, input_rate: int = 48000, output_rate: int = 8000, speed: float = 1.0):
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.resampler = StreamingResampler(input_rate, output_rate)
+        self.stretcher = TimeStretcher(output_rate, speed) if speed != 1.0 else None
+        self._samples = np.empty(960, dtype=np.float32)
+        self._pcm = np.empty(160, dtype=np.int16)
+        self.frames_processed = 0
+
+    def process(self, pcm) -> bytes:
+        """Little-endian int16 PCM bytes/memoryview → µ-law bytes"""
+        if len(pcm) % 2:
+            pcm = pcm[:-1]  # drop a dangling half-sample instead of failing the chunk
+        raw = np.frombuffer(pcm, dtype='<i2')
+        if len(raw) > len(self._samples):
+            self._samples = np.empty(len(raw), dtype=np.float32)
+        samples = self._samples[:len(raw)]
+        samples[:] = raw
+
+        resampled = self.resampler.process_float(samples)
+        if self.stretcher is not None:
+            resampled = self.stretcher.process(resampled)
+        if len(resampled) > len(self._pcm):
+            self._pcm = np.empty(len(resampled), dtype=np.int16)
+        out = _to_pcm16(resampled, self._pcm[:len(resampled)])
+
+        self.frames_processed += 1
+        return ULAW_ENCODE_TABLE[out.view(np.uint16)].tobytes()
+
+    def process_b64(self, linear_b64: str) -> str:
+        """HumeAI audio_output payload → Twilio media payload"""
+        if not linear_b64:
+            return ""
+        return base64.b64encode(self.process(base64.b64decode(linear_b64))).decode('ascii')
+
+    def reset(self):
+        """Drop resampler / time-stretch state (after a barge-in flush)"""
+        self.resampler.reset()
+        if self.stretcher is not None:
+            self.stretcher.reset()
+
+    def metrics(self) -> dict:
+        return {
+            'frames': self.frames_processed,
+            'stretch': self.stretcher.metrics() if self.stretcher is not None else None,
+        }
+
+
+class LinearOutboundPipeline:
+    """
+    Agent audio: linear16 at HumeAI's output rate → linear16 at the telco rate (Vonage 16kHz).
+    """
+
+    def __init__(self, input_rate: int = 48000, output_rate: int = 16000, speed: float = 1.0):
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.resampler = StreamingResampler(input_rate, output_rate)
+        self.stretcher = TimeStretcher(output_rate, speed) if speed != 1.0 else None
+
+    def process(self, pcm) -> bytes:
+        if len(pcm) % 2:
+            pcm = pcm[:-1]
+        if self.stretcher is None:
+            return self.resampler.process(pcm)
+        self.resampler.frames_processed += 1
+        samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32)
+        stretched = self.stretcher.process(self.resampler.process_float(samples))
+        return _to_pcm16(stretched, np.empty(len(stretched), dtype='<i2')).tobytes()
+
+    def reset(self):
+        self.resampler.reset()
+        if self.stretcher is not None:
+            self.stretcher.reset()
+
+    def metrics(self) -> dict:
+        return {
+            'frames': self.resampler.frames_processed,
+            'stretch': self.stretcher.metrics() if self.stretcher is not None else None,
+        }
+
+
+def twilio_inbound_pipeline():
+    """Twilio µ-law 8kHz → VAD → AGC → HumeAI 48kHz"""
+    return MulawInboundPipeline(
+        output_rate=48000, agc=AutomaticGainControl(sample_rate=8000),
+        vad=VoiceActivityDetector(sample_rate=8000),
+    )
+
+
+def twilio_outbound_pipeline(speed: float = 1.0):
+    """HumeAI 48kHz → [agent speed] → Twilio µ-law 8kHz"""
+    return MulawOutboundPipeline(input_rate=48000, speed=speed)
+
+
+def vonage_inbound_pipeline():
+    """Vonage linear16 16kHz → VAD → AGC → HumeAI 48kHz"""
+    return LinearInboundPipeline(
+        16000, 48000, agc=AutomaticGainControl(sample_rate=16000),
+        vad=VoiceActivityDetector(sample_rate=16000),
+    )
+
+
+def vonage_outbound_pipeline(speed: float = 1.0):
+    """HumeAI 48kHz → [agent speed] → Vonage linear16 16kHz"""
+    return LinearOutboundPipeline(48000, 16000, speed=speed)
@@ -0,0 +1,177 @@
+"""
+Real-time outbound playout scheduler
+Releases agent audio to the telco one frame at a time, paced by the clock
+
+- Frames are sent at most ``lead_ms`` ahead of real time, so the telco jitter
+  buffer never holds more than that (instead of multi-second bursts)
+- Audio still queued here can be dropped instantly on barge-in (``flush()``)
+- One instance (and one asyncio task) per call
+"""
+
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PlayoutScheduler:
+    """
+    Per-call frame pacer for outbound audio.
+
+    Usage:
+        playout = PlayoutScheduler(send_frame, frame_bytes=160, silence=b'\\xff')
+        playout.enqueue(mulaw_bytes)   # any size; split into 20ms frames
+        await playout.flush()          # caller interrupted: drop queued audio
+        await playout.close()          # call ended
+
+    ``send_frame`` is an ``async def (frame: bytes)`` that writes one frame to
+    the telco socket. ``on_flush`` (optional, async) lets the transport discard
+    audio it has already buffered, e.g. Twilio's ``clear`` event.
+    """
+
+    def __init__(self, send_frame, frame_bytes: int, frame_ms: int = 20, lead_ms: int = 60,
+                 silence: bytes = b'\x00', on_flush=None, name: str = 'playout'):
+        self.frame_bytes = frame_bytes
+        self.frame_ms = frame_ms
+        self.lead_ms = lead_ms
+        self.name = name
+        self._send_frame = send_frame
+        self._on_flush = on_flush
+        self._silence = silence
+        self._frame_s = frame_ms / 1000.0
+        self._lead_s = lead_ms / 1000.0
+
+        self._frames = deque()
+        self._partial = bytearray()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closed = False
+        self._playhead = None  # loop time at which the next frame starts playing at the far end
+
+        # Metrics
+        self.frames_sent = 0
+        self.underruns = 0
+        self.flushes = 0
+        self.dropped_ms = 0.0
+        self.max_queued_ms = 0.0
+
+    @property
+    def queued_ms(self) -> float:
+        """Audio accepted but not yet sent to the telco"""
+        return len(self._frames) * self.frame_ms + len(self._partial) * self.frame_ms / self.frame_bytes
+
+    @property
+    def buffered_ms(self) -> float:
+        """Audio already sent but not yet played out at the far end"""
+        if self._playhead is None:
+            return 0.0
+        return max(0.0, (self._playhead - asyncio.get_running_loop().time()) * 1000.0)
+
+    @property
+    def is_playing(self) -> bool:
+        return bool(self._frames or self._partial) or self.buffered_ms > 0
+
+    def enqueue(self, audio: bytes):
+        """Queue agent audio; whole frames go out on the clock, a remainder waits for more"""
+        if self._closed or not audio:
+            return
+        data = self._partial + audio if self._partial else bytes(audio)
+        whole = len(data) - len(data) % self.frame_bytes
+        frame_bytes = self.frame_bytes
+        self._frames.extend(bytes(data[i:i + frame_bytes]) for i in range(0, whole, frame_bytes))
+        self._partial = bytearray(data[whole:])
+
+        self.max_queued_ms = max(self.max_queued_ms, self.queued_ms)
+        self._wakeup.set()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def flush(self) -> float:
+        """Drop everything not yet sent (barge-in). Returns the milliseconds dropped."""
+        dropped = self.queued_ms
+        self._frames.clear()
+        self._partial.clear()
+        self._playhead = None
+        self.flushes += 1
+        self.dropped_ms += dropped
+        self._wakeup.set()
+
+        if self._on_flush is not None:
+            try:
+                await self._on_flush()
+            except Exception as e:
+                logger.error(f"❌ [{self.name}] Flush hook error: {e}")
+        return dropped
+
+    async def close(self):
+        """Stop the pacing task; queued audio is discarded"""
+        self._closed = True
+        self._frames.clear()
+        self._partial.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    async def _wait(self, timeout=None):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        idle = True
+        while not self._closed:
+            now = loop.time()
+            if not self._frames:
+                if not self._partial:
+                    idle = True
+                    await self._wait()
+                    continue
+                ahead = (self._playhead or now) - now
+                if ahead > self._frame_s:
+                    # Give the producer until the far end is about to starve before padding
+                    await self._wait(ahead - self._frame_s)
+                    continue
+                tail = bytes(self._partial)
+                self._partial.clear()
+                self._frames.append(tail + self._silence * (self.frame_bytes - len(tail)))
+
+            if self._playhead is None or self._playhead < now:
+                if not idle:
+                    # Fell behind the clock mid-stream: the far end heard a gap
+                    self.underruns += 1
+                self._playhead = now
+            idle = False
+
+            ahead = self._playhead - now
+            if ahead > self._lead_s:
+                await self._wait(ahead - self._lead_s)
+                continue
+
+            frame = self._frames.popleft()
+            try:
+                await self._send_frame(frame)
+            except Exception as e:
+                logger.error(f"❌ [{self.name}] Frame send failed, stopping playout: {e}")
+                self._closed = True
+                break
+            self._playhead += self._frame_s
+            self.frames_sent += 1
+
+    def metrics(self) -> dict:
+        return {
+            'frames_sent': self.frames_sent,
+            'sent_ms': self.frames_sent * self.frame_ms,
+            'queued_ms': round(self.queued_ms, 1),
+            'max_queued_ms': round(self.max_queued_ms, 1),
+            'underruns': self.underruns,
+            'flushes': self.flushes,
+            'dropped_ms': round(self.dropped_ms, 1),
+        }
@@ -0,0 +1,197 @@
+"""
+Streaming Resampler for live call audio
+Carries filter state across 20ms telco frames so packet boundaries stay seamless
+
+- Default backend: vectorised NumPy polyphase FIR (windowed-sinc, Kaiser window)
+- Fallback backend: audioop.ratecv with its state tuple carried between calls
+"""
+
+import logging
+from math import gcd
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is in requirements.txt
+    np = None
+
+try:
+    import audioop
+except ImportError:  # pragma: no cover - audioop was removed in Python 3.13
+    audioop = None
+
+logger = logging.getLogger(__name__)
+
+
+def design_polyphase_filter(up: int, down: int, zero_crossings: int = 8,
+                            cutoff: float = 0.9, kaiser_beta: float = 6.0):
+    """
+    Design the polyphase filter bank for an up/down rational resampler.
+
+    Returns an array of shape (up, taps_per_phase) where row ``p`` holds the
+    taps used for output phase ``p``, already reversed so a frame window can
+    be dotted with it directly.
+    """
+    factor = max(up, down)
+    num_taps = 2 * zero_crossings * factor + 1
+    taps_per_phase = -(-num_taps // up)  # ceil division
+    padded = taps_per_phase * up
+
+    # Low-pass at the tighter of the two Nyquist limits (upsampled-rate units)
+    fc = cutoff / factor
+    centre = (num_taps - 1) / 2.0
+    n = np.arange(num_taps, dtype=np.float64)
+    taps = fc * np.sinc(fc * (n - centre)) * np.kaiser(num_taps, kaiser_beta)
+    taps *= up / taps.sum()  # unity DC gain after zero-stuffing
+
+    taps = np.concatenate([taps, np.zeros(padded - num_taps)])
+    # Phase p uses taps[p], taps[p + up], taps[p + 2*up], ... on x[i], x[i-1], ...
+    bank = taps.reshape(taps_per_phase, up).T
+    return np.ascontiguousarray(bank[:, ::-1], dtype=np.float32)
+
+
+def _frame_windows(buffer, taps: int):
+    """Zero-copy (len - taps + 1, taps) view of a contiguous float32 buffer"""
+    step = buffer.strides[0]
+    return np.ndarray((len(buffer) - taps + 1, taps), dtype=buffer.dtype,
+                      buffer=buffer, strides=(step, step))
+
+
+def float_to_pcm16(samples) -> bytes:
+    """Round, saturate and pack float samples (int16 scale) as little-endian PCM"""
+    samples = np.rint(samples)
+    np.maximum(samples, -32768, out=samples)
+    np.minimum(samples, 32767, out=samples)
+    return samples.astype('<i2').tobytes()
+
+
+class StreamingResampler:
+    """
+    Stateful int16 mono resampler for one direction of one call.
+
+    Create one instance per call and per direction (e.g. Vonage 16k→48k upstream
+    and 48k→16k downstream) and feed it consecutive frames with ``process()``.
+    The last ``taps_per_phase - 1`` input samples and the output phase are kept
+    between frames, so the output is identical to resampling the whole stream
+    in one go.
+    """
+
+    BACKENDS = ('numpy', 'audioop')
+
+    def __init__(self, input_rate: int, output_rate: int, backend: Optional[str] = None,
+                 zero_crossings: int = 8):
+        if input_rate <= 0 or output_rate <= 0:
+            raise ValueError("Sample rates must be positive")
+
+        if backend is None:
+            backend = 'numpy' if np is not None else 'audioop'
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown resampler backend: {backend}")
+        if backend == 'numpy' and np is None:
+            raise ImportError("NumPy is required for the 'numpy' resampler backend")
+        if backend == 'audioop' and audioop is None:
+            raise ImportError("audioop is not available on this Python version")
+
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.backend = backend
+
+        divisor = gcd(input_rate, output_rate)
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+
+        self.frames_processed = 0
+        self._ratecv_state = None
+
+        if backend == 'numpy':
+            self._bank = design_polyphase_filter(self.up, self.down, zero_crossings)
+            self._bank_t = np.ascontiguousarray(self._bank.T)
+            self.taps_per_phase = self._bank.shape[1]
+            self._inputs_seen = 0   # total input samples consumed
+            self._outputs_made = 0  # total output samples produced
+            # Work buffer = [history (taps - 1) | current frame], reused between frames
+            self._work = np.zeros(self.taps_per_phase - 1 + 960, dtype=np.float32)
+
+    def reset(self):
+        """Drop all carried state (e.g. after a barge-in flush)"""
+        self.frames_processed = 0
+        self._ratecv_state = None
+        if self.backend == 'numpy':
+            self._work[:] = 0.0
+            self._inputs_seen = 0
+            self._outputs_made = 0
+
+    def process(self, pcm) -> bytes:
+        """Resample one frame of little-endian int16 PCM (bytes or memoryview)"""
+        if not pcm:
+            return b''
+
+        self.frames_processed += 1
+
+        if self.up == self.down:
+            return bytes(pcm)
+
+        if self.backend == 'audioop':
+            converted, self._ratecv_state = audioop.ratecv(
+                pcm, 2, 1, self.input_rate, self.output_rate, self._ratecv_state
+            )
+            return converted
+
+        samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32)
+        return float_to_pcm16(self.process_float(samples))
+
+    def process_float(self, samples):
+        """
+        Resample a float32 frame (int16 scale) and return float32 output.
+
+        Used directly by pipelines that keep audio in float between stages.
+        """
+        if self.backend != 'numpy':
+            raise RuntimeError("process_float() requires the numpy backend")
+
+        frame_len = len(samples)
+        if frame_len == 0:
+            return np.zeros(0, dtype=np.float32)
+        if self.up == self.down:
+            return np.asarray(samples, dtype=np.float32)
+
+        taps = self.taps_per_phase
+        keep = taps - 1
+        if keep + frame_len > len(self._work):
+            grown = np.zeros(keep + frame_len, dtype=np.float32)
+            grown[:keep] = self._work[:keep]
+            self._work = grown
+        buffer = self._work[:keep + frame_len]
+        buffer[keep:] = samples
+        available = self._inputs_seen + frame_len
+
+        # Output n needs input index (n * down) // up to be present
+        last_output = (available * self.up - 1) // self.down
+
+        if last_output >= self._outputs_made:
+            if self.down == 1:
+                # Pure interpolation: every input sample yields all `up` phases
+                out = np.dot(_frame_windows(buffer, taps)[:frame_len], self._bank_t).reshape(-1)
+            elif self.up == 1:
+                # Pure decimation: one phase, every `down`-th window (strided view, no gather)
+                first = self._outputs_made * self.down - self._inputs_seen
+                count = last_output + 1 - self._outputs_made
+                step = buffer.strides[0]
+                hops = np.ndarray((count, taps), dtype=buffer.dtype, buffer=buffer,
+                                  offset=first * step, strides=(self.down * step, step))
+                out = np.einsum('ij,j->i', hops, self._bank[0])
+            else:
+                t = np.arange(self._outputs_made, last_output + 1, dtype=np.int64) * self.down
+                start = t // self.up - self._inputs_seen
+                windows = _frame_windows(buffer, taps)
+                out = np.einsum('ij,ij->i', windows[start], self._bank[t % self.up])
+        else:
+            out = np.zeros(0, dtype=np.float32)
+
+        self._outputs_made = last_output + 1
+        self._inputs_seen = available
+        if keep:
+            # Slide the newest `keep` samples to the front for the next frame
+            self._work[:keep] = buffer[-keep:]
+
+        return out.astype(np.float32, copy=False)
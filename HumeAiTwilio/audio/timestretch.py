@@ -0,0 +1,148 @@
+"""
+Streaming WSOLA time-stretch (change speaking rate, keep pitch)
+Replaces the per-chunk ``pydub.effects.speedup`` call in the consumers
+
+WSOLA (waveform-similarity overlap-add), SoundTouch-style: output is built from
+``sequence_ms`` segments (50-125ms, shorter at higher speeds) joined by short
+``overlap_ms`` crossfades. Each next
+segment is read ``speed`` synthesis hops further into the input, nudged by up to
+±search_ms to the offset that best matches the natural continuation of the
+previous segment, so pitch periods line up across the seam instead of cancelling.
+
+Only the offset search is sequential (one correlate + argmax per segment); the
+energy normalisation and the overlap-add for a whole chunk are single vectorised
+passes. State (unconsumed input and the previous segment's tail) is carried
+between calls, so chunk boundaries from HumeAI never show up as clicks. Added
+latency is one sequence + the search range (~100ms at 1.25x).
+"""
+
+import numpy as np
+
+MIN_SPEED = 0.5
+MAX_SPEED = 2.0
+
+
+class TimeStretcher:
+    """
+    Stateful WSOLA over float32 samples (int16 scale).
+
+    ``speed`` > 1 plays faster (1.25 = 25% faster), < 1 slower; 1.0 is a
+    passthrough. Output length per call varies; on average it is
+    ``len(input) / speed``.
+    """
+
+    def __init__(self, sample_rate: int, speed: float = 1.0, sequence_ms: float = None,
+                 overlap_ms: float = 8.0, search_ms: float = None):
+        if not MIN_SPEED <= speed <= MAX_SPEED:
+            raise ValueError(f"speed must be within {MIN_SPEED}..{MAX_SPEED}, got {speed}")
+        # SoundTouch's automatic tuning: long segments when slowing down, short when speeding up
+        blend = (speed - MIN_SPEED) / (MAX_SPEED - MIN_SPEED)
+        if sequence_ms is None:
+            sequence_ms = 125.0 - 75.0 * blend
+        if search_ms is None:
+            search_ms = 12.5 - 5.0 * blend
+        self.sample_rate = sample_rate
+        self.speed = float(speed)
+        self.overlap = max(8, int(sample_rate * overlap_ms / 1000))
+        self.sequence = max(2 * self.overlap, int(sample_rate * sequence_ms / 1000))
+        self.search = max(1, int(sample_rate * search_ms / 1000))
+        self.synthesis_hop = self.sequence - self.overlap
+        self.analysis_hop = self.speed * self.synthesis_hop
+
+        ramp = (np.arange(self.overlap, dtype=np.float32) + 0.5) / self.overlap
+        self._fade_in = ramp
+        self._fade_out = (1.0 - ramp).astype(np.float32)
+        self._offsets = np.arange(self.sequence)
+
+        self._buffer = np.zeros(4 * (self.sequence + 2 * self.search), dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        """Drop carried input and overlap (e.g. after a barge-in flush)"""
+        self._filled = self.search       # leading zeros so the first search has room on the left
+        self._buffer[:self._filled] = 0.0
+        self._position = float(self.search)  # next nominal segment start in _buffer
+        self._previous = None            # start of the last segment taken (its tail is the template)
+        self._tail = None                # last segment's faded-out tail, not yet emitted
+        self.samples_in = 0
+        self.samples_out = 0
+
+    def _append(self, samples):
+        # Compact: keep the previous segment's tail and the left edge of the next search
+        left = int(self._position) - self.search
+        if self._previous is not None:
+            left = min(left, self._previous + self.synthesis_hop)
+        if left > 0:
+            keep = self._filled - left
+            self._buffer[:keep] = self._buffer[left:self._filled]
+            self._filled = keep
+            self._position -= left
+            if self._previous is not None:
+                self._previous -= left
+        need = self._filled + len(samples)
+        if need > len(self._buffer):
+            grown = np.zeros(2 * need, dtype=np.float32)
+            grown[:self._filled] = self._buffer[:self._filled]
+            self._buffer = grown
+        self._buffer[self._filled:need] = samples
+        self._filled = need
+
+    def process(self, samples):
+        """Stretch one chunk of float32 samples; returns a new float32 array"""
+        samples = np.asarray(samples, dtype=np.float32)
+        self.samples_in += len(samples)
+        if self.speed == 1.0:
+            self.samples_out += len(samples)
+            return samples.copy()
+
+        self._append(samples)
+        overlap, sequence, search = self.overlap, self.sequence, self.search
+        buffer = self._buffer[:self._filled]
+        last = self._filled - search - sequence  # largest nominal start with a full search window
+        if int(self._position) > last:
+            return np.zeros(0, dtype=np.float32)
+
+        # 1 / RMS of every overlap-length window, so loud candidates do not win by default
+        squares = np.concatenate(([0.0], np.cumsum(np.square(buffer, dtype=np.float64))))
+        inv_norm = (1.0 / np.sqrt(np.maximum(squares[overlap:] - squares[:-overlap], 1e-3))).astype(np.float32)
+
+        starts = []
+        position, previous = self._position, self._previous
+        while int(position) <= last:
+            nominal = int(position)
+            if previous is None:
+                start = nominal
+            else:
+                template = buffer[previous + self.synthesis_hop:previous + sequence]
+                low = nominal - search
+                scores = np.correlate(buffer[low:nominal + search + overlap], template, mode='valid')
+                scores *= inv_norm[low:low + len(scores)]
+                start = low + int(scores.argmax())
+            starts.append(start)
+            previous = start
+            position += self.analysis_hop
+        self._position, self._previous = position, previous
+
+        # Vectorised overlap-add: each segment emits [crossfaded head | body]; its tail waits
+        segments = buffer[np.asarray(starts)[:, None] + self._offsets]
+        out = segments[:, :self.synthesis_hop].copy()
+        heads = out[:, :overlap]
+        heads *= self._fade_in
+        heads[1:] += segments[:-1, self.synthesis_hop:] * self._fade_out
+        if self._tail is not None:
+            heads[0] += self._tail
+        else:
+            heads[0] = segments[0, :overlap]  # stream start: nothing to crossfade from
+        self._tail = segments[-1, self.synthesis_hop:] * self._fade_out
+
+        out = out.ravel()
+        self.samples_out += len(out)
+        return out
+
+    def metrics(self) -> dict:
+        return {
+            'speed': self.speed,
+            'samples_in': self.samples_in,
+            'samples_out': self.samples_out,
+            'buffered_ms': round(1000 * max(0, self._filled - int(self._position)) / self.sample_rate, 1),
+        }
@@ -0,0 +1,122 @@
+"""
+Frame-level Voice Activity Detection for barge-in
+Runs on decoded PCM (never on raw µ-law bytes) inside the inbound pipelines
+
+- Energy: frame RMS against an adaptive noise floor (tracked on non-speech frames)
+- Zero-crossing rate: rejects broadband hiss/line noise that is loud but not voiced
+- Onset needs ``min_speech_ms`` of consecutive speech (clicks and pops don't barge in)
+- Hangover keeps "speaking" for ``hangover_ms`` after the last speech frame
+"""
+
+import math
+
+import numpy as np
+
+ONSET = 'onset'
+OFFSET = 'offset'
+
+
+class VoiceActivityDetector:
+    """
+    Per-call streaming VAD working on float32/int16 frames (int16 scale).
+
+    ``process()`` returns ``'onset'`` on the frame that confirms caller speech,
+    ``'offset'`` when the hangover runs out, otherwise ``None``. The latest
+    result is also kept in ``last_event`` for pipelines that host the detector.
+    """
+
+    MIN_SPEECH_MS = 60.0
+    HANGOVER_MS = 300.0
+
+    def __init__(self, sample_rate: int, min_rms: float = 300.0, snr_ratio: float = 3.0,
+                 max_zcr: float = 0.35, min_speech_ms: float = MIN_SPEECH_MS,
+                 hangover_ms: float = HANGOVER_MS, noise_adapt: float = 0.05):
+        self.sample_rate = sample_rate
+        self.min_rms = min_rms
+        self.snr_ratio = snr_ratio
+        self.max_zcr = max_zcr
+        self.min_speech_ms = min_speech_ms
+        self.hangover_ms = hangover_ms
+        self.noise_adapt = noise_adapt
+
+        self.noise_rms = min_rms / snr_ratio
+        self.speaking = False
+        self.last_event = None
+        self.last_rms = 0.0
+        self.last_zcr = 0.0
+        self._speech_ms = 0.0
+        self._silence_ms = 0.0
+
+        self.frames = 0
+        self.speech_frames = 0
+        self.onsets = 0
+
+    @property
+    def threshold(self) -> float:
+        return max(self.min_rms, self.noise_rms * self.snr_ratio)
+
+    @property
+    def onset_delay_ms(self) -> float:
+        """How far the onset event lags the first speech frame"""
+        return self.min_speech_ms
+
+    def is_speech(self, samples) -> bool:
+        """Classify one frame (no state change apart from the noise floor)"""
+        length = len(samples)
+        if length < 2:
+            return False
+        samples = np.asarray(samples, dtype=np.float32)
+        rms = math.sqrt(float(np.dot(samples, samples)) / length)
+        signs = np.signbit(samples)
+        zcr = np.count_nonzero(signs[1:] != signs[:-1]) / (length - 1)
+        self.last_rms = rms
+        self.last_zcr = zcr
+
+        threshold = self.threshold
+        if rms > threshold and (zcr < self.max_zcr or rms > 4 * threshold):
+            return True
+        # Only non-speech frames move the noise floor (slowly, so speech can't drag it up)
+        self.noise_rms += self.noise_adapt * (rms - self.noise_rms)
+        return False
+
+    def process(self, samples):
+        """Feed one frame; returns 'onset', 'offset' or None"""
+        frame_ms = 1000.0 * len(samples) / self.sample_rate
+        speech = self.is_speech(samples)
+        self.frames += 1
+        event = None
+
+        if speech:
+            self.speech_frames += 1
+            self._speech_ms += frame_ms
+            self._silence_ms = 0.0
+            if not self.speaking and self._speech_ms >= self.min_speech_ms:
+                self.speaking = True
+                self.onsets += 1
+                event = ONSET
+        else:
+            self._silence_ms += frame_ms
+            if self.speaking:
+                if self._silence_ms >= self.hangover_ms:
+                    self.speaking = False
+                    self._speech_ms = 0.0
+                    event = OFFSET
+            else:
+                self._speech_ms = 0.0
+
+        self.last_event = event
+        return event
+
+    def reset(self):
+        self.speaking = False
+        self.last_event = None
+        self._speech_ms = 0.0
+        self._silence_ms = 0.0
+
+    def metrics(self) -> dict:
+        return {
+            'frames': self.frames,
+            'speech_ratio': round(self.speech_frames / self.frames, 3) if self.frames else 0.0,
+            'onsets': self.onsets,
+            'noise_rms': round(self.noise_rms, 1),
+        }
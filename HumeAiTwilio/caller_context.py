@@ -0,0 +1,133 @@
+"""
+Precomputed returning-customer context (CallerContext), keyed by phone number
+
+Call setup used to query the caller's history (unindexed filter + ORDER BY
+ended_at) and get_or_create their profile before HumeAI was even contacted.
+The context is now built once at call end (``refresh_caller_context``) and
+read at connect with ``get_caller_context``: Django cache first, then one
+lookup on the unique phone_number index. The consumer runs that read next to
+the HumeAI handshake and hands the summary to EVI when it arrives.
+
+Settings:
+    CALLER_CONTEXT_RECENT_CALLS    calls kept in recent_calls (default 3)
+    CALLER_CONTEXT_CACHE_SECONDS   cache lifetime of a context (default 1 day)
+"""
+
+import logging
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import CallerContext, CustomerProfile, TwilioCall
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_FIELDS = ('phone_number', 'profile_name', 'call_count', 'recent_calls', 'summary', 'last_call_at')
+
+
+def customer_number(call) -> Optional[str]:
+    """The customer's side of the call: callee for outbound, caller for inbound"""
+    if call is None:
+        return None
+    return call.from_number if call.direction == 'inbound' else call.to_number
+
+
+def _cache_key(phone: str) -> str:
+    return f"caller_context:{phone}"
+
+
+def _cache_seconds() -> float:
+    return getattr(settings, 'CALLER_CONTEXT_CACHE_SECONDS', 86400)
+
+
+def get_caller_context(phone: str) -> Optional[dict]:
+    """Context dict for a returning number, None for a first-time caller"""
+    if not phone:
+        return None
+    key = _cache_key(phone)
+    context = cache.get(key)
+    if context is None:
+        context = CallerContext.objects.filter(phone_number=phone).values(*CONTEXT_FIELDS).first() or {}
+        cache.set(key, context, _cache_seconds())  # {} remembers "no history" until the first call ends
+    return context or None
+
+
+def _recent_call(row: dict) -> dict:
+    sentiment = row['clarifies_analytics__avg_sentiment']
+    return {
+        'call_sid': row['call_sid'],
+        'ended_at': row['ended_at'].isoformat() if row['ended_at'] else None,
+        'duration': row['duration'],
+        'outcome': row['clarifies_analytics__outcome'],
+        'sentiment': round(sentiment, 2) if sentiment is not None else None,
+        'emotion': row['clarifies_analytics__dominant_customer_emotion'] or None,
+    }
+
+
+def summarize(profile_name: Optional[str], call_count: int, recent_calls: list) -> str:
+    """Plain-text context for the agent, e.g. "Returning caller Sara, 3 previous calls. ..." """
+    who = f"Returning caller {profile_name}" if profile_name else "Returning caller"
+    lines = [f"{who}, {call_count} previous call{'s' if call_count != 1 else ''}."]
+    for idx, recent in enumerate(recent_calls, 1):
+        details = [recent['ended_at'][:10] if recent['ended_at'] else 'date unknown']
+        if recent['duration']:
+            details.append(f"{recent['duration'] // 60}m {recent['duration'] % 60:02d}s")
+        if recent['outcome']:
+            details.append(f"outcome {recent['outcome']}")
+        if recent['emotion']:
+            details.append(f"mostly {recent['emotion']}")
+        if recent['sentiment'] is not None:
+            details.append(f"sentiment {recent['sentiment']:+.2f}")
+        lines.append(f"{idx}. " + ", ".join(details))
+    return "\n".join(lines)
+
+
+RECENT_CALL_FIELDS = (
+    'call_sid', 'ended_at', 'duration', 'clarifies_analytics__outcome',
+    'clarifies_analytics__avg_sentiment', 'clarifies_analytics__dominant_customer_emotion',
+)
+
+
+def completed_calls(phone: str):
+    """Completed calls with this customer number, newest first
+
+    One UNION arm per side of the call so each searches its own
+    (number, status, -ended_at) index instead of the planner falling back to
+    the low-selectivity status index for an OR.
+    """
+    inbound = TwilioCall.objects.filter(from_number=phone, status='completed', direction='inbound')
+    outbound = TwilioCall.objects.filter(to_number=phone, status='completed').exclude(direction='inbound')
+    return (inbound.order_by().values(*RECENT_CALL_FIELDS)
+            .union(outbound.order_by().values(*RECENT_CALL_FIELDS), all=True)
+            .order_by('-ended_at'))
+
+
+def refresh_caller_context(call) -> Optional[dict]:
+    """Rebuild the number's context after a call ends (idempotent) and refresh the cache"""
+    phone = customer_number(call)
+    if not phone:
+        return None
+    limit = getattr(settings, 'CALLER_CONTEXT_RECENT_CALLS', 3)
+    completed = completed_calls(phone)
+    rows = list(completed[:limit])
+    recent_calls = [_recent_call(row) for row in rows]
+    call_count = completed.count()
+    if not call_count:
+        return None
+
+    profile_name = CustomerProfile.objects.filter(phone_number=phone).values_list('full_name', flat=True).first()
+    context = {
+        'phone_number': phone,
+        'profile_name': profile_name,
+        'call_count': call_count,
+        'recent_calls': recent_calls,
+        'summary': summarize(profile_name, call_count, recent_calls),
+        'last_call_at': rows[0]['ended_at'] if rows else None,
+    }
+    CallerContext.objects.update_or_create(
+        phone_number=phone, defaults={k: v for k, v in context.items() if k != 'phone_number'}
+    )
+    cache.set(_cache_key(phone), context, _cache_seconds())
+    logger.info(f"📇 [CONTEXT] Caller context for {phone} saved ({call_count} calls)")
+    return context
@@ -0,0 +1,247 @@
+"""
+Per-call write-behind buffer for ConversationLog rows
+
+The realtime consumers used to run one ``ConversationLog.objects.create`` per
+HumeAI event (every transcript and every prosody/emotion frame), each holding a
+thread-pool slot and a DB round-trip on the audio path. ``ConversationLogBuffer``
+collects the rows in memory and writes them with a single ``bulk_create`` when
+``max_rows`` are pending or ``max_delay`` seconds after the first pending row,
+whichever comes first.
+
+Durability: ``close()`` (called from ``handle_stop`` / ``disconnect``) always
+flushes what is left, so every row is in the database before the call is marked
+completed and post-call analysis reads the transcript. A failed batch stays in
+the buffer and is retried on the next flush; ``close()`` falls back to per-row
+saves so one bad row cannot drop the rest.
+
+The Twilio consumer keeps its Q/A pairs in memory instead and hands them to
+``persist_history_later`` at call end: one transaction, one ``bulk_create``,
+one analytics snapshot, run after ``disconnect`` has returned.
+"""
+
+import asyncio
+import logging
+import time
+
+from channels.db import database_sync_to_async
+
+logger = logging.getLogger(__name__)
+
+
+def _bulk_create(rows):
+    from .models import ConversationLog
+    ConversationLog.objects.bulk_create(rows)
+
+
+class ConversationLogBuffer:
+    """Batches unsaved ConversationLog instances for one call"""
+
+    def __init__(self, max_rows: int = 25, max_delay: float = 2.0, write=_bulk_create, clock=time.monotonic):
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.clock = clock
+        self._write = database_sync_to_async(write)
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+        self._lock = asyncio.Lock()
+        self._closed = False
+        self.rows_added = 0
+        self.rows_written = 0
+        self.round_trips = 0
+        self.failed_flushes = 0
+        self.max_flush_ms = 0.0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, **fields):
+        """Queue one ConversationLog row; returns the (not yet saved) instance"""
+        from .models import ConversationLog
+        log = ConversationLog(**fields)
+        self._pending.append(log)
+        self.rows_added += 1
+        if self._closed:
+            # Late event after close(): nothing else will flush it
+            self._schedule_flush()
+        elif len(self._pending) >= self.max_rows:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._schedule_flush)
+        return log
+
+    def _schedule_flush(self):
+        # Flushes queue on the lock; one started behind a running flush picks up what arrived meanwhile
+        self._cancel_timer()
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def flush(self) -> int:
+        """Write every pending row in one bulk_create; returns rows written"""
+        async with self._lock:
+            self._cancel_timer()
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, []
+            started = self.clock()
+            try:
+                await self._write(batch)
+            except Exception as e:
+                self._pending[:0] = batch  # keep order; retried by the next flush / close()
+                self.failed_flushes += 1
+                if not self._closed and self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._schedule_flush)
+                logger.error(f"❌ [DB] ConversationLog batch of {len(batch)} failed, will retry: {e}")
+                return 0
+            self.round_trips += 1
+            self.rows_written += len(batch)
+            self.max_flush_ms = max(self.max_flush_ms, (self.clock() - started) * 1000)
+            logger.info(f"💾 [DB] Flushed {len(batch)} ConversationLog rows")
+            return len(batch)
+
+    async def close(self) -> int:
+        """Final flush at call end; falls back to per-row saves if the batch fails"""
+        self._closed = True
+        written = await self.flush()
+        if self._pending:
+            async with self._lock:
+                batch, self._pending = self._pending, []
+                lost = 0
+                for log in batch:
+                    try:
+                        await database_sync_to_async(log.save)(force_insert=True)
+                        self.round_trips += 1
+                        self.rows_written += 1
+                        written += 1
+                    except Exception as e:
+                        lost += 1
+                        logger.error(f"❌ [DB] ConversationLog row dropped at call end: {e}")
+                if lost:
+                    logger.error(f"❌ [DB] {lost} ConversationLog rows could not be saved")
+        return written
+
+    def stats(self) -> dict:
+        return {
+            'rows': self.rows_added,
+            'written': self.rows_written,
+            'pending': len(self._pending),
+            'round_trips': self.round_trips,
+            'failed_flushes': self.failed_flushes,
+            'max_flush_ms': round(self.max_flush_ms, 1),
+        }
+
+
+def get_conversation_buffer() -> ConversationLogBuffer:
+    """Buffer built from settings.CONVERSATION_BUFFER_MAX_ROWS / CONVERSATION_BUFFER_MAX_DELAY"""
+    from django.conf import settings
+    return ConversationLogBuffer(
+        max_rows=getattr(settings, 'CONVERSATION_BUFFER_MAX_ROWS', 25),
+        max_delay=getattr(settings, 'CONVERSATION_BUFFER_MAX_DELAY', 2.0),
+    )
+
+
+def persist_conversation_history(call_sid: str, history: list) -> int:
+    """
+    End-of-call write of the Twilio consumer's Q/A pairs
+
+    Every pair becomes a user + assistant ConversationLog row; all rows go in one
+    ``bulk_create`` and the call's analytics snapshot is folded from them once,
+    inside one transaction. If the batch fails the rows are saved one by one so
+    one bad row cannot drop the transcript. Then marks the transcript complete.
+    Returns rows written.
+    """
+    from .models import TwilioCall
+
+    call = TwilioCall.objects.filter(call_sid=call_sid).first()
+    if not call:
+        logger.warning(f"⚠️ Call not found in database: {call_sid}")
+        return 0
+    written = _write_history(call, history)
+    mark_transcript_complete(call_sid)
+    return written
+
+
+def _write_history(call, history: list) -> int:
+    from django.db import transaction
+    from django.utils import timezone
+    from .emotion_vectors import emotion_fields
+    from .models import ConversationLog
+    from .services.live_analytics import LiveCallAnalytics
+
+    logs = []
+    for idx, pair in enumerate(history):
+        try:
+            answered_at = pair.get('answered_at') or timezone.now()
+            logs += [
+                ConversationLog(call=call, role='user', message=pair['question'], metadata={'pair_index': idx},
+                                timestamp=pair.get('asked_at') or answered_at, **emotion_fields(pair.get('emotions'))),
+                ConversationLog(call=call, role='assistant', message=pair['answer'], metadata={'pair_index': idx},
+                                timestamp=answered_at),
+            ]
+        except Exception as e:
+            logger.error(f"❌ Failed to prepare conversation pair {idx}: {e}")
+    if not logs:
+        return 0
+
+    try:
+        with transaction.atomic():
+            ConversationLog.objects.bulk_create(logs)
+            written = len(logs)
+            snapshot = LiveCallAnalytics.from_logs(logs).persist(call)
+    except Exception as e:
+        logger.error(f"❌ [DB] Conversation history batch failed, saving row by row: {e}")
+        written = 0
+        for log in logs:
+            try:
+                log.save(force_insert=True)
+                written += 1
+            except Exception as e:
+                logger.error(f"❌ [DB] ConversationLog row dropped at call end: {e}")
+        try:
+            snapshot = LiveCallAnalytics.from_logs(logs).persist(call)
+        except Exception as e:
+            snapshot = None
+            logger.error(f"Analytics update failed: {e}")
+
+    if snapshot:
+        logger.info(f"📊 Analytics updated for call {call.call_sid}: "
+                    f"sentiment {snapshot['avg_sentiment']} ({snapshot['sentiment_trend']})")
+    logger.info(f"💾 Saved {written} conversation messages to database")
+    return written
+
+
+def mark_transcript_complete(call_sid: str) -> bool:
+    """
+    Record that the consumer's final ConversationLog write for this call is done
+    (post_call.finalise_transcript waits on it). A post-call run already waiting
+    for the transcript is resumed straight away rather than on its next retry.
+    """
+    from django.utils import timezone
+    from .models import PostCallRun, TwilioCall
+
+    if not TwilioCall.objects.filter(call_sid=call_sid).update(transcript_completed_at=timezone.now()):
+        return False
+    if PostCallRun.objects.filter(call_sid=call_sid, status='retrying').exists():
+        from .post_call import dispatch
+        try:
+            dispatch(call_sid)
+        except Exception as e:
+            logger.error(f"❌ [POST-CALL] Could not resume {call_sid} after its transcript: {e}")
+    return True
+
+
+_history_tasks = set()
+
+
+def persist_history_later(call_sid: str, history: list) -> asyncio.Task:
+    """Run persist_conversation_history off the caller's path (e.g. a consumer's disconnect)"""
+    task = asyncio.ensure_future(database_sync_to_async(persist_conversation_history)(call_sid, list(history)))
+    _history_tasks.add(task)  # keep a reference until it finishes
+    task.add_done_callback(_history_tasks.discard)
+    return task
@@ -0,0 +1,272 @@
+"""
+Shared sentence-embedding model for knowledge search
+
+KnowledgeManager (ChromaDB / NumPy backends), build_vector_index and the
+training API each loaded all-MiniLM-L6-v2 themselves at startup and encoded
+one string per call. One EmbeddingService per process (get_embedding_service)
+replaces that:
+
+- the model is loaded on the first encode that misses the cache, so startup
+  and cache-only processes never pay for it
+- encode() calls from different threads are micro-batched: a batcher thread
+  takes every queued text (at most EMBEDDING_BATCH_SIZE) and runs one
+  model.encode() for them. Texts queue up while a batch is encoding; once
+  batches hold more than one text it also waits up to EMBEDDING_BATCH_WAIT_MS
+  for company, while a lone caller is encoded at once. Identical texts
+  already in flight share one future
+- vectors are cached by the SHA-1 of the model name and normalise_phrase(text)
+  (case / punctuation / whitespace-insensitive): an in-process LRU of
+  EMBEDDING_CACHE_SIZE entries, then one .npy per text under
+  EMBEDDING_CACHE_DIR, shared by every process and kept across restarts
+
+encode() mirrors SentenceTransformer.encode: a str gives a (dim,) vector, a
+list a (n, dim) matrix (lists skip the batcher and encode their misses in one
+call).
+
+Settings:
+    EMBEDDING_MODEL           sentence-transformers model name
+    EMBEDDING_BATCH_SIZE      texts per model.encode() (default 32)
+    EMBEDDING_BATCH_WAIT_MS   how long a batch waits for company (default 5)
+    EMBEDDING_CACHE_SIZE      in-process LRU entries (default 10000)
+    EMBEDDING_CACHE_DIR       on-disk cache ('' disables, default agent_knowledge_db/embeddings)
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+from django.conf import settings
+
+from .response_cache import normalise_phrase
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def model_available() -> bool:
+    """sentence-transformers is installed (checked without importing it)"""
+    return importlib.util.find_spec('sentence_transformers') is not None
+
+
+def _load_sentence_transformer(name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+
+class EmbeddingService:
+    """Lazy model + micro-batching + LRU / disk cache; thread-safe, one per process"""
+
+    def __init__(self, model_name: str = None, loader=None, cache_dir=None, cache_size: int = None,
+                 batch_size: int = None, batch_wait_ms: float = None):
+        self.model_name = model_name or _setting('EMBEDDING_MODEL', DEFAULT_MODEL)
+        self._loader = loader or _load_sentence_transformer
+        cache_dir = _setting('EMBEDDING_CACHE_DIR', 'agent_knowledge_db/embeddings') if cache_dir is None else cache_dir
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cache_size = cache_size or _setting('EMBEDDING_CACHE_SIZE', 10000)
+        self.batch_size = batch_size or _setting('EMBEDDING_BATCH_SIZE', 32)
+        wait = _setting('EMBEDDING_BATCH_WAIT_MS', 5) if batch_wait_ms is None else batch_wait_ms
+        self.batch_wait = wait / 1000.0
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._lru = OrderedDict()                 # key -> float32 vector
+        self._pending = {}                        # key -> Future of a queued text
+        self._lock = threading.Lock()             # guards _lru, _pending, stats
+        self._queue = queue.Queue()
+        self._batcher = None
+        self.stats = Counter()
+        self.load_seconds = None
+
+    # ------------------------------------------------------------------ model
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    started = time.perf_counter()
+                    model = self._loader(self.model_name)
+                    self.load_seconds = time.perf_counter() - started
+                    logger.info(f"🧠 [EMBEDDINGS] Loaded {self.model_name} in {self.load_seconds:.2f}s")
+                    self._model = model
+        return self._model
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.model.encode(texts, batch_size=self.batch_size), dtype=np.float32)
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['encoded'] += len(texts)
+        return vectors.reshape(len(texts), -1)
+
+    # ------------------------------------------------------------------ cache
+
+    def cache_key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\n{normalise_phrase(text)}".encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.npy'
+
+    def _cached(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return vector
+        if self.cache_dir is not None:
+            try:
+                vector = np.load(self._disk_path(key))
+            except (OSError, ValueError):
+                vector = None
+            if vector is not None:
+                self._remember(key, vector, disk=False)
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+                return vector
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def _remember(self, key: str, vector: np.ndarray, disk: bool = True):
+        vector.setflags(write=False)  # shared between callers
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.cache_size:
+                self._lru.popitem(last=False)
+        if disk and self.cache_dir is not None:
+            path = self._disk_path(key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                partial = path.with_name(f'{key}.{os.getpid()}.{threading.get_ident()}.tmp')
+                with open(partial, 'wb') as handle:
+                    np.save(handle, vector)
+                os.replace(partial, path)
+            except OSError as e:
+                logger.warning(f"⚠️ [EMBEDDINGS] Disk cache write failed: {e}")
+
+    # ------------------------------------------------------------------ batching
+
+    def submit(self, text: str) -> Future:
+        """Future of one text's vector: resolved at once on a cache hit, else queued for the batcher"""
+        key = self.cache_key(text)
+        vector = self._cached(key)
+        if vector is not None:
+            future = Future()
+            future.set_result(vector)
+            return future
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future
+            future = self._pending[key] = Future()
+            if self._batcher is None or not self._batcher.is_alive():
+                self._batcher = threading.Thread(target=self._run_batcher, name='embedding-batcher', daemon=True)
+                self._batcher.start()
+        self._queue.put((key, text, future))
+        return future
+
+    def _run_batcher(self):
+        last_size = 1
+        while True:
+            batch = [self._queue.get()]
+            # only wait for company under load: a lone caller's text is encoded at once
+            deadline = time.monotonic() + (self.batch_wait if last_size > 1 else 0.0)
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            last_size = len(batch)
+            try:
+                vectors = self._encode_batch([text for _, text, _ in batch])
+            except Exception as e:
+                logger.error(f"❌ [EMBEDDINGS] Batch of {len(batch)} failed: {e}")
+                for key, _, future in batch:
+                    self._settle(key, future, error=e)
+                continue
+            for (key, _, future), vector in zip(batch, vectors):
+                self._remember(key, vector)
+                self._settle(key, future, vector)
+
+    def _settle(self, key: str, future: Future, vector=None, error: Exception = None):
+        with self._lock:
+            self._pending.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(vector)
+
+    # ------------------------------------------------------------------ public
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = None, timeout: float = None) -> np.ndarray:
+        """(dim,) vector for a str (micro-batched with other threads), (n, dim) matrix for a list"""
+        if isinstance(texts, str):
+            return self.submit(texts).result(timeout)
+        return self.encode_many(texts, batch_size)
+
+    def encode_many(self, texts: List[str], batch_size: int = None) -> np.ndarray:
+        """Cached rows plus one model.encode() per batch_size of distinct misses, in input order"""
+        batch_size = batch_size or self.batch_size
+        keys = [self.cache_key(text) for text in texts]
+        found = {}
+        for key in dict.fromkeys(keys):
+            vector = self._cached(key)
+            if vector is not None:
+                found[key] = vector
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        items = list(missing.items())
+        for start in range(0, len(items), batch_size):
+            chunk = items[start:start + batch_size]
+            for (key, _), vector in zip(chunk, self._encode_batch([text for _, text in chunk])):
+                self._remember(key, vector)
+                found[key] = vector
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([found[key] for key in keys])
+
+    async def aencode(self, text: str) -> np.ndarray:
+        """encode() for consumers: awaits the batch without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, 'model': self.model_name, 'model_loaded': self._model is not None,
+                    'load_seconds': self.load_seconds, 'memory_entries': len(self._lru)}
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """This process's EmbeddingService (the model itself loads on first use)"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService()
+        return _service
+
+
+def reset_embedding_service():
+    """Drop this process's service (tests)"""
+    global _service
+    with _service_lock:
+        _service = None
@@ -0,0 +1,116 @@
+"""
+Retention policy for HumeAI prosody emotion events
+
+HumeAI sends emotion updates many times per utterance; storing each one as a
+ConversationLog row gave dashboards hundreds of near-identical rows per call.
+``EmotionRetention`` groups consecutive frames into spans and stores one row per
+span: the mean vector over the span, with the frame count in
+``metadata['emotion_frames']`` so LiveCallAnalytics / process_completed_call
+weight the row by how many frames it stands for.
+
+Policies (settings.EMOTION_RETENTION_POLICY):
+    all        one row per frame (previous behaviour)
+    utterance  one row per caller utterance (span closed on user_message)
+    rate       one row per EMOTION_RETENTION_INTERVAL seconds
+    change     a new row only when the top emotion changes or its score moves
+               by EMOTION_RETENTION_DELTA from the current span's mean
+
+Rows are emitted when their span closes, so they keep arrival order with the
+transcript rows around them.
+"""
+
+import time
+
+import numpy as np
+
+from .emotion_vectors import EMOTION_VOCABULARY, encode_vector, to_vector, top_emotions
+
+RETENTION_POLICIES = ('all', 'utterance', 'rate', 'change')
+
+
+class EmotionRetention:
+    """Per-call span aggregator; ``offer`` / ``end_utterance`` / ``flush`` return rows to store"""
+
+    def __init__(self, policy: str = 'change', interval: float = 1.0, delta: float = 0.15,
+                 dtype: str = None, clock=time.monotonic):
+        if policy not in RETENTION_POLICIES:
+            raise ValueError(f"policy must be one of {RETENTION_POLICIES}, got {policy!r}")
+        self.policy = policy
+        self.interval = interval
+        self.delta = delta
+        self.dtype = dtype
+        self.clock = clock
+        self.frames = 0
+        self.rows = 0
+        self._reset_span()
+
+    def _reset_span(self):
+        self._sum = np.zeros(len(EMOTION_VOCABULARY), dtype=np.float64)
+        self._extras = {}
+        self._count = 0
+        self._started = None
+
+    def _closes_span(self, vector) -> bool:
+        if not self._count:
+            return False
+        if self.policy == 'rate':
+            return self.clock() - self._started >= self.interval
+        if self.policy == 'change':
+            mean = self._sum / self._count
+            top = int(mean.argmax())
+            return int(vector.argmax()) != top or abs(vector[top] - mean[top]) >= self.delta
+        return False  # utterance: closed by end_utterance()
+
+    def offer(self, scores) -> list:
+        """Add one emotion frame; returns the rows (0-2) that are now final"""
+        vector, extras = to_vector(scores)
+        if not vector.any() and not extras:
+            return []
+        self.frames += 1
+        rows = self.flush() if self._closes_span(vector) else []
+        if self._started is None:
+            self._started = self.clock()
+        self._sum += vector
+        self._extras.update(extras)
+        self._count += 1
+        if self.policy == 'all':
+            rows += self.flush()
+        return rows
+
+    def end_utterance(self) -> list:
+        """Caller finished an utterance (user_message); closes the span for the 'utterance' policy"""
+        return self.flush() if self.policy == 'utterance' else []
+
+    def flush(self) -> list:
+        """Close the open span (call end / span boundary)"""
+        if not self._count:
+            return []
+        mean = self._sum / self._count
+        row = {
+            'emotion_top': top_emotions(mean),
+            'emotion_scores': dict(self._extras) or None,
+            'metadata': {'emotion_frames': self._count, 'retention': self.policy},
+        }
+        if mean.any():
+            row['emotion_vector'] = encode_vector(mean, self.dtype)
+        self._reset_span()
+        self.rows += 1
+        return [row]
+
+    def stats(self) -> dict:
+        return {
+            'policy': self.policy,
+            'frames': self.frames,
+            'rows': self.rows,
+            'frames_per_row': round(self.frames / self.rows, 1) if self.rows else None,
+        }
+
+
+def get_emotion_retention() -> EmotionRetention:
+    """Per-call policy from settings.EMOTION_RETENTION_POLICY / _INTERVAL / _DELTA"""
+    from django.conf import settings
+    return EmotionRetention(
+        policy=getattr(settings, 'EMOTION_RETENTION_POLICY', 'change'),
+        interval=getattr(settings, 'EMOTION_RETENTION_INTERVAL', 1.0),
+        delta=getattr(settings, 'EMOTION_RETENTION_DELTA', 0.15),
+    )
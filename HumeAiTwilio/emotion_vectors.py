@@ -0,0 +1,120 @@
+"""
+Compact storage for Hume emotion scores
+
+Every HumeAI prosody event carries ~48 named scores. ConversationLog used to
+store them as a JSON dict per row (the Twilio path even as a JSON *string*
+inside the JSONField), and every analytics pass parsed that JSON again.
+
+Rows now store ``emotion_vector``: the scores over the fixed ``EMOTION_VOCABULARY``
+as little-endian float16 (96 bytes; float32 = 192 bytes via
+EMOTION_VECTOR_DTYPE) plus ``emotion_top``, a small JSON dict of the strongest
+emotions for the dashboards. Scores outside the vocabulary (rare, e.g.
+``agent_confidence``) stay in ``emotion_scores``. The dtype is recovered from
+the blob length, so float16 and float32 rows can coexist.
+
+Readers decode with ``np.frombuffer``; ``stack_vectors`` turns a whole call or
+date range into one (rows, 48) matrix in a single call.
+"""
+
+import json
+
+import numpy as np
+
+EMOTION_VOCABULARY = (
+    'Admiration', 'Adoration', 'Aesthetic Appreciation', 'Amusement', 'Anger', 'Anxiety',
+    'Awe', 'Awkwardness', 'Boredom', 'Calmness', 'Concentration', 'Confusion',
+    'Contemplation', 'Contempt', 'Contentment', 'Craving', 'Desire', 'Determination',
+    'Disappointment', 'Disgust', 'Distress', 'Doubt', 'Ecstasy', 'Embarrassment',
+    'Empathic Pain', 'Entrancement', 'Envy', 'Excitement', 'Fear', 'Guilt',
+    'Horror', 'Interest', 'Joy', 'Love', 'Nostalgia', 'Pain',
+    'Pride', 'Realization', 'Relief', 'Romance', 'Sadness', 'Satisfaction',
+    'Shame', 'Surprise (negative)', 'Surprise (positive)', 'Sympathy', 'Tiredness', 'Triumph',
+)
+EMOTION_INDEX = {name: i for i, name in enumerate(EMOTION_VOCABULARY)}
+
+VECTOR_DTYPES = {'float16': np.dtype('<f2'), 'float32': np.dtype('<f4')}
+_DTYPE_BY_SIZE = {len(EMOTION_VOCABULARY) * dtype.itemsize: dtype for dtype in VECTOR_DTYPES.values()}
+
+TOP_K = 3
+
+
+def _default_dtype():
+    from django.conf import settings
+    return getattr(settings, 'EMOTION_VECTOR_DTYPE', 'float16')
+
+
+def parse_scores(scores):
+    """Emotion scores as a dict: accepts dicts and (double-encoded) JSON strings"""
+    while isinstance(scores, str):
+        scores = json.loads(scores)
+    return scores if isinstance(scores, dict) else {}
+
+
+def to_vector(scores) -> tuple:
+    """(float64 vector over EMOTION_VOCABULARY, {other name: value}) from a scores dict"""
+    vector = np.zeros(len(EMOTION_VOCABULARY), dtype=np.float64)
+    extras = {}
+    for name, value in parse_scores(scores).items():
+        index = EMOTION_INDEX.get(name)
+        if index is not None and isinstance(value, (int, float)):
+            vector[index] = value
+        else:
+            extras[name] = value
+    return vector, extras
+
+
+def encode_vector(vector, dtype: str = None) -> bytes:
+    return np.asarray(vector).astype(VECTOR_DTYPES[dtype or _default_dtype()]).tobytes()
+
+
+def decode_vector(blob) -> np.ndarray:
+    """float32 vector over EMOTION_VOCABULARY from a stored blob"""
+    blob = bytes(blob)
+    return np.frombuffer(blob, dtype=_DTYPE_BY_SIZE[len(blob)]).astype(np.float32)
+
+
+def stack_vectors(blobs) -> np.ndarray:
+    """(rows, len(EMOTION_VOCABULARY)) float32 matrix from stored blobs, one frombuffer per dtype"""
+    blobs = [bytes(blob) for blob in blobs]
+    matrix = np.empty((len(blobs), len(EMOTION_VOCABULARY)), dtype=np.float32)
+    if not blobs:
+        return matrix
+    sizes = np.fromiter((len(blob) for blob in blobs), dtype=np.int64, count=len(blobs))
+    for size in np.unique(sizes):
+        rows = np.flatnonzero(sizes == size)
+        joined = b''.join(blobs[i] for i in rows)
+        matrix[rows] = np.frombuffer(joined, dtype=_DTYPE_BY_SIZE[int(size)]).reshape(len(rows), -1)
+    return matrix
+
+
+def top_emotions(vector, k: int = TOP_K) -> dict:
+    """{name: score} for the k strongest emotions, strongest first"""
+    vector = np.asarray(vector)
+    k = min(k, len(vector))
+    top = np.argpartition(vector, -k)[-k:]
+    top = top[np.argsort(vector[top])[::-1]]
+    return {EMOTION_VOCABULARY[i]: round(float(vector[i]), 4) for i in top if vector[i] > 0}
+
+
+def vector_to_dict(vector, extras: dict = None) -> dict:
+    """Sparse {name: score} (non-zero vocabulary entries + extras), the shape the APIs always returned"""
+    vector = np.asarray(vector)
+    scores = {EMOTION_VOCABULARY[i]: round(float(vector[i]), 4) for i in np.flatnonzero(vector)}
+    if extras:
+        scores.update(extras)
+    return scores
+
+
+def emotion_fields(scores, dtype: str = None) -> dict:
+    """ConversationLog field values (emotion_vector / emotion_top / emotion_scores) for one Hume event"""
+    scores = parse_scores(scores)
+    if not scores:
+        return {}
+    vector, extras = to_vector(scores)
+    if not vector.any():
+        return {'emotion_scores': extras or None}
+    return {
+        'emotion_vector': encode_vector(vector, dtype),
+        'emotion_top': top_emotions(vector),
+        'emotion_scores': extras or None,
+    }
@@ -0,0 +1,234 @@
+"""
+Pre-warmed HumeAI EVI WebSocket pool keyed by config_id
+
+Opening an EVI chat costs a TLS + WebSocket handshake (hundreds of ms) that the
+callee used to hear as dead air: the consumers only dialled HumeAI after the
+telco stream connected. ``initiate_call`` now calls ``prewarm(config_id)`` while
+the phone is still ringing; the consumer's ``acquire(config_id)`` takes the
+ready socket (or waits for the one still handshaking) and only falls back to a
+fresh connect on a miss. Unused sockets are closed after HUME_POOL_TTL_SECONDS
+so idle EVI sessions are not left running.
+
+All pool state lives on the consumers' event loop: ``bind_loop()`` is called on
+every consumer connect and ``prewarm()`` (safe from sync views / other threads)
+hands work to that loop with ``call_soon_threadsafe``.
+
+Limitation: the pool is per process and only learns its loop from a consumer
+connect, so the first call after a restart is never prewarmed, and neither is
+a call whose initiate_call request lands in another worker process than its
+media stream (``stats()['skipped']`` counts these). Those calls connect as before.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+HUME_EVI_URL = "wss://api.hume.ai/v0/assistant/chat?config_id={config_id}"
+
+
+def hume_api_key() -> str:
+    from decouple import config
+    return config('HUME_AI_API_KEY', default=config('HUME_API_KEY', default=''))
+
+
+def open_hume_socket(config_id: str, api_key: str = None):
+    """``websockets.connect`` for an EVI chat (awaitable; same options the consumers used)"""
+    return websockets.connect(
+        HUME_EVI_URL.format(config_id=config_id),
+        extra_headers={'X-Hume-Api-Key': api_key or hume_api_key(), 'Content-Type': 'application/json'},
+        ping_interval=20,
+        ping_timeout=20,
+    )
+
+
+class HumeSessionPool:
+    """Idle, already-connected EVI sockets per config_id with TTL expiry"""
+
+    def __init__(self, ttl: float = 45.0, max_idle: int = 4, connect_timeout: float = 10.0,
+                 enabled: bool = True, connect=open_hume_socket, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_idle = max_idle
+        self.connect_timeout = connect_timeout
+        self.enabled = enabled
+        self.connect = connect
+        self.clock = clock
+        self._loop = None
+        self._idle = {}      # config_id → deque of (socket, opened_at)
+        self._opening = {}   # config_id → list of futures for handshakes in flight
+        self._claimed = set()  # in-flight handshakes a consumer is already waiting on
+        self.hits = 0
+        self.misses = 0
+        self.prewarmed = 0
+        self.expired = 0
+        self.failed = 0
+        self.skipped = 0     # prewarm requested before any consumer bound a loop
+
+    def bind_loop(self, loop=None):
+        """Remember the consumers' event loop (call from consumer connect)"""
+        loop = loop or asyncio.get_running_loop()
+        if self._loop is not loop:
+            old_loop, idle, opening = self._loop, self._idle, self._opening
+            self._loop = loop
+            self._idle, self._opening, self._claimed = {}, {}, set()
+            if old_loop is not None:
+                self._discard(old_loop, idle, opening)
+
+    @staticmethod
+    def _discard(loop, idle: dict, opening: dict):
+        """Close sockets / cancel handshakes left on a loop the pool no longer serves"""
+        sockets = [socket for entries in idle.values() for socket, _ in entries]
+        futures = [future for pending in opening.values() for future in pending]
+        if not sockets and not futures:
+            return
+        if loop.is_closed():
+            # nothing can run there any more: drop the connections outright
+            for socket in sockets:
+                transport = getattr(socket, 'transport', None)
+                if transport is not None:
+                    transport.abort()
+            return
+
+        def cleanup():
+            for future in futures:
+                future.cancel()
+            for socket in sockets:
+                asyncio.ensure_future(socket.close())
+        loop.call_soon_threadsafe(cleanup)
+        logger.info(f"🔥 HumeAI pool: loop changed, closing {len(sockets)} idle / {len(futures)} opening sessions")
+
+    def prewarm(self, config_id: str, count: int = 1) -> bool:
+        """Start opening ``count`` sessions for an outbound call that is about to ring"""
+        if not self.enabled or not config_id:
+            return False
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self.skipped += 1
+            logger.info(f"🔥 HumeAI pool: no consumer loop yet, prewarm skipped for {config_id}")
+            return False
+        loop.call_soon_threadsafe(self._start_open, config_id, count)
+        return True
+
+    def _start_open(self, config_id: str, count: int):
+        for _ in range(count):
+            pending = len(self._idle.get(config_id, ())) + len(self._opening.get(config_id, ()))
+            if pending >= self.max_idle:
+                return
+            future = self._loop.create_task(self._open(config_id))
+            self._opening.setdefault(config_id, []).append(future)
+            future.add_done_callback(lambda done, cid=config_id: self._opened(cid, done))
+
+    async def _open(self, config_id: str):
+        started = self.clock()
+        socket = await asyncio.wait_for(self.connect(config_id), timeout=self.connect_timeout)
+        logger.info(f"🔥 HumeAI pool: warm session for {config_id} in {(self.clock() - started) * 1000:.0f}ms")
+        return socket
+
+    def _opened(self, config_id: str, future):
+        if future.get_loop() is not self._loop:
+            # handshake from a loop the pool was rebound away from (_discard cancels it)
+            if not future.cancelled() and future.exception() is None:
+                asyncio.ensure_future(future.result().close())
+            return
+        opening = self._opening.get(config_id, [])
+        if future in opening:
+            opening.remove(future)
+        if future.cancelled():
+            self._claimed.discard(future)
+            return
+        if future.exception() is not None:
+            self._claimed.discard(future)
+            self.failed += 1
+            logger.warning(f"⚠️ HumeAI pool: prewarm failed for {config_id}: {future.exception()}")
+            return
+        self.prewarmed += 1
+        if future in self._claimed:
+            self._claimed.discard(future)
+            return  # a consumer awaited this handshake and took the socket
+        socket = future.result()
+        self._idle.setdefault(config_id, deque()).append((socket, self.clock()))
+        self._loop.call_later(self.ttl, self._expire, config_id, socket)
+
+    def _expire(self, config_id: str, socket):
+        idle = self._idle.get(config_id)
+        for entry in list(idle or ()):
+            if entry[0] is socket:
+                idle.remove(entry)
+                self.expired += 1
+                asyncio.ensure_future(socket.close())
+                logger.info(f"⌛ HumeAI pool: unused session for {config_id} expired after {self.ttl:.0f}s")
+                return
+
+    async def acquire(self, config_id: str):
+        """
+        A connected EVI socket for ``config_id`` or None (caller connects itself).
+        Waits for a prewarm handshake that is still in flight rather than racing it.
+        """
+        if not self.enabled or not config_id:
+            return None
+        self.bind_loop()
+        idle = self._idle.get(config_id)
+        while idle:
+            socket, _ = idle.popleft()
+            if getattr(socket, 'open', True):
+                self.hits += 1
+                return socket
+            self.expired += 1  # closed by HumeAI while idle
+        for future in self._opening.get(config_id, []):
+            if future not in self._claimed:
+                self._claimed.add(future)
+                try:
+                    socket = await asyncio.shield(future)
+                except Exception:
+                    break
+                self.hits += 1
+                return socket
+        self.misses += 1
+        return None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'prewarmed': self.prewarmed,
+            'expired': self.expired,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'idle': {config_id: len(idle) for config_id, idle in list(self._idle.items()) if idle},
+            'opening': {config_id: len(opening) for config_id, opening in list(self._opening.items()) if opening},
+        }
+
+    async def close(self):
+        """Close every idle socket (shutdown / tests)"""
+        for opening in self._opening.values():
+            for future in opening:
+                future.cancel()
+        for idle in self._idle.values():
+            while idle:
+                socket, _ = idle.popleft()
+                await socket.close()
+        self._opening.clear()
+        self._claimed.clear()
+
+
+_default_pool = None
+
+
+def get_hume_session_pool() -> HumeSessionPool:
+    """Process-wide pool built from settings.HUME_POOL_ENABLED / HUME_POOL_TTL_SECONDS / HUME_POOL_MAX_IDLE"""
+    global _default_pool
+    if _default_pool is None:
+        from django.conf import settings
+        _default_pool = HumeSessionPool(
+            ttl=getattr(settings, 'HUME_POOL_TTL_SECONDS', 45.0),
+            max_idle=getattr(settings, 'HUME_POOL_MAX_IDLE', 4),
+            enabled=getattr(settings, 'HUME_POOL_ENABLED', True),
+        )
+    return _default_pool
@@ -9,12 +9,20 @@ import base64
 import asyncio
 import logging
 import websockets
-import audioop  # For audio format conversion
+from functools import partial
 from typing import Optional
 from channels.generic.websocket import AsyncWebsocketConsumer
-from pydub import AudioSegment
-from pydub.effects import speedup
-import io
+from django.utils import timezone
+from .audio import (
+    PlayoutScheduler, VoiceActivityDetector, get_dsp_executor,
+    twilio_inbound_pipeline, twilio_outbound_pipeline,
+)
+import numpy as np
+import time
+from .metrics import TurnLatencyTracker, ensure_loop_lag_monitor
+from .hume_pool import get_hume_session_pool, open_hume_socket
+from .response_cache import PhraseRecorder, ResponseCache, normalise_phrase
+from .conversation_buffer import persist_history_later
 
 logger = logging.getLogger(__name__)
 
@@ -25,45 +33,32 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
     Handles real-time bidirectional audio streaming
     """
     
-    def convert_mulaw_to_linear16(self, mulaw_b64: str) -> str:
+    # Greeting sent in the EVI session config; the only turn cached as this voice's greeting
+    GREETING_TEXT = "Hello! This is Sarah from SalesAice.ai. How are you today?"
+    
+    async def convert_mulaw_to_linear16(self, mulaw_b64: str) -> str:
         """Convert µ-law audio from Twilio to linear16 PCM for HumeAI with VOLUME BOOST"""
         try:
             if not mulaw_b64:
                 logger.warning(f"⚠️ Empty µ-law data provided for conversion")
                 return ""
             
-            # Decode base64 µ-law audio
-            mulaw_data = base64.b64decode(mulaw_b64)
+            # 🔥 Fused pipeline: µ-law decode (one table lookup) → VAD → per-call AGC
+            # → stateful 8kHz → 48kHz resample → base64, all in one pass
+            # (runs inline, on a thread or in a DSP worker per AUDIO_DSP_MODE)
+            linear_b64 = await self.inbound_pipeline.process_b64(mulaw_b64)
             
-            if len(mulaw_data) == 0:
+            if not linear_b64:
                 logger.warning(f"⚠️ Empty µ-law data after base64 decode")
                 return ""
             
-            # Convert µ-law to linear16 PCM
-            linear_data = audioop.ulaw2lin(mulaw_data, 2)  # 2 bytes per sample (16-bit)
-            
-            # 🔥🔥 BOOST CUSTOMER VOLUME by 2.8x (180% louder for PERFECT HumeAI detection)
-            linear_data = audioop.mul(linear_data, 2, 2.8)
-            
-            # 🔥 ABSOLUTE MAX: Resample from 8kHz → 48kHz for HumeAI
-            # 6x the sample rate for STUDIO QUALITY audio
-            linear_data = audioop.ratecv(linear_data, 2, 1, 8000, 48000, None)[0]
-            
-            # Validate conversion
-            expected_len = len(mulaw_data) * 2 * 6  # *2 for 16-bit, *6 for 8k→48k upsampling
-            if len(linear_data) != expected_len:
-                logger.warning(f"⚠️ Unexpected conversion size: {len(mulaw_data)} µ-law → {len(linear_data)} linear16")
-            
-            # Encode back to base64
-            linear_b64 = base64.b64encode(linear_data).decode('utf-8')
-            
             # Log conversion success occasionally
             if not hasattr(self, '_conversion_count'):
                 self._conversion_count = 0
             self._conversion_count += 1
             
             if self._conversion_count % 100 == 1:  # Log first and every 100th
-                logger.info(f"🔄 Audio conversion #{self._conversion_count}: {len(mulaw_data)} µ-law 8kHz → {len(linear_data)} linear16 48kHz (STUDIO QUALITY)")
+                logger.info(f"🔄 Audio conversion #{self._conversion_count}: {len(mulaw_b64)} chars µ-law 8kHz → {len(linear_b64)} chars linear16 48kHz (STUDIO QUALITY)")
             
             return linear_b64
             
@@ -72,68 +67,99 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
             logger.error(f"   Input length: {len(mulaw_b64) if mulaw_b64 else 0}")
             return ""  # Return empty instead of original to prevent bad data
     
-    def convert_linear16_to_mulaw(self, linear_b64: str) -> str:
+    async def convert_linear16_to_mulaw(self, linear_b64: str) -> str:
         """Convert linear16 PCM from HumeAI to µ-law for Twilio"""
         try:
-            # Decode base64 linear16 audio
-            linear_data = base64.b64decode(linear_b64)
+            # 🔥 Fused pipeline: stateful 48kHz → 8kHz resample + µ-law table encode
+            mulaw_b64 = await self.outbound_pipeline.process_b64(linear_b64)
             
-            # �🔥 ABSOLUTE MAX: Downsample from 48kHz → 8kHz for Twilio
-            # This ensures proper playback speed with studio-quality source
-            linear_data = audioop.ratecv(linear_data, 2, 1, 48000, 8000, None)[0]
-            
-            logger.info(f"🔄 Converting audio: {len(linear_data)} bytes linear16 48kHz → 8kHz µ-law (STUDIO → PHONE)")
-            
-            # Convert linear16 PCM to µ-law
-            mulaw_data = audioop.lin2ulaw(linear_data, 2)  # 2 bytes per sample (16-bit)
-            
-            # Encode back to base64
-            mulaw_b64 = base64.b64encode(mulaw_data).decode('utf-8')
-            
-            logger.info(f"✅ Conversion successful: {len(mulaw_data)} bytes µ-law")
+            logger.info(f"✅ Conversion successful: {len(linear_b64)} chars linear16 48kHz → {len(mulaw_b64)} chars µ-law 8kHz")
             return mulaw_b64
         except Exception as e:
             logger.error(f"❌ Audio conversion error: {e}")
             logger.error(f"❌ Input data length: {len(linear_b64) if linear_b64 else 0}")
             return linear_b64  # Return original if conversion fails
 
-    def speed_up_audio(self, linear_data: bytes, speed_factor: float = 2.0) -> bytes:
-        """
-        Speed up audio by the given factor using pydub
-        speed_factor = 2.0 means 100% faster (DOUBLE SPEED for natural human speech)
-        """
+    async def apply_agent_speed(self, speed) -> None:
+        """Rebuild the outbound stage with the agent's WSOLA speaking rate (before agent audio flows)"""
         try:
-            # Convert raw bytes to AudioSegment
-            audio = AudioSegment.from_raw(
-                io.BytesIO(linear_data),
-                sample_width=2,  # 16-bit audio (2 bytes per sample)
-                frame_rate=8000,  # 8kHz sample rate (Twilio standard)
-                channels=1  # Mono audio
-            )
-            
-            # Speed up the audio
-            fast_audio = speedup(audio, playback_speed=speed_factor)
-            
-            # Convert back to raw bytes
-            output = io.BytesIO()
-            fast_audio.export(output, format="raw")
-            
-            sped_up_data = output.getvalue()
-            
-            # Log speed adjustment (occasionally to avoid spam)
-            if not hasattr(self, '_speedup_count'):
-                self._speedup_count = 0
-            self._speedup_count += 1
-            
-            if self._speedup_count % 50 == 1:  # Log first and every 50th
-                logger.info(f"🚀 Audio speed adjustment #{self._speedup_count}: {speed_factor}x faster ({len(linear_data)} → {len(sped_up_data)} bytes)")
-            
-            return sped_up_data
+            speed = float(speed or 1.0)
+            if speed == 1.0:
+                return
+            self.agent_speed = speed
+            previous = self.outbound_pipeline
+            self.outbound_pipeline = self.dsp.session(partial(twilio_outbound_pipeline, speed=speed))
+            await previous.close()
+            logger.info(f"🚀 Agent speaking rate: {speed}x (streaming WSOLA)")
+        except Exception as e:
+            logger.error(f"❌ Speed adjustment setup failed: {e}")
+
+    async def get_audio_metrics(self) -> dict:
+        """Per-call audio stats (AGC gain trajectory, VAD, playout, barge-in)"""
+        inbound = getattr(self, 'inbound_pipeline', None)
+        stages = await inbound.metrics() if inbound else {}
+        playout = getattr(self, 'playout', None)
+        latencies = getattr(self, 'barge_in_latencies_ms', [])
+        return {
+            'agc': stages.get('agc'),
+            'playout': playout.metrics() if playout else None,
+            'vad': stages.get('vad'),
+            'barge_in': {
+                'count': len(latencies),
+                'latency_ms_p50': round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+                'latency_ms_max': round(max(latencies), 1) if latencies else None,
+            },
+        }
+
+    def init_audio_pipelines(self):
+        """Create the per-call audio stages (also used by bench_barge_in)"""
+        # 🎚️ Per-call fused audio pipelines (preallocated buffers + resampler state)
+        # Inbound: VAD (🗣️ local barge-in) → AGC (replaces the fixed 2.8x boost) → resample
+        # Each stage runs where AUDIO_DSP_MODE says: inline, thread pool or DSP worker process
+        self.dsp = get_dsp_executor()
+        self.inbound_pipeline = self.dsp.session(twilio_inbound_pipeline)    # Twilio → HumeAI
+        self.outbound_pipeline = self.dsp.session(twilio_outbound_pipeline)  # HumeAI → Twilio
+        
+        # ⏱️ Paced playout: 20ms µ-law frames (160 bytes) released on a real-time clock
+        self.playout = PlayoutScheduler(
+            self.send_twilio_frame, frame_bytes=160, silence=b'\xff',
+            on_flush=self.send_twilio_clear, name='twilio-playout'
+        )
+        self.barge_in_active = False      # caller is talking over the agent; drop agent audio
+        self.barge_in_latencies_ms = []   # caller speech start → agent silent
+        self.latency = TurnLatencyTracker('twilio')  # ⏱️ caller speech end → first agent byte
+        self.agent_speed = 1.0
+        self.phrase_recorder = None       # 🗃️ records greeting / common phrase clips for the audio cache
+        self.cached_greeting = None       # normalised text of a greeting already played from cache
+        self.suppress_reply_audio = False  # HumeAI is re-speaking the cached greeting - drop it
+
+    async def get_call_metrics(self) -> dict:
+        """Everything persisted to TwilioCall.call_metrics at the end of the call"""
+        latency = getattr(self, 'latency', None)
+        return {
+            'turn_latency': latency.summary() if latency else None,
+            'audio': await self.get_audio_metrics(),
+        }
+
+    async def save_call_metrics(self):
+        """⏱️ Store turn latency percentiles + audio stats on the call (one UPDATE)"""
+        try:
+            from HumeAiTwilio.models import TwilioCall
+            from channels.db import database_sync_to_async
             
+            if not self.call_sid:
+                return
+            metrics = await self.get_call_metrics()
+            updated = await database_sync_to_async(
+                TwilioCall.objects.filter(call_sid=self.call_sid).update
+            )(call_metrics=metrics)
+            logger.info(f"🎚️ Audio metrics for call {self.call_sid}: {metrics['audio']}")
+            turn_latency = metrics['turn_latency'] or {}
+            total = turn_latency.get('stages', {}).get('turn_total', {})
+            logger.info(f"⏱️ Turn latency for call {self.call_sid}: {turn_latency.get('turns', 0)} turns, "
+                        f"p50 {total.get('p50_ms')}ms / p95 {total.get('p95_ms')}ms (saved: {bool(updated)})")
         except Exception as e:
-            logger.error(f"❌ Speed adjustment failed: {e}")
-            # Return original audio if speed adjustment fails
-            return linear_data
+            logger.error(f"❌ Save call metrics error: {str(e)}")
 
     async def connect(self):
         """Accept WebSocket connection from Twilio"""
@@ -145,8 +171,13 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
         self.hume_ws = None
         self.hume_connected = False
         
+        # 🎚️ Per-call audio stages (pipelines, AGC, VAD, paced playout)
+        self.init_audio_pipelines()
+        ensure_loop_lag_monitor()  # ⏱️ how long frames wait behind work on this loop
+        get_hume_session_pool().bind_loop()  # 🔥 prewarms from initiate_call land on this loop
+        
         # 🚀 ISSUE #3 FIX: Initialize response caching for faster responses
-        from .response_cache import ResponseCache, initialize_response_cache
+        from .response_cache import initialize_response_cache
         initialize_response_cache()
         logger.info("✅ Response cache system initialized for this connection")
         
@@ -163,8 +194,14 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
         logger.info(f"WebSocket disconnected: {close_code}")
+        await self.playout.close()
         
-        # 💾 SAVE: Store conversation to database first
+        # ⏱️ SAVE: Per-call turn latency percentiles + audio stats
+        await self.save_call_metrics()
+        await self.inbound_pipeline.close()
+        await self.outbound_pipeline.close()
+        
+        # 💾 SAVE: Q&A pairs + analytics in one background transaction (not awaited here)
         await self.save_conversation_to_database()
         
         # 🎯 AUTO-TRAIN: Extract conversation and train agent
@@ -209,6 +246,7 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
             
             logger.info(f"✅ Twilio WebSocket connected for call: {self.call_sid}")
             logger.info(f"📞 Stream started: {self.stream_sid}")
+            self.latency.mark_stream_start()  # ⏱️ callee is listening: time to first greeting
             
             # Send initial configuration to Twilio for optimal audio
             await self.configure_twilio_stream()
@@ -270,13 +308,16 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
                     from HumeAiTwilio.models import TwilioCall
                     
                     # Get call from database
-                    call = await sync_to_async(TwilioCall.objects.filter(call_sid=self.call_sid).first)()
+                    call = await sync_to_async(
+                        TwilioCall.objects.select_related('agent').filter(call_sid=self.call_sid).first
+                    )()
                     
                     if call:
                         # Try to get from agent relationship first
                         if hasattr(call, 'agent') and call.agent and call.agent.hume_config_id:
                             requested_config_id = call.agent.hume_config_id
                             logger.info(f"📥 Config ID from database agent: {requested_config_id}")
+                            await self.apply_agent_speed(call.agent.speech_speed)
                         
                         # Try to get from metadata
                         elif call.metadata:
@@ -327,16 +368,18 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
             hume_url = f"wss://api.hume.ai/v0/assistant/chat?config_id={config_id}"
             logger.info(f"🌐 URL: {hume_url}")
             
-            # Add authentication headers with API key
-            headers = {
-                'X-Hume-Api-Key': hume_api_key,
-                'Content-Type': 'application/json'
-            }
+            # 🗃️ Cached greeting plays right away while the HumeAI session comes up
+            voice = ResponseCache.voice_key(config_id, self.agent_speed)
+            self.play_cached_greeting(voice)
+            self.phrase_recorder = PhraseRecorder(voice, 'mulaw_8k', greeting_text=self.GREETING_TEXT)
             
-            self.hume_ws = await asyncio.wait_for(
-                websockets.connect(hume_url, extra_headers=headers, ping_interval=20, ping_timeout=20),
-                timeout=10.0
-            )
+            # 🔥 Warm session prewarmed by initiate_call (skips TLS + WebSocket handshake)
+            self.hume_ws = await get_hume_session_pool().acquire(config_id)
+            self.latency.mark_hume_session(pool_hit=self.hume_ws is not None)
+            if self.hume_ws is None:
+                self.hume_ws = await asyncio.wait_for(open_hume_socket(config_id, hume_api_key), timeout=10.0)
+            else:
+                logger.info(f"🔥 Using pre-warmed HumeAI session for {config_id}")
             
             self.hume_connected = True
             logger.info(f"✅ HumeAI WebSocket connected successfully!")
@@ -382,7 +425,7 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
                 # 🎙️ GREETING: Auto greeting with interruption + wait for response
                 "greeting": {
                     "enabled": True,
-                    "text": "Hello! This is Sarah from SalesAice.ai. How are you today?",
+                    "text": self.GREETING_TEXT,
                     "interruptible": True,             # ✅ Customer can interrupt greeting!
                     "style": "natural",
                     "wait_for_response": True,         # ✅ Wait for customer to respond
@@ -515,13 +558,19 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
                 logger.info(f"   📡 Stream: {self.stream_sid}")
                 self._first_audio_logged = True
             
-            # Convert µ-law to linear16 PCM for HumeAI
-            linear_payload = self.convert_mulaw_to_linear16(payload)
+            received_at = asyncio.get_running_loop().time()
+            
+            # Convert µ-law to linear16 PCM for HumeAI (VAD runs on the decoded frame)
+            linear_payload = await self.convert_mulaw_to_linear16(payload)
             
             if not linear_payload:
                 logger.error(f"❌ Audio conversion failed")
                 return
             
+            # 🗣️ Caller started/stopped talking → barge-in handling
+            if self.inbound_pipeline.last_event:
+                await self.handle_vad_event(self.inbound_pipeline.last_event, received_at)
+            
             # Send converted audio to HumeAI with enhanced message
             hume_message = {
                 "type": "audio_input",
@@ -559,6 +608,9 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
         try:
             logger.info(f"⏹️  Stream stopped: {self.stream_sid}")
             
+            # Nothing left to play to a closed stream
+            await self.playout.close()
+            
             # Close HumeAI connection
             if self.hume_ws and not self.hume_ws.closed:
                 await self.hume_ws.close()
@@ -583,7 +635,13 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
                     # HumeAI EVI v2 sends audio in 'data' field
                     audio_data = data.get('data')
                     
-                    if audio_data:
+                    if self.barge_in_active:
+                        # Caller is talking over the agent - don't queue the rest of this reply
+                        logger.debug(f"🔇 Dropping agent audio during barge-in")
+                    elif self.suppress_reply_audio:
+                        logger.debug(f"🗃️ Dropping HumeAI greeting audio (already played from cache)")
+                    elif audio_data:
+                        self.latency.mark_first_audio()
                         logger.info(f"🔊 Received audio from HumeAI ({len(audio_data)} chars)")
                         
                         # 🚀 Send audio in optimized 60ms chunks for natural playback
@@ -591,7 +649,15 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
                     else:
                         logger.warning(f"⚠️ audio_output without 'data' field")
                 
+                elif msg_type == 'user_interruption':
+                    # HumeAI detected the interruption itself - stop whatever is still queued
+                    if self.playout.is_playing:
+                        dropped = await self.playout.flush()
+                        logger.info(f"✋ HumeAI user_interruption: dropped {dropped:.0f}ms of agent audio")
+                
                 elif msg_type == 'user_message':
+                    self.latency.mark_transcript()
+                    
                     # Log transcription with emotion detection
                     transcript = data.get('text')
                     logger.info(f"👤 User said: {transcript}")
@@ -603,15 +669,17 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
                     if transcript:
                         message_data = {
                             'text': transcript,
-                            'emotions': emotions if emotions else None
+                            'emotions': emotions if emotions else None,
+                            'at': timezone.now()
                         }
                         self.customer_messages.append(message_data)
                 
                 elif msg_type == 'assistant_message':
                     # Log AI response text
-                    response = data.get('content') or data.get('text')
+                    response = data.get('content') or data.get('text') or (data.get('message') or {}).get('content')
                     if response:
                         logger.info(f"🤖 AI responds: {response}")
+                        self.on_assistant_text(response)
                         
                         # 🎯 STORE for training
                         self.agent_messages.append(response)
@@ -626,9 +694,18 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
                             self.conversation_history.append({
                                 "question": last_question,
                                 "answer": response,
-                                "emotions": last_emotions
+                                "emotions": last_emotions,
+                                "asked_at": None if isinstance(last_message, str) else last_message.get('at'),
+                                "answered_at": timezone.now()
                             })
                 
+                elif msg_type == 'assistant_end':
+                    # 🗃️ Turn complete: cache it if it was the greeting / a common phrase
+                    if self.phrase_recorder:
+                        self.phrase_recorder.finish()
+                    self.cached_greeting = None
+                    self.suppress_reply_audio = False
+                
                 elif msg_type == 'error':
                     # Log HumeAI error details
                     error_msg = data.get('message', 'Unknown error')
@@ -642,46 +719,106 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
             logger.error(f"❌ Listen to HumeAI error: {str(e)}")
     
     async def send_audio_chunks_to_twilio(self, audio_base64: str):
-        """Send audio to Twilio in small 60ms chunks for smooth, natural playback"""
+        """Queue HumeAI audio for paced 20ms playout to Twilio"""
         try:
             if not audio_base64:
                 logger.warning(f"⚠️ Empty audio data received from HumeAI")
                 return
             
             # Convert linear16 PCM from HumeAI to µ-law for Twilio (with 48kHz→8kHz downsampling)
-            mulaw_payload = self.convert_linear16_to_mulaw(audio_base64)
-            mulaw_bytes = base64.b64decode(mulaw_payload)
-            
-            # 🚀 EXTREME OPTIMIZED: 40ms chunks = 320 bytes at 8kHz µ-law (8000 samples/sec × 0.04 sec)
-            # Smaller chunks = FASTER initial audio delivery for instant response feel!
-            chunk_size = 320
-            chunk_count = 0
-            
-            logger.info(f"🚀 Sending {len(mulaw_bytes)} bytes in {len(mulaw_bytes)//chunk_size + 1} chunks (40ms - EXTREME FAST!)")
-            
-            for i in range(0, len(mulaw_bytes), chunk_size):
-                chunk = mulaw_bytes[i:i + chunk_size]
-                chunk_b64 = base64.b64encode(chunk).decode("utf-8")
-                
-                message = {
-                    "event": "media",
-                    "streamSid": self.stream_sid,
-                    "media": {"payload": chunk_b64}
-                }
-                
-                await self.send(text_data=json.dumps(message))
-                chunk_count += 1
-                
-                # NO DELAY - Send as fast as possible for instant response!
-                # Smaller 40ms chunks = faster initial audio = perceived instant response!
-            
-            logger.info(f"✅ Sent {chunk_count} chunks in 40ms intervals - LIGHTNING FAST!")
+            # Raw bytes straight through the pipeline - no intermediate base64 round-trip
+            mulaw_bytes = await self.outbound_pipeline.process(base64.b64decode(audio_base64))
+            if self.phrase_recorder:
+                self.phrase_recorder.on_audio(mulaw_bytes)
+            
+            # ⏱️ The scheduler releases frames on the clock (small lead) instead of bursting
+            # seconds of audio into Twilio's buffer, so barge-in can still cancel it
+            self.playout.enqueue(mulaw_bytes)
+            logger.info(f"🎵 Queued {len(mulaw_bytes)} bytes for playout ({self.playout.queued_ms:.0f}ms queued)")
                 
         except Exception as e:
             logger.error(f"❌ Send audio chunks error: {str(e)}")
             import traceback
             logger.error(f"❌ Full traceback: {traceback.format_exc()}")
     
+    def play_cached_greeting(self, voice: str) -> bool:
+        """Queue this voice's cached µ-law greeting clip (no HumeAI round-trip)"""
+        try:
+            text = ResponseCache.get_greeting_text(voice)
+            clip = ResponseCache.get_cached_audio(text, voice, 'mulaw_8k')
+            if not clip:
+                return False
+            self.playout.enqueue(clip)
+            self.cached_greeting = normalise_phrase(text)
+            logger.info(f"🗃️ Playing cached greeting ({len(clip) / 8000:.1f}s): {text}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Cached greeting error: {str(e)}")
+            return False
+    
+    def on_assistant_text(self, text: str):
+        """Track the assistant turn for the phrase recorder / cached-greeting suppression"""
+        if self.phrase_recorder:
+            self.phrase_recorder.on_text(text)
+        if self.cached_greeting is not None:
+            spoken = normalise_phrase(self.phrase_recorder.text if self.phrase_recorder else text)
+            # HumeAI's own greeting repeats what the caller already heard from cache
+            self.suppress_reply_audio = bool(spoken) and self.cached_greeting.startswith(spoken)
+            if not self.suppress_reply_audio:
+                self.cached_greeting = None
+    
+    async def handle_vad_event(self, event: str, received_at: float):
+        """Local VAD onset while the agent is talking → barge-in; offset → let HumeAI answer"""
+        try:
+            if event == 'onset':
+                if self.playout.is_playing:
+                    await self.interrupt_agent(received_at)
+            elif event == 'offset':
+                # Speech really ended one hangover before the offset fired
+                self.latency.mark_speech_end(time.monotonic() - VoiceActivityDetector.HANGOVER_MS / 1000.0)
+                if self.barge_in_active:
+                    self.barge_in_active = False
+                    if self.hume_ws and not self.hume_ws.closed:
+                        await self.hume_ws.send(json.dumps({"type": "resume_assistant_message"}))
+                    logger.info(f"🗣️ Caller finished speaking - HumeAI resumed")
+        except Exception as e:
+            logger.error(f"❌ VAD event error: {str(e)}")
+    
+    async def interrupt_agent(self, received_at: float):
+        """Silence the agent now: drop queued audio, clear Twilio's buffer, pause HumeAI"""
+        loop = asyncio.get_running_loop()
+        speech_started = received_at - VoiceActivityDetector.MIN_SPEECH_MS / 1000.0
+        self.barge_in_active = True
+        self.latency.cancel_turn()
+        if self.phrase_recorder:
+            self.phrase_recorder.cancel()
+        
+        dropped = await self.playout.flush()  # also sends Twilio 'clear'
+        await self.outbound_pipeline.reset()
+        latency_ms = (loop.time() - speech_started) * 1000.0
+        self.barge_in_latencies_ms.append(latency_ms)
+        
+        if self.hume_ws and not self.hume_ws.closed:
+            await self.hume_ws.send(json.dumps({"type": "pause_assistant_message"}))
+        
+        logger.info(f"✋ Barge-in: dropped {dropped:.0f}ms of agent audio, agent silent {latency_ms:.0f}ms after caller speech")
+    
+    async def send_twilio_frame(self, frame: bytes):
+        """Send one paced µ-law frame to Twilio"""
+        self.latency.mark_first_send()
+        message = {
+            "event": "media",
+            "streamSid": self.stream_sid,
+            "media": {"payload": base64.b64encode(frame).decode("ascii")}
+        }
+        await self.send(text_data=json.dumps(message))
+    
+    async def send_twilio_clear(self):
+        """Tell Twilio to drop audio it has buffered but not yet played"""
+        if self.stream_sid:
+            await self.send(text_data=json.dumps({"event": "clear", "streamSid": self.stream_sid}))
+            logger.info(f"🧹 Sent clear to Twilio stream {self.stream_sid}")
+    
     async def send_audio_chunk_to_twilio(self, chunk_payload: str, sequence: int):
         """Send individual audio chunk to Twilio with sequence tracking"""
         try:
@@ -719,7 +856,7 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
                 return
             
             # Convert linear16 PCM from HumeAI to µ-law for Twilio
-            mulaw_payload = self.convert_linear16_to_mulaw(audio_base64)
+            mulaw_payload = await self.convert_linear16_to_mulaw(audio_base64)
             
             # Log detailed audio info
             logger.info(f"🔊 Audio conversion: {len(audio_base64)} → {len(mulaw_payload)} bytes")
@@ -802,85 +939,17 @@ class HumeTwilioRealTimeConsumer(AsyncWebsocketConsumer):
     async def save_conversation_to_database(self):
         """
         💾 Save conversation logs to database for analytics & transcript
+        One transaction + bulk_create + analytics snapshot, scheduled so disconnect does not wait on it
         """
         try:
-            from HumeAiTwilio.models import TwilioCall, ConversationLog
-            from channels.db import database_sync_to_async
-            
             if not self.call_sid:
                 logger.warning(f"⚠️ No call_sid available, skipping conversation save")
                 return
-            
-            # Get TwilioCall object
-            @database_sync_to_async
-            def get_call():
-                return TwilioCall.objects.filter(call_sid=self.call_sid).first()
-            
-            call = await get_call()
-            
-            if not call:
-                logger.warning(f"⚠️ Call not found in database: {self.call_sid}")
-                return
-            
-            # Save conversation logs
-            @database_sync_to_async
-            def save_logs():
-                import json
-                saved_count = 0
-                
-                # Save customer messages and agent responses together
-                for idx, qa_pair in enumerate(self.conversation_history):
-                    try:
-                        # Extract emotions if available
-                        emotions = qa_pair.get('emotions')
-                        emotion_scores_json = json.dumps(emotions) if emotions else None
-                        
-                        # Save customer message with emotions
-                        customer_log = ConversationLog.objects.create(
-                            call=call,
-                            role='user',
-                            message=qa_pair['question'],
-                            emotion_scores=emotion_scores_json,
-                            metadata={'pair_index': idx}
-                        )
-                        saved_count += 1
-                        
-                        # 📊 Update analytics in real-time with Hume AI emotion scores
-                        if emotion_scores_json:
-                            try:
-                                from .services.analytics_processor import AnalyticsProcessor
-                                AnalyticsProcessor.update_analytics_on_new_message(
-                                    call_sid=str(call.call_sid),
-                                    message=qa_pair['question'],
-                                    role='user',
-                                    emotion_scores=emotions
-                                )
-                                logger.info(f"📊 Analytics updated for user message in call {call.call_sid}")
-                            except Exception as e:
-                                logger.error(f"Analytics update failed: {e}")
-                        
-                        # Save agent response
-                        ConversationLog.objects.create(
-                            call=call,
-                            role='assistant',
-                            message=qa_pair['answer'],
-                            metadata={'pair_index': idx}
-                        )
-                        saved_count += 1
-                        
-                    except Exception as e:
-                        logger.error(f"❌ Failed to save conversation pair {idx}: {e}")
-                        continue
-                
-                return saved_count
-            
-            saved_count = await save_logs()
-            logger.info(f"💾 Saved {saved_count} conversation messages to database")
-            
+            # Also for an empty history: it marks the transcript complete for the post-call pipeline
+            persist_history_later(self.call_sid, self.conversation_history)
+            logger.info(f"💾 Saving {len(self.conversation_history)} Q&A pairs in the background")
         except Exception as e:
             logger.error(f"❌ Save conversation failed: {str(e)}")
-            import traceback
-            logger.error(f"❌ Full traceback: {traceback.format_exc()}")
     
     def _detect_goodbye_emotion(self, emotions: dict) -> bool:
         """
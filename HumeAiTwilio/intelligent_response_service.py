@@ -7,10 +7,11 @@ Intelligent Response Service
 
 import logging
 import re
-import requests
 from typing import Optional, Dict, Any, Tuple
 from django.utils import timezone
 from .models import LearnedKnowledge, CustomerProfile, TwilioCall
+from .knowledge_index import get_knowledge_index
+from .web_search import get_web_search_client
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +23,20 @@ class IntelligentResponseService:
     
     def __init__(self, call: TwilioCall = None):
         self.call = call
+        self.agent_id = call.agent_id if call else None  # knowledge partition searched / learned into
         self.customer_profile = None
         if call and call.to_number:
             self.customer_profile = self._get_or_create_customer_profile(call.to_number)
+        self._load_knowledge_partition()
+    
+    def _load_knowledge_partition(self):
+        """Build this agent's knowledge index now (call start, off the event loop), not on the first question"""
+        if not self.agent_id:
+            return
+        try:
+            get_knowledge_index(self.agent_id)
+        except Exception as e:
+            logger.error(f"❌ [KNOWLEDGE] Could not load knowledge for agent {self.agent_id}: {e}")
     
     def _get_or_create_customer_profile(self, phone_number: str) -> Optional[CustomerProfile]:
         """Get existing customer profile or create new one"""
@@ -164,59 +176,19 @@ class IntelligentResponseService:
         """
         🔍 Smart search in knowledge base with synonym matching
         Understands different ways to ask same question
+        BM25 over this process's LearnedKnowledge index (knowledge_index.py), synonyms
+        expanded at index time, instead of scoring every row per question; only this
+        call's agent's entries are searched
         """
         try:
-            query_lower = query.lower().strip()
-            
-            # 🎯 SYNONYM GROUPS - Different ways to ask same thing
-            synonyms = {
-                'price': ['cost', 'price', 'pricing', 'expensive', 'fee', 'charge', 'payment'],
-                'features': ['do', 'does', 'feature', 'function', 'capability', 'work', 'about'],
-                'small': ['small', 'startup', 'little', 'tiny', 'mid-sized'],
-                'business': ['business', 'company', 'firm', 'organization', 'team'],
-                'try': ['try', 'test', 'demo', 'trial', 'sample'],
-                'integrate': ['integrate', 'work with', 'connect', 'sync', 'compatible'],
-            }
-            
-            # Expand query with synonyms
-            expanded_words = set(query_lower.split())
-            for word in query_lower.split():
-                for key, syn_list in synonyms.items():
-                    if word in syn_list:
-                        expanded_words.update(syn_list)
-            
-            # Get all knowledge entries
-            knowledge_entries = LearnedKnowledge.objects.all()
-            
-            best_match = None
-            best_score = 0
-            
-            for entry in knowledge_entries:
-                question_lower = entry.question.lower()
-                question_words = set(question_lower.split())
-                
-                # Calculate similarity with synonym expansion
-                common_words = expanded_words & question_words
-                score = len(common_words) / max(len(expanded_words), len(question_words))
-                
-                # Boost score if key words match
-                if 'cost' in query_lower or 'price' in query_lower:
-                    if 'cost' in question_lower or 'price' in question_lower:
-                        score += 0.3
-                
-                if 'small' in query_lower and 'business' in query_lower:
-                    if 'small' in question_lower and 'business' in question_lower:
-                        score += 0.3
-                
-                if score > best_score and score > 0.4:  # 40% threshold (more lenient)
-                    best_score = score
-                    best_match = entry
+            best_match = get_knowledge_index(self.agent_id).best_match(query)
             
             if best_match:
-                logger.info(f"✅ [KNOWLEDGE FOUND] Similarity: {best_score:.2f}")
-                logger.info(f"   Question: {best_match.question[:50]}...")
-                logger.info(f"   Answer: {best_match.answer[:100]}...")
-                return best_match.answer
+                logger.info(f"✅ [KNOWLEDGE FOUND] Score: {best_match['score']:.2f} "
+                            f"(coverage {best_match['coverage']:.2f})")
+                logger.info(f"   Question: {best_match['question'][:50]}...")
+                logger.info(f"   Answer: {best_match['answer'][:100]}...")
+                return best_match['answer']
             
             logger.info(f"❌ [NO MATCH] No knowledge found for: {query[:50]}...")
             return None
@@ -228,57 +200,16 @@ class IntelligentResponseService:
     def web_search(self, query: str) -> Optional[str]:
         """
         Perform web search using DuckDuckGo Instant Answer API (free, no API key)
-        Falls back to simple search if API fails
+        Cached, rate-limited and bounded by WEB_SEARCH_BUDGET_MS (web_search.py):
+        None when there is no answer in time for the turn
         """
         try:
             logger.info(f"🔍 [WEB SEARCH] Searching for: {query}")
-            
-            # DuckDuckGo Instant Answer API (free, no key required)
-            url = "https://api.duckduckgo.com/"
-            params = {
-                'q': query,
-                'format': 'json',
-                'no_html': 1,
-                'skip_disambig': 1
-            }
-            
-            response = requests.get(url, params=params, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Try Abstract first (best answer)
-                if data.get('Abstract'):
-                    answer = data['Abstract']
-                    logger.info(f"✅ [FOUND] Web answer: {answer[:100]}...")
-                    
-                    # Save to knowledge base for future
-                    LearnedKnowledge.objects.get_or_create(
-                        question=query,
-                        defaults={
-                            'answer': answer,
-                            'source': 'web_search',
-                            'metadata': {'search_engine': 'duckduckgo'}
-                        }
-                    )
-                    return answer
-                
-                # Try RelatedTopics if Abstract empty
-                if data.get('RelatedTopics') and len(data['RelatedTopics']) > 0:
-                    first_topic = data['RelatedTopics'][0]
-                    if isinstance(first_topic, dict) and 'Text' in first_topic:
-                        answer = first_topic['Text']
-                        logger.info(f"✅ [FOUND] Related topic: {answer[:100]}...")
-                        
-                        LearnedKnowledge.objects.get_or_create(
-                            question=query,
-                            defaults={
-                                'answer': answer,
-                                'source': 'web_search',
-                                'metadata': {'search_engine': 'duckduckgo'}
-                            }
-                        )
-                        return answer
+            answer = get_web_search_client().search(query)
+            if answer:
+                logger.info(f"✅ [FOUND] Web answer: {answer[:100]}...")
+                self._learn_web_answer(query, answer)
+                return answer
             
             logger.warning(f"⚠️  [NO RESULTS] Web search returned no results")
             return None
@@ -287,6 +218,18 @@ class IntelligentResponseService:
             logger.error(f"❌ [SEARCH ERROR] Web search failed: {e}")
             return None
     
+    def _learn_web_answer(self, query: str, answer: str):
+        """Save to knowledge base (this agent's partition) for future"""
+        LearnedKnowledge.objects.get_or_create(
+            agent_id=self.agent_id,
+            question=query,
+            defaults={
+                'answer': answer,
+                'source': 'web_search',
+                'metadata': {'search_engine': 'duckduckgo'}
+            }
+        )
+    
     def get_intelligent_response(self, user_question: str) -> Tuple[str, str]:
         """
         Get intelligent response with fallback chain:
@@ -0,0 +1,370 @@
+"""
+In-process BM25 index over LearnedKnowledge for IntelligentResponseService
+
+search_knowledge_base used to load every LearnedKnowledge row and score a
+Python set overlap per row for each caller question, on the live call path.
+There is one index per agent partition (knowledge_partitions.py), built in
+this process on first use and kept current: post_save / post_delete on
+LearnedKnowledge update loaded partitions in this process, and other
+processes pick up rows changed since their last sync every
+KNOWLEDGE_INDEX_SYNC_SECONDS (a row count mismatch, i.e. a delete, rebuilds).
+
+Synonym groups are applied at index time: a document word from a group is also
+indexed under the group's key (``~price``), so a query only maps its own words
+to keys. Question and answer are both indexed, question terms counting
+QUESTION_WEIGHT times. Scores are BM25 from cached per-term impact arrays
+(NumPy), with very common terms only scored for entries that can still make the
+top k. A match must also cover KNOWLEDGE_MIN_COVERAGE of the query's IDF-weighted words
+so a single shared word never returns an unrelated answer.
+
+Settings:
+    KNOWLEDGE_INDEX_SYNC_SECONDS  cross-process refresh interval (default 30)
+    KNOWLEDGE_MIN_COVERAGE        share of the query a match must cover (default 0.5)
+"""
+
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .knowledge_partitions import PartitionRegistry, partition_filter, partition_key
+
+logger = logging.getLogger(__name__)
+
+# Different ways to ask the same thing (was inline in search_knowledge_base)
+SYNONYMS = {
+    'price': ['cost', 'price', 'pricing', 'expensive', 'fee', 'charge', 'payment'],
+    'features': ['do', 'does', 'feature', 'function', 'capability', 'work', 'about'],
+    'small': ['small', 'startup', 'little', 'tiny', 'mid-sized'],
+    'business': ['business', 'company', 'firm', 'organization', 'team'],
+    'try': ['try', 'test', 'demo', 'trial', 'sample'],
+    'integrate': ['integrate', 'work with', 'connect', 'sync', 'compatible'],
+}
+
+STOPWORDS = frozenset("""
+    a an the is are was were be been am to of and or in on at for with it its this that these those
+    what whats how i im you your we our us they them their my me can could would should will
+    if so than then just also any some there here please much many when where who why which
+    have has had get
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def stem(word: str) -> str:
+    """Plural folding only: companies -> company, businesses -> business (business stays)"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('sses', 'ches', 'shes', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us')):
+        return word[:-1]
+    return word
+
+
+SYNONYM_KEYS = {stem(word): f'~{key}' for key, words in SYNONYMS.items() for word in words if ' ' not in word}
+SYNONYM_PHRASES = [(phrase, f'~{key}') for key, words in SYNONYMS.items() for phrase in words if ' ' in phrase]
+
+
+def analyze(text: str) -> List[str]:
+    """Lower-case, stemmed words without stopwords (synonym-group words are always kept)"""
+    words = (stem(word) for word in _WORD.findall(text.lower().replace("'", '')))
+    return [word for word in words if word in SYNONYM_KEYS or word not in STOPWORDS]
+
+
+def _phrase_keys(text: str) -> Counter:
+    text = ' '.join(_WORD.findall(text.lower()))
+    return Counter({key: text.count(phrase) for phrase, key in SYNONYM_PHRASES if phrase in text})
+
+
+def document_terms(question: str, answer: str, question_weight: int) -> Counter:
+    """Term frequencies of one entry, synonym keys included"""
+    counts = Counter()
+    for text, weight in ((question, question_weight), (answer, 1)):
+        for word in analyze(text):
+            counts[word] += weight
+            if word in SYNONYM_KEYS:
+                counts[SYNONYM_KEYS[word]] += weight
+        for key, count in _phrase_keys(text).items():
+            counts[key] += count * weight
+    return counts
+
+
+class KnowledgeIndex:
+    """Inverted index with BM25 scoring over one agent's entries; thread-safe, incrementally updated"""
+
+    QUESTION_WEIGHT = 2
+    K1 = 1.2
+    B = 0.75
+    SELECTIVE_DF = 0.1  # terms in more than this share of entries only score candidates
+
+    def __init__(self, agent_id=None):
+        self.agent_id = partition_key(agent_id)
+        self._lock = threading.RLock()
+        self._reset()
+        self.synced_at = 0.0
+        self._watermark = None
+
+    def _reset(self):
+        self._postings: Dict[str, Dict[int, float]] = {}   # term -> {slot: tf}
+        self._arrays = {}                                    # term -> (slots, impacts), rebuilt lazily
+        self._arrays_avgdl = 0.0
+        self._scratch = np.zeros(0, dtype=np.float64)        # dense score accumulator, reset after each search
+        self._docs = []                                      # slot -> (pk, question, answer, terms) or None
+        self._slots = {}                                     # pk -> slot
+        self._doc_len = np.zeros(1024, dtype=np.float64)
+        self._total_len = 0.0
+
+    def __len__(self):
+        return len(self._slots)
+
+    # ------------------------------------------------------------------ updates
+
+    def add(self, pk, question: str, answer: str):
+        """Index (or re-index) one LearnedKnowledge entry"""
+        with self._lock:
+            if pk in self._slots:
+                self._remove(pk)
+                self._maybe_compact()
+            counts = document_terms(question, answer, self.QUESTION_WEIGHT)
+            slot = len(self._docs)
+            self._docs.append((pk, question, answer, tuple(counts)))
+            self._slots[pk] = slot
+            if slot >= len(self._doc_len):
+                self._doc_len = np.concatenate([self._doc_len, np.zeros_like(self._doc_len)])
+            length = sum(count for term, count in counts.items() if not term.startswith('~'))
+            self._doc_len[slot] = length
+            self._total_len += length
+            for term, count in counts.items():
+                self._postings.setdefault(term, {})[slot] = float(count)
+                self._arrays.pop(term, None)
+
+    def remove(self, pk):
+        with self._lock:
+            if pk in self._slots:
+                self._remove(pk)
+                self._maybe_compact()
+
+    def _remove(self, pk):
+        slot = self._slots.pop(pk)
+        for term in self._docs[slot][3]:
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+            self._arrays.pop(term, None)
+        self._total_len -= self._doc_len[slot]
+        self._doc_len[slot] = 0.0
+        self._docs[slot] = None
+
+    def _maybe_compact(self):
+        """Drop the slots left by removed / re-indexed entries once they outnumber live ones"""
+        if len(self._docs) <= 2 * len(self._slots) + 1024:
+            return
+        docs = [doc for doc in self._docs if doc]
+        self._reset()
+        for pk, question, answer, _ in docs:
+            self.add(pk, question, answer)
+
+    # ------------------------------------------------------------------ search
+
+    def _idf(self, df: int) -> float:
+        n = len(self._slots)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def _posting_arrays(self, term: str):
+        """(sorted slots, BM25 term-frequency impacts) for a term, cached until its postings or avgdl move"""
+        avgdl = self._total_len / len(self._slots)
+        if abs(avgdl - self._arrays_avgdl) > 0.02 * self._arrays_avgdl:
+            self._arrays.clear()
+            self._arrays_avgdl = avgdl
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings.get(term)
+            if not postings:
+                return None
+            # Slots are handed out in increasing order, so insertion order is sorted order
+            slots = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            tfs = np.fromiter(postings.values(), dtype=np.float64, count=len(postings))
+            norm = self.K1 * (1.0 - self.B + self.B * self._doc_len[slots] / self._arrays_avgdl)
+            arrays = (slots, tfs * (self.K1 + 1.0) / (tfs + norm))
+            self._arrays[term] = arrays
+        return arrays
+
+    @staticmethod
+    def _concepts(query: str) -> list:
+        """One (word, synonym key) pair per distinct query word; a phrase key is (None, key)"""
+        concepts = {(word, SYNONYM_KEYS.get(word)) for word in analyze(query)}
+        concepts.update((None, key) for key in _phrase_keys(query))
+        return sorted(concepts, key=str)
+
+    def search(self, query: str, k: int = 5) -> List[dict]:
+        """
+        Top-k entries by BM25: [{'id', 'question', 'answer', 'score', 'coverage'}].
+        ``coverage`` is the IDF-weighted share of query words (or their synonyms) the entry has.
+        """
+        concepts = self._concepts(query)
+        with self._lock:
+            if not self._slots or not concepts:
+                return []
+            terms = {term for concept in concepts for term in concept if term}
+            postings = [(self._idf(len(arrays[0])), *arrays)
+                        for arrays in map(self._posting_arrays, terms) if arrays is not None]
+            if not postings:
+                return []
+            top, scores = self._top_k(postings, k)
+
+            weights = [self._idf(len(self._postings.get(key or word, ()))) for word, key in concepts]
+            total_weight = sum(weights)
+            results = []
+            for slot, score in zip(top.tolist(), scores.tolist()):
+                if score <= 0:
+                    break
+                covered = sum(weight for (word, key), weight in zip(concepts, weights)
+                              if slot in self._postings.get(word, ()) or slot in self._postings.get(key, ()))
+                pk, question, answer, _ = self._docs[slot]
+                results.append({'id': pk, 'question': question, 'answer': answer,
+                                'score': score, 'coverage': covered / total_weight})
+            return results
+
+    def _top_k(self, postings: list, k: int):
+        """
+        Exact top-k BM25 (MaxScore-style): selective terms are scattered into a dense
+        scratch array; very common terms (df > SELECTIVE_DF) are only added for
+        entries that could still reach the top k given those terms' largest impact.
+        """
+        limit = self.SELECTIVE_DF * len(self._slots)
+        selective = [posting for posting in postings if len(posting[1]) <= limit]
+        common = [posting for posting in postings if len(posting[1]) > limit]
+        if not selective:
+            selective, common = postings, []
+        if len(self._scratch) < len(self._docs):
+            self._scratch = np.zeros(2 * len(self._docs), dtype=np.float64)
+        scores = self._scratch
+
+        touched = np.concatenate([slots for _, slots, _ in selective])
+        for idf, slots, impacts in selective:
+            scores[slots] += idf * impacts
+        values = scores[touched]
+        # an entry appears once per selective term it has, so the (k * terms)-th value is a safe k-th bound
+        m = k * len(selective)
+        if len(values) >= m:
+            kth = np.partition(values, len(values) - m)[len(values) - m]
+        else:
+            distinct = scores[np.unique(touched)]
+            # fewer than k such entries: ones matching only common terms may fill the rest
+            kth = np.partition(distinct, len(distinct) - k)[len(distinct) - k] if len(distinct) >= k else 0.0
+        bound = sum(idf * impacts.max() for idf, _, impacts in common)
+        if common and kth - bound <= 0:
+            scores[touched] = 0.0
+            return self._top_k_dense(postings, k)
+        candidates = np.unique(touched[values >= kth - bound])
+        totals = scores[candidates]
+        scores[touched] = 0.0
+        for idf, slots, impacts in common:
+            pos = np.minimum(np.searchsorted(slots, candidates), len(slots) - 1)
+            hit = slots[pos] == candidates
+            totals[hit] += idf * impacts[pos[hit]]
+
+        if len(totals) > k:
+            order = np.argpartition(-totals, k - 1)[:k]
+            candidates, totals = candidates[order], totals[order]
+        order = np.argsort(-totals, kind='stable')
+        return candidates[order], totals[order]
+
+    def _top_k_dense(self, postings: list, k: int):
+        """Every term scattered into one array (queries made only of very common words)"""
+        scores = np.zeros(len(self._docs), dtype=np.float64)
+        for idf, slots, impacts in postings:
+            scores[slots] += idf * impacts
+        k = min(k, len(scores))
+        order = np.argpartition(-scores, k - 1)[:k]
+        order = order[np.argsort(-scores[order], kind='stable')]
+        return order, scores[order]
+
+    def best_match(self, query: str, min_coverage: float = None) -> Optional[dict]:
+        """Highest-scoring entry covering at least ``min_coverage`` of the query, or None"""
+        if min_coverage is None:
+            min_coverage = getattr(settings, 'KNOWLEDGE_MIN_COVERAGE', 0.5)
+        for match in self.search(query):
+            if match['coverage'] >= min_coverage:
+                return match
+        return None
+
+    # ------------------------------------------------------------------ database
+
+    def rebuild(self):
+        """(Re)load every LearnedKnowledge row of this partition"""
+        from .models import LearnedKnowledge
+
+        started = time.perf_counter()
+        with self._lock:
+            self._reset()
+            self._watermark = None
+            rows = (LearnedKnowledge.objects.filter(**partition_filter(self.agent_id))
+                    .values_list('pk', 'question', 'answer', 'updated_at'))
+            for pk, question, answer, updated_at in rows.iterator(chunk_size=2000):
+                self.add(pk, question, answer)
+                if self._watermark is None or updated_at > self._watermark:
+                    self._watermark = updated_at
+            self.synced_at = time.monotonic()
+        logger.info(f"📚 [KNOWLEDGE INDEX] Indexed {len(self)} entries of {self.agent_id or 'unassigned'}, {len(self._postings)} terms "
+                    f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def sync(self):
+        """Pick up rows saved by other processes since the last sync; rebuild after deletes"""
+        from .models import LearnedKnowledge
+
+        with self._lock:
+            partition = LearnedKnowledge.objects.filter(**partition_filter(self.agent_id))
+            changed = partition
+            if self._watermark is not None:
+                changed = changed.filter(updated_at__gte=self._watermark)
+            for pk, question, answer, updated_at in changed.values_list('pk', 'question', 'answer', 'updated_at'):
+                self.add(pk, question, answer)
+                if self._watermark is None or updated_at > self._watermark:
+                    self._watermark = updated_at
+            if partition.count() != len(self):
+                self.rebuild()
+            self.synced_at = time.monotonic()
+
+
+def _build(agent_id) -> KnowledgeIndex:
+    index = KnowledgeIndex(agent_id)
+    index.rebuild()
+    return index
+
+
+_registry = PartitionRegistry(_build, 'KNOWLEDGE INDEX')
+
+
+def get_knowledge_index(agent_id=None) -> KnowledgeIndex:
+    """This process's index of one agent's entries (None: unassigned rows), built on first use"""
+    return _registry.get(agent_id)
+
+
+def index_knowledge(entry):
+    """post_save: keep loaded partitions current (no-op for partitions not loaded here)"""
+    for key, index in _registry.loaded().items():
+        if key != partition_key(entry.agent_id):
+            index.remove(entry.pk)  # moved to another agent
+    index = _registry.peek(entry.agent_id)
+    if index is not None:
+        index.add(entry.pk, entry.question, entry.answer)
+
+
+def unindex_knowledge(entry):
+    index = _registry.peek(entry.agent_id)
+    if index is not None:
+        index.remove(entry.pk)
+
+
+def reset_knowledge_index():
+    """Drop every partition loaded in this process (tests); the next search rebuilds"""
+    _registry.clear()
@@ -1,6 +1,14 @@
 """
 Knowledge Manager - Works on Local & PythonAnywhere
 Hybrid: ChromaDB (local) + SQLite (production)
++ NumPy vectors: embeddings on LearnedKnowledge rows, memory-mapped index (vector_index.py)
+
+Knowledge is partitioned per HumeAgent (knowledge_partitions.py): pass agent_id, or
+a metadata call_sid to take the call's agent. ChromaDB keeps one collection per agent;
+agent_id=None is the unassigned / legacy partition.
+
+Settings:
+    KNOWLEDGE_BACKEND  auto (ChromaDB if installed, else django_db) | chromadb | numpy | django_db
 """
 
 import os
@@ -24,6 +32,8 @@ class KnowledgeManager:
         
         if self.backend == "chromadb":
             self._init_chromadb()
+        elif self.backend == "numpy":
+            self._init_numpy()
         else:
             self._init_django_db()
     
@@ -32,7 +42,13 @@ class KnowledgeManager:
         Auto-detect best backend:
         - PythonAnywhere: Use Django DB
         - Local: Use ChromaDB
+        KNOWLEDGE_BACKEND overrides the detection
         """
+        from django.conf import settings
+        backend = getattr(settings, 'KNOWLEDGE_BACKEND', 'auto')
+        if backend != 'auto':
+            return backend
+        
         # Check if running on PythonAnywhere
         if os.environ.get('PYTHONANYWHERE_SITE'):
             return "django_db"
@@ -48,10 +64,9 @@ class KnowledgeManager:
         """Initialize ChromaDB for local development"""
         try:
             import chromadb
-            from sentence_transformers import SentenceTransformer
             
             self.chroma_client = chromadb.PersistentClient(path="./agent_knowledge_db")
-            self.embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+            self.embedding_model = self._load_embedding_model()
             logger.info("✅ ChromaDB initialized (Local Development)")
             
         except Exception as e:
@@ -59,6 +74,28 @@ class KnowledgeManager:
             self.backend = "django_db"
             self._init_django_db()
     
+    @staticmethod
+    def _load_embedding_model():
+        """
+        Process-wide embedding service (embeddings.py): the model loads on first encode,
+        calls are micro-batched and cached. Fails here if sentence-transformers is missing
+        """
+        from HumeAiTwilio.embeddings import get_embedding_service, model_available
+        if not model_available():
+            raise ImportError("sentence-transformers is not installed")
+        return get_embedding_service()
+    
+    def _init_numpy(self):
+        """Initialize the NumPy vector backend (index mapped lazily on first search)"""
+        try:
+            self.embedding_model = self._load_embedding_model()
+            self._init_django_db()
+            logger.info("✅ NumPy vector index backend initialized")
+        except Exception as e:
+            logger.warning(f"⚠️ NumPy vector backend init failed, falling back to Django DB: {e}")
+            self.backend = "django_db"
+            self._init_django_db()
+    
     def _init_django_db(self):
         """Initialize Django database backend"""
         try:
@@ -69,25 +106,45 @@ class KnowledgeManager:
             logger.error(f"❌ Failed to initialize Django DB: {e}")
             self.django_model = None
     
-    def add_knowledge(self, question: str, answer: str, metadata: Dict = None) -> bool:
+    @staticmethod
+    def _agent_for(metadata: Dict = None):
+        """Agent of the call a Q&A pair was learned on (metadata call_sid), else None"""
+        call_sid = (metadata or {}).get('call_sid')
+        if not call_sid:
+            return None
+        from HumeAiTwilio.models import TwilioCall
+        return TwilioCall.objects.filter(call_sid=call_sid).values_list('agent_id', flat=True).first()
+    
+    @staticmethod
+    def _collection_name(agent_id=None) -> str:
+        from HumeAiTwilio.knowledge_partitions import partition_key
+        key = partition_key(agent_id)
+        return "learned_conversations" if key is None else f"learned_conversations_{key.replace('-', '')}"
+    
+    def add_knowledge(self, question: str, answer: str, metadata: Dict = None, agent_id=None) -> bool:
         """
         Add Q&A to knowledge base
         Works on both ChromaDB and Django DB
+        Stored in agent_id's partition (default: the agent of metadata['call_sid'])
         """
         try:
+            if agent_id is None:
+                agent_id = self._agent_for(metadata)
             if self.backend == "chromadb":
-                return self._add_chromadb(question, answer, metadata)
+                return self._add_chromadb(question, answer, metadata, agent_id)
+            elif self.backend == "numpy":
+                return self._add_django_db(question, answer, metadata, agent_id, embed=True)
             else:
-                return self._add_django_db(question, answer, metadata)
+                return self._add_django_db(question, answer, metadata, agent_id)
         except Exception as e:
             logger.error(f"❌ Failed to add knowledge: {e}")
             return False
     
-    def _add_chromadb(self, question: str, answer: str, metadata: Dict = None) -> bool:
+    def _add_chromadb(self, question: str, answer: str, metadata: Dict = None, agent_id=None) -> bool:
         """Add to ChromaDB with vector embeddings"""
         try:
             collection = self.chroma_client.get_or_create_collection(
-                name="learned_conversations",
+                name=self._collection_name(agent_id),
                 metadata={"description": "Auto-learned from calls"}
             )
             
@@ -119,20 +176,27 @@ class KnowledgeManager:
             logger.error(f"❌ ChromaDB add failed: {e}")
             return False
     
-    def _add_django_db(self, question: str, answer: str, metadata: Dict = None) -> bool:
-        """Add to Django database"""
+    def _add_django_db(self, question: str, answer: str, metadata: Dict = None, agent_id=None,
+                       embed: bool = False) -> bool:
+        """Add to Django database (embed=True: NumPy backend, question embedding stored on the row)"""
         try:
             if not self.django_model:
                 return False
             
-            # Create or update
+            defaults = {
+                'answer': answer,
+                'metadata': json.dumps(metadata or {}),
+                'source': metadata.get('source', 'live_call') if metadata else 'live_call'
+            }
+            if embed:
+                from HumeAiTwilio.vector_index import encode_embedding
+                defaults['embedding'] = encode_embedding(self.embedding_model.encode(question))
+            
+            # Create or update (post_save adds the embedding to this process's vector index)
             obj, created = self.django_model.objects.update_or_create(
+                agent_id=agent_id,
                 question=question,
-                defaults={
-                    'answer': answer,
-                    'metadata': json.dumps(metadata or {}),
-                    'source': metadata.get('source', 'live_call') if metadata else 'live_call'
-                }
+                defaults=defaults
             )
             
             action = "Created" if created else "Updated"
@@ -143,24 +207,26 @@ class KnowledgeManager:
             logger.error(f"❌ Django DB add failed: {e}")
             return False
     
-    def search_knowledge(self, query: str, limit: int = 3) -> List[Dict]:
+    def search_knowledge(self, query: str, limit: int = 3, agent_id=None) -> List[Dict]:
         """
         Search knowledge base
-        Returns list of matching Q&A pairs
+        Returns list of matching Q&A pairs from agent_id's partition only
         """
         try:
             if self.backend == "chromadb":
-                return self._search_chromadb(query, limit)
+                return self._search_chromadb(query, limit, agent_id)
+            elif self.backend == "numpy":
+                return self._search_numpy(query, limit, agent_id)
             else:
-                return self._search_django_db(query, limit)
+                return self._search_django_db(query, limit, agent_id)
         except Exception as e:
             logger.error(f"❌ Search failed: {e}")
             return []
     
-    def _search_chromadb(self, query: str, limit: int = 3) -> List[Dict]:
+    def _search_chromadb(self, query: str, limit: int = 3, agent_id=None) -> List[Dict]:
         """Search ChromaDB with vector similarity"""
         try:
-            collection = self.chroma_client.get_collection("learned_conversations")
+            collection = self.chroma_client.get_collection(self._collection_name(agent_id))
             
             # Generate query embedding
             embedding = self.embedding_model.encode(query).tolist()
@@ -189,7 +255,34 @@ class KnowledgeManager:
             logger.error(f"❌ ChromaDB search failed: {e}")
             return []
     
-    def _search_django_db(self, query: str, limit: int = 3) -> List[Dict]:
+    def _search_numpy(self, query: str, limit: int = 3, agent_id=None) -> List[Dict]:
+        """Search the memory-mapped NumPy index (cosine; distance = 1 - similarity)"""
+        try:
+            from HumeAiTwilio.vector_index import get_vector_index
+            
+            hits = get_vector_index(agent_id).search(self.embedding_model.encode(query), k=limit)
+            rows = self.django_model.objects.in_bulk([pk for pk, _ in hits])
+            
+            matches = []
+            for pk, similarity in hits:
+                result = rows.get(pk)
+                if result is None:
+                    continue  # deleted since the index was synced
+                matches.append({
+                    'question': result.question,
+                    'answer': result.answer,
+                    'distance': 1.0 - similarity,
+                    'metadata': json.loads(result.metadata) if isinstance(result.metadata, str) else (result.metadata or {})
+                })
+            
+            logger.info(f"🔍 NumPy vectors: Found {len(matches)} matches for '{query[:30]}...'")
+            return matches
+            
+        except Exception as e:
+            logger.error(f"❌ NumPy vector search failed: {e}")
+            return []
+    
+    def _search_django_db(self, query: str, limit: int = 3, agent_id=None) -> List[Dict]:
         """Search Django database with keyword matching"""
         try:
             if not self.django_model:
@@ -197,9 +290,10 @@ class KnowledgeManager:
             
             # Simple keyword search
             from django.db.models import Q
+            from HumeAiTwilio.knowledge_partitions import partition_filter
             
             results = self.django_model.objects.filter(
-                Q(question__icontains=query) | Q(answer__icontains=query)
+                Q(question__icontains=query) | Q(answer__icontains=query), **partition_filter(agent_id)
             ).order_by('-created_at')[:limit]
             
             matches = []
@@ -222,6 +316,8 @@ class KnowledgeManager:
         try:
             if self.backend == "chromadb":
                 return self._get_chromadb_stats()
+            elif self.backend == "numpy":
+                return self._get_numpy_stats()
             else:
                 return self._get_django_stats()
         except Exception as e:
@@ -242,6 +338,23 @@ class KnowledgeManager:
         except Exception as e:
             return {"backend": "ChromaDB", "error": str(e)}
     
+    def _get_numpy_stats(self) -> Dict:
+        """Get NumPy vector index statistics"""
+        try:
+            from django.conf import settings
+            from HumeAiTwilio.vector_index import loaded_partitions
+            loaded = loaded_partitions()
+            
+            return {
+                "backend": "NumPy vectors",
+                "total_items": self.django_model.objects.filter(embedding__isnull=False).count(),
+                "loaded_partitions": len(loaded),
+                "unindexed_items": sum(index.delta_size for index in loaded.values()),
+                "location": getattr(settings, 'KNOWLEDGE_VECTOR_DIR', 'agent_knowledge_db/vectors')
+            }
+        except Exception as e:
+            return {"backend": "NumPy vectors", "error": str(e)}
+    
     def _get_django_stats(self) -> Dict:
         """Get Django database statistics"""
         try:
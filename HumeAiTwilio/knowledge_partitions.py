@@ -0,0 +1,121 @@
+"""
+Per-agent partitions of the learned-knowledge indexes
+
+LearnedKnowledge rows belong to the HumeAgent that learned them (``agent``;
+the owner is ``agent.created_by``). Rows with no agent, learned before
+partitioning or from calls without one, form their own ``unassigned``
+partition. A search only ever sees one partition, so tenants never get each
+other's answers and a search costs what the agent's own corpus costs.
+
+PartitionRegistry keeps one index per partition in this process (the BM25
+index in knowledge_index.py, the vector index in vector_index.py):
+
+- an agent's index is built on first use, normally when
+  IntelligentResponseService is created at the start of that agent's call
+- it is synced like before, every KNOWLEDGE_INDEX_SYNC_SECONDS
+- it is dropped once unused for KNOWLEDGE_PARTITION_IDLE_SECONDS, and the
+  least recently used partitions go first beyond KNOWLEDGE_PARTITION_MAX
+
+Settings:
+    KNOWLEDGE_PARTITION_IDLE_SECONDS  evict partitions unused this long (default 900)
+    KNOWLEDGE_PARTITION_MAX           loaded partitions per process (default 200)
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+UNASSIGNED = 'unassigned'
+
+
+def partition_key(agent_id) -> Optional[str]:
+    """Registry key of an agent id (UUID or str); None is the unassigned partition"""
+    return None if agent_id in (None, '') else str(agent_id)
+
+
+def partition_filter(agent_id) -> dict:
+    """LearnedKnowledge filter kwargs for one partition"""
+    key = partition_key(agent_id)
+    return {'agent__isnull': True} if key is None else {'agent_id': key}
+
+
+def partition_name(agent_id) -> str:
+    """Directory-safe partition name"""
+    return partition_key(agent_id) or UNASSIGNED
+
+
+class PartitionRegistry:
+    """
+    Loaded per-partition indexes of one kind. ``factory(agent_id)`` builds a ready
+    index; indexes need ``sync()`` and a ``synced_at`` monotonic timestamp.
+    """
+
+    def __init__(self, factory: Callable, label: str):
+        self._factory = factory
+        self._label = label
+        self._indexes = OrderedDict()   # key -> index, least recently used first
+        self._used_at = {}
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    def get(self, agent_id):
+        """The partition's index: built on first use, synced when stale"""
+        key = partition_key(agent_id)
+        with self._lock:
+            self._evict_idle()
+            index = self._indexes.get(key)
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        if index is None:
+            with build_lock:  # one build per partition; other partitions keep searching
+                with self._lock:
+                    index = self._indexes.get(key)
+                if index is None:
+                    index = self._factory(key)
+                    logger.info(f"📚 [{self._label}] Loaded partition {partition_name(key)} ({len(index)} entries)")
+        elif time.monotonic() - index.synced_at > getattr(settings, 'KNOWLEDGE_INDEX_SYNC_SECONDS', 30):
+            index.sync()
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            self._used_at[key] = time.monotonic()
+            self._evict_overflow()
+        return index
+
+    def peek(self, agent_id):
+        """The partition's index if loaded in this process (signals), else None"""
+        with self._lock:
+            return self._indexes.get(partition_key(agent_id))
+
+    def loaded(self) -> dict:
+        """{partition key: index} currently loaded"""
+        with self._lock:
+            return dict(self._indexes)
+
+    def _drop(self, key, reason: str):
+        self._indexes.pop(key, None)
+        self._used_at.pop(key, None)
+        self._build_locks.pop(key, None)
+        logger.info(f"📚 [{self._label}] Evicted partition {partition_name(key)} ({reason})")
+
+    def _evict_idle(self):
+        idle = getattr(settings, 'KNOWLEDGE_PARTITION_IDLE_SECONDS', 900)
+        now = time.monotonic()
+        for key in [key for key, used_at in self._used_at.items() if now - used_at > idle]:
+            self._drop(key, 'idle')
+
+    def _evict_overflow(self):
+        limit = getattr(settings, 'KNOWLEDGE_PARTITION_MAX', 200)
+        while len(self._indexes) > limit:
+            self._drop(next(iter(self._indexes)), 'least recently used')
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._used_at.clear()
+            self._build_locks.clear()
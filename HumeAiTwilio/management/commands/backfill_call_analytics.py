@@ -0,0 +1,83 @@
+"""
+Management command to backfill CLARIFIES analytics for historical completed calls
+
+Runs AnalyticsProcessor.process_calls over every completed call that has no
+finalised ConversationAnalytics yet (none at all, or only a live snapshot), in
+chunks keyed on the primary key: one ConversationLog query and one write
+transaction per chunk. Prints progress and calls/s as it goes. Safe to re-run:
+finalised calls are skipped.
+
+Usage:
+    python manage.py backfill_call_analytics --batch-size 200 [--since 2025-01-01] [--limit 5000] [--dry-run]
+"""
+
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from HumeAiTwilio.models import TwilioCall
+from HumeAiTwilio.services.analytics_processor import AnalyticsProcessor
+
+
+class Command(BaseCommand):
+    help = 'Backfill ConversationAnalytics, objections and CLARIFIES steps for completed calls without them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Calls per chunk (one transaction each)')
+        parser.add_argument('--since', default=None, help='Only calls created on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many calls')
+        parser.add_argument('--dry-run', action='store_true', help='Analyse without writing')
+
+    def handle(self, *args, **options):
+        pending = (TwilioCall.objects
+                   .filter(status='completed')
+                   .exclude(clarifies_analytics__is_live=False)
+                   .order_by('pk'))
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError(f"--since must be YYYY-MM-DD, got {options['since']!r}")
+            pending = pending.filter(created_at__gte=timezone.make_aware(since))
+
+        total = pending.count()
+        if options['limit']:
+            total = min(total, options['limit'])
+        self.stdout.write(f"{total} completed calls without final analytics")
+
+        batch_size = options['batch_size']
+        totals = {'calls': 0, 'skipped': 0, 'objections': 0, 'steps': 0}
+        seen = 0
+        last_pk = None
+        started = time.perf_counter()
+
+        while seen < total:
+            page = pending.filter(pk__gt=last_pk) if last_pk else pending
+            calls = list(page[:min(batch_size, total - seen)])
+            if not calls:
+                break
+            last_pk = calls[-1].pk
+            seen += len(calls)
+            try:
+                result = AnalyticsProcessor.process_calls(calls, dry_run=options['dry_run'])
+            except Exception as e:
+                totals['skipped'] += len(calls)
+                self.stdout.write(self.style.WARNING(f"  chunk ending at {last_pk} failed: {e}"))
+                continue
+            for key, value in result.items():
+                totals[key] += value
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"  {seen}/{total} calls ({100 * seen / total:.0f}%), "
+                              f"{totals['calls']} analysed, {seen / elapsed:.0f} calls/s")
+
+        elapsed = time.perf_counter() - started
+        verb = 'Would analyse' if options['dry_run'] else 'Analysed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['calls']} calls ({totals['skipped']} skipped): "
+            f"{totals['objections']} objections, {totals['steps']} CLARIFIES steps"
+        ))
+        if seen:
+            self.stdout.write(f"Throughput: {seen / elapsed:.0f} calls/s "
+                              f"({1000 * elapsed / seen:.2f} ms/call over {elapsed:.1f}s)")
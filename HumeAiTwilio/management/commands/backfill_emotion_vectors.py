@@ -0,0 +1,76 @@
+"""
+Management command to move legacy ConversationLog.emotion_scores JSON into emotion_vector
+
+Rows written before the compact format keep the full Hume dict (Twilio rows as a
+double-encoded JSON string). This re-encodes them as a float16/float32 vector +
+top-k summary, leaving only non-vocabulary scores in emotion_scores. Safe to
+re-run: rows that already have a vector are skipped.
+
+Usage:
+    python manage.py backfill_emotion_vectors --batch-size 1000 [--dtype float32] [--dry-run]
+"""
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from HumeAiTwilio.emotion_vectors import VECTOR_DTYPES, emotion_fields
+from HumeAiTwilio.models import ConversationLog
+
+
+class Command(BaseCommand):
+    help = 'Backfill ConversationLog.emotion_vector / emotion_top from legacy emotion_scores JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_update')
+        parser.add_argument('--dtype', choices=sorted(VECTOR_DTYPES), default=None,
+                            help='Vector dtype (default: settings.EMOTION_VECTOR_DTYPE)')
+        parser.add_argument('--dry-run', action='store_true', help='Report sizes without writing')
+
+    def handle(self, *args, **options):
+        pending = (ConversationLog.objects
+                   .filter(emotion_vector__isnull=True, emotion_scores__isnull=False)
+                   .only('id', 'emotion_scores')
+                   .order_by('id'))
+        batch_size = options['batch_size']
+        converted = skipped = failed = 0
+        json_bytes = compact_bytes = 0
+        last_id = None
+
+        while True:
+            page = pending.filter(id__gt=last_id) if last_id else pending
+            logs = list(page[:batch_size])
+            if not logs:
+                break
+            last_id = logs[-1].id
+            changed = []
+            for log in logs:
+                try:
+                    fields = emotion_fields(log.emotion_scores, options['dtype'])
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"  {log.id}: unreadable emotion_scores ({e})"))
+                    continue
+                if not fields.get('emotion_vector'):
+                    skipped += 1
+                    continue
+                json_bytes += len(json.dumps(log.emotion_scores))
+                compact_bytes += len(fields['emotion_vector']) + len(json.dumps(fields['emotion_top']))
+                if fields['emotion_scores']:
+                    compact_bytes += len(json.dumps(fields['emotion_scores']))
+                log.emotion_vector = fields['emotion_vector']
+                log.emotion_top = fields['emotion_top']
+                log.emotion_scores = fields['emotion_scores']
+                changed.append(log)
+            if changed and not options['dry_run']:
+                ConversationLog.objects.bulk_update(changed, ['emotion_vector', 'emotion_top', 'emotion_scores'])
+            converted += len(changed)
+            self.stdout.write(f"  {converted} rows converted...")
+
+        verb = 'Would convert' if options['dry_run'] else 'Converted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {converted} rows ({skipped} without vocabulary emotions, {failed} unreadable)"
+        ))
+        if converted:
+            self.stdout.write(f"Emotion storage: {json_bytes / 1024:.1f} KiB JSON -> "
+                              f"{compact_bytes / 1024:.1f} KiB compact ({json_bytes / compact_bytes:.1f}x smaller)")
@@ -0,0 +1,85 @@
+"""
+Management command to benchmark the streaming resampler
+
+Measures 20ms-frame throughput (frames/sec on one core) for the Vonage bridge
+directions and estimates how many concurrent calls one Daphne worker can carry.
+
+Usage:
+    python manage.py bench_audio_resampler --frames 5000
+"""
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from HumeAiTwilio.audio import StreamingResampler
+
+try:
+    import audioop
+except ImportError:  # Python 3.13+
+    audioop = None
+
+
+FRAMES_PER_SECOND_PER_CALL = 50  # 20ms telco frames
+
+
+def _test_frame(rate: int) -> bytes:
+    """One 20ms frame of speech-band noise plus tone at the given rate"""
+    rng = np.random.default_rng(7)
+    samples = rate // FRAMES_PER_SECOND_PER_CALL
+    t = np.arange(samples) / rate
+    signal = 6000 * np.sin(2 * np.pi * 440 * t) + rng.normal(0, 1500, samples)
+    return np.clip(signal, -32768, 32767).astype('<i2').tobytes()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the per-call streaming resampler (frames/sec per core)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--frames', type=int, default=5000, help='Frames per measurement')
+
+    def _measure(self, process, frame: bytes, frames: int) -> float:
+        for _ in range(50):  # warm-up
+            process(frame)
+        start = time.perf_counter()
+        for _ in range(frames):
+            process(frame)
+        return frames / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        frames = options['frames']
+        directions = [
+            ('upstream 16k→48k', 16000, 48000),
+            ('downstream 48k→16k', 48000, 16000),
+        ]
+
+        self.stdout.write(self.style.SUCCESS(f'Resampler benchmark ({frames} x 20ms frames)\n'))
+
+        results = {}
+        for backend in ('numpy', 'audioop'):
+            if backend == 'audioop' and audioop is None:
+                continue
+            for label, src, dst in directions:
+                resampler = StreamingResampler(src, dst, backend=backend)
+                fps = self._measure(resampler.process, _test_frame(src), frames)
+                results[(backend, label)] = fps
+                self.stdout.write(f'  {backend:<8} {label:<20} {fps:>12,.0f} frames/sec')
+
+        if audioop is not None:
+            # Previous behaviour: stateless ratecv per frame (state dropped each packet)
+            for label, src, dst in directions:
+                fps = self._measure(
+                    lambda data, s=src, d=dst: audioop.ratecv(data, 2, 1, s, d, None)[0],
+                    _test_frame(src), frames
+                )
+                results[('stateless', label)] = fps
+                self.stdout.write(f'  {"stateless":<8} {label:<20} {fps:>12,.0f} frames/sec')
+
+        self.stdout.write('\nEstimated concurrent calls per core (resampling only, both directions):')
+        for backend in ('numpy', 'audioop', 'stateless'):
+            rates = [results.get((backend, label)) for label, _, _ in directions]
+            if not all(rates):
+                continue
+            seconds_per_call = sum(FRAMES_PER_SECOND_PER_CALL / fps for fps in rates)
+            self.stdout.write(f'  {backend:<10} ~{int(1 / seconds_per_call):,} calls')
@@ -0,0 +1,117 @@
+"""
+Management command to benchmark barge-in (caller speech → agent silence)
+
+Drives the real Twilio consumer audio path (handle_media → VAD → playout flush →
+Twilio 'clear' → HumeAI pause) with synthetic audio at the real 20ms frame
+cadence, while the agent has several seconds of reply queued.
+
+Usage:
+    python manage.py bench_barge_in --trials 10
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from HumeAiTwilio.audio import VoiceActivityDetector, ulaw_encode
+from HumeAiTwilio.hume_realtime_consumer import HumeTwilioRealTimeConsumer
+
+
+class _FakeHume:
+    """Stands in for the HumeAI websocket; records what the consumer sends"""
+
+    def __init__(self):
+        self.closed = False
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def _caller_frames(rng, silence_frames: int, speech_frames: int):
+    """Line noise, then voiced speech (harmonics + noise), as 160-byte µ-law frames"""
+    total = (silence_frames + speech_frames) * 160
+    t = np.arange(total) / 8000
+    audio = rng.normal(0, 40, total)
+    voiced = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 6)) * 2500
+    audio[silence_frames * 160:] += voiced[silence_frames * 160:]
+    pcm = np.clip(audio, -32768, 32767).astype('<i2')
+    return [
+        base64.b64encode(ulaw_encode(pcm[i:i + 160])).decode('ascii')
+        for i in range(0, total, 160)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark local VAD barge-in latency (caller speech start → agent silent)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trials', type=int, default=10, help='Barge-in trials to run')
+
+    async def _trial(self, rng) -> dict:
+        consumer = HumeTwilioRealTimeConsumer()
+        consumer.stream_sid = 'MZbench'
+        consumer.hume_ws = _FakeHume()
+        consumer.hume_connected = True
+        cleared_at = []
+
+        async def send(text_data=None, bytes_data=None):
+            if json.loads(text_data).get('event') == 'clear':
+                cleared_at.append(time.perf_counter())
+
+        consumer.send = send
+        consumer.init_audio_pipelines()
+
+        # Agent is mid-reply with 3 seconds of audio queued
+        reply = (rng.normal(0, 3000, 48000 * 3)).clip(-32768, 32767).astype('<i2').tobytes()
+        await consumer.send_audio_chunks_to_twilio(base64.b64encode(reply).decode('ascii'))
+
+        frames = _caller_frames(rng, silence_frames=25, speech_frames=15)
+        speech_started = None
+        loop = asyncio.get_running_loop()
+        next_frame = loop.time()
+        for index, payload in enumerate(frames):
+            if index == 25:
+                speech_started = time.perf_counter()
+            await consumer.handle_media({'media': {'payload': payload}})
+            if cleared_at:
+                break
+            next_frame += 0.02
+            await asyncio.sleep(max(0.0, next_frame - loop.time()))
+
+        await consumer.playout.close()
+        paused = any('pause_assistant_message' in m for m in consumer.hume_ws.sent)
+        return {
+            'latency_ms': (cleared_at[0] - speech_started) * 1000 if cleared_at and speech_started else None,
+            'false_onset': bool(cleared_at) and speech_started is None,
+            'paused': paused,
+        }
+
+    def _vad_cost(self, rng, frames: int = 20000) -> float:
+        vad = VoiceActivityDetector(sample_rate=8000)
+        frame = rng.normal(0, 2000, 160).astype(np.float32)
+        start = time.perf_counter()
+        for _ in range(frames):
+            vad.process(frame)
+        return (time.perf_counter() - start) / frames * 1e6
+
+    def handle(self, *args, **options):
+        logging.getLogger('HumeAiTwilio').setLevel(logging.WARNING)
+        rng = np.random.default_rng(5)
+
+        results = [asyncio.run(self._trial(rng)) for _ in range(options['trials'])]
+        latencies = [r['latency_ms'] for r in results if r['latency_ms'] is not None]
+
+        self.stdout.write(self.style.SUCCESS(f"Barge-in benchmark ({options['trials']} trials)\n"))
+        if latencies:
+            self.stdout.write(f"  speech → agent silent  p50 {np.percentile(latencies, 50):6.1f} ms"
+                              f"   p95 {np.percentile(latencies, 95):6.1f} ms   max {max(latencies):6.1f} ms")
+        self.stdout.write(f"  detected               {len(latencies)}/{len(results)}")
+        self.stdout.write(f"  false onsets (noise)   {sum(r['false_onset'] for r in results)}")
+        self.stdout.write(f"  HumeAI paused          {sum(r['paused'] for r in results)}/{len(results)}")
+        self.stdout.write(f"  VAD cost               {self._vad_cost(rng):6.1f} µs/frame")
@@ -0,0 +1,126 @@
+"""
+Management command to load-test ConversationLog writes: per-event create vs write-behind buffer
+
+Simulates N concurrent calls on one event loop, each producing HumeAI events
+(emotion frames and transcripts) every --interval-ms. Counts the SQL statements
+actually sent for ConversationLog rows and how long each event handler awaited
+the database. Test rows are deleted afterwards.
+
+Usage:
+    python manage.py bench_conversation_log --calls 20 --events 240 --interval-ms 10
+"""
+
+import asyncio
+import time
+import uuid
+
+import numpy as np
+from channels.db import database_sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from HumeAiTwilio.conversation_buffer import ConversationLogBuffer
+from HumeAiTwilio.emotion_vectors import emotion_fields
+from HumeAiTwilio.models import ConversationLog, TwilioCall
+
+
+class _QueryCounter:
+    """execute_wrapper counting statements on whichever thread runs the write"""
+
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def wrap(self, write):
+        def counted(*args, **kwargs):
+            with connection.execute_wrapper(self):
+                return write(*args, **kwargs)
+        return counted
+
+
+class Command(BaseCommand):
+    help = 'Load-test ConversationLog persistence: per-event create vs bulk_create write-behind'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=20, help='Concurrent simulated calls')
+        parser.add_argument('--events', type=int, default=240, help='HumeAI events per call')
+        parser.add_argument('--interval-ms', type=float, default=10.0, help='Gap between events per call')
+        parser.add_argument('--max-rows', type=int, default=25, help='Buffer size threshold')
+        parser.add_argument('--max-delay', type=float, default=2.0, help='Buffer age threshold (seconds)')
+
+    def _fields(self, call, i):
+        if i % 6 == 0:
+            return {'call': call, 'role': 'user' if i % 12 == 0 else 'assistant', 'message': f'turn {i}'}
+        return {'call': call, 'role': 'system', 'message': '', **emotion_fields({'Calmness': 0.4, 'Joy': 0.2})}
+
+    async def _per_event(self, call, events, interval, counter, waits):
+        create = database_sync_to_async(counter.wrap(ConversationLog.objects.create))
+        for i in range(events):
+            started = time.perf_counter()
+            await create(**self._fields(call, i))
+            waits.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(interval)
+
+    async def _buffered(self, call, events, interval, counter, waits, max_rows, max_delay):
+        buffer = ConversationLogBuffer(max_rows=max_rows, max_delay=max_delay,
+                                       write=counter.wrap(ConversationLog.objects.bulk_create))
+        for i in range(events):
+            started = time.perf_counter()
+            buffer.add(**self._fields(call, i))
+            waits.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(interval)
+        await buffer.close()
+
+    async def _run(self, mode, calls, options):
+        counter = _QueryCounter()
+        waits = []
+        interval = options['interval_ms'] / 1000
+        started = time.perf_counter()
+        if mode == 'per-event':
+            await asyncio.gather(*(
+                self._per_event(call, options['events'], interval, counter, waits) for call in calls
+            ))
+        else:
+            await asyncio.gather(*(
+                self._buffered(call, options['events'], interval, counter, waits,
+                               options['max_rows'], options['max_delay']) for call in calls
+            ))
+        elapsed = time.perf_counter() - started
+        rows = await database_sync_to_async(ConversationLog.objects.filter(call__in=calls).count)()
+        return {
+            'queries': counter.queries, 'rows': rows, 'elapsed': elapsed,
+            'wait_p50': float(np.percentile(waits, 50)), 'wait_p99': float(np.percentile(waits, 99)),
+        }
+
+    def _make_calls(self, count):
+        return [
+            TwilioCall.objects.create(call_sid=f'bench-{uuid.uuid4()}', from_number='+10000000000',
+                                      to_number='+10000000001', provider='vonage')
+            for _ in range(count)
+        ]
+
+    def handle(self, *args, **options):
+        expected = options['calls'] * options['events']
+        self.stdout.write(f"{options['calls']} calls x {options['events']} events = {expected} rows per mode\n")
+        self.stdout.write(f"{'mode':<11} {'rows':>6} {'queries':>8} {'per call':>9} {'wait p50':>9} {'wait p99':>9} {'wall':>7}")
+        results = {}
+        for mode in ('per-event', 'buffered'):
+            calls = self._make_calls(options['calls'])
+            try:
+                result = asyncio.run(self._run(mode, calls, options))
+            finally:
+                TwilioCall.objects.filter(pk__in=[call.pk for call in calls]).delete()
+            results[mode] = result
+            self.stdout.write(
+                f"{mode:<11} {result['rows']:>6} {result['queries']:>8} "
+                f"{result['queries'] / options['calls']:>9.1f} {result['wait_p50']:>7.3f}ms "
+                f"{result['wait_p99']:>7.3f}ms {result['elapsed']:>6.2f}s"
+            )
+            if result['rows'] != expected:
+                self.stdout.write(self.style.ERROR(f"  {mode}: {result['rows']} rows saved, expected {expected}"))
+
+        reduction = results['per-event']['queries'] / max(1, results['buffered']['queries'])
+        self.stdout.write(self.style.SUCCESS(f"\nDB round-trips per call cut {reduction:.1f}x"))
@@ -0,0 +1,95 @@
+"""
+Management command to benchmark the audio DSP execution modes under load
+
+Simulates N concurrent Twilio calls on one event loop (like one Daphne process):
+each call pushes a 20ms caller frame every 20ms through the inbound pipeline and
+a 200ms HumeAI chunk every 200ms through the outbound pipeline. Reports event
+loop lag and per-frame processing time for each mode.
+
+Usage:
+    python manage.py bench_dsp_executor --calls 50 --seconds 5 --modes inline,thread,process
+"""
+
+import asyncio
+import base64
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from HumeAiTwilio.audio import DSPExecutor, twilio_inbound_pipeline, twilio_outbound_pipeline, ulaw_encode
+from HumeAiTwilio.metrics import LatencyRegistry, LoopLagMonitor, LOOP_LAG_BUCKETS_MS
+
+
+class Command(BaseCommand):
+    help = 'Benchmark inline / thread / process audio DSP under concurrent call load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=50, help='Concurrent simulated calls')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration per mode')
+        parser.add_argument('--workers', type=int, default=2, help='Thread/process workers')
+        parser.add_argument('--modes', default='inline,thread,process', help='Comma-separated modes')
+
+    async def _call(self, executor, seconds, frame_b64, chunk, frame_times):
+        inbound = executor.session(twilio_inbound_pipeline)
+        outbound = executor.session(twilio_outbound_pipeline)
+        loop = asyncio.get_running_loop()
+
+        async def caller():
+            next_at = loop.time()
+            end = next_at + seconds
+            while loop.time() < end:
+                start = time.perf_counter()
+                await inbound.process_b64(frame_b64)
+                frame_times.append((time.perf_counter() - start) * 1000)
+                next_at += 0.02
+                await asyncio.sleep(max(0.0, next_at - loop.time()))
+
+        async def agent():
+            next_at = loop.time()
+            end = next_at + seconds
+            while loop.time() < end:
+                await outbound.process(chunk)
+                next_at += 0.2
+                await asyncio.sleep(max(0.0, next_at - loop.time()))
+
+        await asyncio.gather(caller(), agent())
+        await inbound.close()
+        await outbound.close()
+
+    async def _run_mode(self, mode, calls, seconds, workers):
+        rng = np.random.default_rng(9)
+        frame_b64 = base64.b64encode(ulaw_encode(rng.normal(0, 2000, 160).astype('<i2'))).decode('ascii')
+        chunk = rng.normal(0, 2000, 9600).clip(-32768, 32767).astype('<i2').tobytes()  # 200ms @ 48kHz
+
+        executor = DSPExecutor(mode, workers=workers)
+        registry = LatencyRegistry('bench_loop_lag_ms', buckets=LOOP_LAG_BUCKETS_MS)
+        monitor = LoopLagMonitor(interval=0.01, registry=registry, label=mode).start()
+        frame_times = []
+        try:
+            await asyncio.gather(*(
+                self._call(executor, seconds, frame_b64, chunk, frame_times) for _ in range(calls)
+            ))
+        finally:
+            monitor.stop()
+            executor.shutdown()
+
+        lag = registry.histogram(mode, 'event_loop_lag')
+        return {
+            'lag_p50': lag.quantile(0.5), 'lag_p99': lag.quantile(0.99), 'lag_max': monitor.max_lag_ms,
+            'frame_p50': float(np.percentile(frame_times, 50)), 'frame_p99': float(np.percentile(frame_times, 99)),
+            'frames': len(frame_times),
+        }
+
+    def handle(self, *args, **options):
+        calls, seconds, workers = options['calls'], options['seconds'], options['workers']
+        self.stdout.write(self.style.SUCCESS(
+            f'Audio DSP executor benchmark ({calls} calls x {seconds:.0f}s, {workers} workers)\n'
+        ))
+        self.stdout.write(f"  {'mode':<8} {'loop lag p50':>13} {'p99':>8} {'max':>8}   {'frame p50':>10} {'p99':>8}   frames")
+        for mode in [m.strip() for m in options['modes'].split(',') if m.strip()]:
+            r = asyncio.run(self._run_mode(mode, calls, seconds, workers))
+            self.stdout.write(
+                f"  {mode:<8} {r['lag_p50']:>10.1f} ms {r['lag_p99']:>5.1f} ms {r['lag_max']:>5.1f} ms"
+                f"   {r['frame_p50']:>7.2f} ms {r['frame_p99']:>5.2f} ms   {r['frames']}"
+            )
@@ -0,0 +1,112 @@
+"""
+Management command to benchmark the shared embedding service (embeddings.py)
+
+Reports, for the configured EMBEDDING_MODEL:
+    cold start      service creation + first encode (includes the model load)
+    warm query      p50/p99 of one uncached text, of an LRU hit and of a disk-cache hit
+    throughput      texts/s from --threads concurrent callers, one text per call:
+                    micro-batched vs batch size 1 (the old one-encode-per-call path)
+
+--simulate swaps the model for a stand-in with a fixed cost per encode() call
+plus a cost per text (--call-ms / --text-ms), for machines without
+sentence-transformers; it measures the service's batching and caching, not
+MiniLM itself. The disk cache goes to a temporary directory.
+
+Usage:
+    python manage.py bench_embeddings [--texts 2000] [--threads 8] [--simulate --call-ms 8 --text-ms 0.5]
+"""
+
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from HumeAiTwilio.embeddings import EmbeddingService, model_available
+
+
+class _SimulatedModel:
+    """Costs call_ms per encode() plus text_ms per text; vectors are hashed words (384 dims)"""
+
+    def __init__(self, call_ms, text_ms, load_seconds):
+        time.sleep(load_seconds)
+        self.call_ms, self.text_ms = call_ms, text_ms
+
+    def encode(self, texts, batch_size=None):
+        time.sleep((self.call_ms + self.text_ms * len(texts)) / 1000.0)
+        vectors = np.zeros((len(texts), 384), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.split():
+                vectors[row, zlib.crc32(word.encode()) % 384] += 1
+        return vectors
+
+
+class Command(BaseCommand):
+    help = 'Cold start, warm query latency and batch throughput of the shared embedding service'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--texts', type=int, default=2000, help='Distinct texts for the throughput run')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent callers')
+        parser.add_argument('--queries', type=int, default=200, help='Samples per warm-latency figure')
+        parser.add_argument('--simulate', action='store_true', help='Stand-in model instead of sentence-transformers')
+        parser.add_argument('--call-ms', type=float, default=8.0, help='Simulated cost per encode() call')
+        parser.add_argument('--text-ms', type=float, default=0.5, help='Simulated cost per text')
+        parser.add_argument('--load-seconds', type=float, default=3.0, help='Simulated model load time')
+
+    def handle(self, *args, **options):
+        if options['simulate']:
+            loader = lambda name: _SimulatedModel(options['call_ms'], options['text_ms'], options['load_seconds'])
+        elif model_available():
+            loader = None
+        else:
+            raise CommandError("sentence-transformers is not installed (use --simulate)")
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            started = time.perf_counter()
+            service = EmbeddingService(loader=loader, cache_dir=cache_dir)
+            created = time.perf_counter() - started
+            service.encode('how much does the starter plan cost')
+            cold = time.perf_counter() - started
+            self.stdout.write(f"cold start: service {created * 1000:.2f} ms, first vector {cold * 1000:.0f} ms "
+                              f"(model load {service.load_seconds * 1000:.0f} ms)")
+
+            texts = [f"question {i} about pricing plan {i % 97} and integration {i % 13}"
+                     for i in range(options['texts'] + options['queries'])]
+            warm, texts = texts[:options['queries']], texts[options['queries']:]
+            self._latency('uncached', [lambda t=t: service.encode(t) for t in warm])
+            self._latency('lru hit', [lambda t=t: service.encode(t.upper()) for t in warm])
+            disk = EmbeddingService(loader=lambda name: service.model, cache_dir=cache_dir)
+            self._latency('disk hit', [lambda t=t: disk.encode(t) for t in warm])
+
+            for label, batch_size in (('batch size 1', 1), ('micro-batched', None)):
+                fresh = EmbeddingService(loader=lambda name: service.model, cache_dir='', batch_size=batch_size,
+                                         batch_wait_ms=0 if batch_size == 1 else None)
+                rate = self._throughput(fresh, texts, options['threads'])
+                stats = fresh.get_stats()
+                self.stdout.write(f"throughput {label:<14} {rate:>8.0f} texts/s "
+                                  f"({stats.get('batches', 0)} encode calls, {options['threads']} threads)")
+            started = time.perf_counter()
+            EmbeddingService(loader=lambda name: service.model, cache_dir='').encode(texts)
+            self.stdout.write(f"throughput {'encode(list)':<14} {len(texts) / (time.perf_counter() - started):>8.0f} texts/s")
+
+    def _latency(self, label, calls):
+        timings = []
+        for call in calls:
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(f"warm query {label:<9} p50 {np.percentile(timings, 50):8.3f} ms   "
+                          f"p99 {np.percentile(timings, 99):8.3f} ms")
+
+    def _throughput(self, service, texts, threads):
+        shares = [texts[i::threads] for i in range(threads)]
+        workers = [threading.Thread(target=lambda share=share: [service.encode(text) for text in share])
+                   for share in shares]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return len(texts) / (time.perf_counter() - started)
@@ -0,0 +1,143 @@
+"""
+Management command to compare emotion retention policies: rows per call, dashboard query time, analytics drift
+
+Simulates calls with HumeAI prosody frames at --hz while the caller talks
+(utterances of 2-6s, emotions drifting with occasional shifts), stores them under
+each EMOTION_RETENTION_POLICY together with the transcript, then times the
+dashboard reads: one call's transcript with decoded emotions and the
+tone-trends daily emotion profile over all simulated calls. Analytics are
+compared with the 'all' policy. Test rows are deleted afterwards.
+
+Usage:
+    python manage.py bench_emotion_retention --calls 30 --minutes 3 --hz 4
+"""
+
+import time
+import uuid
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db.models.functions import TruncDate
+
+from HumeAiTwilio.emotion_retention import RETENTION_POLICIES, EmotionRetention
+from HumeAiTwilio.emotion_vectors import EMOTION_VOCABULARY
+from HumeAiTwilio.models import ConversationAnalytics, ConversationLog, TwilioCall
+from HumeAiTwilio.services.analytics_processor import AnalyticsProcessor
+from HumeAiTwilio.services.live_analytics import LiveCallAnalytics
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Command(BaseCommand):
+    help = 'Compare emotion retention policies: rows per call, dashboard query time, analytics drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=30, help='Simulated calls per policy')
+        parser.add_argument('--minutes', type=float, default=3.0, help='Call length')
+        parser.add_argument('--hz', type=float, default=4.0, help='Prosody frames per second of caller speech')
+        parser.add_argument('--policies', default=','.join(RETENTION_POLICIES), help='Comma-separated policies')
+
+    def _script(self, seed, minutes, hz):
+        """[(t, 'frame', scores) | (t, 'utterance', text)] for one call"""
+        rng = np.random.default_rng(seed)
+        events, t, mood = [], 0.0, rng.dirichlet(np.full(len(EMOTION_VOCABULARY), 0.3))
+        while t < minutes * 60:
+            length = rng.uniform(2.0, 6.0)
+            if rng.random() < 0.25:  # the caller's mood shifts
+                mood = rng.dirichlet(np.full(len(EMOTION_VOCABULARY), 0.3))
+            for step in range(int(length * hz)):
+                noisy = np.clip(mood + rng.normal(0, 0.01, mood.shape), 0, None)
+                events.append((t + step / hz, 'frame', dict(zip(EMOTION_VOCABULARY, noisy.round(4).tolist()))))
+            t += length
+            events.append((t, 'utterance', f'caller sentence at {t:.0f}s'))
+            t += rng.uniform(2.0, 5.0)  # agent talks
+            events.append((t, 'reply', f'agent reply at {t:.0f}s'))
+        return events
+
+    def _rows(self, call, script, policy):
+        clock = _Clock()
+        retention = EmotionRetention(policy, clock=clock)
+        logs = []
+
+        def emotion_logs(rows):
+            for row in rows:
+                logs.append(ConversationLog(call=call, role='system', message='', sentiment='neutral', **row))
+
+        for t, kind, payload in script:
+            clock.now = t
+            if kind == 'frame':
+                emotion_logs(retention.offer(payload))
+            else:
+                if kind == 'utterance':
+                    emotion_logs(retention.end_utterance())
+                logs.append(ConversationLog(call=call, role='user' if kind == 'utterance' else 'assistant',
+                                            message=payload))
+        emotion_logs(retention.flush())
+        return logs
+
+    def _timed(self, fn, repeat=5):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000
+
+    def handle(self, *args, **options):
+        scripts = [self._script(seed, options['minutes'], options['hz']) for seed in range(options['calls'])]
+        frames = sum(1 for script in scripts for event in script if event[1] == 'frame')
+        self.stdout.write(f"{options['calls']} calls x {options['minutes']:.0f} min, "
+                          f"{frames / options['calls']:.0f} emotion frames per call\n")
+        self.stdout.write(f"{'policy':<10} {'rows/call':>9} {'emotion':>8} {'transcript':>11} "
+                          f"{'tone trends':>12} {'avg sentiment':>14} {'same dominant':>14}")
+
+        baseline = None
+        for policy in options['policies'].split(','):
+            calls = [TwilioCall.objects.create(call_sid=f'bench-{uuid.uuid4()}', from_number='+1',
+                                               to_number='+2', provider='vonage') for _ in scripts]
+            try:
+                analytics = []
+                for call, script in zip(calls, scripts):
+                    logs = self._rows(call, script, policy)
+                    ConversationLog.objects.bulk_create(logs)
+                    live = LiveCallAnalytics()
+                    for log in logs:
+                        live.add_log(log)
+                    snapshot = live.snapshot()
+                    ConversationAnalytics.objects.create(call=call, **snapshot)
+                    analytics.append((snapshot['avg_sentiment'], snapshot['dominant_customer_emotion']))
+
+                rows = ConversationLog.objects.filter(call__in=calls).count()
+                emotion_rows = ConversationLog.objects.filter(call__in=calls, role='system').count()
+
+                def transcript():
+                    for log in ConversationLog.objects.filter(call=calls[0]).order_by('timestamp'):
+                        log.emotion_dict
+
+                def tone_trends():
+                    AnalyticsProcessor.top_emotions_by_day(
+                        ConversationLog.objects.filter(
+                            call__clarifies_analytics__call__in=calls, emotion_vector__isnull=False
+                        ).annotate(day=TruncDate('call__clarifies_analytics__analyzed_at'))
+                        .values_list('day', 'emotion_vector')
+                    )
+
+                transcript_ms, trends_ms = self._timed(transcript), self._timed(tone_trends)
+            finally:
+                TwilioCall.objects.filter(pk__in=[call.pk for call in calls]).delete()
+
+            baseline = baseline or analytics
+            drift = max(abs(a[0] - b[0]) for a, b in zip(analytics, baseline))
+            same = sum(a[1] == b[1] for a, b in zip(analytics, baseline))
+            self.stdout.write(
+                f"{policy:<10} {rows / len(calls):>9.1f} {emotion_rows / len(calls):>8.1f} "
+                f"{transcript_ms:>9.2f}ms {trends_ms:>10.2f}ms {'±' + format(drift, '.3f'):>14} "
+                f"{same:>8}/{len(calls)}"
+            )
+        self.stdout.write("\nAnalytics drift is measured against the first policy listed ('all' by default).")
@@ -0,0 +1,104 @@
+"""
+Management command to benchmark emotion score storage: JSON dict vs compact vector
+
+Generates Hume-like prosody frames (48 named scores) and compares bytes per row
+and the cost of an analytics read pass (decode + sentiment fold + mean emotion
+profile) for the old JSON representation and the float16 / float32 vectors.
+
+Usage:
+    python manage.py bench_emotion_storage --rows 20000
+"""
+
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from HumeAiTwilio.emotion_vectors import EMOTION_VOCABULARY, decode_vector, emotion_fields, stack_vectors
+from HumeAiTwilio.services.live_analytics import LiveCallAnalytics
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ConversationLog emotion storage: JSON vs float16/float32 vectors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Emotion events to encode')
+
+    def _frames(self, rows):
+        rng = np.random.default_rng(13)
+        scores = rng.beta(0.6, 6.0, size=(rows, len(EMOTION_VOCABULARY)))
+        return [dict(zip(EMOTION_VOCABULARY, row.round(6).tolist())) for row in scores]
+
+    def _timed(self, fn, repeat=3):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - started)
+        return best, result
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        frames = self._frames(rows)
+        stored_json = [json.dumps(frame) for frame in frames]
+        stored_double = [json.dumps(text) for text in stored_json]  # old Twilio path
+        compact = {dtype: [emotion_fields(frame, dtype) for frame in frames] for dtype in ('float16', 'float32')}
+
+        self.stdout.write(f"{rows} emotion events, {len(EMOTION_VOCABULARY)} emotions each\n")
+        self.stdout.write(f"{'format':<22} {'bytes/row':>10} {'total KiB':>10}")
+        sizes = {
+            'json dict': sum(map(len, stored_json)),
+            'json string (twilio)': sum(map(len, stored_double)),
+        }
+        for dtype, fields in compact.items():
+            sizes[f'{dtype} + top-3'] = sum(len(f['emotion_vector']) + len(json.dumps(f['emotion_top'])) for f in fields)
+        for name, total in sizes.items():
+            self.stdout.write(f"{name:<22} {total / rows:>10.1f} {total / 1024:>10.1f}")
+
+        # Read pass: decode every row, fold sentiment / dominant emotion, mean emotion profile
+        def read_json():
+            live = LiveCallAnalytics()
+            profile = {}
+            for text in stored_json:
+                scores = json.loads(text)
+                live.add(emotion_scores=scores)
+                for name, value in scores.items():
+                    profile[name] = profile.get(name, 0.0) + value
+            return live.avg_sentiment
+
+        def read_vectors(dtype):
+            def run():
+                matrix = stack_vectors([f['emotion_vector'] for f in compact[dtype]])
+                live = LiveCallAnalytics()
+                for row in matrix:
+                    live.add(emotion_vector=row)
+                matrix.mean(axis=0)
+                return live.avg_sentiment
+            return run
+
+        def decode_json():
+            return [json.loads(text) for text in stored_json]
+
+        def decode_stacked():
+            return stack_vectors([f['emotion_vector'] for f in compact['float16']])
+
+        def decode_each():
+            return [decode_vector(f['emotion_vector']) for f in compact['float16']]
+
+        self.stdout.write(f"\n{'read pass':<22} {'ms':>10} {'us/row':>10}")
+        results = [('decode json', decode_json), ('decode f16 per row', decode_each),
+                   ('decode f16 stacked', decode_stacked), ('analytics json', read_json),
+                   ('analytics float16', read_vectors('float16')), ('analytics float32', read_vectors('float32'))]
+        sentiments = {}
+        for name, fn in results:
+            seconds, value = self._timed(fn)
+            if name.startswith('analytics'):
+                sentiments[name] = value
+            self.stdout.write(f"{name:<22} {seconds * 1000:>10.1f} {seconds * 1e6 / rows:>10.2f}")
+
+        exact = np.array([list(frame.values()) for frame in frames], dtype=np.float64)
+        error = np.abs(stack_vectors([f['emotion_vector'] for f in compact['float16']]) - exact).max()
+        self.stdout.write(f"\nfloat16 max abs score error: {error:.2e}")
+        self.stdout.write(f"avg_sentiment json {sentiments['analytics json']:.6f} / "
+                          f"float16 {sentiments['analytics float16']:.6f} / float32 {sentiments['analytics float32']:.6f}")
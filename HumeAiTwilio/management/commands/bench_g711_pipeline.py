@@ -0,0 +1,80 @@
+"""
+Management command to benchmark the fused G.711 pipelines
+
+Compares the Twilio consumer's previous audioop chain (ulaw2lin → mul → ratecv,
+with base64 in and out) against MulawInboundPipeline / MulawOutboundPipeline.
+
+Usage:
+    python manage.py bench_g711_pipeline --frames 5000
+"""
+
+import base64
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from HumeAiTwilio.audio import (
+    AutomaticGainControl, MulawInboundPipeline, MulawOutboundPipeline, ulaw_encode,
+)
+
+try:
+    import audioop
+except ImportError:  # Python 3.13+
+    audioop = None
+
+
+def _audioop_inbound(mulaw_b64: str) -> str:
+    linear = audioop.ulaw2lin(base64.b64decode(mulaw_b64), 2)
+    linear = audioop.mul(linear, 2, 2.8)
+    linear = audioop.ratecv(linear, 2, 1, 8000, 48000, None)[0]
+    return base64.b64encode(linear).decode('utf-8')
+
+
+def _audioop_outbound(linear_b64: str) -> str:
+    linear = audioop.ratecv(base64.b64decode(linear_b64), 2, 1, 48000, 8000, None)[0]
+    return base64.b64encode(audioop.lin2ulaw(linear, 2)).decode('utf-8')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark fused µ-law pipelines against the audioop chain'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--frames', type=int, default=5000, help='20ms frames per measurement')
+
+    def _measure(self, fn, payload, frames: int) -> float:
+        for _ in range(50):
+            fn(payload)
+        start = time.perf_counter()
+        for _ in range(frames):
+            fn(payload)
+        return frames / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        frames = options['frames']
+        rng = np.random.default_rng(11)
+
+        # 20ms Twilio frame (160 µ-law bytes) and 20ms HumeAI chunk (960 samples @ 48kHz)
+        speech_8k = np.clip(rng.normal(0, 3000, 160), -32768, 32767).astype('<i2')
+        mulaw_b64 = base64.b64encode(ulaw_encode(speech_8k)).decode('ascii')
+        speech_48k = np.clip(rng.normal(0, 3000, 960), -32768, 32767).astype('<i2')
+        linear_b64 = base64.b64encode(speech_48k.tobytes()).decode('ascii')
+
+        inbound = MulawInboundPipeline(output_rate=48000, gain=2.8)
+        inbound_agc = MulawInboundPipeline(output_rate=48000, agc=AutomaticGainControl(8000))
+        outbound = MulawOutboundPipeline(input_rate=48000)
+
+        rows = [
+            ('inbound  fused', self._measure(inbound.process_b64, mulaw_b64, frames)),
+            ('inbound  + AGC', self._measure(inbound_agc.process_b64, mulaw_b64, frames)),
+            ('outbound fused', self._measure(outbound.process_b64, linear_b64, frames)),
+        ]
+        if audioop is not None:
+            rows += [
+                ('inbound  audioop', self._measure(_audioop_inbound, mulaw_b64, frames)),
+                ('outbound audioop', self._measure(_audioop_outbound, linear_b64, frames)),
+            ]
+
+        self.stdout.write(self.style.SUCCESS(f'G.711 pipeline benchmark ({frames} x 20ms frames)\n'))
+        for label, fps in rows:
+            self.stdout.write(f'  {label:<18} {fps:>12,.0f} frames/sec  ({1e6 / fps:6.1f} µs/frame)')
@@ -0,0 +1,82 @@
+"""
+Management command to benchmark end-of-call persistence of the Twilio consumer's Q/A history
+
+Compares the old per-row path (two ConversationLog.objects.create per Q/A pair in
+autocommit, analytics folded as rows are saved) with persist_conversation_history
+(one transaction, one bulk_create, one analytics snapshot) for several call
+lengths. Reports persist time and SQL statements per call. Test rows are deleted
+afterwards.
+
+Usage:
+    python manage.py bench_history_persist --pairs 10,50,200 --calls 5
+"""
+
+import time
+import uuid
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from HumeAiTwilio.conversation_buffer import persist_conversation_history
+from HumeAiTwilio.emotion_vectors import EMOTION_VOCABULARY, emotion_fields
+from HumeAiTwilio.models import ConversationLog, TwilioCall
+from HumeAiTwilio.services.live_analytics import LiveCallAnalytics
+
+
+class Command(BaseCommand):
+    help = 'Benchmark Twilio end-of-call history persistence: per-row create vs one bulk_create transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pairs', default='10,50,200', help='Comma-separated Q/A pairs per call')
+        parser.add_argument('--calls', type=int, default=5, help='Calls per length and mode')
+
+    def _history(self, pairs, seed):
+        rng = np.random.default_rng(seed)
+        return [{
+            'question': f'customer question {i} about pricing and delivery',
+            'answer': f'agent answer {i} with the details the customer asked for',
+            'emotions': dict(zip(EMOTION_VOCABULARY, rng.beta(0.6, 6.0, len(EMOTION_VOCABULARY)).round(4).tolist())),
+        } for i in range(pairs)]
+
+    def _per_row(self, call, history):
+        """The previous save_logs loop"""
+        live = LiveCallAnalytics()
+        for idx, pair in enumerate(history):
+            live.add_log(ConversationLog.objects.create(call=call, role='user', message=pair['question'],
+                                                        metadata={'pair_index': idx},
+                                                        **emotion_fields(pair['emotions'])))
+            live.add_log(ConversationLog.objects.create(call=call, role='assistant', message=pair['answer'],
+                                                        metadata={'pair_index': idx}))
+        live.persist(call)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'pairs':>6} {'mode':<9} {'rows':>6} {'queries':>8} {'ms/call':>9} {'ms/row':>8}")
+        for pairs in [int(p) for p in options['pairs'].split(',')]:
+            results = {}
+            for mode in ('per-row', 'batched'):
+                calls = [TwilioCall.objects.create(call_sid=f'bench-{uuid.uuid4()}', from_number='+1',
+                                                   to_number='+2') for _ in range(options['calls'])]
+                try:
+                    elapsed, queries = [], 0
+                    for seed, call in enumerate(calls):
+                        history = self._history(pairs, seed)
+                        with CaptureQueriesContext(connection) as captured:
+                            started = time.perf_counter()
+                            if mode == 'per-row':
+                                self._per_row(call, history)
+                            else:
+                                persist_conversation_history(call.call_sid, history)
+                            elapsed.append((time.perf_counter() - started) * 1000)
+                        queries += len(captured)
+                    rows = ConversationLog.objects.filter(call__in=calls).count()
+                finally:
+                    TwilioCall.objects.filter(pk__in=[call.pk for call in calls]).delete()
+                ms = float(np.median(elapsed))
+                results[mode] = ms
+                self.stdout.write(f"{pairs:>6} {mode:<9} {rows // len(calls):>6} {queries / len(calls):>8.0f} "
+                                  f"{ms:>9.1f} {ms / (2 * pairs):>8.3f}")
+            self.stdout.write(self.style.SUCCESS(
+                f"{pairs:>6} pairs: {results['per-row'] / results['batched']:.1f}x faster batched"
+            ))
@@ -0,0 +1,118 @@
+"""
+Management command to benchmark learned-knowledge search: BM25 index vs the old full scan
+
+Fills LearnedKnowledge with synthetic Q&A pairs (source='bench'), then asks
+paraphrased versions of stored questions (words dropped, synonyms swapped) and
+reports per-query latency and how often the source entry's answer comes back.
+The full scan is the previous search_knowledge_base loop (every row loaded and
+set-overlap scored per question), so it only runs a few queries at large sizes.
+Bench rows are deleted afterwards.
+
+Usage:
+    python manage.py bench_knowledge_search --sizes 1000,10000,100000 --queries 500 --scan-queries 5
+"""
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from HumeAiTwilio.knowledge_index import SYNONYMS, KnowledgeIndex
+from HumeAiTwilio.models import LearnedKnowledge
+
+TOPICS = [word for words in SYNONYMS.values() for word in words if ' ' not in word]
+
+
+def full_scan(query):
+    """The search_knowledge_base loop before the index (best answer or None)"""
+    query_lower = query.lower().strip()
+    expanded_words = set(query_lower.split())
+    for word in query_lower.split():
+        for syn_list in SYNONYMS.values():
+            if word in syn_list:
+                expanded_words.update(syn_list)
+    best_match, best_score = None, 0
+    for entry in LearnedKnowledge.objects.all():
+        question_lower = entry.question.lower()
+        question_words = set(question_lower.split())
+        score = len(expanded_words & question_words) / max(len(expanded_words), len(question_words))
+        if 'cost' in query_lower or 'price' in query_lower:
+            if 'cost' in question_lower or 'price' in question_lower:
+                score += 0.3
+        if 'small' in query_lower and 'business' in query_lower:
+            if 'small' in question_lower and 'business' in question_lower:
+                score += 0.3
+        if score > best_score and score > 0.4:
+            best_score, best_match = score, entry
+    return best_match.answer if best_match else None
+
+
+class Command(BaseCommand):
+    help = 'Benchmark LearnedKnowledge search: in-process BM25 index vs full table scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated knowledge base sizes')
+        parser.add_argument('--queries', type=int, default=500, help='Index queries per size')
+        parser.add_argument('--scan-queries', type=int, default=5, help='Full-scan queries per size')
+        parser.add_argument('--seed', type=int, default=7)
+
+    def _corpus(self, rng, size):
+        """Zipf-distributed words from a 20k vocabulary plus one synonym-group word per question"""
+        vocabulary = np.array([f'w{i}' for i in range(20000)])
+        weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+        lengths = rng.integers(5, 12, size=size)
+        words = rng.choice(vocabulary, size=int(lengths.sum()), p=weights / weights.sum())
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        rows = []
+        for i in range(size):
+            question = list(words[offsets[i]:offsets[i + 1]])
+            question.insert(int(rng.integers(0, len(question))), str(rng.choice(TOPICS)))
+            rows.append(LearnedKnowledge(question=f"{' '.join(question)} q{i}", answer=f'answer {i}', source='bench'))
+        return rows
+
+    def _paraphrase(self, rng, question):
+        words = question.split()[:-1]  # drop the unique q<i> marker
+        keep = [word for word in words if rng.random() > 0.25] or words
+        for idx, word in enumerate(keep):
+            for synonyms in SYNONYMS.values():
+                if word in synonyms:
+                    keep[idx] = str(rng.choice([s for s in synonyms if ' ' not in s]))
+        return ' '.join(keep)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'entries':>8} {'mode':<6} {'build ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'hit %':>6}")
+        for size in [int(s) for s in options['sizes'].split(',')]:
+            rng = np.random.default_rng(options['seed'])
+            rows = self._corpus(rng, size)
+            LearnedKnowledge.objects.bulk_create(rows, batch_size=2000)
+            try:
+                sample = rng.choice(len(rows), size=options['queries'])
+                queries = [(self._paraphrase(rng, rows[i].question), rows[i].answer) for i in sample]
+
+                started = time.perf_counter()
+                index = KnowledgeIndex()
+                index.rebuild()
+                build_ms = (time.perf_counter() - started) * 1000
+                timings, hits = [], 0
+                for query, answer in queries:
+                    started = time.perf_counter()
+                    match = index.best_match(query)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    hits += bool(match and match['answer'] == answer)
+                self._report(size, 'index', build_ms, timings, hits, len(queries))
+
+                timings, hits = [], 0
+                for query, answer in queries[:options['scan_queries']]:
+                    started = time.perf_counter()
+                    result = full_scan(query)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    hits += result == answer
+                self._report(size, 'scan', 0.0, timings, hits, len(timings))
+            finally:
+                LearnedKnowledge.objects.filter(source='bench').delete()
+
+    def _report(self, size, mode, build_ms, timings, hits, count):
+        if not timings:
+            return
+        self.stdout.write(f"{size:>8} {mode:<6} {build_ms:>9.0f} {np.percentile(timings, 50):>8.3f} "
+                          f"{np.percentile(timings, 99):>8.3f} {100 * hits / count:>6.1f}")
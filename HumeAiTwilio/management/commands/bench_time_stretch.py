@@ -0,0 +1,89 @@
+"""
+Management command to benchmark the agent speaking-rate stage
+
+Compares the consumers' previous per-chunk ``pydub.effects.speedup`` call
+(AudioSegment.from_raw → speedup → export) against the streaming WSOLA
+TimeStretcher, on the same 8kHz linear16 chunks. The consumers stretch each
+HumeAI audio_output as it arrives, so the default sweep covers the sizes those
+chunks come in (40ms up to a 2s sentence). pydub rebuilds its output on every
+150ms append, so it gets slower than linear as chunks grow, and it refuses
+chunks much shorter than that (reported as n/a).
+
+The ratio depends on chunk size: roughly 8-11x at 2s, but only 3-4x at
+500ms, short of 10x. Either way the per-chunk cost is far below the chunk's
+own duration.
+
+Usage:
+    python manage.py bench_time_stretch --chunks 200 --chunk-ms 40 120 500 2000 --speed 1.25
+"""
+
+import io
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from HumeAiTwilio.audio import TimeStretcher, float_to_pcm16
+
+try:
+    from pydub import AudioSegment
+    from pydub.effects import speedup
+except ImportError:
+    AudioSegment = None
+
+
+def _pydub_speedup(linear_data: bytes, speed: float) -> bytes:
+    audio = AudioSegment.from_raw(io.BytesIO(linear_data), sample_width=2, frame_rate=8000, channels=1)
+    output = io.BytesIO()
+    speedup(audio, playback_speed=speed).export(output, format="raw")
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark streaming WSOLA time-stretch against pydub speedup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunks', type=int, default=200, help='Chunks per measurement')
+        parser.add_argument('--chunk-ms', type=int, nargs='+', default=[40, 120, 500, 2000],
+                            help='Chunk lengths in ms (one row each)')
+        parser.add_argument('--speed', type=float, default=1.25, help='Playback speed factor')
+
+    def _measure(self, fn, payload, chunks: int) -> float:
+        for _ in range(10):
+            fn(payload)
+        start = time.perf_counter()
+        for _ in range(chunks):
+            fn(payload)
+        return chunks / (time.perf_counter() - start)
+
+    def _chunk(self, chunk_ms: int, rng) -> bytes:
+        # Voiced-ish 8kHz chunk: 140Hz harmonic stack plus noise
+        t = np.arange(8 * chunk_ms) / 8000
+        voiced = sum(np.sin(2 * np.pi * 140 * h * t) / h for h in range(1, 6)) * 4000
+        return np.clip(voiced + rng.normal(0, 300, len(t)), -32768, 32767).astype('<i2').tobytes()
+
+    def handle(self, *args, **options):
+        chunks, speed = options['chunks'], options['speed']
+        rng = np.random.default_rng(5)
+
+        self.stdout.write(self.style.SUCCESS(f'Time-stretch benchmark ({chunks} chunks per size @ 8kHz, {speed}x)\n'))
+        self.stdout.write(f'  {"chunk":>7}  {"WSOLA µs":>10}  {"pydub µs":>10}  {"speedup":>8}')
+        for chunk_ms in options['chunk_ms']:
+            chunk = self._chunk(chunk_ms, rng)
+            stretcher = TimeStretcher(8000, speed)
+
+            def wsola(pcm):
+                samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32)
+                return float_to_pcm16(stretcher.process(samples))
+
+            wsola_us = 1e6 / self._measure(wsola, chunk, chunks)
+            pydub_us = None
+            if AudioSegment is not None:
+                try:
+                    pydub_us = 1e6 / self._measure(lambda pcm: _pydub_speedup(pcm, speed), chunk, chunks)
+                except Exception:
+                    pass  # pydub cannot stretch chunks this short
+            if pydub_us is None:
+                self.stdout.write(f'  {chunk_ms:>5}ms  {wsola_us:>10.1f}  {"n/a":>10}  {"n/a":>8}')
+            else:
+                self.stdout.write(f'  {chunk_ms:>5}ms  {wsola_us:>10.1f}  {pydub_us:>10.1f}  {pydub_us / wsola_us:>7.1f}x')
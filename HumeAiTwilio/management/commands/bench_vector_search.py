@@ -0,0 +1,99 @@
+"""
+Management command to benchmark the NumPy vector index against ChromaDB
+
+Both get the same synthetic embeddings (clustered unit vectors, MiniLM's 384
+dims) and the same held-out queries. Recall@k is measured against exact
+float32 brute force; latency is per single query, as on the call path. The
+NumPy index is written to a temporary directory and mapped like production;
+ChromaDB runs in-memory (EphemeralClient, HNSW, cosine space) and is skipped
+when not installed. Nothing touches the database.
+
+Usage:
+    python manage.py bench_vector_search --sizes 10000,100000 --queries 200 --k 10 --nprobe 4,8,16
+"""
+
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from HumeAiTwilio.vector_index import VectorIndex, normalize, write_index
+
+
+class Command(BaseCommand):
+    help = 'Recall/latency of the NumPy vector index (flat, IVF, int8) vs ChromaDB on the same data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000', help='Comma-separated corpus sizes')
+        parser.add_argument('--dim', type=int, default=384)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--nprobe', default='4,8,16', help='IVF lists scanned, comma-separated')
+        parser.add_argument('--no-chroma', action='store_true', help='Skip the ChromaDB comparison')
+        parser.add_argument('--seed', type=int, default=7)
+
+    def _data(self, rng, size, dim, queries):
+        """Points around size/50 topic centres, like question embeddings of a few hundred topics"""
+        centres = normalize(rng.standard_normal((max(size // 50, 1), dim)))
+        topics = rng.integers(0, len(centres), size=size + queries)
+        points = normalize(centres[topics] + 0.6 * normalize(rng.standard_normal((size + queries, dim))))
+        return points[:size], points[size:]
+
+    def handle(self, *args, **options):
+        k = options['k']
+        self.stdout.write(f"{'entries':>8} {'backend':<16} {'build s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+                          f"{'recall@' + str(k):>9}")
+        for size in [int(s) for s in options['sizes'].split(',')]:
+            rng = np.random.default_rng(options['seed'])
+            corpus, queries = self._data(rng, size, options['dim'], options['queries'])
+            ids = np.arange(size)
+            truth = [set(np.argpartition(-(corpus @ query), k - 1)[:k].tolist()) for query in queries]
+
+            for dtype in ('float32', 'int8'):
+                for ivf in (False, True):
+                    with tempfile.TemporaryDirectory() as path:
+                        started = time.perf_counter()
+                        write_index(path, ids, corpus, dtype=dtype, ivf_min=1 if ivf else size + 1)
+                        index = VectorIndex(path)
+                        index.open()
+                        build = time.perf_counter() - started
+                        for nprobe in [int(n) for n in options['nprobe'].split(',')] if ivf else [None]:
+                            label = f"ivf{nprobe}-{dtype}" if ivf else f"flat-{dtype}"
+                            self._run(size, label, build, queries, truth, k,
+                                      lambda query: [pk for pk, _ in index.search(query, k, nprobe=nprobe)])
+
+            if not options['no_chroma']:
+                self._chroma(size, corpus, queries, truth, k)
+
+    def _chroma(self, size, corpus, queries, truth, k):
+        try:
+            import chromadb
+        except ImportError:
+            self.stdout.write(f"{size:>8} {'chromadb':<16} not installed")
+            return
+        client = chromadb.EphemeralClient()
+        name = f'bench_{size}'
+        collection = client.create_collection(name, metadata={'hnsw:space': 'cosine'})
+        started = time.perf_counter()
+        for i in range(0, size, 5000):
+            collection.add(ids=[str(n) for n in range(i, min(i + 5000, size))], embeddings=corpus[i:i + 5000].tolist())
+        build = time.perf_counter() - started
+
+        def search(query):
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            return [int(pk) for pk in result['ids'][0]]
+
+        self._run(size, 'chromadb-hnsw', build, queries, truth, k, search)
+        client.delete_collection(name)
+
+    def _run(self, size, label, build, queries, truth, k, search):
+        search(queries[0])  # warm up (page in the mapping)
+        timings, found = [], 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            result = search(query)
+            timings.append((time.perf_counter() - started) * 1000)
+            found += len(expected & set(result))
+        self.stdout.write(f"{size:>8} {label:<16} {build:>8.1f} {np.percentile(timings, 50):>8.3f} "
+                          f"{np.percentile(timings, 99):>8.3f} {found / (k * len(queries)):>9.3f}")
@@ -0,0 +1,62 @@
+"""
+Management command to (re)build the memory-mapped LearnedKnowledge vector index
+
+Writes a new generation per agent partition under KNOWLEDGE_VECTOR_DIR from
+the rows' stored embeddings (vector_index.py); running workers map it on
+their next sync. --agent limits it to one agent ('unassigned' for rows
+without one).
+--embed-missing first embeds rows saved without one (keyword-backend rows,
+admin edits) with the KnowledgeManager embedding model.
+
+Usage:
+    python manage.py build_vector_index [--agent <uuid>|unassigned] [--embed-missing] [--dtype int8] [--batch-size 256]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from HumeAiTwilio.knowledge_partitions import UNASSIGNED, partition_filter, partition_name
+from HumeAiTwilio.models import LearnedKnowledge
+from HumeAiTwilio.vector_index import encode_embedding, rebuild_vector_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the NumPy vector index from LearnedKnowledge embeddings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agent', default=None, help="One HumeAgent id, or 'unassigned' (default: every partition)")
+        parser.add_argument('--embed-missing', action='store_true', help='Embed rows without an embedding first')
+        parser.add_argument('--dtype', choices=['float32', 'int8'], default=None,
+                            help='Stored row type (default: settings.KNOWLEDGE_VECTOR_DTYPE)')
+        parser.add_argument('--batch-size', type=int, default=256, help='Questions per encode() call')
+
+    def handle(self, *args, **options):
+        if options['agent'] is None:
+            agents = LearnedKnowledge.objects.order_by().values_list('agent_id', flat=True).distinct()
+        else:
+            agents = [None if options['agent'] == UNASSIGNED else options['agent']]
+        total = 0
+        for agent_id in agents:
+            if options['embed_missing']:
+                self._embed_missing(agent_id, options['batch_size'])
+            count = rebuild_vector_index(agent_id, dtype=options['dtype'])
+            self.stdout.write(f"  {partition_name(agent_id)}: {count} rows")
+            total += count
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} embedded LearnedKnowledge rows"))
+
+    def _embed_missing(self, agent_id, batch_size):
+        from HumeAiTwilio.knowledge_manager import KnowledgeManager
+        try:
+            model = KnowledgeManager._load_embedding_model()
+        except ImportError as e:
+            raise CommandError(f"Embedding model unavailable: {e}")
+
+        missing = (LearnedKnowledge.objects.filter(embedding__isnull=True, **partition_filter(agent_id))
+                   .only('id', 'question').order_by('pk'))
+        done = 0
+        while batch := list(missing[:batch_size]):
+            vectors = model.encode([row.question for row in batch], batch_size=batch_size)
+            for row, vector in zip(batch, vectors):
+                row.embedding = encode_embedding(vector)
+            LearnedKnowledge.objects.bulk_update(batch, ['embedding'])
+            done += len(batch)
+            self.stdout.write(f"  embedded {done} rows")
@@ -0,0 +1,66 @@
+"""
+Management command to recompute CLARIFIES analytics for historical calls
+
+Re-runs AnalyticsProcessor.build_records over completed calls in a date range
+and/or for one agent (services/reprocessing.py), across a process pool, and
+upserts only the records that change. Use after editing the keyword lists.
+--dry-run prints what would change without writing.
+
+Usage:
+    python manage.py recompute_analytics --from 2025-01-01 --to 2025-01-31 [--agent <uuid>]
+        [--workers 4] [--batch-size 200] [--dry-run] [--show 20]
+"""
+
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from HumeAiTwilio.services.reprocessing import recompute_analytics, select_calls
+
+
+def _date(value, option):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        raise CommandError(f"{option} must be YYYY-MM-DD, got {value!r}")
+
+
+class Command(BaseCommand):
+    help = 'Recompute ConversationAnalytics, objections and CLARIFIES steps for historical calls'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', default=None, help='First call date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', default=None, help='Last call date (YYYY-MM-DD)')
+        parser.add_argument('--agent', default=None, help='Only calls of this HumeAgent id')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: settings.ANALYTICS_RECOMPUTE_WORKERS, 1 = inline)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Calls per chunk / transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report differences without writing')
+        parser.add_argument('--show', type=int, default=20, help='Per-call diffs to print')
+
+    def handle(self, *args, **options):
+        calls = select_calls(_date(options['date_from'], '--from'), _date(options['date_to'], '--to'),
+                             options['agent'])
+
+        def progress(report):
+            percent = 100 * report['done'] / report['calls'] if report['calls'] else 100
+            self.stdout.write(f"  {report['done']}/{report['calls']} calls ({percent:.0f}%), "
+                              f"{report['changed']} changed, {report['calls_per_second']:.0f} calls/s")
+
+        report = recompute_analytics(calls, batch_size=options['batch_size'], workers=options['workers'],
+                                     dry_run=options['dry_run'], progress=progress)
+
+        for diff in report['diffs'][:options['show']]:
+            label = 'new' if diff['created'] else 'changed'
+            self.stdout.write(f"  {diff['call_sid']} ({label}): {json.dumps(diff['changes'], default=str)}")
+        if report['field_changes']:
+            counts = ', '.join(f"{name} {count}" for name, count in sorted(report['field_changes'].items()))
+            self.stdout.write(f"Changed fields: {counts}")
+
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['changed']} of {report['analysed']} analysed calls "
+            f"({report['skipped']} without a transcript, {report['failed']} failed) "
+            f"in {report['elapsed']:.1f}s, {report['calls_per_second']:.0f} calls/s"
+        ))
@@ -0,0 +1,292 @@
+"""
+Per-turn latency instrumentation for the live HumeAI bridge
+
+A "turn" is the caller finishing a sentence and the agent starting to answer:
+
+    speech_end    end of caller speech (local VAD offset, minus the hangover)
+    transcript    HumeAI `user_message` arrives
+    first_audio   first HumeAI `audio_output` for the reply
+    first_send    first agent audio byte written to the telco socket
+
+Each call owns a TurnLatencyTracker (summary stored on TwilioCall.call_metrics);
+every completed turn is also observed into process-wide histograms that are
+exported by the /metrics/turn-latency/ endpoint (JSON or Prometheus text).
+
+LoopLagMonitor measures how late the event loop wakes up (how long other
+calls' frames wait behind inline work) into a second registry.
+
+Time to first greeting (telco stream start → first agent byte sent, split by
+whether the HumeAI session came warm from the pool) goes into a third.
+"""
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+# Stage name → (start mark, end mark)
+STAGES = {
+    'speech_to_transcript': ('speech_end', 'transcript'),
+    'transcript_to_first_audio': ('transcript', 'first_audio'),
+    'first_audio_to_first_send': ('first_audio', 'first_send'),
+    'turn_total': (None, 'first_send'),  # from speech_end (or transcript if VAD missed it)
+}
+
+# Upper bounds in milliseconds (Prometheus-style cumulative buckets, +Inf implied)
+LATENCY_BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+LOOP_LAG_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket cumulative histogram (thread-safe, O(1) memory)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float):
+        index = int(np.searchsorted(self.buckets, value_ms, side='left'))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value_ms
+
+    def quantile(self, q: float):
+        """Bucket-interpolated quantile estimate (None when empty)"""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        lower = 0.0
+        for index, bucket_count in enumerate(counts):
+            upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+            if bucket_count and seen + bucket_count >= rank:
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return float(self.buckets[-1])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = [], 0
+            for bucket, bucket_count in zip(self.buckets + ('+Inf',), self.counts):
+                running += bucket_count
+                cumulative.append((bucket, running))
+            count, total = self.count, self.total
+        return {
+            'count': count,
+            'sum_ms': round(total, 1),
+            'buckets': {str(bucket): value for bucket, value in cumulative},
+            'p50_ms': self.quantile(0.50),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+        }
+
+
+class LatencyRegistry:
+    """Process-wide histograms keyed by (provider, stage)"""
+
+    def __init__(self, name: str = 'hume_turn_latency_ms', description: str = 'Live call turn latency by stage',
+                 buckets=LATENCY_BUCKETS_MS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, provider: str, stage: str) -> LatencyHistogram:
+        key = (provider, stage)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, LatencyHistogram(self.buckets))
+        return histogram
+
+    def observe(self, provider: str, stage: str, value_ms: float):
+        self.histogram(provider, stage).observe(value_ms)
+
+    def snapshot(self) -> dict:
+        result = {}
+        for (provider, stage), histogram in sorted(self._histograms.items()):
+            result.setdefault(provider, {})[stage] = histogram.snapshot()
+        return result
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        name = self.name
+        lines = [f'# HELP {name} {self.description}', f'# TYPE {name} histogram']
+        for (provider, stage), histogram in sorted(self._histograms.items()):
+            labels = f'provider="{provider}",stage="{stage}"'
+            snap = histogram.snapshot()
+            for bucket, value in snap['buckets'].items():
+                lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {value}')
+            lines.append(f'{name}_sum{{{labels}}} {snap["sum_ms"]}')
+            lines.append(f'{name}_count{{{labels}}} {snap["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+latency_registry = LatencyRegistry()
+loop_lag_registry = LatencyRegistry('hume_event_loop_lag_ms', 'Event loop wake-up lag', LOOP_LAG_BUCKETS_MS)
+greeting_registry = LatencyRegistry('hume_time_to_first_greeting_ms', 'Telco stream start to first greeting audio sent')
+
+
+class LoopLagMonitor:
+    """
+    Sleeps ``interval`` seconds in a loop and records how late each wake-up is.
+    One per event loop; started by the consumers on connect.
+    """
+
+    def __init__(self, interval: float = 0.05, registry: LatencyRegistry = loop_lag_registry,
+                 label: str = 'daphne'):
+        self.interval = interval
+        self.registry = registry
+        self.label = label
+        self.max_lag_ms = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000.0)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            self.registry.observe(self.label, 'event_loop_lag', lag_ms)
+
+
+_loop_monitors = {}
+
+
+def ensure_loop_lag_monitor() -> LoopLagMonitor:
+    """Start (once per running loop) the process loop-lag monitor"""
+    loop = asyncio.get_running_loop()
+    monitor = _loop_monitors.get(loop)
+    if monitor is None:
+        for stale in [l for l in _loop_monitors if l.is_closed()]:
+            del _loop_monitors[stale]
+        monitor = _loop_monitors[loop] = LoopLagMonitor()
+    return monitor.start()
+
+
+class TurnLatencyTracker:
+    """
+    Per-call turn timing. Call the ``mark_*`` methods from the consumer as
+    events happen; a turn completes on ``mark_first_send`` and is recorded.
+    """
+
+    def __init__(self, provider: str, registry: LatencyRegistry = latency_registry, clock=time.monotonic,
+                 greeting_registry: LatencyRegistry = greeting_registry):
+        self.provider = provider
+        self.registry = registry
+        self.greeting_registry = greeting_registry
+        self.clock = clock
+        self.samples = {stage: [] for stage in STAGES}
+        self.turns = 0
+        self.abandoned = 0
+        self.first_greeting_ms = None
+        self.hume_pool = None  # 'pool_hit' / 'pool_miss' once the HumeAI session is up
+        self._turn = None
+        self._stream_start = None
+
+    def mark_stream_start(self, at=None):
+        """Telco media stream connected: the callee is listening from here"""
+        self._stream_start = self.clock() if at is None else at
+
+    def mark_hume_session(self, pool_hit: bool):
+        self.hume_pool = 'pool_hit' if pool_hit else 'pool_miss'
+
+    def _mark(self, name: str, at=None, opens_turn: bool = False, latest: bool = False):
+        at = self.clock() if at is None else at
+        if self._turn is None:
+            if not opens_turn:
+                return
+            self._turn = {}
+        if latest:
+            self._turn[name] = at  # caller kept talking: the turn starts at the last end
+        else:
+            self._turn.setdefault(name, at)
+
+    def mark_speech_end(self, at=None):
+        """Caller stopped talking (pass ``at`` to back-date past the VAD hangover)"""
+        self._mark('speech_end', at, opens_turn=True, latest=True)
+
+    def mark_transcript(self, at=None):
+        self._mark('transcript', at, opens_turn=True, latest=True)
+
+    def mark_first_audio(self, at=None):
+        self._mark('first_audio', at)
+
+    def mark_first_send(self, at=None):
+        """First agent byte to the telco: closes the open turn (no-op otherwise)"""
+        if self._stream_start is not None:
+            self._greeting_sent(self.clock() if at is None else at)
+        if self._turn is None:
+            return
+        self._mark('first_send', at)
+        self._complete(self._turn)
+        self._turn = None
+
+    def _greeting_sent(self, at):
+        self.first_greeting_ms = max(0.0, (at - self._stream_start) * 1000.0)
+        self._stream_start = None
+        self.greeting_registry.observe(self.provider, self.hume_pool or 'pool_miss', self.first_greeting_ms)
+
+    def cancel_turn(self):
+        """Reply was dropped (e.g. barge-in) before any audio reached the caller"""
+        if self._turn is not None:
+            self.abandoned += 1
+            self._turn = None
+
+    def _complete(self, turn: dict):
+        self.turns += 1
+        for stage, (start, end) in STAGES.items():
+            begin = turn.get(start) if start else turn.get('speech_end', turn.get('transcript'))
+            finish = turn.get(end)
+            if begin is None or finish is None or finish < begin:
+                continue
+            value_ms = (finish - begin) * 1000.0
+            self.samples[stage].append(value_ms)
+            self.registry.observe(self.provider, stage, value_ms)
+
+    def summary(self) -> dict:
+        """p50/p95/p99 per stage for this call"""
+        stages = {}
+        for stage, values in self.samples.items():
+            if not values:
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            stages[stage] = {
+                'count': len(values),
+                'p50_ms': round(float(p50), 1),
+                'p95_ms': round(float(p95), 1),
+                'p99_ms': round(float(p99), 1),
+                'max_ms': round(max(values), 1),
+            }
+        return {
+            'turns': self.turns,
+            'abandoned': self.abandoned,
+            'stages': stages,
+            'first_greeting_ms': round(self.first_greeting_ms, 1) if self.first_greeting_ms is not None else None,
+            'hume_pool': self.hume_pool,
+        }
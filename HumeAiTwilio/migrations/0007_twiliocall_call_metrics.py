@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HumeAiTwilio', '0006_callobjection_clarifiesstep_conversationanalytics_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='twiliocall',
+            name='call_metrics',
+            field=models.JSONField(blank=True, default=dict, help_text='Per-call turn latency and audio metrics'),
+        ),
+    ]
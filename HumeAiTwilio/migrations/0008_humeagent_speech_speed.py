@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HumeAiTwilio', '0007_twiliocall_call_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='humeagent',
+            name='speech_speed',
+            field=models.FloatField(default=1.0, help_text='Agent speaking rate on calls (1.0 = as generated, 1.25 = 25% faster; 0.5-2.0)'),
+        ),
+    ]
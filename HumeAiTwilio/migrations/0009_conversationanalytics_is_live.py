@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HumeAiTwilio', '0008_humeagent_speech_speed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationanalytics',
+            name='is_live',
+            field=models.BooleanField(default=False, help_text='Snapshot of a call still being analysed live'),
+        ),
+    ]
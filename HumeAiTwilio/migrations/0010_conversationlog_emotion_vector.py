@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HumeAiTwilio', '0009_conversationanalytics_is_live'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationlog',
+            name='emotion_top',
+            field=models.JSONField(blank=True, help_text='Strongest emotions {name: score}', null=True),
+        ),
+        migrations.AddField(
+            model_name='conversationlog',
+            name='emotion_vector',
+            field=models.BinaryField(blank=True, help_text='Emotion scores over EMOTION_VOCABULARY (float16/float32 bytes)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='conversationlog',
+            name='emotion_scores',
+            field=models.JSONField(blank=True, help_text='Emotion scores outside EMOTION_VOCABULARY (and legacy rows)', null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HumeAiTwilio', '0010_conversationlog_emotion_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallerContext',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(help_text='Customer side of the call', max_length=20, unique=True)),
+                ('profile_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('call_count', models.IntegerField(default=0, help_text='Completed calls with this number')),
+                ('recent_calls', models.JSONField(blank=True, default=list, help_text='Last N completed calls, newest first')),
+                ('summary', models.TextField(blank=True, help_text='Context text given to the agent on the next call')),
+                ('last_call_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Caller Context',
+                'verbose_name_plural': 'Caller Contexts',
+                'db_table': 'hume_caller_contexts',
+            },
+        ),
+    ]
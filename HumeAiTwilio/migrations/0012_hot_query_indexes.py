@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HumeAiTwilio', '0011_callercontext'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='twiliocall',
+            name='twilio_call_from_nu_fb5a80_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='twiliocall',
+            name='twilio_call_to_numb_b0bfca_idx',
+        ),
+        migrations.AddIndex(
+            model_name='conversationlog',
+            index=models.Index(fields=['call', 'timestamp'], name='conversatio_call_id_8af93d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='twiliocall',
+            index=models.Index(fields=['provider', 'status', '-started_at'], name='twilio_call_provide_5e5e18_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='twiliocall',
+            index=models.Index(fields=['from_number', 'status', '-ended_at'], name='twilio_call_from_nu_be84cc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='twiliocall',
+            index=models.Index(fields=['to_number', 'status', '-ended_at'], name='twilio_call_to_numb_043e54_idx'),
+        ),
+    ]
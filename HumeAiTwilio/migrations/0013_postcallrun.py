@@ -0,0 +1,35 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HumeAiTwilio', '0012_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostCallRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('call_sid', models.CharField(max_length=255, unique=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('retrying', 'Retrying'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('completed_stages', models.JSONField(blank=True, default=list)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('enqueued_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Post-call Run',
+                'verbose_name_plural': 'Post-call Runs',
+                'db_table': 'hume_post_call_runs',
+                'ordering': ['-enqueued_at'],
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='hume_post_c_status_3b463a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HumeAiTwilio', '0013_postcallrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learnedknowledge',
+            name='embedding',
+            field=models.BinaryField(blank=True, help_text='Question embedding (unit float32 bytes), see vector_index.py', null=True),
+        ),
+    ]
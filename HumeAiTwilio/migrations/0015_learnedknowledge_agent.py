@@ -0,0 +1,36 @@
+# Generated by Django 4.2.16 on 2026-10-18 00:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HumeAiTwilio', '0014_learnedknowledge_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learnedknowledge',
+            name='agent',
+            field=models.ForeignKey(blank=True, help_text='Agent this was learned for (search partition); empty = unassigned', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='learned_knowledge', to='HumeAiTwilio.humeagent'),
+        ),
+        migrations.AlterField(
+            model_name='learnedknowledge',
+            name='question',
+            field=models.TextField(db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='learnedknowledge',
+            index=models.Index(fields=['agent', 'updated_at'], name='idx_knowledge_agent_updated'),
+        ),
+        migrations.AddConstraint(
+            model_name='learnedknowledge',
+            constraint=models.UniqueConstraint(fields=('agent', 'question'), name='uniq_knowledge_agent_question'),
+        ),
+        migrations.AddConstraint(
+            model_name='learnedknowledge',
+            constraint=models.UniqueConstraint(condition=models.Q(('agent__isnull', True)), fields=('question',), name='uniq_knowledge_unassigned_question'),
+        ),
+    ]
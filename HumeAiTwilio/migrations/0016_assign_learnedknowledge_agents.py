@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-18 00:41
+
+from django.db import migrations
+import json
+
+
+def assign_agents(apps, schema_editor):
+    """Rows learned on a call (metadata call_sid) go to that call's agent; the rest stay unassigned"""
+    LearnedKnowledge = apps.get_model('HumeAiTwilio', 'LearnedKnowledge')
+    TwilioCall = apps.get_model('HumeAiTwilio', 'TwilioCall')
+    by_call = {}
+    for pk, metadata in LearnedKnowledge.objects.filter(metadata__isnull=False).values_list('pk', 'metadata').iterator():
+        while isinstance(metadata, str):  # KnowledgeManager stored json.dumps() output
+            try:
+                metadata = json.loads(metadata)
+            except ValueError:
+                break
+        if isinstance(metadata, dict) and metadata.get('call_sid'):
+            by_call.setdefault(metadata['call_sid'], []).append(pk)
+    sids = list(by_call)
+    for start in range(0, len(sids), 500):
+        calls = TwilioCall.objects.filter(call_sid__in=sids[start:start + 500], agent__isnull=False)
+        for call_sid, agent_id in calls.values_list('call_sid', 'agent_id'):
+            LearnedKnowledge.objects.filter(pk__in=by_call[call_sid]).update(agent_id=agent_id)
+
+
+# Kept apart from 0015's ALTER TABLEs: on PostgreSQL the new agent FK is DEFERRABLE
+# INITIALLY DEFERRED, and altering the table while these UPDATEs leave pending
+# trigger events in the same transaction fails
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HumeAiTwilio', '0015_learnedknowledge_agent'),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_agents, migrations.RunPython.noop),
+    ]
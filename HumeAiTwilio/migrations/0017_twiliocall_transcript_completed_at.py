@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HumeAiTwilio', '0016_assign_learnedknowledge_agents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='twiliocall',
+            name='transcript_completed_at',
+            field=models.DateTimeField(blank=True, help_text='Realtime consumer wrote its last ConversationLog rows', null=True),
+        ),
+    ]
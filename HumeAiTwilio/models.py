@@ -23,6 +23,10 @@ class HumeAgent(models.Model):
     # Agent Settings
     voice_name = models.CharField(max_length=100, default="ITO", help_text="Voice model name")
     language = models.CharField(max_length=10, default="en", help_text="Language code")
+    speech_speed = models.FloatField(
+        default=1.0,
+        help_text="Agent speaking rate on calls (1.0 = as generated, 1.25 = 25% faster; 0.5-2.0)"
+    )
     
     # Personality & Behavior
     system_prompt = models.TextField(
@@ -121,6 +125,29 @@ class CustomerProfile(models.Model):
         return f"{name} ({self.phone_number})"
 
 
+class CallerContext(models.Model):
+    """
+    Precomputed returning-customer context, one row per phone number
+    Written at call end, read at call connect (cache or one unique-index lookup)
+    """
+
+    phone_number = models.CharField(max_length=20, unique=True, help_text="Customer side of the call")
+    profile_name = models.CharField(max_length=255, blank=True, null=True)
+    call_count = models.IntegerField(default=0, help_text="Completed calls with this number")
+    recent_calls = models.JSONField(default=list, blank=True, help_text="Last N completed calls, newest first")
+    summary = models.TextField(blank=True, help_text="Context text given to the agent on the next call")
+    last_call_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'hume_caller_contexts'
+        verbose_name = 'Caller Context'
+        verbose_name_plural = 'Caller Contexts'
+
+    def __str__(self):
+        return f"{self.profile_name or 'Unknown'} ({self.phone_number}, {self.call_count} calls)"
+
+
 class TwilioCall(models.Model):
     """Twilio Call Records with HumeAI Integration"""
     
@@ -171,9 +198,14 @@ class TwilioCall(models.Model):
     customer_name = models.CharField(max_length=255, blank=True, null=True)
     customer_email = models.EmailField(blank=True, null=True)
     
+    # Live call performance (turn latency p50/p95/p99, AGC/playout/VAD stats)
+    call_metrics = models.JSONField(default=dict, blank=True, help_text="Per-call turn latency and audio metrics")
+    
     # Timestamps
     started_at = models.DateTimeField(null=True, blank=True)
     ended_at = models.DateTimeField(null=True, blank=True)
+    transcript_completed_at = models.DateTimeField(null=True, blank=True,
+                                                   help_text="Realtime consumer wrote its last ConversationLog rows")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -185,8 +217,11 @@ class TwilioCall(models.Model):
         indexes = [
             models.Index(fields=['call_sid']),
             models.Index(fields=['status']),
-            models.Index(fields=['from_number']),
-            models.Index(fields=['to_number']),
+            # Dashboards: status__in + provider, newest first
+            models.Index(fields=['provider', 'status', '-started_at']),
+            # Customer history (caller context): number + status, latest ended first
+            models.Index(fields=['from_number', 'status', '-ended_at']),
+            models.Index(fields=['to_number', 'status', '-ended_at']),
         ]
     
     def __str__(self):
@@ -210,7 +245,9 @@ class ConversationLog(models.Model):
     message = models.TextField()
     
     # Emotion & Sentiment (from HumeAI)
-    emotion_scores = models.JSONField(blank=True, null=True, help_text="Emotion detection scores")
+    emotion_vector = models.BinaryField(blank=True, null=True, help_text="Emotion scores over EMOTION_VOCABULARY (float16/float32 bytes)")
+    emotion_top = models.JSONField(blank=True, null=True, help_text="Strongest emotions {name: score}")
+    emotion_scores = models.JSONField(blank=True, null=True, help_text="Emotion scores outside EMOTION_VOCABULARY (and legacy rows)")
     sentiment = models.CharField(max_length=20, blank=True, null=True)
     confidence = models.FloatField(default=0.0)
     
@@ -223,9 +260,21 @@ class ConversationLog(models.Model):
         ordering = ['timestamp']
         verbose_name = 'Conversation Log'
         verbose_name_plural = 'Conversation Logs'
+        indexes = [
+            models.Index(fields=['call', 'timestamp']),  # one call's transcript in order
+        ]
     
     def __str__(self):
         return f"{self.role}: {self.message[:50]}..."
+    
+    @property
+    def emotion_dict(self) -> dict:
+        """All emotion scores as {name: score} (decoded vector + extras, or legacy JSON)"""
+        from .emotion_vectors import decode_vector, parse_scores, vector_to_dict
+        extras = parse_scores(self.emotion_scores) if self.emotion_scores else {}
+        if self.emotion_vector:
+            return vector_to_dict(decode_vector(self.emotion_vector), extras)
+        return extras
 
 
 class CallAnalytics(models.Model):
@@ -314,6 +363,44 @@ class WebhookLog(models.Model):
         return f"{self.source} - {self.event_type}"
 
 
+class PostCallRun(models.Model):
+    """
+    Post-call pipeline run, one per call_sid (the idempotency key)
+    Records which stages finished so a retry or a redelivered task resumes instead of repeating
+    """
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('retrying', 'Retrying'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    call_sid = models.CharField(max_length=255, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    completed_stages = models.JSONField(default=list, blank=True)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+
+    enqueued_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'hume_post_call_runs'
+        ordering = ['-enqueued_at']
+        verbose_name = 'Post-call Run'
+        verbose_name_plural = 'Post-call Runs'
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),  # recovery sweep
+        ]
+
+    def __str__(self):
+        return f"{self.call_sid} ({self.status}, {len(self.completed_stages)} stages)"
+
+
 # ============================================
 # KNOWLEDGE STORAGE MODELS (PythonAnywhere)
 # ============================================
@@ -323,10 +410,13 @@ class LearnedKnowledge(models.Model):
     Store learned Q&A pairs in database
     Works on PythonAnywhere, Heroku, any hosting
     """
-    question = models.TextField(unique=True, db_index=True)
+    agent = models.ForeignKey(HumeAgent, on_delete=models.CASCADE, null=True, blank=True, related_name='learned_knowledge',
+                              help_text="Agent this was learned for (search partition); empty = unassigned")
+    question = models.TextField(db_index=True)
     answer = models.TextField()
     source = models.CharField(max_length=50, default='live_call', db_index=True)
     metadata = models.JSONField(null=True, blank=True)
+    embedding = models.BinaryField(blank=True, null=True, help_text="Question embedding (unit float32 bytes), see vector_index.py")
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -338,6 +428,13 @@ class LearnedKnowledge(models.Model):
         indexes = [
             models.Index(fields=['question'], name='idx_question'),
             models.Index(fields=['source', '-created_at'], name='idx_source_created'),
+            models.Index(fields=['agent', 'updated_at'], name='idx_knowledge_agent_updated'),
+        ]
+        constraints = [
+            # Same question may be learned by different agents, once each
+            models.UniqueConstraint(fields=['agent', 'question'], name='uniq_knowledge_agent_question'),
+            models.UniqueConstraint(fields=['question'], condition=models.Q(agent__isnull=True),
+                                    name='uniq_knowledge_unassigned_question'),
         ]
     
     def __str__(self):
@@ -677,6 +774,9 @@ class ConversationAnalytics(models.Model):
         help_text="Critical moments that influenced outcome"
     )
     
+    # Live snapshot from the realtime consumer; process_completed_call finalises it
+    is_live = models.BooleanField(default=False, help_text="Snapshot of a call still being analysed live")
+    
     # Timestamps
     analyzed_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
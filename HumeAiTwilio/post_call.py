@@ -0,0 +1,224 @@
+"""
+Post-call pipeline: ordered, idempotent stages run once per completed call
+
+Call completion used to fan out from several places: Vonage / Twilio status
+webhooks started a daemon thread running process_completed_call, the
+TwilioCall post_save signal ran AnalyticsService.calculate_analytics inside the
+webhook request, and the Vonage consumer ran call learning in disconnect. Work
+was duplicated, lost on restart, and held up webhook responses.
+
+Now the signal only enqueues (after commit) and every stage runs in order:
+
+    transcript  wait until the realtime consumer marks its transcript complete
+    analytics   CallAnalytics summary (AnalyticsService.calculate_analytics)
+    clarifies   ConversationAnalytics + objections + CLARIFIES steps
+    learning    call_learning_service.analyze_and_improve
+    scheduling  next-call scheduling (only with POST_CALL_SCHEDULING)
+
+``PostCallRun`` is keyed by call_sid: a second enqueue for the same call is
+dropped, a retry resumes after the last finished stage, and a run left
+``running`` by a dead worker is reclaimed once its lease expires.
+
+Executors (settings.POST_CALL_EXECUTOR):
+    celery  tasks.run_post_call_pipeline with retry + backoff (default)
+    local   in-process, inline, retries immediately (tests / development)
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ConversationLog, PostCallRun, TwilioCall
+
+logger = logging.getLogger(__name__)
+
+
+class StageNotReady(Exception):
+    """A stage's input is not there yet (e.g. transcript still being flushed); retry later"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ---- stages --------------------------------------------------------------
+
+def finalise_transcript(call):
+    """
+    Wait for the realtime consumer's final transcript write (TwilioCall.transcript_completed_at),
+    which can trail the status webhook. Rows alone are not enough: the Vonage consumer
+    flushes ConversationLog batches during the call, so rows exist before the last ones land.
+    """
+    if call.ended_at and not call.duration and call.started_at:
+        call.duration = int((call.ended_at - call.started_at).total_seconds())
+        TwilioCall.objects.filter(pk=call.pk).update(duration=call.duration)
+    if call.transcript_completed_at:
+        return
+    ended = call.ended_at or call.updated_at
+    waited = (timezone.now() - ended).total_seconds() if ended else None
+    if waited is not None and waited < _setting('POST_CALL_TRANSCRIPT_WAIT', 120):
+        raise StageNotReady(f"transcript not complete yet ({waited:.0f}s after call end)")
+    rows = ConversationLog.objects.filter(call=call).count()
+    logger.info(f"📝 [POST-CALL] {call.call_sid} transcript never marked complete, continuing with {rows} rows")
+
+
+def call_analytics(call):
+    from .services import AnalyticsService
+    AnalyticsService.calculate_analytics(call)
+
+
+def clarifies_analytics(call):
+    from .services.analytics_processor import AnalyticsProcessor
+    AnalyticsProcessor.process_completed_call(call.call_sid, raise_errors=True)
+
+
+def call_learning(call):
+    from .call_learning_service import call_learning_service
+    call_learning_service.analyze_and_improve(call)
+
+
+def next_call_scheduling(call):
+    if not _setting('POST_CALL_SCHEDULING', False):
+        return
+    from .intelligent_hume_scheduler import hume_twilio_scheduler
+    hume_twilio_scheduler.analyze_hume_call_and_schedule(call)
+
+
+STAGES = (
+    ('transcript', finalise_transcript),
+    ('analytics', call_analytics),
+    ('clarifies', clarifies_analytics),
+    ('learning', call_learning),
+    ('scheduling', next_call_scheduling),
+)
+
+
+# ---- runner --------------------------------------------------------------
+
+def _claim(call_sid: str) -> bool:
+    """Atomically move a run to 'running'; False if done, failed or held by a live worker"""
+    now = timezone.now()
+    expired = now - timezone.timedelta(seconds=_setting('POST_CALL_LEASE_SECONDS', 600))
+    return bool(PostCallRun.objects.filter(call_sid=call_sid).filter(
+        Q(status__in=['queued', 'retrying']) | Q(status='running', updated_at__lt=expired)
+    ).update(status='running', attempts=F('attempts') + 1, started_at=now, updated_at=now))
+
+
+def run_post_call(call_sid: str) -> str:
+    """
+    Run the stages still pending for this call; returns the run status.
+    Raises (after recording 'retrying') when a stage fails so the executor can retry.
+    """
+    if not _claim(call_sid):
+        status = PostCallRun.objects.filter(call_sid=call_sid).values_list('status', flat=True).first()
+        logger.info(f"⏭️ [POST-CALL] {call_sid} not claimed ({status or 'not enqueued'})")
+        return status or 'missing'
+
+    run = PostCallRun.objects.get(call_sid=call_sid)
+    call = TwilioCall.objects.select_related('agent').filter(call_sid=call_sid).first()
+    if not call:
+        _finish(run, 'failed', 'call not found')
+        return run.status
+
+    for name, stage in STAGES:
+        if name in run.completed_stages:
+            continue
+        try:
+            stage(call)
+        except Exception as e:
+            run.status, run.last_error = 'retrying', f"{name}: {e}"
+            run.save(update_fields=['status', 'last_error', 'updated_at'])
+            logger.warning(f"🔁 [POST-CALL] {call_sid} stage '{name}' will retry: {e}")
+            raise
+        run.completed_stages = run.completed_stages + [name]
+        run.save(update_fields=['completed_stages', 'updated_at'])
+
+    _finish(run, 'done')
+    logger.info(f"✅ [POST-CALL] {call_sid} done in {run.attempts} attempt(s)")
+    return run.status
+
+
+def _finish(run, status: str, error: str = None):
+    run.status, run.finished_at = status, timezone.now()
+    if error:
+        run.last_error = error
+    run.save(update_fields=['status', 'finished_at', 'last_error', 'updated_at'])
+
+
+def mark_failed(call_sid: str, error: str):
+    """Retries exhausted"""
+    run = PostCallRun.objects.filter(call_sid=call_sid).first()
+    if run:
+        _finish(run, 'failed', error)
+        logger.error(f"❌ [POST-CALL] {call_sid} failed after {run.attempts} attempts: {error}")
+
+
+# ---- executors -----------------------------------------------------------
+
+def retry_countdown(retries: int) -> int:
+    """Seconds before retry n (0-based): 15s, 30s, 60s ... capped at 10 min"""
+    return min(15 * 2 ** retries, 600)
+
+
+def run_locally(call_sid: str) -> str:
+    """
+    In-process executor: run inline, retrying failed stages straight away up to
+    POST_CALL_MAX_RETRIES. A StageNotReady run is left 'retrying' for recover_stale_runs.
+    """
+    max_retries = _setting('POST_CALL_MAX_RETRIES', 5)
+    for attempt in range(max_retries + 1):
+        try:
+            return run_post_call(call_sid)
+        except StageNotReady:
+            return 'retrying'
+        except Exception as e:
+            if attempt == max_retries:
+                mark_failed(call_sid, str(e))
+    return 'failed'
+
+
+def dispatch(call_sid: str):
+    if _setting('POST_CALL_EXECUTOR', 'celery') == 'local':
+        run_locally(call_sid)
+    else:
+        from .tasks import run_post_call_pipeline
+        run_post_call_pipeline.delay(call_sid)
+
+
+def enqueue_post_call(call_sid: str) -> bool:
+    """Queue the pipeline for a completed call; False if this call_sid was already queued (dedupe)"""
+    run, created = PostCallRun.objects.get_or_create(call_sid=call_sid)
+    if not created:
+        logger.info(f"⏭️ [POST-CALL] {call_sid} already {run.status}, not queued again")
+        return False
+    try:
+        dispatch(call_sid)
+        logger.info(f"📬 [POST-CALL] Queued {call_sid}")
+    except Exception as e:
+        # The run row stays 'queued'; recover_post_call_runs picks it up
+        logger.error(f"❌ [POST-CALL] Could not queue {call_sid}: {e}")
+    return True
+
+
+def enqueue_post_call_on_commit(call_sid: str):
+    """Enqueue once the surrounding transaction (e.g. the webhook's status update) commits"""
+    transaction.on_commit(lambda: enqueue_post_call(call_sid))
+
+
+def recover_stale_runs() -> int:
+    """Re-dispatch runs a restart left behind: queued / retrying / running past the lease"""
+    cutoff = timezone.now() - timezone.timedelta(seconds=_setting('POST_CALL_LEASE_SECONDS', 600))
+    stale = list(PostCallRun.objects.filter(
+        status__in=['queued', 'retrying', 'running'], updated_at__lt=cutoff
+    ).values_list('call_sid', flat=True)[:500])
+    for call_sid in stale:
+        try:
+            dispatch(call_sid)
+        except Exception as e:
+            logger.error(f"❌ [POST-CALL] Could not re-queue {call_sid}: {e}")
+    if stale:
+        logger.info(f"♻️ [POST-CALL] Re-queued {len(stale)} stale runs")
+    return len(stale)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .audio.timestretch import MIN_SPEED, MAX_SPEED
 from .models import (
     HumeAgent, TwilioCall, ConversationLog,
     CallAnalytics, WebhookLog
@@ -13,7 +14,7 @@ class HumeAgentSerializer(serializers.ModelSerializer):
         model = HumeAgent
         fields = [
             'id', 'name', 'description', 'hume_config_id',
-            'voice_name', 'language', 'system_prompt', 'greeting_message',
+            'voice_name', 'language', 'speech_speed', 'system_prompt', 'greeting_message',
             'status', 'created_by', 'created_by_name', 'total_calls',
             'created_at', 'updated_at'
         ]
@@ -21,16 +22,27 @@ class HumeAgentSerializer(serializers.ModelSerializer):
     
     def get_total_calls(self, obj):
         return obj.calls.count()
+    
+    def validate_speech_speed(self, value):
+        if not MIN_SPEED <= value <= MAX_SPEED:
+            raise serializers.ValidationError(f"Speech speed must be between {MIN_SPEED} and {MAX_SPEED}")
+        return value
 
 
 class ConversationLogSerializer(serializers.ModelSerializer):
+    # Decoded from the compact emotion_vector (+ extras); same {name: score} shape as before
+    emotion_scores = serializers.SerializerMethodField()
+    
     class Meta:
         model = ConversationLog
         fields = [
-            'id', 'role', 'message', 'emotion_scores',
+            'id', 'role', 'message', 'emotion_scores', 'emotion_top',
             'sentiment', 'confidence', 'metadata', 'timestamp'
         ]
-        read_only_fields = ['id', 'timestamp']
+        read_only_fields = ['id', 'timestamp', 'emotion_top']
+    
+    def get_emotion_scores(self, obj):
+        return obj.emotion_dict or None
 
 
 class CallAnalyticsSerializer(serializers.ModelSerializer):
@@ -18,6 +18,7 @@ from ..services_legacy import (
 # Import new CLARIFIES services from this package
 from .clarifies_processor import CLARIFIESProcessor, get_step_display_name
 from .risk_filter import RiskFilter, validate_message_safety
+from .live_analytics import LiveCallAnalytics
 
 __all__ = [
     # Original services (from services_legacy.py)
@@ -31,4 +32,5 @@ __all__ = [
     'get_step_display_name',
     'RiskFilter',
     'validate_message_safety',
+    'LiveCallAnalytics',
 ]
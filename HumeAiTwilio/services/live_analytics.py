@@ -0,0 +1,302 @@
+"""
+Streaming per-call conversation analytics
+
+``LiveCallAnalytics`` folds ConversationLog rows one at a time into the numbers
+``AnalyticsProcessor.process_completed_call`` used to compute from the whole
+transcript: sentiment mean + trend, dominant customer emotion, outcome,
+objections and the CLARIFIES steps. The realtime consumers keep one per call and
+persist a snapshot to ConversationAnalytics every ANALYTICS_SNAPSHOT_SECONDS and
+at call end (one UPDATE) instead of running four queries per HumeAI event.
+``process_completed_call`` folds the stored logs through the same class, so the
+live snapshot and the post-call record cannot drift apart.
+
+Extra live stats go into ``emotion_breakdown``: Welford mean/std of the
+sentiment samples, an EWMA of recent sentiment and the top-k emotions by mean
+score. Emotion frames are folded as vectors over EMOTION_VOCABULARY, straight
+from ``ConversationLog.emotion_vector`` when the row has one. A row that
+summarises several frames (``metadata['emotion_frames']``, see
+emotion_retention.py) counts with that weight.
+
+Keywords (objections, win / loss) are matched with precompiled alternations and
+each message is scanned once as it is folded, not re-joined per question asked.
+"""
+
+import heapq
+import logging
+import math
+import re
+from collections import Counter, deque
+
+import numpy as np
+
+from HumeAiTwilio.emotion_vectors import (
+    EMOTION_INDEX, EMOTION_VOCABULARY, decode_vector, parse_scores, stack_vectors, to_vector,
+)
+
+logger = logging.getLogger(__name__)
+
+POSITIVE_EMOTIONS = ['Joy', 'Contentment', 'Amusement', 'Love', 'Excitement', 'Satisfaction', 'Relief']
+NEGATIVE_EMOTIONS = ['Sadness', 'Anger', 'Fear', 'Disgust', 'Anxiety', 'Disappointment', 'Frustration']
+_POSITIVE_INDEX = np.array([EMOTION_INDEX[e] for e in POSITIVE_EMOTIONS if e in EMOTION_INDEX])
+_NEGATIVE_INDEX = np.array([EMOTION_INDEX[e] for e in NEGATIVE_EMOTIONS if e in EMOTION_INDEX])
+
+WIN_KEYWORDS = ['yes', 'interested', 'schedule', 'demo', 'sign up', 'agreement', 'deal', 'interested']
+LOSS_KEYWORDS = ['not interested', 'no thanks', 'not now', 'busy', 'call back later', 'not right now']
+
+OBJECTION_KEYWORDS = {
+    'price': ['expensive', 'cost', 'price', 'afford', 'budget'],
+    'timing': ['busy', 'no time', 'later', 'schedule'],
+    'need': ['not need', 'not interested', 'not right now'],
+    'trust': ['not sure', 'doubt', 'guarantee', 'proven'],
+}
+
+
+def _keyword_automaton(groups: dict):
+    """
+    One compiled alternation for all keyword groups: a single pass over a message
+    reports every group with a keyword in it (plain substring semantics). The
+    zero-width lookahead lets matches overlap; only keywords of two groups starting
+    at the same character (one a prefix of the other) would resolve to the first.
+    """
+    branches = [f"(?P<{name}>{'|'.join(re.escape(keyword) for keyword in keywords)})"
+                for name, keywords in groups.items()]
+    return re.compile(f"(?=(?:{'|'.join(branches)}))")
+
+
+def _keyword_groups(pattern, text: str) -> set:
+    """Names of the groups whose keywords occur in text"""
+    return {match.lastgroup for match in pattern.finditer(text)}
+
+
+_OBJECTION_PATTERN = _keyword_automaton(OBJECTION_KEYWORDS)
+_WIN_PATTERN = re.compile('|'.join(re.escape(keyword) for keyword in WIN_KEYWORDS))
+_LOSS_PATTERN = re.compile('|'.join(re.escape(keyword) for keyword in LOSS_KEYWORDS))
+
+
+def emotion_sentiment(vector, extras: dict = None):
+    """Net sentiment (-1..1) from Hume emotion scores, None when no polar emotion is present"""
+    extras = extras or {}
+    positive_score = float(vector[_POSITIVE_INDEX].sum())
+    negative_score = float(vector[_NEGATIVE_INDEX].sum())
+    positive_score += sum([extras[e] for e in POSITIVE_EMOTIONS if isinstance(extras.get(e), (int, float))])
+    negative_score += sum([extras[e] for e in NEGATIVE_EMOTIONS if isinstance(extras.get(e), (int, float))])
+    if positive_score + negative_score > 0:
+        return (positive_score - negative_score) / (positive_score + negative_score)
+    return None
+
+
+def sentiment_trend(avg_sentiment: float) -> str:
+    """Matching ConversationAnalytics.sentiment_trend choices"""
+    if avg_sentiment > 0.2:
+        return 'improving'
+    if avg_sentiment < -0.2:
+        return 'declining'
+    return 'stable'
+
+
+def _frames(log) -> int:
+    metadata = log.metadata if isinstance(log.metadata, dict) else {}
+    return int(metadata.get('emotion_frames', 1))
+
+
+class LiveCallAnalytics:
+    """Incremental ConversationAnalytics for one call"""
+
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, top_k: int = 5):
+        self.top_k = top_k
+        self.logs_count = 0
+        # Sentiment: running (weighted) total keeps the mean bit-identical to sum()/len(); Welford M2 for std
+        self._sentiment_total = 0.0
+        self._sentiment_count = 0
+        self._welford_mean = 0.0
+        self._welford_m2 = 0.0
+        self._ewma = None
+        # Emotions
+        self._emotion_counts = np.zeros(len(EMOTION_VOCABULARY), dtype=np.int64)  # occurrences (dominant fallback)
+        self._extra_counts = Counter()
+        self._emotion_totals = np.zeros(len(EMOTION_VOCABULARY), dtype=np.float64)  # summed scores (top-k)
+        self._extra_totals = {}            # same for names outside the vocabulary
+        self._emotion_frames = 0
+        self._dominant = None
+        # Text
+        self._objections = set()           # objection types seen so far (scanned once per message)
+        self._last_messages = deque(maxlen=3)
+
+    # ------------------------------------------------------------------ input
+
+    @classmethod
+    def from_logs(cls, logs, **kwargs):
+        """Fold a stored transcript; every emotion vector is decoded in one stack_vectors pass"""
+        live = cls(**kwargs)
+        logs = list(logs)
+        vectors = iter(stack_vectors([log.emotion_vector for log in logs if log.emotion_vector]))
+        for log in logs:
+            live.add(message=log.message, emotion_scores=log.emotion_scores, sentiment=log.sentiment,
+                     emotion_vector=next(vectors) if log.emotion_vector else None, weight=_frames(log))
+        return live
+
+    def add_log(self, log):
+        """Fold one ConversationLog (saved or not)"""
+        self.add(message=log.message, emotion_scores=log.emotion_scores, sentiment=log.sentiment,
+                 emotion_vector=log.emotion_vector, weight=_frames(log))
+
+    def add(self, message: str = '', emotion_scores=None, sentiment: str = None, emotion_vector=None,
+            weight: int = 1):
+        """
+        ``emotion_vector``: stored bytes or an array over EMOTION_VOCABULARY;
+        ``emotion_scores``: a {name: score} dict (or legacy JSON string), extras when a vector is given;
+        ``weight``: emotion frames the row stands for
+        """
+        self.logs_count += 1
+        if emotion_scores or emotion_vector is not None:
+            try:
+                if emotion_vector is None:
+                    vector, extras = to_vector(emotion_scores)
+                else:
+                    if isinstance(emotion_vector, (bytes, bytearray, memoryview)):
+                        emotion_vector = decode_vector(emotion_vector)
+                    vector = np.asarray(emotion_vector, dtype=np.float64)
+                    extras = parse_scores(emotion_scores) if emotion_scores else {}
+                self._add_emotions(vector, extras, weight)
+            except Exception as e:
+                logger.warning(f"Error parsing emotion_scores for log: {e}")
+
+        # Fallback to the sentiment label until the first emotion-based sample arrives
+        if not self._sentiment_count and sentiment:
+            label = sentiment.lower()
+            self._add_sentiment(0.7 if label == 'positive' else (-0.7 if label == 'negative' else 0.0))
+
+        self._last_messages.append(message)
+        if message and len(self._objections) < len(OBJECTION_KEYWORDS):
+            self._objections |= _keyword_groups(_OBJECTION_PATTERN, message.lower())
+
+    def _add_emotions(self, vector, extras: dict, weight: int = 1):
+        score = emotion_sentiment(vector, extras)
+        if score is not None:
+            self._add_sentiment(score, weight)
+
+        present = vector != 0
+        numeric = {name: value for name, value in extras.items() if isinstance(value, (int, float))}
+        self._emotion_counts += present * weight
+        for name in extras:
+            self._extra_counts[name] += weight
+        if present.any() or extras:
+            self._emotion_frames += weight
+            self._emotion_totals += vector * weight
+            for name, value in numeric.items():
+                self._extra_totals[name] = self._extra_totals.get(name, 0.0) + value * weight
+            candidates = list(numeric.items())
+            if present.any():
+                strongest = int(vector.argmax())
+                candidates.insert(0, (EMOTION_VOCABULARY[strongest], float(vector[strongest])))
+            if candidates:
+                top_emotion, top_score = max(candidates, key=lambda item: item[1])
+                if not self._dominant or top_score > 0.5:
+                    self._dominant = top_emotion
+
+    def _add_sentiment(self, value: float, weight: int = 1):
+        self._sentiment_total += value * weight
+        self._sentiment_count += weight
+        delta = value - self._welford_mean
+        self._welford_mean += delta * weight / self._sentiment_count
+        self._welford_m2 += weight * delta * (value - self._welford_mean)
+        self._ewma = value if self._ewma is None else self._ewma + self.EWMA_ALPHA * (value - self._ewma)
+
+    # ----------------------------------------------------------------- output
+
+    @property
+    def avg_sentiment(self) -> float:
+        return self._sentiment_total / self._sentiment_count if self._sentiment_count else 0.0
+
+    @property
+    def sentiment_std(self) -> float:
+        return math.sqrt(self._welford_m2 / self._sentiment_count) if self._sentiment_count else 0.0
+
+    @property
+    def dominant_emotion(self):
+        if not self._dominant:
+            counts = [(EMOTION_VOCABULARY[i], self._emotion_counts[i]) for i in np.flatnonzero(self._emotion_counts)]
+            counts += self._extra_counts.items()
+            if counts:
+                return max(counts, key=lambda item: item[1])[0]
+        return self._dominant
+
+    def top_emotions(self, k: int = None) -> list:
+        """[(emotion, mean score)] for the k strongest emotions so far"""
+        if not self._emotion_frames:
+            return []
+        totals = [(EMOTION_VOCABULARY[i], self._emotion_totals[i]) for i in np.flatnonzero(self._emotion_totals)]
+        totals += self._extra_totals.items()
+        top = heapq.nlargest(k or self.top_k, totals, key=lambda item: item[1])
+        return [(name, round(total / self._emotion_frames, 4)) for name, total in top]
+
+    @property
+    def outcome(self) -> str:
+        last_text = ' '.join(message.lower() for message in self._last_messages if message)
+        if _WIN_PATTERN.search(last_text):
+            return 'won'
+        if _LOSS_PATTERN.search(last_text):
+            return 'lost'
+        return 'follow_up'
+
+    def objection_types(self) -> list:
+        return [obj_type for obj_type in OBJECTION_KEYWORDS if obj_type in self._objections]
+
+    def clarifies_steps(self, objection_types: list = None, outcome: str = None) -> list:
+        """CLARIFIES steps process_completed_call records: C per objection, L if the call ran, S if won"""
+        objection_types = self.objection_types() if objection_types is None else objection_types
+        steps = ['C'] * len(objection_types)
+        if self.logs_count > 2 and 'L' not in steps:
+            steps.insert(0, 'L')
+        if (outcome or self.outcome) == 'won':
+            steps.append('S')
+        return steps
+
+    def snapshot(self) -> dict:
+        """ConversationAnalytics field values for the call so far"""
+        objections = self.objection_types()
+        outcome = self.outcome
+        steps = self.clarifies_steps(objections, outcome)
+        avg_sentiment = self.avg_sentiment
+        return {
+            'total_objections': len(objections),
+            'objections_resolved': len(objections),  # assume resolved if the call continued
+            'objections_escalated': 0,
+            'outcome': outcome,
+            'sentiment_trend': sentiment_trend(avg_sentiment),
+            'avg_sentiment': round(avg_sentiment, 3),
+            'dominant_customer_emotion': self.dominant_emotion or '',
+            'win_probability': 0.7 if outcome == 'won' else (0.2 if outcome == 'lost' else 0.5),
+            'clarifies_steps_used': steps,
+            'total_steps': len(steps),
+            'emotion_breakdown': {
+                'top': dict(self.top_emotions()),
+                'sentiment': {
+                    'samples': self._sentiment_count,
+                    'mean': round(avg_sentiment, 4),
+                    'std': round(self.sentiment_std, 4),
+                    'recent': round(self._ewma, 4) if self._ewma is not None else None,
+                },
+            },
+        }
+
+    def persist(self, call):
+        """
+        Write the snapshot onto the call's live ConversationAnalytics row (one UPDATE once it exists).
+        Never overwrites a record process_completed_call already finalised. Sync; wrap for async.
+        """
+        from HumeAiTwilio.models import ConversationAnalytics
+
+        if self.logs_count < 2:
+            return None  # process_completed_call skips these calls too
+        fields = self.snapshot()
+        if ConversationAnalytics.objects.filter(call=call, is_live=True).update(**fields):
+            return fields
+        analytics, created = ConversationAnalytics.objects.get_or_create(
+            call=call, defaults={**fields, 'is_live': True}
+        )
+        if created:
+            logger.info(f"📊 Live analytics started for call {call.call_sid}")
+        return fields if created else None
@@ -0,0 +1,219 @@
+"""
+Recompute CLARIFIES analytics for historical calls
+
+process_completed_call analyses a call once and then skips it, so after the
+keyword lists in live_analytics change, older calls keep stale
+ConversationAnalytics. This re-runs the same fold
+(AnalyticsProcessor.build_records) over a date range and/or agent:
+
+    select_calls         completed calls matching the filters
+    recompute_chunk      one chunk of call ids: one log query, a diff against the
+                         stored record, then (unless dry-run) one transaction that
+                         replaces the generated objections / steps and upserts
+                         ConversationAnalytics on call_id (bulk_create with
+                         update_conflicts)
+    recompute_analytics  streams call ids with iterator() and fans chunks out over
+                         a process pool (spawned workers, each with its own DB
+                         connection); workers=1 runs inline, as do writes
+                         on SQLite (single writer)
+
+Only calls whose record would change are written. Objections / steps saved by
+CLARIFIESProcessor during a call are left alone.
+
+Settings:
+    ANALYTICS_RECOMPUTE_WORKERS     worker processes (default 4)
+    ANALYTICS_RECOMPUTE_BATCH_SIZE  calls per chunk / transaction (default 200)
+"""
+
+import logging
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import groupby, islice
+
+import django
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+from HumeAiTwilio.models import (
+    CallObjection, CLARIFIESStep, ConversationAnalytics, ConversationLog, TwilioCall,
+)
+from HumeAiTwilio.services.analytics_processor import AnalyticsProcessor
+
+logger = logging.getLogger(__name__)
+
+# Fields reported in dry-run diffs (emotion_breakdown is rewritten but not diffed)
+DIFF_FIELDS = (
+    'outcome', 'win_probability', 'total_objections', 'objections_resolved', 'clarifies_steps_used',
+    'total_steps', 'avg_sentiment', 'sentiment_trend', 'dominant_customer_emotion',
+)
+MAX_DIFFS = 1000  # diffs kept in a report; field counts cover every call
+
+
+def select_calls(date_from=None, date_to=None, agent_id=None, user_id=None):
+    """Completed calls created within [date_from, date_to] (dates, inclusive), optionally for one agent / owner"""
+    calls = TwilioCall.objects.filter(status='completed')
+    if date_from:
+        calls = calls.filter(created_at__date__gte=date_from)
+    if date_to:
+        calls = calls.filter(created_at__date__lte=date_to)
+    if agent_id:
+        calls = calls.filter(agent_id=agent_id)
+    if user_id is not None:
+        calls = calls.filter(user_id=user_id)
+    return calls
+
+
+def _diff(old, fields: dict, old_objections: list, new_objections: list) -> dict:
+    if old is None:
+        return {name: [None, fields[name]] for name in DIFF_FIELDS}
+    changes = {name: [getattr(old, name), fields[name]] for name in DIFF_FIELDS
+               if getattr(old, name) != fields[name]}
+    if old_objections != new_objections:
+        changes['objection_types'] = [old_objections, new_objections]
+    return changes
+
+
+def recompute_chunk(call_ids, dry_run: bool = False) -> dict:
+    """
+    Recompute one chunk of calls (runs in a pool worker or inline).
+    Returns {'analysed', 'changed', 'skipped', 'field_changes', 'diffs'}.
+    """
+    calls = {call.pk: call for call in TwilioCall.objects.filter(pk__in=call_ids).only('id', 'call_sid')}
+    existing = {analytics.call_id: analytics
+                for analytics in ConversationAnalytics.objects.filter(call_id__in=call_ids)}
+    generated_objections, generated_steps = AnalyticsProcessor.generated_records(call_ids)
+    old_objections = {}
+    for call_id, objection_type in generated_objections.order_by('call_id', 'objection_type').values_list(
+            'call_id', 'objection_type'):
+        old_objections.setdefault(call_id, []).append(objection_type)
+    logs = (ConversationLog.objects.filter(call_id__in=call_ids)
+            .order_by('call_id', 'timestamp')
+            .only('call_id', 'message', 'emotion_scores', 'emotion_vector', 'sentiment', 'metadata', 'timestamp'))
+
+    rows, objections, steps, diffs = [], [], [], []
+    field_changes = Counter()
+    upsert_fields = set()
+    analysed = 0
+    for call_id, call_logs in groupby(logs, key=lambda log: log.call_id):
+        call_logs = list(call_logs)
+        if len(call_logs) < 2:
+            continue  # process_completed_call skips these too
+        analysed += 1
+        call = calls[call_id]
+        fields, call_objections, call_steps = AnalyticsProcessor.build_records(call, call_logs)
+        old = existing.get(call_id)
+        changes = _diff(old, fields, old_objections.get(call_id, []),
+                        sorted(objection.objection_type for objection in call_objections))
+        if not changes and not old.is_live:
+            continue
+        field_changes.update(changes.keys())
+        diffs.append({'call_sid': call.call_sid, 'created': old is None, 'changes': changes})
+        rows.append(ConversationAnalytics(call=call, is_live=False, **fields))
+        objections.extend(call_objections)
+        steps.extend(call_steps)
+        upsert_fields.update(fields)
+
+    if rows and not dry_run:
+        changed_ids = [row.call_id for row in rows]
+        generated_objections, generated_steps = AnalyticsProcessor.generated_records(changed_ids)
+        with transaction.atomic():
+            generated_steps.delete()
+            generated_objections.delete()
+            CallObjection.objects.bulk_create(objections)
+            CLARIFIESStep.objects.bulk_create(steps)
+            ConversationAnalytics.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['call'],
+                update_fields=[*sorted(upsert_fields), 'is_live', 'updated_at'],
+            )
+
+    return {
+        'analysed': analysed,
+        'changed': len(rows),
+        'skipped': len(call_ids) - analysed,
+        'field_changes': dict(field_changes),
+        'diffs': diffs,
+    }
+
+
+def _chunks(ids, size: int):
+    ids = iter(ids)
+    while chunk := list(islice(ids, size)):
+        yield chunk
+
+
+def recompute_analytics(calls, batch_size: int = None, workers: int = None, dry_run: bool = False,
+                        progress=None) -> dict:
+    """
+    Recompute every call in the ``calls`` queryset (see select_calls).
+    ``progress(report)`` is called after each chunk. Returns the merged report with
+    calls/s; ``diffs`` holds the first MAX_DIFFS changed calls.
+    """
+    batch_size = batch_size or getattr(settings, 'ANALYTICS_RECOMPUTE_BATCH_SIZE', 200)
+    workers = workers or getattr(settings, 'ANALYTICS_RECOMPUTE_WORKERS', 4)
+    ids = calls.order_by('pk').values_list('pk', flat=True)
+    total = ids.count()
+    if connection.vendor == 'sqlite':
+        ids = list(ids)  # an open SQLite read cursor would block the workers' commits
+        if not dry_run and workers > 1:
+            logger.info("♻️ [RECOMPUTE] SQLite allows one writer at a time, recomputing inline")
+            workers = 1
+    else:
+        ids = ids.iterator(chunk_size=batch_size)
+
+    report = {'calls': total, 'done': 0, 'analysed': 0, 'changed': 0, 'skipped': 0, 'failed': 0,
+              'field_changes': Counter(), 'diffs': [], 'dry_run': dry_run}
+    started = time.perf_counter()
+
+    def merge(chunk_size, result=None, error=None):
+        report['done'] += chunk_size
+        if error is not None:
+            report['failed'] += chunk_size
+            logger.error(f"❌ [RECOMPUTE] Chunk of {chunk_size} calls failed: {error}")
+        else:
+            for key in ('analysed', 'changed', 'skipped'):
+                report[key] += result[key]
+            report['field_changes'].update(result['field_changes'])
+            report['diffs'].extend(result['diffs'][:MAX_DIFFS - len(report['diffs'])])
+        elapsed = time.perf_counter() - started
+        report['elapsed'] = round(elapsed, 3)
+        report['calls_per_second'] = round(report['done'] / elapsed, 1) if elapsed else 0.0
+        if progress:
+            progress(report)
+
+    if workers <= 1:
+        for chunk in _chunks(ids, batch_size):
+            try:
+                merge(len(chunk), recompute_chunk(chunk, dry_run))
+            except Exception as e:
+                merge(len(chunk), error=e)
+    else:
+        connections.close_all()  # never hand an open connection to the workers
+        # Spawned (not forked) workers; the initializer must not import models before setup
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as pool:
+            pending = {}
+            for chunk in _chunks(ids, batch_size):
+                pending[pool.submit(recompute_chunk, chunk, dry_run)] = len(chunk)
+                if len(pending) >= 2 * workers:  # bounded in-flight chunks while ids stream in
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        _merge_future(merge, future, pending.pop(future))
+            for future in list(pending):
+                _merge_future(merge, future, pending.pop(future))
+
+    report['field_changes'] = dict(report['field_changes'])
+    report.setdefault('elapsed', round(time.perf_counter() - started, 3))
+    report.setdefault('calls_per_second', 0.0)
+    verb = 'would change' if dry_run else 'changed'
+    logger.info(f"♻️ [RECOMPUTE] {report['analysed']} calls analysed, {report['changed']} {verb} "
+                f"({report['calls_per_second']} calls/s, {workers} worker(s))")
+    return report
+
+
+def _merge_future(merge, future, chunk_size: int):
+    try:
+        merge(chunk_size, future.result())
+    except Exception as e:
+        merge(chunk_size, error=e)
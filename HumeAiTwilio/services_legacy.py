@@ -259,13 +259,14 @@ class ConversationService:
         confidence: float = 0.0
     ) -> ConversationLog:
         """Log a conversation message"""
+        from .emotion_vectors import emotion_fields
         return ConversationLog.objects.create(
             call=call,
             role=role,
             message=message,
-            emotion_scores=emotion_scores,
             sentiment=sentiment,
-            confidence=confidence
+            confidence=confidence,
+            **emotion_fields(emotion_scores)
         )
     
     @staticmethod
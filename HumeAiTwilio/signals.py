@@ -6,12 +6,14 @@ NOTE: HumeAgent sync is now handled directly in views.py (HumeAgentViewSet)
       but are disabled.
 """
 
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import TwilioCall, CallAnalytics, HumeAgent
-from .services import AnalyticsService
+from .models import TwilioCall, CallAnalytics, HumeAgent, LearnedKnowledge
+from .knowledge_index import index_knowledge, unindex_knowledge
+from .vector_index import index_vector, unindex_vector
+from .post_call import enqueue_post_call_on_commit
 from .hume_agent_service import hume_agent_service
 
 import logging
@@ -92,14 +94,31 @@ def delete_agent_from_hume_DISABLED(sender, instance, **kwargs):
 def call_status_changed(sender, instance, created, **kwargs):
     """
     Signal handler for when call status changes
+    Completed calls are queued for the post-call pipeline (analytics, CLARIFIES, learning)
+    once the status update commits; the request itself does no post-call work
     """
     if not created:
-        # If call is completed, generate analytics
         if instance.status == 'completed':
             try:
-                # Check if analytics already exists
-                if not hasattr(instance, 'analytics'):
-                    AnalyticsService.calculate_analytics(instance)
-                    logger.info(f"Analytics generated for call: {instance.call_sid}")
+                enqueue_post_call_on_commit(instance.call_sid)
             except Exception as e:
-                logger.error(f"Error generating analytics: {str(e)}")
+                logger.error(f"Error queuing post-call pipeline: {str(e)}")
+
+
+@receiver(post_save, sender=LearnedKnowledge)
+def learned_knowledge_saved(sender, instance, **kwargs):
+    """Keep this process's knowledge search indexes current (other processes sync periodically)"""
+    try:
+        index_knowledge(instance)
+        index_vector(instance)
+    except Exception as e:
+        logger.error(f"Error indexing learned knowledge: {str(e)}")
+
+
+@receiver(post_delete, sender=LearnedKnowledge)
+def learned_knowledge_deleted(sender, instance, **kwargs):
+    try:
+        unindex_knowledge(instance)
+        unindex_vector(instance)
+    except Exception as e:
+        logger.error(f"Error unindexing learned knowledge: {str(e)}")
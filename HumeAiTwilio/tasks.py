@@ -0,0 +1,42 @@
+from celery import shared_task
+from django.conf import settings
+import logging
+
+from .post_call import mark_failed, recover_stale_runs, retry_countdown, run_post_call
+from .services.reprocessing import recompute_analytics, select_calls
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, acks_late=True, max_retries=None)
+def run_post_call_pipeline(self, call_sid):
+    """
+    Post-call stages for one call (see post_call.py)
+    acks_late: a worker that dies mid-run gets the task redelivered; the run row makes it resume
+    """
+    try:
+        return run_post_call(call_sid)
+    except Exception as e:
+        max_retries = getattr(settings, 'POST_CALL_MAX_RETRIES', 5)
+        if self.request.retries >= max_retries:
+            mark_failed(call_sid, str(e))
+            return 'failed'
+        raise self.retry(exc=e, countdown=retry_countdown(self.request.retries))
+
+
+@shared_task
+def recover_post_call_runs():
+    """Re-queue post-call runs left queued / running by a restart"""
+    return {'requeued': recover_stale_runs()}
+
+
+@shared_task
+def recompute_call_analytics(date_from=None, date_to=None, agent_id=None, user_id=None, dry_run=False):
+    """
+    Recompute historical analytics (services/reprocessing.py) for the API.
+    Runs the chunks inline: prefork worker processes cannot start a process pool.
+    """
+    calls = select_calls(date_from, date_to, agent_id, user_id=user_id)
+    report = recompute_analytics(calls, workers=1, dry_run=dry_run)
+    report['diffs'] = report['diffs'][:100]
+    return report
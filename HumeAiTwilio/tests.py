@@ -1,6 +1,71 @@
-from django.test import TestCase
+from django.test import RequestFactory, TestCase, SimpleTestCase, override_settings
+from unittest import mock
+from unittest import skipUnless
+from django.db import connection
+from asgiref.sync import async_to_sync
 from django.contrib.auth.models import User
 from .models import HumeAgent, TwilioCall, ConversationLog, CallAnalytics
+from .audio import (
+    StreamingResampler, MulawInboundPipeline, MulawOutboundPipeline, LinearInboundPipeline,
+    AutomaticGainControl, PlayoutScheduler, VoiceActivityDetector, DSPExecutor, TimeStretcher,
+    ulaw_decode, ulaw_encode,
+    twilio_inbound_pipeline, twilio_outbound_pipeline,
+)
+import asyncio
+from .metrics import LatencyHistogram, LatencyRegistry, TurnLatencyTracker
+from .hume_pool import HumeSessionPool
+from .response_cache import PhraseRecorder, ResponseCache
+from .conversation_buffer import (ConversationLogBuffer, mark_transcript_complete, persist_conversation_history,
+                                  persist_history_later)
+from django.test.utils import CaptureQueriesContext
+from .services.live_analytics import LiveCallAnalytics
+from .services.analytics_processor import AnalyticsProcessor
+from .models import CallObjection, ConversationAnalytics, CLARIFIESStep
+from .emotion_vectors import EMOTION_VOCABULARY, decode_vector, emotion_fields, stack_vectors
+from django.core.management import call_command
+from .emotion_retention import EmotionRetention
+from .caller_context import completed_calls, get_caller_context, refresh_caller_context
+from .models import CallerContext, CustomerProfile
+from .vonage_realtime_consumer import VonageRealTimeConsumer
+from .vonage_voice_bridge import vonage_event_callback
+from .models import PostCallRun
+from .models import LearnedKnowledge
+from . import knowledge_index
+from .knowledge_index import KnowledgeIndex, analyze, get_knowledge_index, reset_knowledge_index
+from .intelligent_response_service import IntelligentResponseService
+from . import vector_index
+from .vector_index import VectorIndex, encode_embedding, normalize, rebuild_vector_index, reset_vector_index, write_index
+from .knowledge_manager import KnowledgeManager
+from . import embeddings
+from .embeddings import EmbeddingService
+from .knowledge_partitions import partition_name
+from django.apps import apps as django_apps
+from django.db import IntegrityError, transaction
+import importlib
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from .web_search import WebSearchClient
+from .response_cache import normalise_phrase
+import threading
+import concurrent.futures
+from functools import partial
+import shutil
+import tempfile
+import zlib
+from .services.reprocessing import recompute_analytics, select_calls
+from .api_views import analytics_views
+from rest_framework.test import APIRequestFactory, force_authenticate
+from django.contrib.auth import get_user_model
+from . import post_call
+from django.utils import timezone
+from io import StringIO
+from django.core.cache import cache
+import json
+import re
+import time
+import numpy as np
+import base64
 import uuid
 
 
@@ -82,3 +147,1781 @@ class ConversationLogTestCase(TestCase):
         self.assertEqual(self.log.role, 'user')
         self.assertEqual(self.log.message, 'Hello, I need help')
         self.assertEqual(self.log.sentiment, 'neutral')
+
+
+class StreamingResamplerTestCase(SimpleTestCase):
+    """Per-call resampler must be seamless across 20ms frame boundaries"""
+
+    def _tone(self, rate, seconds=0.5):
+        t = np.arange(int(rate * seconds)) / rate
+        return (8000 * np.sin(2 * np.pi * 440 * t)).astype('<i2')
+
+    def test_framed_output_matches_one_shot(self):
+        """Feeding 20ms frames gives exactly the same samples as one big buffer"""
+        for src, dst in [(16000, 48000), (48000, 16000), (8000, 48000), (48000, 8000)]:
+            tone = self._tone(src)
+            whole = StreamingResampler(src, dst).process(tone.tobytes())
+
+            framed = StreamingResampler(src, dst)
+            step = src // 50
+            chunks = [framed.process(tone[i:i + step].tobytes()) for i in range(0, len(tone), step)]
+
+            self.assertEqual(whole, b''.join(chunks), f"{src}→{dst}")
+            self.assertEqual(len(whole) // 2, len(tone) * dst // src)
+
+    def test_preserves_amplitude(self):
+        """Passband tone keeps its level after up- and down-sampling"""
+        up = StreamingResampler(16000, 48000).process(self._tone(16000).tobytes())
+        down = StreamingResampler(48000, 16000).process(up)
+        out = np.frombuffer(down, dtype='<i2')[500:-500].astype(np.float64)
+        self.assertAlmostEqual(out.std() * np.sqrt(2), 8000, delta=160)
+
+
+class G711PipelineTestCase(SimpleTestCase):
+    """Table-driven µ-law codec and fused Twilio pipelines"""
+
+    def test_codec_matches_audioop(self):
+        """Lookup tables are bit-exact with audioop over the full input range"""
+        try:
+            import audioop
+        except ImportError:
+            self.skipTest("audioop not available")
+        every_code = bytes(range(256))
+        every_sample = np.arange(-32768, 32768, dtype='<i2').tobytes()
+        self.assertEqual(ulaw_decode(every_code).astype('<i2').tobytes(), audioop.ulaw2lin(every_code, 2))
+        self.assertEqual(ulaw_encode(every_sample), audioop.lin2ulaw(every_sample, 2))
+
+    def test_inbound_pipeline_frame_size(self):
+        """160 µ-law bytes (20ms @ 8kHz) become 960 int16 samples (20ms @ 48kHz)"""
+        pipeline = MulawInboundPipeline(output_rate=48000, gain=2.8)
+        frame = base64.b64encode(ulaw_encode(np.full(160, 1000, dtype='<i2'))).decode()
+        for _ in range(5):
+            out = base64.b64decode(pipeline.process_b64(frame))
+        self.assertEqual(len(out), 960 * 2)
+        # Steady-state DC level carries the 2.8x boost
+        self.assertAlmostEqual(np.frombuffer(out, dtype='<i2').mean(), 1000 * 2.8, delta=60)
+
+    def test_outbound_pipeline_round_trip(self):
+        """48kHz agent audio comes back as 8kHz µ-law at the same level"""
+        pipeline = MulawOutboundPipeline(input_rate=48000)
+        t = np.arange(960 * 10) / 48000
+        tone = (6000 * np.sin(2 * np.pi * 300 * t)).astype('<i2')
+        mulaw = b''.join(pipeline.process(tone[i:i + 960].tobytes()) for i in range(0, len(tone), 960))
+        self.assertEqual(len(mulaw), 160 * 10)
+        decoded = ulaw_decode(mulaw)[200:].astype(np.float64)
+        self.assertAlmostEqual(decoded.std() * np.sqrt(2), 6000, delta=300)
+
+
+class AutomaticGainControlTestCase(SimpleTestCase):
+    """Per-call AGC with soft limiter"""
+
+    @staticmethod
+    def _tone(amplitude, frames, rate=16000, frame_len=320):
+        t = np.arange(frames * frame_len) / rate
+        tone = (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+        return [tone[i:i + frame_len].copy() for i in range(0, len(tone), frame_len)]
+
+    def _run(self, agc, frames):
+        return np.concatenate([agc.process(frame) for frame in frames])
+
+    def test_quiet_caller_is_raised(self):
+        agc = AutomaticGainControl(sample_rate=16000, target_rms=3000)
+        out = self._run(agc, self._tone(600, 150))
+        tail_rms = np.sqrt(np.mean(out[-3200:] ** 2))
+        self.assertGreater(agc.gain, 4.0)
+        self.assertAlmostEqual(tail_rms, 3000, delta=400)
+
+    def test_loud_caller_is_limited_not_clipped(self):
+        agc = AutomaticGainControl(sample_rate=16000, target_rms=3000)
+        out = self._run(agc, self._tone(30000, 50))
+        self.assertLessEqual(np.abs(out).max(), 32767)
+        self.assertLess(agc.gain, 1.0)
+        self.assertGreater(agc.metrics()['limited_sample_ratio'], 0.0)
+
+    def test_noise_floor_holds_gain(self):
+        agc = AutomaticGainControl(sample_rate=16000, initial_gain=2.0)
+        self._run(agc, [np.zeros(320, dtype=np.float32) for _ in range(100)])
+        self.assertEqual(agc.gain, 2.0)
+
+    def test_metrics_trajectory_is_bounded(self):
+        agc = AutomaticGainControl(sample_rate=16000, history_size=10)
+        self._run(agc, self._tone(1000, 40))
+        metrics = agc.metrics()
+        self.assertEqual(metrics['frames'], 40)
+        self.assertEqual(len(metrics['recent_gains']), 10)
+        self.assertEqual(metrics['recent_gains'][-1], metrics['gain_current'])
+        self.assertLessEqual(metrics['gain_min'], metrics['gain_mean'])
+        self.assertLessEqual(metrics['gain_mean'], metrics['gain_max'])
+
+    def test_linear_pipeline_applies_agc(self):
+        agc = AutomaticGainControl(sample_rate=16000)
+        pipeline = LinearInboundPipeline(16000, 48000, agc=agc)
+        for frame in self._tone(500, 100):
+            out = pipeline.process(frame.astype('<i2').tobytes())
+        self.assertEqual(len(out), 960 * 2)
+        self.assertGreater(np.abs(np.frombuffer(out, dtype='<i2')).max(), 500 * 3)
+
+
+class PlayoutSchedulerTestCase(SimpleTestCase):
+    """Real-time paced outbound playout"""
+
+    def _scheduler(self, sent, **kwargs):
+        async def send_frame(frame):
+            sent.append((time.monotonic(), frame))
+        return PlayoutScheduler(send_frame, frame_bytes=160, frame_ms=10, lead_ms=20,
+                                silence=b'\xff', **kwargs)
+
+    def test_frames_paced_on_clock(self):
+        sent = []
+
+        async def run():
+            playout = self._scheduler(sent)
+            start = time.monotonic()
+            playout.enqueue(b'\x01' * 160 * 10)   # 100ms of audio in one burst
+            await asyncio.sleep(0.005)
+            early = len(sent)
+            while len(sent) < 10:
+                await asyncio.sleep(0.005)
+            await playout.close()
+            return start, early
+
+        start, early = asyncio.run(run())
+        # Only the lead (plus the frame playing now) goes out immediately
+        self.assertLessEqual(early, 3)
+        self.assertTrue(all(len(frame) == 160 for _, frame in sent))
+        self.assertGreaterEqual(sent[-1][0] - start, 0.1 - 0.02 - 0.01)
+
+    def test_partial_tail_padded_with_silence(self):
+        sent = []
+
+        async def run():
+            playout = self._scheduler(sent)
+            playout.enqueue(b'\x01' * 200)
+            await asyncio.sleep(0.06)
+            await playout.close()
+
+        asyncio.run(run())
+        self.assertEqual(len(sent), 2)
+        self.assertEqual(sent[1][1], b'\x01' * 40 + b'\xff' * 120)
+
+    def test_flush_drops_queue_and_calls_hook(self):
+        sent, cleared = [], []
+
+        async def on_flush():
+            cleared.append(True)
+
+        async def run():
+            playout = self._scheduler(sent, on_flush=on_flush)
+            playout.enqueue(b'\x01' * 160 * 50)
+            await asyncio.sleep(0.02)
+            dropped = await playout.flush()
+            sent_at_flush = len(sent)
+            await asyncio.sleep(0.03)
+            metrics = playout.metrics()
+            await playout.close()
+            return dropped, sent_at_flush, metrics
+
+        dropped, sent_at_flush, metrics = asyncio.run(run())
+        self.assertEqual(cleared, [True])
+        self.assertGreater(dropped, 400)
+        self.assertEqual(len(sent), sent_at_flush)
+        self.assertEqual(metrics['queued_ms'], 0)
+        self.assertEqual(metrics['flushes'], 1)
+
+
+class VoiceActivityDetectorTestCase(SimpleTestCase):
+    """Energy + ZCR VAD with hangover, and the consumer barge-in path"""
+
+    @staticmethod
+    def _voiced(frames, amplitude=2500, rate=8000, frame_len=160):
+        t = np.arange(frames * frame_len) / rate
+        audio = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 6)) * amplitude
+        return [audio[i:i + frame_len].astype(np.float32) for i in range(0, len(audio), frame_len)]
+
+    def test_onset_after_min_speech_and_offset_after_hangover(self):
+        vad = VoiceActivityDetector(sample_rate=8000, min_speech_ms=60, hangover_ms=200)
+        events = [vad.process(f) for f in self._voiced(5)]
+        self.assertEqual(events, [None, None, 'onset', None, None])
+        silence = [vad.process(np.zeros(160, dtype=np.float32)) for _ in range(10)]
+        self.assertEqual(silence.index('offset'), 9)  # 10 x 20ms = hangover
+        self.assertFalse(vad.speaking)
+
+    def test_short_click_and_hiss_do_not_trigger(self):
+        vad = VoiceActivityDetector(sample_rate=8000)
+        rng = np.random.default_rng(3)
+        self.assertIsNone(vad.process(self._voiced(1)[0]))  # 20ms click
+        self.assertIsNone(vad.process(np.zeros(160, dtype=np.float32)))
+        hiss = [rng.normal(0, 500, 160).astype(np.float32) for _ in range(20)]
+        self.assertEqual([e for e in map(vad.process, hiss) if e], [])
+
+    def test_barge_in_flushes_agent_audio_and_pauses_hume(self):
+        from .hume_realtime_consumer import HumeTwilioRealTimeConsumer
+
+        class FakeHume:
+            closed = False
+
+            def __init__(self):
+                self.sent = []
+
+            async def send(self, message):
+                self.sent.append(json.loads(message)['type'])
+
+        sent_events = []
+
+        async def send(text_data=None, bytes_data=None):
+            sent_events.append(json.loads(text_data)['event'])
+
+        async def run():
+            consumer = HumeTwilioRealTimeConsumer()
+            consumer.stream_sid = 'MZtest'
+            consumer.hume_ws = FakeHume()
+            consumer.hume_connected = True
+            consumer.send = send
+            consumer.init_audio_pipelines()
+
+            reply = np.full(48000 * 2, 2000, dtype='<i2').tobytes()
+            await consumer.send_audio_chunks_to_twilio(base64.b64encode(reply).decode())
+            self.assertGreater(consumer.playout.queued_ms, 1000)
+
+            for frame in self._voiced(4):
+                payload = base64.b64encode(ulaw_encode(frame.astype('<i2'))).decode()
+                await consumer.handle_media({'media': {'payload': payload}})
+
+            metrics = await consumer.get_audio_metrics()
+            queued = consumer.playout.queued_ms
+            barge_in = consumer.barge_in_active
+            await consumer.playout.close()
+            return consumer.hume_ws.sent, queued, barge_in, metrics
+
+        hume_sent, queued, barge_in, metrics = asyncio.run(run())
+        self.assertIn('clear', sent_events)
+        self.assertIn('pause_assistant_message', hume_sent)
+        self.assertEqual(queued, 0)
+        self.assertTrue(barge_in)
+        self.assertEqual(metrics['barge_in']['count'], 1)
+
+    def test_interrupt_handler_keeps_vad_state_per_call(self):
+        from calls.real_time_interrupt_handler import AudioStreamHandler
+
+        handler = AudioStreamHandler()
+        frames = [ulaw_encode(frame.astype('<i2')) for frame in self._voiced(5)]
+        # A call the handler has not seen a 'start' for still needs frames to accumulate
+        onsets = [handler.detect_voice_activity(frame, 'CAunknown') for frame in frames]
+        self.assertEqual(onsets.count(True), 1)
+        vad = handler.active_streams['CAunknown']['vad']
+        handler.detect_voice_activity(frames[0], 'CAunknown')
+        self.assertIs(handler.active_streams['CAunknown']['vad'], vad)
+
+
+class TurnLatencyTrackerTestCase(TestCase):
+    """Per-turn latency marks, percentiles and histogram export"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.registry = LatencyRegistry()
+        self.tracker = TurnLatencyTracker('twilio', registry=self.registry, clock=lambda: self.now)
+
+    def _turn(self, speech_end, transcript, first_audio, first_send):
+        for at, mark in ((speech_end, self.tracker.mark_speech_end), (transcript, self.tracker.mark_transcript),
+                         (first_audio, self.tracker.mark_first_audio), (first_send, self.tracker.mark_first_send)):
+            if at is None:
+                continue
+            self.now = at
+            mark()
+
+    def test_stages_and_percentiles(self):
+        for i in range(100):
+            base = i * 10.0
+            self._turn(base, base + 0.2, base + 0.5, base + 0.5 + 0.001 * i)
+        summary = self.tracker.summary()
+        self.assertEqual(summary['turns'], 100)
+        self.assertAlmostEqual(summary['stages']['speech_to_transcript']['p50_ms'], 200, delta=0.1)
+        total = summary['stages']['turn_total']
+        self.assertAlmostEqual(total['p50_ms'], 549.5, delta=0.1)
+        self.assertAlmostEqual(total['p99_ms'], 598.0, delta=0.1)
+        self.assertEqual(self.registry.histogram('twilio', 'turn_total').count, 100)
+
+    def test_greeting_audio_without_caller_turn_is_ignored(self):
+        self.tracker.mark_first_audio()
+        self.tracker.mark_first_send()
+        self.assertEqual(self.tracker.summary()['turns'], 0)
+
+    def test_missing_vad_falls_back_to_transcript(self):
+        self._turn(None, 1.0, 1.3, 1.35)
+        stages = self.tracker.summary()['stages']
+        self.assertNotIn('speech_to_transcript', stages)
+        self.assertAlmostEqual(stages['turn_total']['p50_ms'], 350, delta=0.1)
+
+    def test_histogram_quantile_and_prometheus(self):
+        histogram = LatencyHistogram(buckets=(100, 200, 400))
+        for value in (50, 150, 150, 300):
+            histogram.observe(value)
+        self.assertEqual(histogram.quantile(0.5), 150.0)
+        self.registry.observe('vonage', 'turn_total', 120)
+        text = self.registry.prometheus()
+        self.assertIn('hume_turn_latency_ms_bucket{provider="vonage",stage="turn_total",le="200"} 1', text)
+        self.assertIn('hume_turn_latency_ms_count{provider="vonage",stage="turn_total"} 1', text)
+
+    def test_call_metrics_saved_on_call(self):
+        from .hume_realtime_consumer import HumeTwilioRealTimeConsumer
+        TwilioCall.objects.create(call_sid='CAlatency', from_number='+1', to_number='+2')
+        consumer = HumeTwilioRealTimeConsumer()
+        consumer.call_sid = 'CAlatency'
+        consumer.init_audio_pipelines()
+        consumer.latency = self.tracker
+        self._turn(0.0, 0.1, 0.4, 0.45)
+
+        async_to_sync(consumer.save_call_metrics)()
+        metrics = TwilioCall.objects.get(call_sid='CAlatency').call_metrics
+        self.assertEqual(metrics['turn_latency']['turns'], 1)
+        self.assertEqual(metrics['turn_latency']['stages']['turn_total']['p95_ms'], 450.0)
+        self.assertIn('agc', metrics['audio'])
+
+    def test_metrics_api_is_scoped(self):
+        from .api_views.metrics_views import turn_latency_metrics
+        owner = get_user_model().objects.create_user(email='owner@example.com', password='x')
+        other = get_user_model().objects.create_user(email='other@example.com', password='x')
+        TwilioCall.objects.create(call_sid='CAowned', from_number='+1', to_number='+2', user=owner,
+                                  call_metrics={'turn_latency': {'turns': 3}})
+        factory = APIRequestFactory()
+
+        def get(user, **params):
+            request = factory.get('/api/hume-twilio/metrics/turn-latency/', params)
+            force_authenticate(request, user=user)
+            return turn_latency_metrics(request)
+
+        self.assertEqual(get(owner, call_sid='CAowned').data['call_metrics'], {'turn_latency': {'turns': 3}})
+        self.assertEqual(get(other, call_sid='CAowned').status_code, 404)
+        self.assertEqual(get(owner).status_code, 403)  # process-wide histograms: staff only
+        owner.is_staff = True
+        self.assertEqual(get(owner).status_code, 200)
+
+
+class DSPExecutorTestCase(SimpleTestCase):
+    """Inline / thread / process DSP sessions give identical output"""
+
+    def _run(self, mode):
+        async def run():
+            executor = DSPExecutor(mode, workers=1)
+            inbound = executor.session(twilio_inbound_pipeline)
+            outbound = executor.session(twilio_outbound_pipeline)
+            t = np.arange(160 * 10) / 8000
+            speech = (4000 * np.sin(2 * np.pi * 200 * t)).astype('<i2')
+            inbound_out, events = [], []
+            for i in range(0, len(speech), 160):
+                inbound_out.append(await inbound.process_b64(base64.b64encode(ulaw_encode(speech[i:i + 160])).decode()))
+                events.append(inbound.last_event)
+            agent = np.full(48000 * 2, 1000, dtype='<i2').tobytes()  # 192KB: larger than a shm slot
+            outbound_out = await outbound.process(agent)
+            await outbound.reset()
+            metrics = await inbound.metrics()
+            await inbound.close()
+            await outbound.close()
+            executor.shutdown()
+            return inbound_out, events, outbound_out, metrics
+        return asyncio.run(run())
+
+    def test_modes_match_inline(self):
+        expected = self._run('inline')
+        self.assertIn('onset', expected[1])
+        for mode in ('thread', 'process'):
+            with self.subTest(mode=mode):
+                inbound_out, events, outbound_out, metrics = self._run(mode)
+                self.assertEqual(inbound_out, expected[0])
+                self.assertEqual(events, expected[1])
+                self.assertEqual(outbound_out, expected[2])
+                self.assertEqual(metrics['vad']['onsets'], 1)
+
+    def test_unknown_mode_rejected(self):
+        with self.assertRaises(ValueError):
+            DSPExecutor('gpu')
+
+    def test_stage_that_fails_in_worker_runs_inline(self):
+        frame = base64.b64encode(ulaw_encode(np.full(160, 1000, dtype='<i2'))).decode()
+
+        async def run():
+            executor = DSPExecutor('process', workers=1)
+            broken = executor.session(partial(int, 'not a stage'))  # raises in the worker
+            healthy = executor.session(twilio_inbound_pipeline)
+            broken.factory = twilio_inbound_pipeline  # what the parent rebuilds it from
+            outputs = (await broken.process_b64(frame), await healthy.process_b64(frame))
+            local = broken.local
+            await broken.close()
+            await healthy.close()
+            executor.shutdown()
+            return outputs, local
+
+        (broken_out, healthy_out), local = asyncio.run(run())
+        self.assertTrue(local)
+        self.assertEqual(broken_out, twilio_inbound_pipeline().process_b64(frame))
+        self.assertEqual(healthy_out, broken_out)  # same worker kept serving
+
+    def test_stage_that_fails_everywhere_passes_audio_through(self):
+        frame = base64.b64encode(ulaw_encode(np.full(160, 1000, dtype='<i2'))).decode()
+
+        async def run():
+            executor = DSPExecutor('process', workers=1)
+            broken = executor.session(partial(int, 'not a stage'))  # raises in the worker and here
+            outputs = [await broken.process_b64(frame) for _ in range(3)]
+            await broken.reset()
+            metrics = await broken.metrics()
+            local = broken.local
+            await broken.close()
+            executor.shutdown()
+            return outputs, metrics, local
+
+        with self.assertLogs('HumeAiTwilio.audio.executor', level='ERROR') as logs:
+            outputs, metrics, local = asyncio.run(run())
+        self.assertTrue(local)
+        self.assertEqual(outputs, [frame] * 3)
+        self.assertEqual(metrics, {})
+        self.assertEqual(len(logs.records), 2)  # worker open failure + inline failure, once each
+
+
+class TimeStretcherTestCase(SimpleTestCase):
+    """Streaming WSOLA changes duration, not pitch, and is seamless across chunks"""
+
+    def _tone(self, seconds=2.0, rate=8000, freq=200):
+        t = np.arange(int(rate * seconds)) / rate
+        return (8000 * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+    def _pitch(self, samples, rate=8000):
+        crossings = np.count_nonzero(np.diff(np.signbit(samples).astype(np.int8)))
+        return crossings / 2 / (len(samples) / rate)
+
+    def test_duration_scales_and_pitch_is_kept(self):
+        tone = self._tone()
+        for speed in (0.8, 1.25, 1.5, 2.0):
+            with self.subTest(speed=speed):
+                stretcher = TimeStretcher(8000, speed)
+                out = np.concatenate([stretcher.process(tone[i:i + 160]) for i in range(0, len(tone), 160)])
+                self.assertAlmostEqual(len(tone) / len(out), speed, delta=0.1 * speed)
+                self.assertAlmostEqual(self._pitch(out[200:-200]), 200, delta=2)
+                # Segment seams line up in phase: no step larger than the tone's own slope
+                self.assertLess(np.abs(np.diff(out)).max(), 2 * np.pi * 200 / 8000 * 8000 * 1.05)
+
+    def test_chunked_output_matches_one_shot(self):
+        tone = self._tone()
+        whole = TimeStretcher(8000, 1.25).process(tone)
+        stretcher = TimeStretcher(8000, 1.25)
+        chunks = np.concatenate([stretcher.process(tone[i:i + 160]) for i in range(0, len(tone), 160)])
+        self.assertEqual(len(chunks), len(whole))
+        np.testing.assert_allclose(chunks, whole, atol=1e-2)
+
+    def test_unit_speed_is_passthrough_and_range_checked(self):
+        tone = self._tone(0.1)
+        np.testing.assert_array_equal(TimeStretcher(8000, 1.0).process(tone), tone)
+        with self.assertRaises(ValueError):
+            TimeStretcher(8000, 3.0)
+
+    def test_outbound_pipeline_speed(self):
+        t = np.arange(48000) / 48000
+        agent = (6000 * np.sin(2 * np.pi * 180 * t)).astype('<i2')
+        normal = MulawOutboundPipeline(input_rate=48000)
+        faster = twilio_outbound_pipeline(speed=1.25)
+        normal_len = sum(len(normal.process(agent[i:i + 960].tobytes())) for i in range(0, len(agent), 960))
+        faster_len = sum(len(faster.process(agent[i:i + 960].tobytes())) for i in range(0, len(agent), 960))
+        self.assertAlmostEqual(normal_len / faster_len, 1.25, delta=0.15)
+        self.assertEqual(faster.metrics()['stretch']['speed'], 1.25)
+
+
+class _FakeHumeSocket:
+    def __init__(self):
+        self.open = True
+
+    async def close(self):
+        self.open = False
+
+
+class HumeSessionPoolTestCase(SimpleTestCase):
+    """Warm EVI sessions are handed over, awaited while handshaking, and expired"""
+
+    def _pool(self, delay=0.0, **kwargs):
+        self.opened = []
+
+        async def connect(config_id):
+            await asyncio.sleep(delay)
+            socket = _FakeHumeSocket()
+            self.opened.append((config_id, socket))
+            return socket
+        return HumeSessionPool(connect=connect, **kwargs)
+
+    def test_prewarmed_session_is_a_hit(self):
+        async def run():
+            pool = self._pool()
+            pool.bind_loop()
+            self.assertTrue(pool.prewarm('cfg-a'))
+            await asyncio.sleep(0.01)
+            socket = await pool.acquire('cfg-a')
+            miss = await pool.acquire('cfg-b')
+            return pool, socket, miss
+        pool, socket, miss = asyncio.run(run())
+        self.assertIs(socket, self.opened[0][1])
+        self.assertIsNone(miss)
+        stats = pool.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+    def test_acquire_waits_for_handshake_in_flight(self):
+        async def run():
+            pool = self._pool(delay=0.05)
+            pool.bind_loop()
+            pool.prewarm('cfg-a')
+            await asyncio.sleep(0)
+            socket = await pool.acquire('cfg-a')
+            await asyncio.sleep(0)
+            return pool, socket
+        pool, socket = asyncio.run(run())
+        self.assertIs(socket, self.opened[0][1])
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(pool.stats()['idle'], {})
+
+    def test_unused_session_expires_and_closes(self):
+        async def run():
+            pool = self._pool(ttl=0.02)
+            pool.bind_loop()
+            pool.prewarm('cfg-a')
+            await asyncio.sleep(0.06)
+            return pool, await pool.acquire('cfg-a')
+        pool, socket = asyncio.run(run())
+        self.assertIsNone(socket)
+        self.assertFalse(self.opened[0][1].open)
+        self.assertEqual(pool.stats()['expired'], 1)
+
+    def test_rebinding_loop_closes_sessions_left_on_the_old_one(self):
+        pool = self._pool(delay=0.2)
+        old_loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=old_loop.run_forever, daemon=True)
+        thread.start()
+        self.addCleanup(old_loop.close)
+        self.addCleanup(thread.join, 2)
+        self.addCleanup(old_loop.call_soon_threadsafe, old_loop.stop)
+
+        pool.bind_loop(old_loop)
+        pool.prewarm('cfg-a')
+        time.sleep(0.3)  # warm and idle on the old loop
+        pool.prewarm('cfg-a')
+        time.sleep(0.05)  # second handshake still in flight
+
+        async def new_consumer():
+            pool.bind_loop()
+            await asyncio.sleep(0.3)
+            return await pool.acquire('cfg-a')
+
+        self.assertIsNone(asyncio.run(new_consumer()))
+        self.assertEqual(len(self.opened), 1)  # the in-flight handshake was cancelled
+        self.assertFalse(self.opened[0][1].open)  # the idle socket was closed
+        self.assertEqual(pool.stats()['idle'], {})
+
+    def test_prewarm_without_consumer_loop_is_skipped(self):
+        pool = self._pool()
+        self.assertFalse(pool.prewarm('cfg-a'))
+        self.assertEqual(pool.stats()['skipped'], 1)
+
+    def test_time_to_first_greeting_recorded_once(self):
+        clock = iter([10.0, 10.35, 10.5]).__next__
+        registry = LatencyRegistry('test_greeting_ms')
+        tracker = TurnLatencyTracker('twilio', registry=LatencyRegistry(), clock=clock, greeting_registry=registry)
+        tracker.mark_stream_start()
+        tracker.mark_hume_session(pool_hit=True)
+        tracker.mark_first_send()
+        tracker.mark_first_send()
+        self.assertAlmostEqual(tracker.summary()['first_greeting_ms'], 350.0)
+        self.assertEqual(registry.snapshot()['twilio']['pool_hit']['count'], 1)
+
+
+class GreetingAudioCacheTestCase(SimpleTestCase):
+    """Greeting / filler clips are recorded telco-native and replayed on connect"""
+
+    def setUp(self):
+        cache.clear()
+        ResponseCache._audio_stats.update(hits=0, misses=0, stores=0)
+
+    def _consumer(self):
+        from .hume_realtime_consumer import HumeTwilioRealTimeConsumer
+
+        async def send(text_data=None, bytes_data=None):
+            pass
+
+        consumer = HumeTwilioRealTimeConsumer()
+        consumer.stream_sid = 'MZtest'
+        consumer.send = send
+        consumer.init_audio_pipelines()
+        return consumer
+
+    def test_recorder_caches_phrases_and_discards_interrupted_turns(self):
+        recorder = PhraseRecorder('cfg', 'linear16_16k', phrases=('Hi Sam! How are you doing today?',))
+        recorder.on_text('Hi Sam!')
+        recorder.on_text('How are you doing today?')
+        recorder.on_audio(b'\x01\x00' * 16000)
+        self.assertEqual(recorder.finish(), 'Hi Sam! How are you doing today?')
+
+        recorder.on_text('One moment please.')
+        recorder.on_audio(b'\x01\x00' * 8000)
+        recorder.cancel()  # barge-in
+        self.assertIsNone(recorder.finish())
+
+        recorder.on_text('Sure, our pricing starts at ten dollars.')
+        recorder.on_audio(b'\x01\x00' * 8000)
+        self.assertIsNone(recorder.finish())  # not a cacheable phrase
+
+        clip = ResponseCache.get_cached_audio('hi sam how are you doing today', 'cfg', 'linear16_16k')
+        self.assertEqual(len(clip), 32000)
+        self.assertIsNone(ResponseCache.get_cached_audio('One moment please.', 'cfg', 'linear16_16k'))
+        audio = ResponseCache.get_cache_stats()['audio']
+        self.assertEqual((audio['clips'], audio['hits'], audio['misses']), (1, 1, 1))
+        self.assertEqual(audio['formats']['linear16_16k']['seconds'], 1.0)
+
+    def test_twilio_greeting_recorded_then_played_from_cache(self):
+        reply = base64.b64encode(np.full(48000, 2000, dtype='<i2').tobytes()).decode()
+
+        async def first_call(texts):
+            consumer = self._consumer()
+            consumer.phrase_recorder = PhraseRecorder('cfg', 'mulaw_8k', greeting_text='Hello! This is Sarah.')
+            recorded = []
+            for text in texts:
+                consumer.on_assistant_text(text)
+                await consumer.send_audio_chunks_to_twilio(reply)
+                recorded.append(consumer.phrase_recorder.finish())
+            await consumer.playout.close()
+            return recorded
+
+        # caller spoke first: the agent's first turn is an answer, never the voice's greeting
+        self.assertEqual(asyncio.run(first_call(['Our office is in Austin.'])), [None])
+        self.assertIsNone(ResponseCache.get_greeting_text('cfg'))
+
+        async def second_call():
+            consumer = self._consumer()
+            played = consumer.play_cached_greeting('cfg')
+            queued = consumer.playout.queued_ms
+            consumer.phrase_recorder = PhraseRecorder('cfg', 'mulaw_8k', greeting_text='Hello! This is Sarah.')
+            consumer.on_assistant_text('Hello!')
+            suppressed = consumer.suppress_reply_audio
+            consumer.on_assistant_text('What can I do for you?')
+            resumed = not consumer.suppress_reply_audio
+            await consumer.playout.close()
+            return played, queued, suppressed, resumed
+
+        self.assertEqual(asyncio.run(first_call(['Hi Sam, this is Sarah.', 'Hello! This is Sarah.'])),
+                         [None, 'Hello! This is Sarah.'])
+        self.assertEqual(ResponseCache.get_greeting_text('cfg'), 'Hello! This is Sarah.')
+        played, queued, suppressed, resumed = asyncio.run(second_call())
+        self.assertTrue(played)
+        self.assertGreater(queued, 900)
+        self.assertTrue(suppressed)
+        self.assertTrue(resumed)
+
+    def test_common_phrases_report_cached_formats(self):
+        ResponseCache.cache_audio(ResponseCache.COMMON_PHRASES['one_moment'], b'\xff' * 8000, 'cfg', 'mulaw_8k')
+        status = ResponseCache.cache_common_phrases('cfg')
+        self.assertEqual(status['one_moment']['status'], 'cached')
+        self.assertEqual(status['one_moment']['formats'], ['mulaw_8k'])
+        self.assertEqual(status['goodbye']['status'], 'pending_audio_generation')
+
+
+class ConversationLogBufferTestCase(SimpleTestCase):
+    """Write-behind ConversationLog rows: bulk writes on size / age, nothing lost at close"""
+
+    def _buffer(self, fail=0, **kwargs):
+        batches = []
+        failures = [fail]
+
+        def write(rows):
+            if failures[0]:
+                failures[0] -= 1
+                raise RuntimeError('database is locked')
+            batches.append([row.message for row in rows])
+
+        return ConversationLogBuffer(write=write, **kwargs), batches
+
+    def test_size_threshold_batches_and_close_flushes_rest(self):
+        async def run():
+            buffer, batches = self._buffer(max_rows=3, max_delay=60)
+            for i in range(7):
+                buffer.add(role='user', message=f'm{i}')
+                await asyncio.sleep(0.02)  # let a size-triggered flush finish
+            before_close = [len(batch) for batch in batches]
+            await buffer.close()
+            return buffer, batches, before_close
+
+        buffer, batches, before_close = asyncio.run(run())
+        self.assertEqual(before_close, [3, 3])
+        self.assertEqual(sum(batches, []), [f'm{i}' for i in range(7)])
+        self.assertEqual(buffer.stats()['round_trips'], 3)
+        self.assertEqual(buffer.stats()['pending'], 0)
+
+    def test_age_threshold_flushes_partial_batch(self):
+        async def run():
+            buffer, batches = self._buffer(max_rows=25, max_delay=0.02)
+            buffer.add(role='user', message='hello')
+            buffer.add(role='assistant', message='hi there')
+            await asyncio.sleep(0.2)
+            return batches
+
+        self.assertEqual(asyncio.run(run()), [['hello', 'hi there']])
+
+    def test_failed_batch_is_kept_in_order_and_retried(self):
+        async def run():
+            buffer, batches = self._buffer(fail=1, max_rows=25, max_delay=60)
+            buffer.add(role='user', message='a')
+            buffer.add(role='user', message='b')
+            self.assertEqual(await buffer.flush(), 0)
+            buffer.add(role='user', message='c')
+            await buffer.close()
+            return buffer, batches
+
+        buffer, batches = asyncio.run(run())
+        self.assertEqual(batches, [['a', 'b', 'c']])
+        self.assertEqual(buffer.stats()['failed_flushes'], 1)
+        self.assertEqual(buffer.stats()['written'], 3)
+
+
+class LiveCallAnalyticsTestCase(TestCase):
+    """Streaming analytics match the post-call fold over the stored transcript"""
+
+    FRAMES = [
+        {'Joy': 0.6, 'Sadness': 0.1, 'Calmness': 0.3},
+        {'Anger': 0.75, 'Joy': 0.1},
+        {'Calmness': 0.5},
+        {'Contentment': 0.3, 'Frustration': 0.2},
+    ]
+
+    def _transcript(self):
+        return [
+            {'role': 'assistant', 'message': 'Hi, this is Sarah from Acme.'},
+            {'role': 'system', 'message': '', 'emotion_scores': self.FRAMES[0], 'sentiment': 'neutral'},
+            {'role': 'user', 'message': 'Sounds expensive, I am not sure.'},
+            {'role': 'system', 'message': '', 'emotion_scores': self.FRAMES[1], 'sentiment': 'neutral'},
+            {'role': 'system', 'message': '', 'emotion_scores': json.dumps(self.FRAMES[2]), 'sentiment': 'neutral'},
+            {'role': 'user', 'message': 'Okay, yes, schedule a demo.'},
+            {'role': 'system', 'message': '', 'emotion_scores': self.FRAMES[3], 'sentiment': 'neutral'},
+        ]
+
+    def test_incremental_stats(self):
+        live = LiveCallAnalytics(top_k=2)
+        for row in self._transcript():
+            live.add(row['message'], row.get('emotion_scores'), row.get('sentiment'))
+
+        samples = [(0.6 - 0.1) / 0.7, (0.1 - 0.75) / 0.85, (0.3 - 0.2) / 0.5]
+        self.assertAlmostEqual(live.avg_sentiment, sum(samples) / len(samples), places=12)
+        self.assertAlmostEqual(live.sentiment_std, float(np.std(samples)), places=12)
+        self.assertEqual(live.dominant_emotion, 'Anger')
+        self.assertEqual([name for name, _ in live.top_emotions()], ['Calmness', 'Anger'])
+        self.assertEqual(live.outcome, 'won')
+        self.assertEqual(live.objection_types(), ['price', 'timing', 'trust'])
+        self.assertEqual(live.clarifies_steps(), ['L', 'C', 'C', 'C', 'S'])
+
+    def test_sentiment_label_fallback_only_before_first_emotion_sample(self):
+        live = LiveCallAnalytics()
+        live.add('hello', sentiment='positive')
+        live.add('bad news', sentiment='negative')
+        self.assertEqual(live.avg_sentiment, 0.7)
+        self.assertEqual(live.snapshot()['sentiment_trend'], 'improving')
+
+    def test_live_snapshot_is_finalised_by_process_completed_call(self):
+        call = TwilioCall.objects.create(call_sid='CAlive', from_number='+1', to_number='+2', provider='vonage')
+        live = LiveCallAnalytics()
+        for row in self._transcript():
+            live.add_log(ConversationLog.objects.create(call=call, **row))
+            live.persist(call)
+        snapshot = ConversationAnalytics.objects.get(call=call)
+        self.assertTrue(snapshot.is_live)
+
+        analytics = AnalyticsProcessor.process_completed_call('CAlive')
+        self.assertIsNotNone(analytics)
+        self.assertFalse(analytics.is_live)
+        self.assertEqual(ConversationAnalytics.objects.filter(call=call).count(), 1)
+        for field in ('avg_sentiment', 'sentiment_trend', 'dominant_customer_emotion', 'outcome',
+                      'total_objections', 'clarifies_steps_used', 'win_probability', 'emotion_breakdown'):
+            self.assertEqual(getattr(analytics, field), getattr(snapshot, field), field)
+        self.assertEqual(CLARIFIESStep.objects.filter(call=call).count(), 5)
+
+        # A finalised record is never overwritten by a late live snapshot
+        self.assertIsNone(live.persist(call))
+        self.assertIsNone(AnalyticsProcessor.process_completed_call('CAlive'))
+
+
+class AnalyticsBackfillTestCase(TestCase):
+    """Single-pass keyword scan, bulk writes and chunked backfill of CLARIFIES analytics"""
+
+    TRANSCRIPT = ['Hi, this is Sarah from Acme.', 'Sounds expensive and I am not sure.', 'Okay, yes, schedule a demo.']
+
+    def _call(self, sid, messages=TRANSCRIPT, status='completed'):
+        call = TwilioCall.objects.create(call_sid=sid, from_number='+1', to_number='+2', status=status)
+        ConversationLog.objects.bulk_create([ConversationLog(call=call, role='user', message=message)
+                                             for message in messages])
+        return call
+
+    def test_keyword_scan_matches_substring_semantics(self):
+        live = LiveCallAnalytics()
+        live.add('We have NO TIMELINE and no budget')   # overlapping keywords in one message
+        live.add('')
+        live.add('a guaranteed result?')
+        self.assertEqual(live.objection_types(), ['price', 'timing', 'trust'])
+        live.add('not right now')
+        self.assertEqual(live.objection_types(), ['price', 'timing', 'need', 'trust'])
+        self.assertEqual(live.outcome, 'lost')
+
+    def test_process_completed_call_writes_one_insert_per_model(self):
+        self._call('CAbulk')
+        with CaptureQueriesContext(connection) as captured:
+            analytics = AnalyticsProcessor.process_completed_call('CAbulk')
+        self.assertEqual(analytics.clarifies_steps_used, ['L', 'C', 'C', 'C', 'S'])
+        inserts = [q['sql'] for q in captured if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 3)  # objections, steps, analytics
+        self.assertEqual(CallObjection.objects.filter(call=analytics.call).count(), 3)
+        self.assertEqual(sorted(CLARIFIESStep.objects.filter(call=analytics.call).values_list('step_type', flat=True)),
+                         ['C', 'C', 'C', 'L', 'S'])
+
+    def test_process_calls_chunk(self):
+        fresh = self._call('CAfresh')
+        live_call = self._call('CAlivebf')
+        LiveCallAnalytics.from_logs(live_call.conversation_logs.all()).persist(live_call)
+        done = self._call('CAdone')
+        AnalyticsProcessor.process_completed_call('CAdone')
+        short = self._call('CAshort', messages=['hello'])
+        calls = [fresh, live_call, done, short]
+
+        dry = AnalyticsProcessor.process_calls(calls, dry_run=True)
+        self.assertEqual(dry, {'calls': 2, 'skipped': 2, 'objections': 6, 'steps': 10})
+        self.assertFalse(ConversationAnalytics.objects.filter(call=fresh).exists())
+
+        with self.assertNumQueries(8):  # analytics, logs, savepoint x2, 3 bulk inserts, 1 bulk update
+            result = AnalyticsProcessor.process_calls(calls)
+        self.assertEqual(result, dry)
+        self.assertFalse(ConversationAnalytics.objects.get(call=live_call).is_live)
+        self.assertEqual(ConversationAnalytics.objects.get(call=fresh).outcome, 'won')
+        self.assertEqual(CLARIFIESStep.objects.filter(call=done).count(), 5)  # untouched
+        self.assertEqual(AnalyticsProcessor.process_calls(calls)['calls'], 0)
+
+    def test_backfill_command(self):
+        for i in range(5):
+            self._call(f'CAhist{i}')
+        self._call('CAringing', status='ringing')
+        out = StringIO()
+        call_command('backfill_call_analytics', batch_size=2, stdout=out)
+        self.assertIn('Analysed 5 calls', out.getvalue())
+        self.assertIn('calls/s', out.getvalue())
+        self.assertEqual(ConversationAnalytics.objects.filter(is_live=False).count(), 5)
+        self.assertFalse(ConversationAnalytics.objects.filter(call__call_sid='CAringing').exists())
+
+        out = StringIO()
+        call_command('backfill_call_analytics', stdout=out)
+        self.assertIn('0 completed calls', out.getvalue())
+
+
+class RecomputeAnalyticsTestCase(TestCase):
+    """Historical calls recomputed with dry-run diffs and bulk upserts"""
+
+    def _call(self, sid, messages, **kwargs):
+        call = TwilioCall.objects.create(call_sid=sid, from_number='+1', to_number='+2', status='completed', **kwargs)
+        ConversationLog.objects.bulk_create([ConversationLog(call=call, role='user', message=message)
+                                             for message in messages])
+        return call
+
+    def setUp(self):
+        self.stale = self._call('CAstale', ['Hello', 'It is too expensive', 'Maybe, send details'])
+        AnalyticsProcessor.process_completed_call('CAstale')
+        # Keyword lists changed since: the stored record no longer matches the transcript
+        ConversationAnalytics.objects.filter(call=self.stale).update(outcome='lost', win_probability=0.2)
+        CallObjection.objects.filter(call=self.stale).update(objection_type='trust')
+        CLARIFIESStep.objects.create(call=self.stale, step_type='A', step_number=9, reasoning='live step',
+                                     customer_message='It is too expensive', agent_message='I hear you')
+        self.current = self._call('CAcurrent', ['Hi', 'Yes, schedule a demo'])
+        AnalyticsProcessor.process_completed_call('CAcurrent')
+        self.unanalysed = self._call('CAnew', ['Hi', 'I am busy'])
+
+    def test_dry_run_reports_diff_without_writing(self):
+        report = recompute_analytics(select_calls(), workers=1, dry_run=True)
+        self.assertEqual((report['calls'], report['analysed'], report['changed']), (3, 3, 2))
+        diffs = {diff['call_sid']: diff for diff in report['diffs']}
+        self.assertEqual(diffs['CAstale']['changes']['outcome'], ['lost', 'follow_up'])
+        self.assertEqual(diffs['CAstale']['changes']['objection_types'], [['trust'], ['price']])
+        self.assertTrue(diffs['CAnew']['created'])
+        self.assertEqual(report['field_changes']['outcome'], 2)
+        self.assertEqual(ConversationAnalytics.objects.get(call=self.stale).outcome, 'lost')
+        self.assertFalse(ConversationAnalytics.objects.filter(call=self.unanalysed).exists())
+
+    def test_recompute_upserts_changed_calls_only(self):
+        current_updated = ConversationAnalytics.objects.get(call=self.current).updated_at
+        report = recompute_analytics(select_calls(), workers=1, batch_size=2)
+        self.assertEqual((report['changed'], report['failed']), (2, 0))
+
+        stale = ConversationAnalytics.objects.get(call=self.stale)
+        self.assertEqual((stale.outcome, stale.win_probability), ('follow_up', 0.5))
+        self.assertEqual(list(CallObjection.objects.filter(call=self.stale).values_list('objection_type', flat=True)),
+                         ['price'])
+        steps = sorted(CLARIFIESStep.objects.filter(call=self.stale).values_list('step_type', flat=True))
+        self.assertEqual(steps, ['A', 'C', 'L'])  # the live CLARIFIESProcessor step is kept
+        self.assertEqual(ConversationAnalytics.objects.get(call=self.unanalysed).outcome, 'lost')
+        self.assertEqual(ConversationAnalytics.objects.get(call=self.current).updated_at, current_updated)
+
+        self.assertEqual(recompute_analytics(select_calls(), workers=1)['changed'], 0)
+
+    def test_filters(self):
+        agent = HumeAgent.objects.create(name='Recompute agent', hume_config_id='cfg')
+        TwilioCall.objects.filter(pk=self.stale.pk).update(agent=agent)
+        self.assertEqual(list(select_calls(agent_id=agent.id)), [self.stale])
+        tomorrow = (timezone.now() + timezone.timedelta(days=1)).date()
+        self.assertFalse(select_calls(date_from=tomorrow).exists())
+        self.assertEqual(select_calls(date_to=tomorrow).count(), 3)
+
+    def test_command_and_api(self):
+        out = StringIO()
+        call_command('recompute_analytics', dry_run=True, workers=1, stdout=out)
+        self.assertIn('Would update 2 of 3 analysed calls', out.getvalue())
+        self.assertIn('CAstale (changed)', out.getvalue())
+
+        user = get_user_model().objects.create_user(email='ops@example.com', password='x')
+        TwilioCall.objects.filter(pk=self.stale.pk).update(user=user)
+        factory = APIRequestFactory()
+        request = factory.post('/api/hume-twilio/analytics/recompute/', {}, format='json')
+        force_authenticate(request, user=user)
+        response = analytics_views.recompute_analytics(request)
+        self.assertEqual((response.status_code, response.data['calls'], response.data['changed']), (200, 1, 1))
+        self.assertEqual(response.data['diffs'][0]['call_sid'], 'CAstale')
+
+        for limit in ('lots', -1, 0):
+            request = factory.post('/api/hume-twilio/analytics/recompute/', {'limit': limit}, format='json')
+            force_authenticate(request, user=user)
+            self.assertEqual(analytics_views.recompute_analytics(request).status_code, 400, limit)
+        request = factory.post('/api/hume-twilio/analytics/recompute/', {'limit': 10 ** 9}, format='json')
+        force_authenticate(request, user=user)
+        self.assertEqual(analytics_views.recompute_analytics(request).status_code, 200)
+
+        request = factory.post('/api/hume-twilio/analytics/recompute/', {'dry_run': False}, format='json')
+        force_authenticate(request, user=user)
+        with mock.patch('HumeAiTwilio.tasks.recompute_call_analytics.delay') as delay:
+            delay.return_value.id = 'task-1'
+            response = analytics_views.recompute_analytics(request)
+        self.assertEqual((response.status_code, response.data['task_id']), (202, 'task-1'))
+        self.assertEqual(delay.call_args.args[3], user.id)
+
+
+class EmotionVectorTestCase(TestCase):
+    """Hume emotion scores stored as float16/float32 vectors over a fixed vocabulary"""
+
+    SCORES = {'Joy': 0.61, 'Calmness': 0.32, 'Anger': 0.05, 'Interest': 0.2, 'agent_confidence': 0.9}
+
+    def test_encode_decode_round_trip(self):
+        fields = emotion_fields(self.SCORES, 'float16')
+        self.assertEqual(len(fields['emotion_vector']), 2 * len(EMOTION_VOCABULARY))
+        self.assertEqual(list(fields['emotion_top']), ['Joy', 'Calmness', 'Interest'])
+        self.assertEqual(fields['emotion_scores'], {'agent_confidence': 0.9})
+
+        vector = decode_vector(fields['emotion_vector'])
+        self.assertAlmostEqual(float(vector[EMOTION_VOCABULARY.index('Joy')]), 0.61, places=3)
+        self.assertEqual(np.count_nonzero(vector), 4)
+
+        # Double-encoded JSON (old Twilio rows) and float32 decode the same way
+        double = emotion_fields(json.dumps(json.dumps(self.SCORES)), 'float32')
+        self.assertEqual(len(double['emotion_vector']), 4 * len(EMOTION_VOCABULARY))
+        matrix = stack_vectors([fields['emotion_vector'], double['emotion_vector']])
+        self.assertEqual(matrix.shape, (2, len(EMOTION_VOCABULARY)))
+        np.testing.assert_allclose(matrix[0], matrix[1], atol=5e-4)
+
+        log = ConversationLog(message='', **fields)
+        self.assertEqual(log.emotion_dict['agent_confidence'], 0.9)
+        self.assertAlmostEqual(log.emotion_dict['Calmness'], 0.32, places=3)
+
+    def test_live_fold_matches_stored_fold(self):
+        frames = [{'Joy': 0.4, 'Sadness': 0.3}, {'Anger': 0.7, 'Relief': 0.2}, {'Contentment': 0.55}]
+        logs = [ConversationLog(message='', sentiment='neutral', **emotion_fields(frame)) for frame in frames]
+        logs.insert(1, ConversationLog(message='That is too expensive', sentiment=''))
+        live = LiveCallAnalytics()
+        for log in logs:
+            live.add_log(log)
+        self.assertEqual(live.snapshot(), LiveCallAnalytics.from_logs(logs).snapshot())
+        self.assertEqual(live.dominant_emotion, 'Contentment')
+
+    def test_top_emotions_by_day(self):
+        rows = [
+            ('2026-01-01', emotion_fields({'Joy': 0.8, 'Calmness': 0.2})['emotion_vector']),
+            ('2026-01-01', emotion_fields({'Joy': 0.4, 'Anger': 0.6})['emotion_vector']),
+            ('2026-01-02', emotion_fields({'Sadness': 0.5})['emotion_vector']),
+            ('2026-01-02', None),
+        ]
+        daily = AnalyticsProcessor.top_emotions_by_day(rows)
+        self.assertEqual(list(daily['2026-01-01']), ['Joy', 'Anger', 'Calmness'])
+        self.assertAlmostEqual(daily['2026-01-01']['Joy'], 0.6, places=3)
+        self.assertEqual(list(daily['2026-01-02']), ['Sadness'])
+
+    def test_backfill_command(self):
+        call = TwilioCall.objects.create(call_sid='CAbackfill', from_number='+1', to_number='+2')
+        legacy = ConversationLog.objects.create(call=call, role='user', message='hi',
+                                                emotion_scores=json.dumps(self.SCORES))
+        call_command('backfill_emotion_vectors', stdout=StringIO())
+        legacy.refresh_from_db()
+        self.assertEqual(len(legacy.emotion_vector), 2 * len(EMOTION_VOCABULARY))
+        self.assertEqual(legacy.emotion_scores, {'agent_confidence': 0.9})
+        self.assertEqual(list(legacy.emotion_top), ['Joy', 'Calmness', 'Interest'])
+
+
+class EmotionRetentionTestCase(SimpleTestCase):
+    """Emotion frames grouped into spans; rows carry the frame count analytics weight by"""
+
+    CALM = {'Calmness': 0.6, 'Joy': 0.2}
+    ANGRY = {'Anger': 0.7, 'Calmness': 0.1}
+
+    def test_all_keeps_every_frame(self):
+        retention = EmotionRetention('all')
+        rows = retention.offer(self.CALM) + retention.offer(self.CALM)
+        self.assertEqual([row['metadata']['emotion_frames'] for row in rows], [1, 1])
+        self.assertEqual(retention.flush(), [])
+
+    def test_change_closes_span_on_top_emotion_shift(self):
+        retention = EmotionRetention('change', delta=0.15)
+        self.assertEqual(retention.offer(self.CALM), [])
+        self.assertEqual(retention.offer({'Calmness': 0.65, 'Joy': 0.2}), [])  # small move: same span
+        rows = retention.offer(self.ANGRY)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['metadata']['emotion_frames'], 2)
+        self.assertEqual(list(rows[0]['emotion_top'])[0], 'Calmness')
+        self.assertAlmostEqual(rows[0]['emotion_top']['Calmness'], 0.625, places=3)
+        rows = retention.offer({'Anger': 0.3, 'Calmness': 0.1})  # same top, score dropped by 0.4
+        self.assertEqual(rows[0]['metadata']['emotion_frames'], 1)
+        self.assertEqual(retention.flush()[0]['metadata']['emotion_frames'], 1)
+        self.assertEqual(retention.stats()['frames'], 4)
+        self.assertEqual(retention.stats()['rows'], 3)
+
+    def test_rate_and_utterance_spans(self):
+        now = [0.0]
+        retention = EmotionRetention('rate', interval=1.0, clock=lambda: now[0])
+        rows = []
+        for step in range(10):
+            now[0] = step * 0.25
+            rows += retention.offer(self.CALM)
+        rows += retention.flush()
+        self.assertEqual([row['metadata']['emotion_frames'] for row in rows], [4, 4, 2])
+
+        retention = EmotionRetention('utterance')
+        retention.offer(self.CALM)
+        retention.offer(self.ANGRY)
+        rows = retention.end_utterance()
+        self.assertEqual(rows[0]['metadata'], {'emotion_frames': 2, 'retention': 'utterance'})
+        self.assertEqual(retention.end_utterance(), [])
+        with self.assertRaises(ValueError):
+            EmotionRetention('sometimes')
+
+    def test_span_row_weighs_like_its_frames(self):
+        retention = EmotionRetention('utterance')
+        for _ in range(3):
+            retention.offer(self.ANGRY)
+        span = ConversationLog(message='', sentiment='neutral', **retention.end_utterance()[0])
+
+        live = LiveCallAnalytics()
+        live.add_log(ConversationLog(message='', sentiment='neutral', **emotion_fields(self.CALM)))
+        live.add_log(span)
+        expected = LiveCallAnalytics()
+        for frame in (self.CALM, self.ANGRY, self.ANGRY, self.ANGRY):
+            expected.add_log(ConversationLog(message='', sentiment='neutral', **emotion_fields(frame)))
+        self.assertEqual(live.logs_count, 2)
+        self.assertNotAlmostEqual(live.avg_sentiment, 0.0)
+        self.assertAlmostEqual(live.avg_sentiment, expected.avg_sentiment, places=6)
+        self.assertEqual(live.snapshot()['emotion_breakdown']['top'], expected.snapshot()['emotion_breakdown']['top'])
+
+
+class _RecordingHumeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+class CallerContextTestCase(TestCase):
+    """Returning-customer context is built at call end and read from cache / one lookup at connect"""
+
+    def setUp(self):
+        cache.clear()
+
+    def _call(self, sid, ended_hours_ago, status='completed', **kwargs):
+        fields = {'from_number': '+15550000001', 'to_number': '+15550000002', 'provider': 'vonage',
+                  'status': status, 'duration': 125, **kwargs}
+        ended = timezone.now() - timezone.timedelta(hours=ended_hours_ago)
+        return TwilioCall.objects.create(call_sid=sid, ended_at=ended, **fields)
+
+    def test_refresh_builds_recent_calls_for_the_customer_side(self):
+        CustomerProfile.objects.create(phone_number='+15550000002', full_name='Sara Khan')
+        self._call('CAold', 48)
+        won = self._call('CAwon', 2)
+        ConversationAnalytics.objects.create(call=won, outcome='won', avg_sentiment=0.4123,
+                                             dominant_customer_emotion='Joy')
+        self._call('CAfailed', 1, status='failed')
+        self._call('CAinbound', 3, direction='inbound', from_number='+15550000009', to_number='+15550000002')
+
+        context = refresh_caller_context(won)
+        self.assertEqual(context['call_count'], 2)
+        self.assertEqual([c['call_sid'] for c in context['recent_calls']], ['CAwon', 'CAold'])
+        self.assertEqual(context['recent_calls'][0]['outcome'], 'won')
+        self.assertEqual(context['recent_calls'][0]['sentiment'], 0.41)
+        self.assertTrue(context['summary'].startswith('Returning caller Sara Khan, 2 previous calls.'))
+        self.assertIn('2m 05s, outcome won, mostly Joy, sentiment +0.41', context['summary'])
+
+        refresh_caller_context(won)  # handle_stop and disconnect both save it
+        self.assertEqual(CallerContext.objects.filter(phone_number='+15550000002').count(), 1)
+
+    def test_connect_read_is_one_lookup_then_cache(self):
+        call = self._call('CAone', 1)
+        refresh_caller_context(call)
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            context = get_caller_context('+15550000002')
+        self.assertEqual(context['call_count'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_caller_context('+15550000002')['summary'], context['summary'])
+
+        # First-time callers are cached too, until their first call ends
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_caller_context('+15550000077'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_caller_context('+15550000077'))
+        refresh_caller_context(self._call('CAnew', 0, to_number='+15550000077'))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_caller_context('+15550000077')['call_count'], 1)
+
+    def test_consumer_keeps_greeting_note_in_context(self):
+        consumer = VonageRealTimeConsumer()
+        consumer.hume_ws = _RecordingHumeSocket()
+        consumer.hume_connected = True
+        consumer.caller_context = {'summary': 'Returning caller, 1 previous call.'}
+        consumer.greeting_context = 'You have already greeted the caller.'
+        async_to_sync(consumer.send_caller_context)()
+        self.assertEqual(consumer.hume_ws.sent, [{
+            'type': 'session_settings',
+            'context': {'text': 'Returning caller, 1 previous call.\nYou have already greeted the caller.',
+                        'type': 'persistent'},
+        }])
+
+        consumer.caller_context = None
+        async_to_sync(consumer.send_caller_context)()
+        self.assertEqual(len(consumer.hume_ws.sent), 1)
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'EXPLAIN parsing for SQLite / PostgreSQL only')
+class QueryPlanTestCase(TestCase):
+    """Hot dashboard / call-setup queries must be served by an index, never a sequential scan
+
+    Runs against whichever database the suite uses; for Postgres:
+        RAILWAY_ENVIRONMENT=production DATABASE_URL=postgres://localhost/hume python manage.py test HumeAiTwilio.tests.QueryPlanTestCase
+    Test tables are tiny, so on Postgres seq scans are disabled for the plan: the
+    question is whether an index path exists at all.
+    """
+
+    HOT_TABLES = ('twilio_calls', 'conversation_logs', 'hume_caller_contexts')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.call = TwilioCall.objects.create(call_sid='CAplan', from_number='+15550000001',
+                                             to_number='+15550000002', provider='vonage', status='in_progress')
+        ConversationLog.objects.create(call=cls.call, role='user', message='hello')
+
+    def _plan(self, queryset) -> str:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertIndexed(self, queryset, ordered=False):
+        plan = self._plan(queryset)
+        if connection.vendor == 'postgresql':
+            scans, sort = re.findall(r'Seq Scan on (\w+)', plan), re.search(r'\bSort\s+\(', plan)
+        else:
+            scans, sort = re.findall(r'\bSCAN (\w+)', plan), 'TEMP B-TREE FOR ORDER BY' in plan
+        self.assertFalse(set(scans) & set(self.HOT_TABLES), f"sequential scan in plan:\n{plan}")
+        if ordered:
+            self.assertFalse(sort, f"index does not provide the ORDER BY:\n{plan}")
+        return plan
+
+    def test_transcript_in_order(self):
+        # dashboards, call_explainability, call_initiation transcript
+        self.assertIndexed(ConversationLog.objects.filter(call=self.call).order_by('timestamp'), ordered=True)
+        # get_live_call_updates: latest 10 entries
+        self.assertIndexed(ConversationLog.objects.filter(call=self.call).order_by('-timestamp')[:10], ordered=True)
+
+    def test_dashboard_call_lists(self):
+        # get_all_active_calls
+        self.assertIndexed(TwilioCall.objects.filter(
+            status__in=['ringing', 'initiated', 'completed'], provider='vonage'
+        ).select_related('agent').order_by('-started_at'))
+        # get_live_call_updates
+        self.assertIndexed(TwilioCall.objects.filter(
+            status__in=['in_progress'], provider='vonage'
+        ).select_related('agent').order_by('-started_at'), ordered=True)
+        # get_active_inbound_calls
+        self.assertIndexed(TwilioCall.objects.filter(
+            direction='inbound', status__in=['ringing', 'in_progress', 'initiated', 'completed'], provider='vonage'
+        ).select_related('agent').order_by('-started_at'))
+
+    def test_customer_history(self):
+        # refresh_caller_context at call end, CallerContext read at connect
+        self.assertIndexed(completed_calls('+15550000002')[:3], ordered=True)
+        self.assertIndexed(CallerContext.objects.filter(phone_number='+15550000002').values('summary'))
+
+
+class ConversationHistoryPersistTestCase(TestCase):
+    """Twilio end-of-call history: one transaction, one bulk_create, one analytics snapshot"""
+
+    def _history(self):
+        start = timezone.now()
+        return [{
+            'question': f'question {i}', 'answer': f'answer {i}',
+            'emotions': {'Joy': 0.5 + i / 10, 'Anger': 0.1},
+            'asked_at': start + timezone.timedelta(seconds=2 * i),
+            'answered_at': start + timezone.timedelta(seconds=2 * i + 1),
+        } for i in range(3)]
+
+    def test_one_insert_and_one_snapshot(self):
+        call = TwilioCall.objects.create(call_sid='CAhistory', from_number='+1', to_number='+2')
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(persist_conversation_history('CAhistory', self._history()), 6)
+        inserts = [q['sql'] for q in captured if q['sql'].startswith('INSERT INTO "conversation_logs"')]
+        self.assertEqual(len(inserts), 1)
+
+        logs = list(ConversationLog.objects.filter(call=call).order_by('timestamp'))
+        self.assertEqual([log.message for log in logs],
+                         ['question 0', 'answer 0', 'question 1', 'answer 1', 'question 2', 'answer 2'])
+        self.assertEqual(logs[0].emotion_dict['Joy'], np.float16(0.5))
+        analytics = ConversationAnalytics.objects.get(call=call)
+        self.assertTrue(analytics.is_live)
+        self.assertEqual(analytics.dominant_customer_emotion, 'Joy')
+        self.assertIsNotNone(TwilioCall.objects.get(pk=call.pk).transcript_completed_at)
+
+    def test_unknown_call_and_bad_pair(self):
+        self.assertEqual(persist_conversation_history('CAmissing', self._history()), 0)
+        TwilioCall.objects.create(call_sid='CAbad', from_number='+1', to_number='+2')
+        history = self._history()
+        del history[1]['answer']
+        self.assertEqual(persist_conversation_history('CAbad', history), 4)
+
+    def test_scheduled_off_the_callers_path(self):
+        TwilioCall.objects.create(call_sid='CAlater', from_number='+1', to_number='+2')
+
+        async def disconnect():
+            task = persist_history_later('CAlater', self._history())
+            self.assertFalse(task.done())
+            return await task
+
+        self.assertEqual(async_to_sync(disconnect)(), 6)
+
+
+@override_settings(POST_CALL_EXECUTOR='local', POST_CALL_MAX_RETRIES=2)
+class PostCallPipelineTestCase(TestCase):
+    """Completed calls go through the ordered post-call stages once per call_sid"""
+
+    def _completed_call(self, sid, logs=2, ended_seconds_ago=600):
+        call = TwilioCall.objects.create(call_sid=sid, from_number='+1', to_number='+2', provider='vonage',
+                                         status='in_progress')
+        ConversationLog.objects.bulk_create([
+            ConversationLog(call=call, role='user' if i % 2 else 'assistant', message=f'turn {i} sounds good yes')
+            for i in range(logs)
+        ])
+        call.status = 'completed'
+        call.ended_at = timezone.now() - timezone.timedelta(seconds=ended_seconds_ago)
+        return call
+
+    def test_enqueued_once_after_commit_and_runs_every_stage(self):
+        call = self._completed_call('CApost', logs=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            call.save()
+            self.assertFalse(PostCallRun.objects.exists())  # nothing before the status update commits
+        run = PostCallRun.objects.get(call_sid='CApost')
+        self.assertEqual(run.status, 'done')
+        self.assertEqual(run.completed_stages, [name for name, _ in post_call.STAGES])
+        self.assertFalse(ConversationAnalytics.objects.get(call=call).is_live)
+        self.assertTrue(CallAnalytics.objects.filter(call=call).exists())
+        steps = CLARIFIESStep.objects.filter(call=call).count()
+        self.assertGreater(steps, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call.save()  # webhook + consumer both mark the call completed
+        self.assertFalse(post_call.enqueue_post_call('CApost'))
+        self.assertEqual(PostCallRun.objects.get(call_sid='CApost').attempts, 1)
+        self.assertEqual(CLARIFIESStep.objects.filter(call=call).count(), steps)
+
+    def test_failed_stage_retries_and_resumes(self):
+        self._completed_call('CAretry').save()
+        ran = []
+
+        def flaky(call):
+            ran.append('flaky')
+            if ran.count('flaky') == 1:
+                raise RuntimeError('database went away')
+
+        stages = (('first', lambda call: ran.append('first')), ('flaky', flaky), ('last', lambda call: ran.append('last')))
+        with mock.patch.object(post_call, 'STAGES', stages):
+            self.assertTrue(post_call.enqueue_post_call('CAretry'))
+        run = PostCallRun.objects.get(call_sid='CAretry')
+        self.assertEqual((run.status, run.attempts), ('done', 2))
+        self.assertEqual(ran, ['first', 'flaky', 'flaky', 'last'])
+        self.assertEqual(run.last_error, 'flaky: database went away')
+
+        with mock.patch.object(post_call, 'STAGES', (('boom', mock.Mock(side_effect=ValueError('bad'))),)):
+            self._completed_call('CAfail').save()
+            post_call.enqueue_post_call('CAfail')
+        run = PostCallRun.objects.get(call_sid='CAfail')
+        self.assertEqual((run.status, run.attempts), ('failed', 3))
+
+    def test_waits_for_transcript_then_recovers(self):
+        call = self._completed_call('CAwait', logs=0, ended_seconds_ago=5)
+        call.save()
+        post_call.enqueue_post_call('CAwait')
+        run = PostCallRun.objects.get(call_sid='CAwait')
+        self.assertEqual((run.status, run.completed_stages), ('retrying', []))
+        self.assertIn('transcript not complete yet', run.last_error)
+
+        # rows flushed mid-call are not the whole transcript
+        ConversationLog.objects.create(call=call, role='user', message='hello')
+        PostCallRun.objects.filter(pk=run.pk).update(updated_at=timezone.now() - timezone.timedelta(hours=1))
+        self.assertEqual(post_call.recover_stale_runs(), 1)
+        self.assertEqual(PostCallRun.objects.get(pk=run.pk).status, 'retrying')
+
+        # the consumer's final flush marks it complete and resumes the waiting run
+        ConversationLog.objects.create(call=call, role='assistant', message='hi there')
+        self.assertTrue(mark_transcript_complete('CAwait'))
+        self.assertEqual(PostCallRun.objects.get(pk=run.pk).status, 'done')
+        self.assertFalse(ConversationAnalytics.objects.get(call=call).is_live)
+        self.assertEqual(CallAnalytics.objects.get(call=call).total_messages, 2)
+
+    @override_settings(POST_CALL_EXECUTOR='celery')
+    def test_webhook_ack_is_independent_of_call_size(self):
+        factory = RequestFactory()
+        queries = []
+        for sid, logs in (('CAsmall', 4), ('CAlarge', 400)):
+            call = self._completed_call(sid, logs=logs)
+            TwilioCall.objects.filter(pk=call.pk).update(status='in_progress', ended_at=None)
+            request = factory.post('/vonage-event-callback/', data=json.dumps({'uuid': sid, 'status': 'completed'}),
+                                   content_type='application/json')
+            with mock.patch('HumeAiTwilio.tasks.run_post_call_pipeline.delay') as delay:
+                with CaptureQueriesContext(connection) as captured:
+                    with self.captureOnCommitCallbacks(execute=True):
+                        response = vonage_event_callback(request)
+            self.assertEqual(response.status_code, 200)
+            delay.assert_called_once_with(sid)
+            queries.append(len(captured))
+            self.assertFalse(ConversationAnalytics.objects.filter(call=call).exists())
+        self.assertEqual(queries[0], queries[1])
+
+
+class KnowledgeIndexTestCase(TestCase):
+    def setUp(self):
+        reset_knowledge_index()
+        self.addCleanup(reset_knowledge_index)
+        LearnedKnowledge.objects.create(question='How much does it cost?', answer='It is $99 per month.')
+        LearnedKnowledge.objects.create(question='Can I try a demo first?', answer='Yes, there is a 14 day trial.')
+        LearnedKnowledge.objects.create(question='Does it integrate with Salesforce?',
+                                        answer='Yes, we connect to Salesforce and HubSpot.')
+
+    def test_analyze_folds_plurals_and_drops_stopwords(self):
+        self.assertEqual(analyze('What do the companies and businesses charge?'),
+                         ['do', 'company', 'business', 'charge'])
+
+    def test_synonyms_match_and_unrelated_queries_do_not(self):
+        index = get_knowledge_index()
+        self.assertEqual(index.best_match("what's the pricing")['answer'], 'It is $99 per month.')
+        self.assertEqual(index.best_match('is there a trial')['answer'], 'Yes, there is a 14 day trial.')
+        self.assertEqual(index.best_match('will it sync with salesforce')['answer'],
+                         'Yes, we connect to Salesforce and HubSpot.')
+        # one shared word is not enough coverage
+        self.assertIsNone(index.best_match('what is the weather like in paris today'))
+        self.assertEqual(index.search(''), [])
+
+    def test_signals_keep_index_current_without_rescanning(self):
+        index = get_knowledge_index()
+        entry = LearnedKnowledge.objects.create(question='Do you offer refunds?', answer='Within 30 days.')
+        with self.assertNumQueries(0):
+            self.assertEqual(index.best_match('do you do refunds')['answer'], 'Within 30 days.')
+        entry.answer = 'Within 60 days.'
+        entry.save()
+        self.assertEqual(index.best_match('refunds')['answer'], 'Within 60 days.')
+        entry.delete()
+        self.assertIsNone(index.best_match('refunds'))
+        self.assertEqual(len(index), 3)
+
+    def test_sync_picks_up_rows_written_by_other_processes(self):
+        index = get_knowledge_index()
+        with mock.patch.object(knowledge_index._registry, 'peek', return_value=None):  # another process
+            LearnedKnowledge.objects.create(question='Where is your office?', answer='In Austin.')
+            LearnedKnowledge.objects.filter(question='Can I try a demo first?').delete()
+        self.assertIsNone(index.best_match('where is the office'))
+        with override_settings(KNOWLEDGE_INDEX_SYNC_SECONDS=0):
+            self.assertEqual(get_knowledge_index().best_match('where is the office')['answer'], 'In Austin.')
+        self.assertIsNone(index.best_match('demo'))
+        self.assertEqual(len(index), 3)
+
+    def test_top_k_matches_exhaustive_scoring(self):
+        rng = np.random.default_rng(1)
+        vocabulary = [f'w{i}' for i in range(300)]
+        weights = 1.0 / np.arange(1, 301)
+        index = KnowledgeIndex()
+        for pk in range(2000):
+            index.add(pk, ' '.join(rng.choice(vocabulary, 8, p=weights / weights.sum())), 'answer')
+        for _ in range(50):
+            query = ' '.join(rng.choice(vocabulary, 4, p=weights / weights.sum()))
+            terms = {term for concept in index._concepts(query) for term in concept if term}
+            postings = [(index._idf(len(arrays[0])), *arrays)
+                        for arrays in map(index._posting_arrays, terms) if arrays is not None]
+            _, pruned = index._top_k(postings, 5)
+            _, exhaustive = index._top_k_dense(postings, 5)
+            np.testing.assert_allclose(pruned, exhaustive[exhaustive > 0])
+
+    def test_search_knowledge_base_uses_index(self):
+        service = IntelligentResponseService()
+        self.assertEqual(service.search_knowledge_base('how expensive is it'), 'It is $99 per month.')
+        with self.assertNumQueries(0):
+            self.assertEqual(service.search_knowledge_base('can we get a demo'),
+                             'Yes, there is a 14 day trial.')
+        self.assertIsNone(service.search_knowledge_base('tell me a joke'))
+
+
+class _HashingEncoder:
+    """Stand-in for SentenceTransformer: bag of hashed words, 64 dims"""
+
+    def encode(self, texts, batch_size=None):
+        single = isinstance(texts, str)
+        vectors = np.zeros((1 if single else len(texts), 64), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            for word in re.findall(r'[a-z]+', text.lower()):
+                vectors[row, zlib.crc32(word.encode()) % 64] += 1
+        return vectors[0] if single else vectors
+
+
+class VectorIndexTestCase(TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path, ignore_errors=True)
+        reset_vector_index()
+        self.addCleanup(reset_vector_index)
+        rng = np.random.default_rng(0)
+        centres = normalize(rng.standard_normal((40, 32)))
+        self.corpus = normalize(centres[rng.integers(0, 40, 4000)] + 0.5 * normalize(rng.standard_normal((4000, 32))))
+
+    def _exact(self, query, k):
+        return set(np.argpartition(-(self.corpus @ query), k - 1)[:k].tolist())
+
+    def test_flat_int8_and_ivf_search(self):
+        for dtype, ivf_min, minimum_recall in (('float32', 10 ** 6, 1.0), ('int8', 10 ** 6, 0.9),
+                                               ('float32', 1, 0.9)):
+            write_index(self.path, np.arange(4000), self.corpus, dtype=dtype, ivf_min=ivf_min)
+            index = VectorIndex(self.path)
+            self.assertTrue(index.open())
+            self.assertIsInstance(index._vectors, np.memmap)
+            found = 0
+            for query in self.corpus[:50]:
+                hits = index.search(query, k=10, nprobe=8)
+                self.assertEqual(len(hits), 10)
+                found += len(self._exact(query, 10) & {pk for pk, _ in hits})
+            self.assertGreaterEqual(found / 500, minimum_recall, (dtype, ivf_min))
+
+    def test_readers_switch_to_new_generation_and_apply_deltas(self):
+        write_index(self.path, np.arange(100), self.corpus[:100])
+        reader = VectorIndex(self.path)
+        reader.open()
+        write_index(self.path, np.arange(200), self.corpus[:200])
+        self.assertEqual(len(reader), 100)  # old mapping stays valid after its files are removed
+        self.assertNotEqual(reader.search(self.corpus[150], k=1)[0][0], 150)
+        self.assertTrue(reader.open())
+        self.assertEqual(reader.search(self.corpus[150], k=1)[0][0], 150)
+
+        reader.add(150, self.corpus[3])  # row re-embedded: the delta supersedes the mapped row
+        reader.remove(3)
+        self.assertEqual(reader.search(self.corpus[3], k=1)[0][0], 150)
+        self.assertEqual(len(reader), 199)
+
+    def test_knowledge_manager_numpy_backend(self):
+        with override_settings(KNOWLEDGE_BACKEND='numpy', KNOWLEDGE_VECTOR_DIR=self.path), \
+                mock.patch.object(KnowledgeManager, '_load_embedding_model', return_value=_HashingEncoder()):
+            manager = KnowledgeManager()
+            self.assertEqual(manager.backend, 'numpy')
+            self.assertTrue(manager.add_knowledge('How much does the starter plan cost?', '$99 per month.'))
+            self.assertTrue(manager.add_knowledge('Do you integrate with Salesforce?', 'Yes, natively.',
+                                                  {'source': 'manual'}))
+            self.assertIsNotNone(LearnedKnowledge.objects.get(question__startswith='How much').embedding)
+
+            matches = manager.search_knowledge('salesforce integrate', limit=1)
+            self.assertEqual(matches[0]['answer'], 'Yes, natively.')
+            self.assertLess(matches[0]['distance'], 0.5)
+            self.assertEqual(matches[0]['metadata'], {'source': 'manual'})
+
+            # another process saves a row; this one picks it up on its next sync, and after a rebuild
+            with mock.patch.object(vector_index._registry, 'peek', return_value=None):
+                manager.add_knowledge('Is there a free trial?', 'Yes, 14 days.')
+            self.assertNotEqual(manager.search_knowledge('free trial', limit=1)[0]['answer'], 'Yes, 14 days.')
+            vector_index.get_vector_index().sync()
+            self.assertEqual(manager.search_knowledge('free trial', limit=1)[0]['answer'], 'Yes, 14 days.')
+
+            call_command('build_vector_index', stdout=StringIO())
+            LearnedKnowledge.objects.filter(question__startswith='Do you').delete()
+            index = vector_index.get_vector_index()
+            index.sync()
+            # the newest row sits at the watermark and is re-read (>=) into the delta, not duplicated
+            self.assertEqual((len(index), index.delta_size), (2, 1))
+            self.assertEqual(manager.get_stats()['total_items'], 2)
+
+
+    def test_sync_picks_up_rows_saved_in_the_watermark_tick(self):
+        with mock.patch.object(vector_index._registry, 'peek', return_value=None):
+            first = LearnedKnowledge.objects.create(question='q1', answer='a1', embedding=encode_embedding(self.corpus[0]))
+            rebuild_vector_index(path=self.path)
+            second = LearnedKnowledge.objects.create(question='q2', answer='a2', embedding=encode_embedding(self.corpus[1]))
+            LearnedKnowledge.objects.filter(pk=second.pk).update(updated_at=first.updated_at)
+        index = VectorIndex(self.path)
+        index.sync()
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.search(self.corpus[1], k=1)[0][0], second.pk)
+
+
+class _CountingModel(_HashingEncoder):
+    """_HashingEncoder recording each encode() call; ``gate`` holds the first call"""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def encode(self, texts, batch_size=None):
+        self.calls.append(list(texts))
+        self.gate.wait(5)
+        return super().encode(list(texts))
+
+
+class EmbeddingServiceTestCase(SimpleTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        self.model = _CountingModel()
+        self.loads = []
+
+    def _service(self, **kwargs):
+        def loader(name):
+            self.loads.append(name)
+            return self.model
+        return EmbeddingService(loader=loader, cache_dir=self.cache_dir, **kwargs)
+
+    def test_lazy_load_and_normalised_lru_and_disk_cache(self):
+        service = self._service()
+        self.assertEqual(self.loads, [])
+        vector = service.encode('How much does it cost?')
+        self.assertEqual((len(self.loads), len(self.model.calls)), (1, 1))
+        np.testing.assert_array_equal(service.encode('  how much DOES it cost '), vector)
+        self.assertEqual(len(self.model.calls), 1)
+
+        other_process = self._service()
+        np.testing.assert_array_equal(other_process.encode('How much does it cost'), vector)
+        self.assertEqual(len(self.loads), 1)  # a disk hit never loads the model
+        self.assertEqual(other_process.get_stats()['disk_hits'], 1)
+
+    def test_concurrent_callers_share_batches(self):
+        service = self._service(batch_wait_ms=20)
+        self.model.gate.clear()
+        texts = [f'question number {i}' for i in range(12)] + ['question number 0'] * 4
+        results = {}
+        first = threading.Thread(target=lambda: results.setdefault('first', service.encode('warm up')))
+        first.start()
+        while not self.model.calls:
+            time.sleep(0.001)
+        threads = [threading.Thread(target=lambda i=i, text=text: results.setdefault(i, service.encode(text)))
+                   for i, text in enumerate(texts)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)  # everyone queued behind the held first batch
+        self.model.gate.set()
+        for thread in [first, *threads]:
+            thread.join(5)
+
+        self.assertEqual(len(results), len(texts) + 1)
+        self.assertEqual([len(call) for call in self.model.calls], [1, 12])
+        self.assertEqual(service.get_stats()['coalesced'], 4)
+        np.testing.assert_array_equal(results[12], results[0])
+
+    def test_list_encode_and_async(self):
+        service = self._service(batch_size=4)
+        service.encode('cached one')
+        matrix = service.encode(['a b', 'cached one', 'c d', 'a b', 'e f', 'g h', 'i j'])
+        self.assertEqual(matrix.shape, (7, 64))
+        np.testing.assert_array_equal(matrix[0], matrix[3])
+        self.assertEqual([len(call) for call in self.model.calls], [1, 4, 1])
+        np.testing.assert_array_equal(async_to_sync(service.aencode)('c d'), matrix[2])
+
+    def test_knowledge_manager_uses_shared_service(self):
+        with mock.patch.object(embeddings, 'model_available', return_value=True), \
+                mock.patch.object(embeddings, '_service', None):
+            first = KnowledgeManager._load_embedding_model()
+            self.assertIs(KnowledgeManager._load_embedding_model(), first)
+            self.assertFalse(first.get_stats()['model_loaded'])
+        with mock.patch.object(embeddings, 'model_available', return_value=False):
+            with self.assertRaises(ImportError):
+                KnowledgeManager._load_embedding_model()
+
+
+class KnowledgePartitionTestCase(TestCase):
+    """LearnedKnowledge searched per agent partition, loaded on demand and evicted when idle"""
+
+    def setUp(self):
+        reset_knowledge_index()
+        reset_vector_index()
+        self.addCleanup(reset_knowledge_index)
+        self.addCleanup(reset_vector_index)
+        self.acme = HumeAgent.objects.create(name='Acme', hume_config_id='cfg-acme')
+        self.globex = HumeAgent.objects.create(name='Globex', hume_config_id='cfg-globex')
+        LearnedKnowledge.objects.create(agent=self.acme, question='How much does it cost?', answer='Acme: $99.')
+        LearnedKnowledge.objects.create(agent=self.globex, question='How much does it cost?', answer='Globex: $10.')
+        LearnedKnowledge.objects.create(agent=self.globex, question='Is there a free trial?', answer='Globex: 7 days.')
+
+    def test_call_searches_only_its_agents_knowledge(self):
+        call = TwilioCall.objects.create(call_sid='CAacme', from_number='+1', to_number='', agent=self.acme)
+        service = IntelligentResponseService(call=call)
+        self.assertEqual(set(knowledge_index._registry.loaded()), {str(self.acme.pk)})  # warmed at call start
+        self.assertEqual(service.search_knowledge_base('what is the price'), 'Acme: $99.')
+        self.assertIsNone(service.search_knowledge_base('free trial'))  # Globex's answer never leaks
+        self.assertEqual((len(get_knowledge_index(self.acme.pk)), len(get_knowledge_index(self.globex.pk))), (1, 2))
+        self.assertIsNone(get_knowledge_index().best_match('price'))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            LearnedKnowledge.objects.create(agent=self.acme, question='How much does it cost?', answer='dup')
+
+    def test_signals_touch_loaded_partitions_and_idle_ones_are_evicted(self):
+        acme_index = get_knowledge_index(self.acme.pk)
+        LearnedKnowledge.objects.create(agent=self.acme, question='Where is the office?', answer='Austin.')
+        LearnedKnowledge.objects.create(agent=self.globex, question='Where is the office?', answer='Berlin.')
+        self.assertEqual(acme_index.best_match('office')['answer'], 'Austin.')
+        self.assertEqual(set(knowledge_index._registry.loaded()), {str(self.acme.pk)})
+
+        with override_settings(KNOWLEDGE_PARTITION_IDLE_SECONDS=-1):
+            get_knowledge_index(self.globex.pk)
+        self.assertEqual(set(knowledge_index._registry.loaded()), {str(self.globex.pk)})
+        with override_settings(KNOWLEDGE_PARTITION_MAX=1):
+            get_knowledge_index(self.acme.pk)
+        self.assertEqual(set(knowledge_index._registry.loaded()), {str(self.acme.pk)})
+        self.assertIsNot(get_knowledge_index(self.acme.pk), acme_index)  # rebuilt after eviction
+
+    def test_knowledge_manager_partitions(self):
+        TwilioCall.objects.create(call_sid='CAglobex', from_number='+1', to_number='+2', agent=self.globex)
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        with override_settings(KNOWLEDGE_BACKEND='numpy', KNOWLEDGE_VECTOR_DIR=path), \
+                mock.patch.object(KnowledgeManager, '_load_embedding_model', return_value=_HashingEncoder()):
+            manager = KnowledgeManager()
+            self.assertTrue(manager.add_knowledge('Do you integrate with Salesforce?', 'Globex: yes.',
+                                                  {'call_sid': 'CAglobex'}))
+            self.assertTrue(manager.add_knowledge('Do you integrate with Salesforce?', 'Acme: no.',
+                                                  agent_id=self.acme.pk))
+            self.assertEqual(LearnedKnowledge.objects.get(answer='Globex: yes.').agent_id, self.globex.pk)
+            for agent, answer in ((self.acme, 'Acme: no.'), (self.globex, 'Globex: yes.')):
+                matches = manager.search_knowledge('salesforce integration', limit=5, agent_id=agent.pk)
+                self.assertEqual([match['answer'] for match in matches], [answer])
+            self.assertEqual(manager.search_knowledge('salesforce', agent_id=None), [])
+            self.assertTrue((Path(path) / partition_name(self.acme.pk) / 'CURRENT').exists())
+
+        manager = KnowledgeManager.__new__(KnowledgeManager)
+        manager.backend, manager.django_model = 'django_db', LearnedKnowledge
+        self.assertEqual([match['answer'] for match in manager.search_knowledge('cost', agent_id=self.acme.pk)],
+                         ['Acme: $99.'])
+
+    def test_migration_assigns_rows_learned_on_calls(self):
+        TwilioCall.objects.create(call_sid='CAlegacy', from_number='+1', to_number='+2', agent=self.acme)
+        learned = LearnedKnowledge.objects.create(question='Legacy question', answer='a',
+                                                  metadata=json.dumps({'call_sid': 'CAlegacy'}))
+        manual = LearnedKnowledge.objects.create(question='Manual question', answer='b', metadata={'source': 'admin'})
+        migration = importlib.import_module('HumeAiTwilio.migrations.0016_assign_learnedknowledge_agents')
+        migration.assign_agents(django_apps, None)
+        learned.refresh_from_db()
+        manual.refresh_from_db()
+        self.assertEqual((learned.agent_id, manual.agent_id), (self.acme.pk, None))
+
+
+class _InstantAnswerStub(BaseHTTPRequestHandler):
+    """Local stand-in for the DuckDuckGo Instant Answer API (keep-alive, optional delay)"""
+
+    protocol_version = 'HTTP/1.1'
+    answers = {'what is twilio': 'Twilio is a cloud communications platform.'}
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+        self.server.queries.append(query)
+        self.server.ports.add(self.client_address[1])
+        time.sleep(self.server.delay)
+        body = json.dumps({'Abstract': self.answers.get(normalise_phrase(query), ''), 'RelatedTopics': []}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-javascript')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class WebSearchClientTestCase(TestCase):
+    """Async web search fallback: caching, coalescing, rate limit and latency budget against a stub server"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _InstantAnswerStub)
+        self.server.daemon_threads = True
+        self.server.queries, self.server.ports, self.server.delay = [], set(), 0.0
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.now = 1000.0
+
+    def _client(self, **kwargs):
+        options = {'url': f'http://127.0.0.1:{self.server.server_port}/', 'budget_ms': 2000, 'rate': 100, 'burst': 100,
+                   'ttl': 60, 'negative_ttl': 10, 'clock': lambda: self.now}
+        client = WebSearchClient(**{**options, **kwargs})
+        self.addCleanup(client.close)
+        return client
+
+    def test_answers_and_misses_are_cached_over_one_connection(self):
+        client = self._client()
+        self.assertEqual(client.search('What is Twilio?'), 'Twilio is a cloud communications platform.')
+        self.assertEqual(client.search('what is twilio'), 'Twilio is a cloud communications platform.')
+        self.assertIsNone(client.search('who won the match'))
+        self.assertIsNone(client.search('Who won the match?'))
+        self.assertEqual(self.server.queries, ['What is Twilio?', 'who won the match'])
+        self.assertEqual(len(self.server.ports), 1)  # keep-alive connection reused
+
+        self.now += 11  # negative entry expired, answer still fresh
+        self.assertIsNone(client.search('who won the match'))
+        self.assertEqual(client.search('what is twilio'), 'Twilio is a cloud communications platform.')
+        self.assertEqual(len(self.server.queries), 3)
+        stats = client.get_stats()
+        self.assertEqual((stats['hits'], stats['negative_hits'], stats['requests']), (2, 1, 3))
+
+    def test_identical_in_flight_queries_share_one_request(self):
+        client = self._client()
+        self.server.delay = 0.2
+        with concurrent.futures.ThreadPoolExecutor(6) as pool:
+            answers = list(pool.map(client.search, ['what is twilio'] * 6))
+        self.assertEqual(set(answers), {'Twilio is a cloud communications platform.'})
+        self.assertEqual(len(self.server.queries), 1)
+        self.assertEqual(client.get_stats()['coalesced'], 5)
+
+    def test_budget_returns_no_answer_and_late_result_is_cached(self):
+        client = self._client(budget_ms=100)
+        self.server.delay = 0.4
+        started = time.perf_counter()
+        self.assertIsNone(async_to_sync(client.asearch)('what is twilio'))
+        self.assertLess(time.perf_counter() - started, 0.3)
+        time.sleep(0.5)
+        self.assertEqual(client.search('what is twilio'), 'Twilio is a cloud communications platform.')
+        self.assertEqual(len(self.server.queries), 1)
+        self.assertEqual(client.get_stats()['over_budget'], 1)
+
+    def test_rate_limit_drops_queries_that_cannot_start_within_budget(self):
+        client = self._client(rate=1, burst=1, budget_ms=50)
+        self.assertEqual(client.search('what is twilio'), 'Twilio is a cloud communications platform.')
+        self.assertIsNone(client.search('another question'))
+        self.assertEqual(self.server.queries, ['what is twilio'])
+        self.assertEqual(client.get_stats()['rate_limited'], 1)
+
+    def test_service_learns_answer_into_agent_partition(self):
+        agent = HumeAgent.objects.create(name='Search agent', hume_config_id='cfg')
+        call = TwilioCall.objects.create(call_sid='CAweb', from_number='+1', to_number='', agent=agent)
+        client = self._client()
+        with mock.patch('HumeAiTwilio.intelligent_response_service.get_web_search_client', return_value=client):
+            service = IntelligentResponseService(call=call)
+            self.assertEqual(service.get_intelligent_response('What is Twilio?'),
+                             ('Twilio is a cloud communications platform.', 'web_search'))
+            self.assertEqual(service.get_intelligent_response('who won the match')[1], 'default')
+        learned = LearnedKnowledge.objects.get(source='web_search')
+        self.assertEqual((learned.agent_id, learned.question), (agent.pk, 'What is Twilio?'))
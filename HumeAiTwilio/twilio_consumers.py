@@ -246,8 +246,8 @@ class TwilioHumeStreamConsumer(AsyncWebsocketConsumer):
         
         from channels.db import database_sync_to_async
         from .models import ConversationLog
+        from .emotion_vectors import emotion_fields
         from django.utils import timezone
-        import json
         
         @database_sync_to_async
         def create_log():
@@ -256,10 +256,10 @@ class TwilioHumeStreamConsumer(AsyncWebsocketConsumer):
                     call=self.call,
                     role=role,
                     message=message,
-                    emotion_scores=json.dumps(emotion_scores) if emotion_scores else None,  # ✅ Store emotions
                     sentiment=sentiment or 'neutral',  # ✅ Store sentiment
                     confidence=emotion_scores.get('confidence', 0.5) if emotion_scores else 0.0,  # ✅ Store confidence
-                    timestamp=timezone.now()
+                    timestamp=timezone.now(),
+                    **emotion_fields(emotion_scores)  # ✅ Store emotions (compact vector)
                 )
                 logger.info(f"✅ Logged: {role} - {message[:50]}...")
             except Exception as e:
@@ -83,20 +83,8 @@ def twilio_status_callback_fixed(request):
             call.status = call_status.lower().replace('-', '_')
             call.save()
             logger.info(f"✅ Updated call {call_sid} status to {call_status}")
+            # 🔥 Completed calls are queued for post-call analytics by the call_status_changed signal
             
-            # 🔥 AUTO-GENERATE ANALYTICS when call completes
-            if call_status.lower() in ['completed', 'no-answer', 'busy', 'failed']:
-                from .services.analytics_processor import AnalyticsProcessor
-                # Run in background to avoid blocking callback
-                import threading
-                thread = threading.Thread(
-                    target=AnalyticsProcessor.process_completed_call,
-                    args=(call_sid,)
-                )
-                thread.daemon = True
-                thread.start()
-                logger.info(f"🚀 Started analytics processing for call {call_sid}")
-                
     except Exception as e:
         logger.warning(f"⚠️  Could not update call: {e}")
     
@@ -78,6 +78,9 @@ from .api_views.dashboard_views import (
     get_live_call_updates  # 🔴 NEW: Real-time polling endpoint
 )
 
+# ⏱️ Live call latency metrics
+from .api_views.metrics_views import turn_latency_metrics
+
 # 📊 CLARIFIES Analytics APIs
 try:
     from .api_views.analytics_views import (
@@ -87,7 +90,8 @@ try:
         win_loss_rate,
         tone_trends,
         call_explainability,
-        risk_flags_audit
+        risk_flags_audit,
+        recompute_analytics
     )
     print("✅ Analytics views imported successfully!")
 except ImportError as e:
@@ -125,6 +129,10 @@ except ImportError as e:
     @api_view(['GET'])
     def risk_flags_audit(request):
         return Response({'error': 'View not loaded - import failed'}, status=500)
+    
+    @api_view(['POST'])
+    def recompute_analytics(request):
+        return Response({'error': 'View not loaded - import failed'}, status=500)
 
 # 🔍 DEBUG: Test endpoint
 from .test_analytics_endpoint import test_analytics_debug
@@ -151,8 +159,12 @@ urlpatterns = [
     path('analytics/win-loss-rate/', win_loss_rate, name='analytics-win-loss-rate'),
     path('analytics/tone-trends/', tone_trends, name='analytics-tone-trends'),
     path('analytics/risk-flags/', risk_flags_audit, name='analytics-risk-flags'),
+    path('analytics/recompute/', recompute_analytics, name='analytics-recompute'),
     path('call/<str:call_id>/explainability/', call_explainability, name='call-explainability'),
     
+    # ⏱️ LIVE CALL LATENCY METRICS
+    path('metrics/turn-latency/', turn_latency_metrics, name='metrics-turn-latency'),
+    
     # 🔍 DEBUG ENDPOINTS
     path('debug/analytics-test/', test_analytics_debug, name='debug-analytics-test'),
     path('debug/simple-test/', test_simple_view, name='debug-simple-test'),
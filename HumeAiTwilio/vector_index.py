@@ -0,0 +1,374 @@
+"""
+Memory-mapped NumPy vector index over LearnedKnowledge embeddings
+
+A third KnowledgeManager backend next to ChromaDB and the Django DB keyword
+search. Question embeddings are stored with their row (LearnedKnowledge.embedding,
+float32 bytes) and the index is derived from them:
+
+    <KNOWLEDGE_VECTOR_DIR>/<partition>/CURRENT       name of the live generation
+    <KNOWLEDGE_VECTOR_DIR>/<partition>/gen-*/ids.npy  LearnedKnowledge pks, one per row
+                                 vectors.npy   unit-length rows, float32 or int8
+                                 scales.npy    per-row int8 scale
+                                 centroids.npy / offsets.npy  IVF lists (optional)
+                                 meta.json     count, dim, dtype, watermark
+
+There is one directory per agent partition (knowledge_partitions.py: the
+agent id, or ``unassigned``), mapped when that agent's calls first search.
+Files are opened with ``np.load(mmap_mode='r')`` so every worker process
+shares one copy through the page cache. A rebuild writes a new generation and
+swaps CURRENT atomically; readers switch on their next sync and keep their
+old mapping until then. Rows saved after the build live in a small
+per-process delta (post_save here, an updated_at watermark for other
+processes) until the delta grows past KNOWLEDGE_VECTOR_DELTA_MAX and the
+index is rebuilt.
+
+Search is cosine similarity (dot product of unit vectors): brute force over
+the matrix, or, above KNOWLEDGE_VECTOR_IVF_MIN rows, over the
+KNOWLEDGE_VECTOR_NPROBE nearest IVF lists (spherical k-means, rows sorted by
+list so each list is one contiguous slice of the mapping).
+
+Settings:
+    KNOWLEDGE_VECTOR_DIR        index directory (default agent_knowledge_db/vectors)
+    KNOWLEDGE_VECTOR_DTYPE      'float32' or 'int8' (4x smaller, ~1% recall)
+    KNOWLEDGE_VECTOR_IVF_MIN    rows before IVF lists are built (default 20000)
+    KNOWLEDGE_VECTOR_NPROBE     IVF lists scanned per query (default 8)
+    KNOWLEDGE_VECTOR_DELTA_MAX  unindexed rows before a rebuild (default 5000)
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .knowledge_partitions import PartitionRegistry, partition_filter, partition_key, partition_name
+
+logger = logging.getLogger(__name__)
+
+BLOCK_ROWS = 16384  # int8 rows dequantised per matmul
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def normalize(matrix) -> np.ndarray:
+    """Unit-length float32 rows (zero rows stay zero)"""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def encode_embedding(vector) -> bytes:
+    """LearnedKnowledge.embedding blob: unit-length little-endian float32"""
+    return normalize(vector)[0].astype('<f4').tobytes()
+
+
+def decode_embedding(blob) -> np.ndarray:
+    return np.frombuffer(bytes(blob), dtype='<f4')
+
+
+def quantize(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8: (int8 rows, float32 scales) with row ~= int8 * scale"""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def kmeans(matrix: np.ndarray, lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids (lists, dim), trained on a sample of at most 64 rows per list"""
+    rng = np.random.default_rng(seed)
+    sample = matrix[rng.choice(len(matrix), size=min(len(matrix), lists * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=lists)
+        sums = sample[rng.choice(len(sample), size=lists)]  # reseeds empty lists
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(sample[order], np.concatenate([[0], np.cumsum(counts)[:-1]])[filled])
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_lists(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([np.argmax(matrix[i:i + BLOCK_ROWS] @ centroids.T, axis=1)
+                           for i in range(0, len(matrix), BLOCK_ROWS)]) if len(matrix) else np.zeros(0, int)
+
+
+def write_index(path, ids, matrix, dtype: str = None, ivf_min: int = None, watermark: datetime = None) -> str:
+    """
+    Write a new generation from (n,) pks and (n, dim) vectors and make it current.
+    Returns the generation name. Older generations are removed (open mappings stay valid).
+    """
+    path = Path(path)
+    dtype = dtype or _setting('KNOWLEDGE_VECTOR_DTYPE', 'float32')
+    ivf_min = _setting('KNOWLEDGE_VECTOR_IVF_MIN', 20000) if ivf_min is None else ivf_min
+    ids = np.asarray(ids, dtype=np.int64)
+    matrix = normalize(matrix) if len(ids) else np.zeros((0, matrix.shape[1] if np.ndim(matrix) == 2 else 0),
+                                                          dtype=np.float32)
+
+    generation = f'gen-{time.time_ns()}-{os.getpid()}'
+    target = path / generation
+    target.mkdir(parents=True)
+    if len(ids) >= max(ivf_min, 1):
+        centroids = kmeans(matrix, lists=max(1, int(np.sqrt(len(ids)))))
+        assign = assign_lists(matrix, centroids)
+        order = np.argsort(assign, kind='stable')
+        ids, matrix = ids[order], matrix[order]
+        np.save(target / 'centroids.npy', centroids)
+        np.save(target / 'offsets.npy', np.searchsorted(assign[order], np.arange(len(centroids) + 1)))
+    np.save(target / 'ids.npy', ids)
+    if dtype == 'int8':
+        rows, scales = quantize(matrix)
+        np.save(target / 'vectors.npy', rows)
+        np.save(target / 'scales.npy', scales)
+    else:
+        np.save(target / 'vectors.npy', matrix)
+    meta = {'count': len(ids), 'dim': int(matrix.shape[1]), 'dtype': dtype,
+            'watermark': watermark.isoformat() if watermark else None}
+    (target / 'meta.json').write_text(json.dumps(meta))
+
+    pointer = path / f'CURRENT.{os.getpid()}.tmp'
+    pointer.write_text(generation)
+    os.replace(pointer, path / 'CURRENT')
+    for old in path.glob('gen-*'):
+        if old.name != generation:
+            shutil.rmtree(old, ignore_errors=True)
+    return generation
+
+
+class VectorIndex:
+    """
+    Read side of one partition's index directory plus this process's delta rows.
+    search() returns [(pk, cosine similarity)], best first.
+    """
+
+    def __init__(self, path=None, agent_id=None):
+        self.agent_id = partition_key(agent_id)
+        self.path = Path(path or partition_path(agent_id))
+        self._lock = threading.RLock()
+        self.generation = None
+        self.watermark = None
+        self.synced_at = 0.0
+        self._empty()
+
+    def _empty(self):
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._vectors = None
+        self._scales = None
+        self._centroids = None
+        self._offsets = None
+        self._row_of = None                # pk -> base row, built on first remove
+        self._dead = set()                 # base rows removed or superseded by a delta row
+        self._delta = {}                   # pk -> unit float32 vector (rows not in the base files)
+        self._delta_matrix = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids) - len(self._dead) + len(self._delta)
+
+    @property
+    def delta_size(self) -> int:
+        return len(self._delta)
+
+    def open(self) -> bool:
+        """Map the current generation if it changed; returns True when (re)opened"""
+        try:
+            generation = (self.path / 'CURRENT').read_text().strip()
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            if generation == self.generation:
+                return False
+            target = self.path / generation
+            try:
+                meta = json.loads((target / 'meta.json').read_text())
+            except FileNotFoundError:  # replaced by a concurrent rebuild; the next sync maps the new one
+                return False
+            self._empty()
+            self._ids = np.load(target / 'ids.npy')
+            self._vectors = np.load(target / 'vectors.npy', mmap_mode='r')
+            if meta['dtype'] == 'int8':
+                self._scales = np.load(target / 'scales.npy')
+            if (target / 'centroids.npy').exists():
+                self._centroids = np.load(target / 'centroids.npy')
+                self._offsets = np.load(target / 'offsets.npy')
+            self.generation = generation
+            self.watermark = datetime.fromisoformat(meta['watermark']) if meta['watermark'] else None
+        logger.info(f"🧮 [VECTOR INDEX] Mapped {generation}: {meta['count']} rows, {meta['dtype']}, "
+                    f"{0 if self._centroids is None else len(self._centroids)} IVF lists")
+        return True
+
+    # ------------------------------------------------------------------ updates
+
+    def _kill(self, pk):
+        if self._row_of is None:
+            self._row_of = {pk: row for row, pk in enumerate(self._ids.tolist())}
+        row = self._row_of.get(pk)
+        if row is not None:
+            self._dead.add(row)
+
+    def add(self, pk, vector):
+        with self._lock:
+            self._kill(pk)
+            self._delta[pk] = normalize(vector)[0]
+            self._delta_matrix = None
+
+    def remove(self, pk):
+        with self._lock:
+            self._kill(pk)
+            if self._delta.pop(pk, None) is not None:
+                self._delta_matrix = None
+
+    # ------------------------------------------------------------------ search
+
+    def _score(self, start: int, stop: int, query: np.ndarray) -> np.ndarray:
+        if self._scales is None:
+            return self._vectors[start:stop] @ query
+        return np.concatenate([
+            (self._vectors[i:min(i + BLOCK_ROWS, stop)].astype(np.float32) @ query)
+            * self._scales[i:min(i + BLOCK_ROWS, stop)]
+            for i in range(start, stop, BLOCK_ROWS)
+        ]) if stop > start else np.zeros(0, dtype=np.float32)
+
+    def _base_candidates(self, query: np.ndarray, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) from the mapped files: every row, or the nprobe nearest IVF lists"""
+        if self._vectors is None or not len(self._ids):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if self._centroids is None:
+            return np.arange(len(self._ids)), self._score(0, len(self._ids), query)
+        nprobe = min(nprobe, len(self._centroids))
+        lists = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        spans = [(int(self._offsets[i]), int(self._offsets[i + 1])) for i in np.sort(lists)]
+        rows = np.concatenate([np.arange(start, stop) for start, stop in spans])
+        return rows, np.concatenate([self._score(start, stop, query) for start, stop in spans])
+
+    def search(self, vector, k: int = 10, nprobe: int = None) -> List[Tuple[int, float]]:
+        query = normalize(vector)[0]
+        nprobe = nprobe or _setting('KNOWLEDGE_VECTOR_NPROBE', 8)
+        with self._lock:
+            rows, scores = self._base_candidates(query, nprobe)
+            pks = self._ids[rows]
+            if self._dead:
+                alive = ~np.isin(rows, np.fromiter(self._dead, dtype=np.int64))
+                pks, scores = pks[alive], scores[alive]
+            if self._delta:
+                if self._delta_matrix is None:
+                    self._delta_matrix = (np.fromiter(self._delta, dtype=np.int64, count=len(self._delta)),
+                                          np.stack(list(self._delta.values())))
+                delta_ids, delta_vectors = self._delta_matrix
+                pks = np.concatenate([pks, delta_ids])
+                scores = np.concatenate([scores, delta_vectors @ query])
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            pks, scores = pks[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return list(zip(pks[order].tolist(), scores[order].astype(float).tolist()))
+
+    # ------------------------------------------------------------------ database
+
+    def sync(self):
+        """
+        Map a newer generation if one was written, then pick up embedded rows saved
+        since its watermark (delta) and rows deleted since (tombstones).
+        """
+        from .models import LearnedKnowledge
+
+        self.open()
+        embedded = LearnedKnowledge.objects.filter(embedding__isnull=False, **partition_filter(self.agent_id))
+        with self._lock:
+            # >=: a row saved elsewhere in the watermark's own tick must not be missed; add() is idempotent
+            changed = embedded.filter(updated_at__gte=self.watermark) if self.watermark else embedded
+            for pk, blob, updated_at in changed.values_list('pk', 'embedding', 'updated_at').iterator(chunk_size=2000):
+                self.add(pk, decode_embedding(blob))
+                if self.watermark is None or updated_at > self.watermark:
+                    self.watermark = updated_at
+            if embedded.count() != len(self):
+                live = set(embedded.values_list('pk', flat=True))
+                for pk in set(self._ids.tolist()) | set(self._delta):
+                    if pk not in live:
+                        self.remove(pk)
+            self.synced_at = time.monotonic()
+
+    def compact(self):
+        """Fold the delta into a new generation (past KNOWLEDGE_VECTOR_DELTA_MAX rows)"""
+        rebuild_vector_index(self.agent_id, self.path)
+        self.sync()
+
+
+def partition_path(agent_id=None) -> Path:
+    return Path(_setting('KNOWLEDGE_VECTOR_DIR', 'agent_knowledge_db/vectors')) / partition_name(agent_id)
+
+
+def rebuild_vector_index(agent_id=None, path=None, dtype: str = None) -> int:
+    """Write a new generation from one partition's embedded LearnedKnowledge rows; returns the row count"""
+    from .models import LearnedKnowledge
+
+    started = time.perf_counter()
+    ids, blobs, watermark = [], [], None
+    rows = (LearnedKnowledge.objects.filter(embedding__isnull=False, **partition_filter(agent_id))
+            .values_list('pk', 'embedding', 'updated_at'))
+    for pk, blob, updated_at in rows.iterator(chunk_size=2000):
+        ids.append(pk)
+        blobs.append(bytes(blob))
+        if watermark is None or updated_at > watermark:
+            watermark = updated_at
+    matrix = np.frombuffer(b''.join(blobs), dtype='<f4').reshape(len(blobs), -1) if blobs else np.zeros((0, 0))
+    generation = write_index(path or partition_path(agent_id), ids, matrix, dtype=dtype, watermark=watermark)
+    logger.info(f"🧮 [VECTOR INDEX] Wrote {partition_name(agent_id)}/{generation} ({len(ids)} rows) in "
+                f"{(time.perf_counter() - started) * 1000:.0f}ms")
+    return len(ids)
+
+
+def _map(agent_id) -> VectorIndex:
+    index = VectorIndex(agent_id=agent_id)
+    if not index.open():
+        rebuild_vector_index(agent_id, index.path)
+        index.open()
+    index.sync()
+    return index
+
+
+_registry = PartitionRegistry(_map, 'VECTOR INDEX')
+
+
+def get_vector_index(agent_id=None) -> VectorIndex:
+    """This process's mapping of one agent's partition (None: unassigned rows), built if missing"""
+    index = _registry.get(agent_id)
+    if index.delta_size > _setting('KNOWLEDGE_VECTOR_DELTA_MAX', 5000):
+        index.compact()
+    return index
+
+
+def loaded_partitions() -> dict:
+    """{agent id or None: VectorIndex} mapped in this process"""
+    return _registry.loaded()
+
+
+def index_vector(entry):
+    """post_save: add an embedded row to its partition if mapped here (no-op otherwise)"""
+    for key, index in _registry.loaded().items():
+        if key != partition_key(entry.agent_id):
+            index.remove(entry.pk)  # moved to another agent
+    index = _registry.peek(entry.agent_id)
+    if index is not None and entry.embedding:
+        index.add(entry.pk, decode_embedding(entry.embedding))
+
+
+def unindex_vector(entry):
+    index = _registry.peek(entry.agent_id)
+    if index is not None:
+        index.remove(entry.pk)
+
+
+def reset_vector_index():
+    """Drop every partition mapped in this process (tests); the next search maps CURRENT again"""
+    _registry.clear()
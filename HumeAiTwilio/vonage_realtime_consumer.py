@@ -13,14 +13,23 @@ import json
 import base64
 import asyncio
 import logging
-import websockets
-import audioop  # For audio format conversion
+from functools import partial
 from typing import Optional
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.utils import timezone
-from pydub import AudioSegment
-from pydub.effects import speedup
-import io
+from .audio import (
+    PlayoutScheduler, VoiceActivityDetector, get_dsp_executor,
+    vonage_inbound_pipeline, vonage_outbound_pipeline,
+)
+import numpy as np
+import time
+from .metrics import TurnLatencyTracker, ensure_loop_lag_monitor
+from .hume_pool import get_hume_session_pool, open_hume_socket
+from .response_cache import PhraseRecorder, ResponseCache
+from .conversation_buffer import get_conversation_buffer, mark_transcript_complete
+from .services.live_analytics import LiveCallAnalytics
+from .emotion_retention import get_emotion_retention
+from .caller_context import customer_number, get_caller_context, refresh_caller_context
 
 logger = logging.getLogger(__name__)
 
@@ -102,7 +111,7 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
             # If error, hard cut at 250 chars
             return text[:250] + '...' if len(text) > 250 else text
     
-    def convert_linear16_to_linear16(self, linear_b64: str) -> str:
+    async def convert_linear16_to_linear16(self, linear_b64: str) -> str:
         """Vonage sends linear16 PCM, no conversion needed! (Unlike Twilio µ-law)"""
         try:
             if not linear_b64:
@@ -116,20 +125,14 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                 logger.warning(f"[WARNING] Empty linear16 data after base64 decode")
                 return ""
             
-            # [BOOST] BOOST VONAGE VOLUME by 2.5x (150% louder for HumeAI detection)
-            # Vonage audio is typically lower than Twilio, so boost more
-            try:
-                linear_data = audioop.mul(linear_data, 2, 2.5)
-            except Exception as e:
-                logger.warning(f"[WARNING] Volume boost failed: {e}")
-            
+            # [BOOST] Per-call AGC (tracks caller level, soft-limits peaks) replaces the fixed 2.5x boost
             # Vonage uses 16kHz, HumeAI works best with 48kHz
-            # Upsample: 16kHz → 48kHz (3x upsampling)
+            # Upsample: 16kHz → 48kHz (3x upsampling, filter state kept across frames)
             try:
-                linear_data = audioop.ratecv(linear_data, 2, 1, 16000, 48000, None)[0]
+                linear_data = await self.inbound_pipeline.process(linear_data)
             except Exception as e:
-                logger.warning(f"[WARNING] Resampling failed: {e}")
-                # Continue with original if resampling fails
+                logger.warning(f"[WARNING] Inbound audio pipeline failed: {e}")
+                # Continue with original if processing fails
             
             # Encode back to base64
             linear_b64 = base64.b64encode(linear_data).decode('utf-8')
@@ -148,7 +151,7 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
             logger.error(f"[ERROR] Vonage audio conversion error: {e}")
             return ""
     
-    def convert_linear16_to_vonage_format(self, linear_b64: str) -> str:
+    async def convert_linear16_to_vonage_format(self, linear_b64: str) -> str:
         """Convert linear16 PCM from HumeAI back to Vonage format (16kHz linear16)"""
         try:
             # Decode base64 linear16 audio from HumeAI
@@ -157,7 +160,7 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
             # [BOOST] Downsample from 48kHz → 16kHz for Vonage
             # This ensures proper playback speed with studio-quality source
             try:
-                linear_data = audioop.ratecv(linear_data, 2, 1, 48000, 16000, None)[0]
+                linear_data = await self.outbound_pipeline.process(linear_data)
             except Exception as e:
                 logger.warning(f"[WARNING] Vonage resampling failed: {e}")
             
@@ -172,6 +175,154 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
             logger.error(f"[ERROR] Vonage audio conversion error: {e}")
             return linear_b64
 
+    async def get_audio_metrics(self) -> dict:
+        """Per-call audio stats (AGC gain trajectory, VAD, playout, barge-in)"""
+        inbound = getattr(self, 'inbound_pipeline', None)
+        stages = await inbound.metrics() if inbound else {}
+        playout = getattr(self, 'playout', None)
+        latencies = getattr(self, 'barge_in_latencies_ms', [])
+        return {
+            'agc': stages.get('agc'),
+            'playout': playout.metrics() if playout else None,
+            'vad': stages.get('vad'),
+            'barge_in': {
+                'count': len(latencies),
+                'latency_ms_p50': round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+                'latency_ms_max': round(max(latencies), 1) if latencies else None,
+            },
+        }
+
+    async def get_call_metrics(self) -> dict:
+        """Everything persisted to TwilioCall.call_metrics at the end of the call"""
+        latency = getattr(self, 'latency', None)
+        return {
+            'turn_latency': latency.summary() if latency else None,
+            'audio': await self.get_audio_metrics(),
+            'conversation_log': self.log_buffer.stats() if hasattr(self, 'log_buffer') else None,
+            'emotion_retention': self.emotion_retention.stats() if hasattr(self, 'emotion_retention') else None,
+        }
+
+    async def save_call_metrics(self):
+        """⏱️ Store turn latency percentiles + audio stats on the call (one UPDATE)"""
+        try:
+            from .models import TwilioCall
+            from channels.db import database_sync_to_async
+            
+            if not self.call:
+                return
+            metrics = await self.get_call_metrics()
+            await database_sync_to_async(
+                TwilioCall.objects.filter(pk=self.call.pk).update
+            )(call_metrics=metrics)
+            logger.info(f"🎚️ [AUDIO] {metrics['audio']}")
+            turn_latency = metrics['turn_latency'] or {}
+            total = turn_latency.get('stages', {}).get('turn_total', {})
+            logger.info(f"⏱️ [LATENCY] {turn_latency.get('turns', 0)} turns, "
+                        f"p50 {total.get('p50_ms')}ms / p95 {total.get('p95_ms')}ms")
+        except Exception as e:
+            logger.error(f"❌ [ERROR] Save call metrics error: {str(e)}")
+
+    async def mark_transcript_complete(self):
+        """📝 Last transcript + analytics writes are done: the post-call pipeline may finalise this call"""
+        try:
+            from channels.db import database_sync_to_async
+            
+            if self.call and hasattr(self, 'log_buffer'):
+                await database_sync_to_async(mark_transcript_complete)(self.call.call_sid)
+        except Exception as e:
+            logger.error(f"❌ [POST-CALL] Could not mark transcript complete: {e}")
+    
+    async def save_live_analytics(self, force: bool = False):
+        """📊 Snapshot the in-memory analytics to ConversationAnalytics every ANALYTICS_SNAPSHOT_SECONDS (and at call end)"""
+        try:
+            from django.conf import settings
+            from channels.db import database_sync_to_async
+            
+            if not self.call or not hasattr(self, 'live_analytics'):
+                return
+            now = time.monotonic()
+            if not force and now - self.analytics_saved_at < getattr(settings, 'ANALYTICS_SNAPSHOT_SECONDS', 10.0):
+                return
+            self.analytics_saved_at = now
+            snapshot = await database_sync_to_async(self.live_analytics.persist)(self.call)
+            if snapshot:
+                logger.info(f"📊 Live analytics: sentiment {snapshot['avg_sentiment']} ({snapshot['sentiment_trend']}), "
+                            f"emotion {snapshot['dominant_customer_emotion'] or '-'}, outcome {snapshot['outcome']}")
+        except Exception as e:
+            logger.error(f"❌ [ERROR] Save live analytics error: {str(e)}")
+
+    async def load_intelligent_service(self):
+        """🧠 Intelligent response service (CustomerProfile get_or_create), started next to the HumeAI handshake"""
+        try:
+            from channels.db import database_sync_to_async
+            from .intelligent_response_service import IntelligentResponseService
+
+            self.intelligent_service = await database_sync_to_async(IntelligentResponseService)(call=self.call)
+            logger.info(f"🧠 [INTELLIGENCE] Intelligent service initialized")
+        except Exception as e:
+            logger.error(f"❌ [INTELLIGENCE] Intelligent service init error: {e}")
+
+    async def load_caller_context(self):
+        """📇 Returning-customer context from cache or one CallerContext lookup (unique phone_number index)"""
+        try:
+            from channels.db import database_sync_to_async
+
+            phone = customer_number(self.call)
+            started = time.perf_counter()
+            self.caller_context = await database_sync_to_async(get_caller_context)(phone)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if self.caller_context:
+                logger.info(f"📞 [CUSTOMER HISTORY] {self.caller_context['call_count']} previous calls from {phone} "
+                            f"({elapsed_ms:.1f}ms)")
+            else:
+                logger.info(f"✨ [NEW CUSTOMER] No previous calls from {phone} ({elapsed_ms:.1f}ms)")
+        except Exception as e:
+            logger.error(f"❌ [HISTORY] Error fetching caller context: {e}")
+            self.caller_context = None
+
+    async def send_caller_context(self):
+        """📝 Hand the returning-customer summary to EVI once both the session and the context are ready"""
+        try:
+            if not self.caller_context or not self.hume_connected:
+                return
+            text = self.caller_context['summary']
+            if self.greeting_context:
+                # session_settings context replaces the previous one - keep the "already greeted" note
+                text += "\n" + self.greeting_context
+            await self.hume_ws.send(json.dumps({
+                "type": "session_settings",
+                "context": {"text": text, "type": "persistent"}
+            }))
+            logger.info(f"📝 [CONTEXT] Customer history sent to HumeAI")
+        except Exception as e:
+            logger.error(f"❌ [CONTEXT] Send caller context error: {e}")
+
+    async def save_caller_context(self):
+        """📇 Rebuild this number's CallerContext once the call is marked completed"""
+        try:
+            from channels.db import database_sync_to_async
+
+            if not self.call or self.caller_context_saved:
+                return
+            self.caller_context_saved = True
+            await database_sync_to_async(refresh_caller_context)(self.call)
+        except Exception as e:
+            logger.error(f"❌ [CONTEXT] Save caller context error: {e}")
+
+    async def apply_agent_speed(self, speed) -> None:
+        """Rebuild the outbound stage with the agent's WSOLA speaking rate (before agent audio flows)"""
+        try:
+            speed = float(speed or 1.0)
+            if speed == 1.0:
+                return
+            self.agent_speed = speed
+            previous = self.outbound_pipeline
+            self.outbound_pipeline = self.dsp.session(partial(vonage_outbound_pipeline, speed=speed))
+            await previous.close()
+            logger.info(f"🚀 [SPEED] Agent speaking rate: {speed}x (streaming WSOLA)")
+        except Exception as e:
+            logger.error(f"❌ [ERROR] Speed adjustment setup failed: {e}")
+
     async def connect(self):
         """Accept WebSocket connection from Vonage"""
         try:
@@ -183,6 +334,30 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
             self.hume_ws = None
             self.hume_connected = False
             self.intelligent_service = None  # 🔥 NEW: Intelligent response service
+            self.caller_context = None        # 📇 returning-customer context (CallerContext)
+            self.caller_context_saved = False
+            self.greeting_context = None      # "already greeted" note sent to EVI for a cached greeting
+            
+            # 🎚️ Per-call VAD + AGC + streaming resamplers (state carried across 20ms frames)
+            # Each stage runs where AUDIO_DSP_MODE says: inline, thread pool or DSP worker process
+            self.dsp = get_dsp_executor()
+            self.inbound_pipeline = self.dsp.session(vonage_inbound_pipeline)    # Vonage → HumeAI
+            self.outbound_pipeline = self.dsp.session(vonage_outbound_pipeline)  # HumeAI → Vonage
+            ensure_loop_lag_monitor()  # ⏱️ how long frames wait behind work on this loop
+            get_hume_session_pool().bind_loop()  # 🔥 prewarms from initiate_call land on this loop
+            
+            # ⏱️ Paced playout: 20ms linear16 frames (640 bytes @ 16kHz) on a real-time clock
+            self.playout = PlayoutScheduler(self.send_vonage_frame, frame_bytes=640, name='vonage-playout')
+            self.barge_in_active = False      # caller is talking over the agent; drop agent audio
+            self.barge_in_latencies_ms = []   # caller speech start → agent silent
+            self.latency = TurnLatencyTracker('vonage')  # ⏱️ caller speech end → first agent byte
+            self.latency.mark_stream_start()  # ⏱️ callee is listening: time to first greeting
+            self.agent_speed = 1.0
+            self.phrase_recorder = None       # 🗃️ records greeting / common phrase clips for the audio cache
+            self.log_buffer = get_conversation_buffer()  # 💾 write-behind ConversationLog rows (bulk_create)
+            self.emotion_retention = get_emotion_retention()  # 😊 one row per span of similar emotion frames
+            self.live_analytics = LiveCallAnalytics()    # 📊 streaming ConversationAnalytics for this call
+            self.analytics_saved_at = time.monotonic()
             
             logger.info("[CONNECT] Vonage WebSocket connection established")
             
@@ -219,7 +394,6 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
             # Find call in database
             from channels.db import database_sync_to_async
             from .models import TwilioCall
-            from .intelligent_response_service import IntelligentResponseService
             
             @database_sync_to_async
             def get_call():
@@ -233,52 +407,11 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
             if self.call:
                 logger.info(f"[OK] Found Vonage call in database: {self.call.id}")
                 
-                # 🔥 NEW: Initialize Intelligent Response Service
-                @database_sync_to_async
-                def init_intelligent_service():
-                    return IntelligentResponseService(call=self.call)
-                
-                self.intelligent_service = await init_intelligent_service()
-                logger.info(f"🧠 [INTELLIGENCE] Intelligent service initialized")
-                
-                # 📞 CUSTOMER HISTORY: Check previous calls by phone number
-                @database_sync_to_async
-                def get_customer_history():
-                    phone = self.call.caller_number
-                    if not phone:
-                        return None, 0
-                    
-                    # Get last 3 completed calls from this number (excluding current)
-                    previous_calls = TwilioCall.objects.filter(
-                        caller_number=phone,
-                        status='completed'
-                    ).exclude(
-                        id=self.call.id
-                    ).order_by('-ended_at')[:3]
-                    
-                    return list(previous_calls), previous_calls.count()
-                
-                try:
-                    history_calls, history_count = await get_customer_history()
-                    if history_count > 0:
-                        logger.info(f"📞 [CUSTOMER HISTORY] Found {history_count} previous calls from {self.call.caller_number}")
-                        
-                        # Create context message for agent
-                        history_msg = f"🔄 RETURNING CUSTOMER - {history_count} previous calls:\n"
-                        for idx, prev_call in enumerate(history_calls, 1):
-                            duration_str = f"{prev_call.duration}s" if prev_call.duration else "N/A"
-                            date_str = prev_call.ended_at.strftime("%Y-%m-%d") if prev_call.ended_at else "Unknown"
-                            history_msg += f"  {idx}. {date_str} - Duration: {duration_str}\n"
-                        
-                        # Store in call for agent context
-                        self.customer_history = history_msg
-                        logger.info(f"📝 [CONTEXT] Customer history prepared for agent")
-                    else:
-                        logger.info(f"✨ [NEW CUSTOMER] No previous calls from {self.call.caller_number}")
-                        self.customer_history = None
-                except Exception as e:
-                    logger.error(f"❌ [HISTORY] Error fetching customer history: {e}")
-                    self.customer_history = None
+                # 📇 Profile get_or_create + returning-customer context load alongside the HumeAI handshake
+                setup_tasks = [
+                    asyncio.create_task(self.load_intelligent_service()),
+                    asyncio.create_task(self.load_caller_context()),
+                ]
                 
                 # Check if existing customer
                 if self.call.customer_profile and self.call.customer_profile.full_name:
@@ -298,6 +431,7 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                     logger.info(f"   Agent (ForeignKey): {agent_name}")
                     if agent_config_id:
                         logger.info(f"   HumeAI Config (agent): {agent_config_id}")
+                    await self.apply_agent_speed(self.call.agent.speech_speed)
                 
                 # Check call's hume_config_id field (set by call_initiation.py)
                 if self.call.hume_config_id:
@@ -321,6 +455,9 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                     await self.initialize_hume_session()
                 else:
                     logger.warning(f"[WARNING] No agent assigned to call: {self.call_uuid}")
+                
+                await asyncio.gather(*setup_tasks)
+                await self.send_caller_context()
             else:
                 logger.warning(f"[WARNING] Vonage call not found in database: {self.call_uuid}")
                 logger.warning(f"   UUID: {self.call_uuid}")
@@ -336,6 +473,22 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
             logger.info(f"   Close code: {close_code}")
             logger.info(f"   Call UUID: {self.call_uuid}")
             
+            if hasattr(self, 'playout'):
+                await self.playout.close()
+            
+            # 💾 Transcript + emotion rows must be in the DB before post-call analysis
+            if hasattr(self, 'log_buffer'):
+                await self.store_emotion_rows(self.emotion_retention.flush())
+                await self.log_buffer.close()
+            await self.save_live_analytics(force=True)
+            await self.mark_transcript_complete()
+            
+            # ⏱️ Per-call turn latency percentiles + audio stats → TwilioCall.call_metrics
+            await self.save_call_metrics()
+            if hasattr(self, 'inbound_pipeline'):
+                await self.inbound_pipeline.close()
+                await self.outbound_pipeline.close()
+            
             # ✅ STEP 1: Close HumeAI connection if still open
             if self.hume_ws and not self.hume_ws.closed:
                 await self.hume_ws.close()
@@ -375,21 +528,9 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                     logger.info(f"✅ [DB] Call {self.call_uuid} marked as 'completed'")
                 else:
                     logger.info(f"ℹ️  [DB] Call {self.call_uuid} already marked as completed")
+                await self.save_caller_context()
                 
-                # 🎓 STEP 3: Learn from call and improve agent
-                @database_sync_to_async
-                def learn_from_call():
-                    from .call_learning_service import call_learning_service
-                    return call_learning_service.analyze_and_improve(self.call)
-                
-                try:
-                    learned = await learn_from_call()
-                    if learned:
-                        logger.info(f"🎓 [LEARNING] Agent improved from call {self.call_uuid}")
-                    else:
-                        logger.info(f"ℹ️  [LEARNING] No learnings extracted from call")
-                except Exception as e:
-                    logger.error(f"❌ [LEARNING] Learning error: {e}")
+                # 🎓 Learning from the call runs in the post-call pipeline (post_call.py)
             
             logger.info(f"✅ [CLEANUP] All connections closed for call {self.call_uuid}")
         
@@ -523,16 +664,20 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                 logger.info(f"   Config ID: {HUME_CONFIG_ID}")
                 logger.info(f"   Call UUID: {self.call_uuid}")
                 
-                # Connect to HumeAI with correct headers
-                self.hume_ws = await asyncio.wait_for(
-                    websockets.connect(
-                        hume_url,
-                        extra_headers={"X-Hume-Api-Key": HUME_API_KEY},
-                        ping_interval=20,
-                        ping_timeout=20
-                    ),
-                    timeout=10.0
-                )
+                # 🗃️ Cached greeting plays right away while the HumeAI session comes up
+                greeting_text = self._get_greeting_text()
+                voice = ResponseCache.voice_key(HUME_CONFIG_ID, self.agent_speed)
+                greeting_cached = self.play_cached_greeting(greeting_text, voice)
+                self.phrase_recorder = PhraseRecorder(voice, 'linear16_16k', phrases=(greeting_text,))
+                
+                # 🔥 Warm session prewarmed by initiate_call (skips TLS + WebSocket handshake)
+                self.hume_ws = await get_hume_session_pool().acquire(HUME_CONFIG_ID)
+                self.latency.mark_hume_session(pool_hit=self.hume_ws is not None)
+                if self.hume_ws is None:
+                    # Connect to HumeAI with correct headers
+                    self.hume_ws = await asyncio.wait_for(open_hume_socket(HUME_CONFIG_ID, HUME_API_KEY), timeout=10.0)
+                else:
+                    logger.info(f"🔥 [HUME] Using pre-warmed session for {HUME_CONFIG_ID}")
                 
                 self.hume_connected = True
                 logger.info(f"✅ [HUME] CONNECTED to HumeAI EVI successfully!")
@@ -603,17 +748,28 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                 logger.info(f"   🎯 Cloud Config ID: {HUME_CONFIG_ID}")
                 logger.info(f"   📝 Persona from cloud (runtime override NOT supported)")
                 
-                # 🔥 FORCE GREETING: Send greeting as assistant_input to trigger speech
-                # HumeAI EVI needs explicit trigger to start speaking
-                greeting_text = self._get_greeting_text()
-                greeting_message = {
-                    "type": "assistant_input",
-                    "text": greeting_text
-                }
-                
-                await self.hume_ws.send(json.dumps(greeting_message))
-                logger.info(f"🎤 [GREETING] Sent greeting as assistant_input: '{greeting_text}'")
-                logger.info(f"   ✅ Agent will speak first now!")
+                if greeting_cached:
+                    # 🗃️ Caller already heard the greeting from cache - tell HumeAI instead of re-speaking it
+                    self.greeting_context = f"You have already greeted the caller by saying: \"{greeting_text}\". Do not greet them again."
+                    await self.hume_ws.send(json.dumps({
+                        "type": "session_settings",
+                        "context": {
+                            "text": self.greeting_context,
+                            "type": "temporary"
+                        }
+                    }))
+                    logger.info(f"🗃️ [GREETING] Played from cache, HumeAI told not to repeat it")
+                else:
+                    # 🔥 FORCE GREETING: Send greeting as assistant_input to trigger speech
+                    # HumeAI EVI needs explicit trigger to start speaking
+                    greeting_message = {
+                        "type": "assistant_input",
+                        "text": greeting_text
+                    }
+                    
+                    await self.hume_ws.send(json.dumps(greeting_message))
+                    logger.info(f"🎤 [GREETING] Sent greeting as assistant_input: '{greeting_text}'")
+                    logger.info(f"   ✅ Agent will speak first now!")
                 
                 # Start listening for HumeAI responses
                 asyncio.create_task(self.listen_hume_responses())
@@ -639,7 +795,7 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                 logger.debug(f"[AUDIO] Received audio chunk for call: {self.call_uuid}")
                 
                 # Convert audio format
-                converted_audio = self.convert_linear16_to_linear16(payload)
+                converted_audio = await self.convert_linear16_to_linear16(payload)
                 
                 # ✅ FIXED: Removed empty text message - audio-only mode for faster processing
                 # Audio is sent separately via handle_binary_audio()
@@ -667,19 +823,18 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                 # Convert audio format if needed
                 # Vonage sends linear16, HumeAI expects linear16 (but at different sample rate)
                 
-                # 🔥 BOOST VOLUME 2x (200%) - Balanced for clear audio without clipping
+                # 🔊 VAD → AGC (per-call gain + soft limiter, replaces fixed 2x boost)
+                # → resample 16kHz → 48kHz (stateful, no clicks at packet boundaries)
+                received_at = asyncio.get_running_loop().time()
                 try:
-                    audio_data = audioop.mul(bytes_data, 2, 2.0)  # 2x boost (reduced from 4x)
-                    logger.debug(f"🔊 Volume boosted 2x (original: {len(bytes_data)} bytes)")
-                except:
+                    audio_data = await self.inbound_pipeline.process(bytes_data)
+                except Exception as e:
                     audio_data = bytes_data
-                    logger.warning(f"⚠️ Volume boost failed, using original audio")
+                    logger.warning(f"⚠️ Inbound audio pipeline failed: {e}")
                 
-                # Resample: 16kHz → 48kHz
-                try:
-                    audio_data = audioop.ratecv(audio_data, 2, 1, 16000, 48000, None)[0]
-                except:
-                    pass
+                # 🗣️ Caller started/stopped talking → barge-in handling
+                if self.inbound_pipeline.last_event:
+                    await self.handle_vad_event(self.inbound_pipeline.last_event, received_at)
                 
                 # Send to HumeAI
                 if self.hume_ws:
@@ -731,10 +886,23 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                         await self.capture_emotions(response)
                     
                     elif event_type == 'audio_output':
-                        logger.info(f"🎵 [AGENT] AI sending audio response #{response_count}")
-                        await self.send_audio_to_vonage(response)
+                        if self.barge_in_active:
+                            # Caller is talking over the agent - don't queue the rest of this reply
+                            logger.debug(f"🔇 [AGENT] Dropping audio during barge-in")
+                        else:
+                            self.latency.mark_first_audio()
+                            logger.info(f"🎵 [AGENT] AI sending audio response #{response_count}")
+                            await self.send_audio_to_vonage(response)
+                    
+                    elif event_type == 'user_interruption':
+                        # HumeAI detected the interruption itself - stop whatever is still queued
+                        if self.playout.is_playing:
+                            dropped = await self.playout.flush()
+                            logger.info(f"✋ [HUME] user_interruption: dropped {dropped:.0f}ms of agent audio")
                     
                     elif event_type == 'user_message':
+                        self.latency.mark_transcript()
+                        
                         # 🎯 HUMAN-LIKE: Extract customer speech
                         msg = response.get('message', {})
                         text = msg.get('content', msg.get('text', '')) if isinstance(msg, dict) else str(msg)
@@ -743,6 +911,9 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                         if not text and isinstance(response, dict):
                             text = response.get('text', response.get('content', ''))
                         
+                        # 😊 Caller utterance finished: close its emotion span (utterance policy)
+                        await self.store_emotion_rows(self.emotion_retention.end_utterance())
+                        
                         if text and text.strip():
                             logger.info(f"💬 [CUSTOMER] \"{text[:100]}...\"" if len(text) > 100 else f"💬 [CUSTOMER] \"{text}\"")
                             await self.save_conversation_message('user', text.strip())
@@ -759,6 +930,9 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                             text = response.get('text', response.get('content', ''))
                         
                         if text and text.strip():
+                            if self.phrase_recorder:
+                                self.phrase_recorder.on_text(text)
+                            
                             # 🔥 SAFETY NET: Trim response if too wordy (fallback if HumeAI ignores concise rule)
                             original_text = text.strip()
                             trimmed_text = self._trim_wordy_response(original_text)
@@ -772,6 +946,11 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                         else:
                             logger.debug(f"⚠️  [AGENT] Empty response received")
                     
+                    elif event_type == 'assistant_end':
+                        # 🗃️ Turn complete: cache it if it was the greeting / a common phrase
+                        if self.phrase_recorder:
+                            self.phrase_recorder.finish()
+                    
                     else:
                         logger.debug(f"📨 [HUME] Event: {event_type}")
                 
@@ -795,41 +974,41 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
             
             emotions = response.get('emotions', {})
             
-            from channels.db import database_sync_to_async
-            from .models import ConversationLog
-            from .services.analytics_processor import AnalyticsProcessor
-            
-            @database_sync_to_async
-            def save_emotion_log():
-                return ConversationLog.objects.create(
+            # 😊 Retention policy decides which frames become rows (EMOTION_RETENTION_POLICY)
+            rows = self.emotion_retention.offer(emotions)
+            await self.store_emotion_rows(rows, response)
+        
+        except Exception as e:
+            logger.error(f"[ERROR] Capture emotions error: {str(e)}", exc_info=True)
+
+    async def store_emotion_rows(self, rows, response: dict = None):
+        """Queue closed emotion spans as ConversationLog rows and fold them into live analytics"""
+        try:
+            if not self.call or not rows:
+                return
+            response = response or {}
+            for row in rows:
+                metadata = row.pop('metadata')
+                if self.emotion_retention.policy == 'all' and response:
+                    metadata['raw_response'] = response
+                # 💾 Queued; written with the next ConversationLog batch
+                log = self.log_buffer.add(
                     call=self.call,
-                    emotion_scores=emotions,
+                    role='system',
                     sentiment=response.get('sentiment', 'neutral'),
                     confidence=response.get('confidence', 0.0),
-                    raw_response=response
+                    metadata=metadata,
+                    **row  # float16 vector + top-k summary
                 )
-            
-            log = await save_emotion_log()
-            logger.info(f"[OK] Emotions saved for Vonage call {self.call_uuid}: {emotions}")
-            
-            # 📊 Update analytics in real-time with Hume AI emotion scores
-            @database_sync_to_async
-            def update_analytics():
-                try:
-                    AnalyticsProcessor.update_analytics_on_new_message(
-                        call_sid=str(self.call.call_sid),
-                        message="emotion_update",
-                        role="system",
-                        emotion_scores=emotions
-                    )
-                    logger.info(f"📊 Real-time analytics updated for call {self.call_uuid}")
-                except Exception as e:
-                    logger.error(f"Analytics update failed: {e}")
-            
-            await update_analytics()
+                logger.info(f"[OK] Emotions queued for Vonage call {self.call_uuid}: "
+                            f"{row['emotion_top']} ({metadata['emotion_frames']} frames)")
+                
+                # 📊 Real-time analytics with Hume AI emotion scores (in memory, periodic snapshot)
+                self.live_analytics.add_log(log)
+            await self.save_live_analytics()
         
         except Exception as e:
-            logger.error(f"[ERROR] Capture emotions error: {str(e)}", exc_info=True)
+            logger.error(f"[ERROR] Store emotion rows error: {str(e)}", exc_info=True)
 
     async def save_conversation_message(self, role: str, text: str, sentiment: str = '', confidence: float = 0.0, metadata: dict = None):
         """💾 Save conversation message (user/assistant) to ConversationLog database + Learn customer info"""
@@ -838,39 +1017,21 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                 return None
             
             from channels.db import database_sync_to_async
-            from .models import ConversationLog
-            from .services.analytics_processor import AnalyticsProcessor
-            
-            @database_sync_to_async
-            def _save_message():
-                return ConversationLog.objects.create(
-                    call=self.call,
-                    role=role,
-                    message=text,
-                    sentiment=sentiment or '',
-                    confidence=confidence,
-                    metadata=metadata or {}
-                )
-            
-            log = await _save_message()
-            logger.info(f"💾 [DB] Saved {role} message to ConversationLog (call: {self.call_uuid})")
             
-            # 📊 Update analytics in real-time when message includes emotions
-            if log and hasattr(log, 'emotion_scores') and log.emotion_scores:
-                @database_sync_to_async
-                def update_analytics():
-                    try:
-                        AnalyticsProcessor.update_analytics_on_new_message(
-                            call_sid=str(self.call.call_sid),
-                            message=text,
-                            role=role,
-                            emotion_scores=log.emotion_scores
-                        )
-                        logger.info(f"📊 Analytics updated for message in call {self.call_uuid}")
-                    except Exception as e:
-                        logger.error(f"Analytics update failed: {e}")
-                
-                await update_analytics()
+            # 💾 Write-behind: bulk_create on size / age, flushed at handle_stop / disconnect
+            log = self.log_buffer.add(
+                call=self.call,
+                role=role,
+                message=text,
+                sentiment=sentiment or '',
+                confidence=confidence,
+                metadata=metadata or {}
+            )
+            logger.info(f"💾 [DB] Queued {role} message for ConversationLog (call: {self.call_uuid})")
+            
+            # 📊 Outcome / objections follow the transcript
+            self.live_analytics.add_log(log)
+            await self.save_live_analytics()
             
             # 🔥 NEW: Learn customer information from messages
             if self.intelligent_service and role == 'user':
@@ -899,20 +1060,78 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                 
                 # Convert from HumeAI format (48kHz linear16) to Vonage format (16kHz linear16)
                 try:
-                    # Downsample: 48kHz → 16kHz
-                    audio_bytes = audioop.ratecv(audio_bytes, 2, 1, 48000, 16000, None)[0]
+                    # Downsample: 48kHz → 16kHz (stateful across Hume audio chunks)
+                    audio_bytes = await self.outbound_pipeline.process(audio_bytes)
                 except Exception as e:
                     logger.warning(f"⚠️  Audio resampling failed: {e}")
                 
-                # Send RAW BINARY audio to Vonage (not JSON!)
-                await self.send(bytes_data=audio_bytes)
-                logger.info(f"📞 [AGENT] Audio sent to customer ({len(audio_bytes)} bytes binary)")
+                # Queue RAW BINARY audio for paced 20ms playout to Vonage (not JSON!)
+                self.playout.enqueue(audio_bytes)
+                if self.phrase_recorder:
+                    self.phrase_recorder.on_audio(audio_bytes)
+                logger.info(f"📞 [AGENT] Audio queued for customer ({len(audio_bytes)} bytes, {self.playout.queued_ms:.0f}ms queued)")
             else:
                 logger.warning(f"⚠️  No audio data in response: {list(response.keys())}")
         
         except Exception as e:
             logger.error(f"❌ [ERROR] Send audio to Vonage error: {str(e)}", exc_info=True)
 
+    def play_cached_greeting(self, text: str, voice: str) -> bool:
+        """Queue the cached 16kHz greeting clip for this voice (no HumeAI round-trip)"""
+        try:
+            clip = ResponseCache.get_cached_audio(text, voice, 'linear16_16k')
+            if not clip:
+                return False
+            self.playout.enqueue(clip)
+            logger.info(f"🗃️ [GREETING] Playing cached greeting ({len(clip) / 32000:.1f}s): {text}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ [ERROR] Cached greeting error: {str(e)}")
+            return False
+
+    async def handle_vad_event(self, event: str, received_at: float):
+        """Local VAD onset while the agent is talking → barge-in; offset → let HumeAI answer"""
+        try:
+            if event == 'onset':
+                if self.playout.is_playing:
+                    await self.interrupt_agent(received_at)
+            elif event == 'offset':
+                # Speech really ended one hangover before the offset fired
+                self.latency.mark_speech_end(time.monotonic() - VoiceActivityDetector.HANGOVER_MS / 1000.0)
+                if self.barge_in_active:
+                    self.barge_in_active = False
+                    if self.hume_ws and not self.hume_ws.closed:
+                        await self.hume_ws.send(json.dumps({"type": "resume_assistant_message"}))
+                    logger.info(f"🗣️ [BARGE-IN] Caller finished speaking - HumeAI resumed")
+        except Exception as e:
+            logger.error(f"❌ [ERROR] VAD event error: {str(e)}")
+
+    async def interrupt_agent(self, received_at: float):
+        """Silence the agent now: drop queued audio and pause HumeAI"""
+        loop = asyncio.get_running_loop()
+        speech_started = received_at - VoiceActivityDetector.MIN_SPEECH_MS / 1000.0
+        self.barge_in_active = True
+        self.latency.cancel_turn()
+        if self.phrase_recorder:
+            self.phrase_recorder.cancel()
+        
+        # Vonage has no 'clear' - audio already sent (≤ playout lead) still plays out
+        residual_ms = self.playout.buffered_ms
+        dropped = await self.playout.flush()
+        await self.outbound_pipeline.reset()
+        latency_ms = (loop.time() - speech_started) * 1000.0 + residual_ms
+        self.barge_in_latencies_ms.append(latency_ms)
+        
+        if self.hume_ws and not self.hume_ws.closed:
+            await self.hume_ws.send(json.dumps({"type": "pause_assistant_message"}))
+        
+        logger.info(f"✋ [BARGE-IN] Dropped {dropped:.0f}ms of agent audio, agent silent {latency_ms:.0f}ms after caller speech")
+
+    async def send_vonage_frame(self, frame: bytes):
+        """Send one paced linear16 frame to Vonage"""
+        self.latency.mark_first_send()
+        await self.send(bytes_data=frame)
+
     async def send_raw_audio_to_vonage(self, audio_bytes):
         """Send raw binary audio response to Vonage"""
         try:
@@ -939,6 +1158,15 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
             logger.info(f"🛑 [STOP] Vonage stream stopped for call: {self.call_uuid}")
             logger.info(f"   Reason: Call completed/disconnected")
             
+            # Nothing left to play to a closed stream
+            await self.playout.close()
+            
+            # 💾 Flush buffered ConversationLog rows before the call is marked completed
+            await self.store_emotion_rows(self.emotion_retention.flush())
+            await self.log_buffer.close()
+            await self.save_live_analytics(force=True)
+            await self.mark_transcript_complete()
+            
             # ✅ STEP 1: Close HumeAI connection immediately
             if self.hume_ws and not self.hume_ws.closed:
                 await self.hume_ws.close()
@@ -973,6 +1201,7 @@ class VonageRealTimeConsumer(AsyncWebsocketConsumer):
                 duration = await update_call_status()
                 logger.info(f"✅ [DB] Call {self.call_uuid} marked as 'completed'")
                 logger.info(f"   Duration: {duration} seconds")
+                await self.save_caller_context()
             
             # ✅ STEP 3: Close Vonage WebSocket connection
             await self.close()
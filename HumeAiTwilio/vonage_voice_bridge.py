@@ -330,18 +330,8 @@ def vonage_event_callback(request):
                 call.ended_at = timezone.now()
                 if call.started_at:
                     call.duration = int((call.ended_at - call.started_at).total_seconds())
-                
-                # 🔥 AUTO-GENERATE ANALYTICS when call completes
-                from .services.analytics_processor import AnalyticsProcessor
-                import threading
-                thread = threading.Thread(
-                    target=AnalyticsProcessor.process_completed_call,
-                    args=(uuid,)
-                )
-                thread.daemon = True
-                thread.start()
-                logger.info(f"🚀 Started analytics processing for call {uuid}")
             
+            # 🔥 Post-call analytics are queued by the call_status_changed signal on save
             call.save()
             logger.info(f"✅ Updated call {uuid} status to {status}")
             
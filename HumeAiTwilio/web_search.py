@@ -0,0 +1,284 @@
+"""
+Web search fallback for IntelligentResponseService (DuckDuckGo Instant Answer API)
+
+web_search used to do a blocking requests.get with a 5 s timeout on the call
+path, with a new connection per question and nothing remembered, so every
+question the API cannot answer paid the full round-trip again. One
+WebSearchClient per process (get_web_search_client) replaces that:
+
+- requests run on the client's own event loop thread over one aiohttp session,
+  so connections (TLS) are reused; sync callers block on a future for at most
+  the budget, async callers can await it (asearch) without blocking their loop
+- answers are cached for WEB_SEARCH_CACHE_TTL and "no answer" results for
+  WEB_SEARCH_NEGATIVE_TTL, keyed by normalise_phrase(query); failed requests
+  are not cached
+- identical queries already in flight share one request
+- a token bucket (WEB_SEARCH_RATE per second, bursts of WEB_SEARCH_BURST)
+  caps requests from the whole process; a query that would wait longer than
+  the budget for a token is dropped
+- a caller waits at most WEB_SEARCH_BUDGET_MS and then gets None ("no answer")
+  in time for the turn; the request carries on (up to WEB_SEARCH_TIMEOUT) and
+  its result is cached for the next time the question comes up
+
+Settings:
+    WEB_SEARCH_URL              Instant Answer endpoint
+    WEB_SEARCH_BUDGET_MS        longest a caller waits (default 1500)
+    WEB_SEARCH_TIMEOUT          request timeout in seconds (default 5)
+    WEB_SEARCH_CACHE_TTL        seconds an answer is cached (default 86400)
+    WEB_SEARCH_NEGATIVE_TTL     seconds "no answer" is cached (default 3600)
+    WEB_SEARCH_CACHE_SIZE       cached queries (default 5000)
+    WEB_SEARCH_RATE             requests per second, per process (default 5)
+    WEB_SEARCH_BURST            token bucket size (default 10)
+    WEB_SEARCH_MAX_CONNECTIONS  pooled connections (default 8)
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+import aiohttp
+from django.conf import settings
+
+from .response_cache import normalise_phrase
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL = 'https://api.duckduckgo.com/'
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def parse_instant_answer(data: dict) -> Optional[str]:
+    """Abstract (best answer), else the first related topic's text, else None"""
+    if data.get('Abstract'):
+        return data['Abstract']
+    topics = data.get('RelatedTopics') or []
+    if topics and isinstance(topics[0], dict) and topics[0].get('Text'):
+        return topics[0]['Text']
+    return None
+
+
+class TokenBucket:
+    """``rate`` tokens per second up to ``burst``; reserve() books the next free token"""
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Seconds until the booked token is usable, or None (nothing booked) if over max_wait"""
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+        if wait > max_wait:
+            return None
+        self._tokens -= 1
+        return wait
+
+
+class WebSearchClient:
+    """Cached, coalesced, rate-limited Instant Answer lookups on a private event loop; thread-safe"""
+
+    def __init__(self, url: str = None, budget_ms: float = None, timeout: float = None, ttl: float = None,
+                 negative_ttl: float = None, cache_size: int = None, rate: float = None, burst: int = None,
+                 max_connections: int = None, clock=time.monotonic):
+        self.url = url or _setting('WEB_SEARCH_URL', DEFAULT_URL)
+        self.budget = (_setting('WEB_SEARCH_BUDGET_MS', 1500) if budget_ms is None else budget_ms) / 1000.0
+        self.timeout = timeout or _setting('WEB_SEARCH_TIMEOUT', 5.0)
+        self.ttl = _setting('WEB_SEARCH_CACHE_TTL', 86400) if ttl is None else ttl
+        self.negative_ttl = _setting('WEB_SEARCH_NEGATIVE_TTL', 3600) if negative_ttl is None else negative_ttl
+        self.cache_size = cache_size or _setting('WEB_SEARCH_CACHE_SIZE', 5000)
+        self.max_connections = max_connections or _setting('WEB_SEARCH_MAX_CONNECTIONS', 8)
+        self.clock = clock
+        self._limiter = TokenBucket(rate or _setting('WEB_SEARCH_RATE', 5.0),
+                                    burst or _setting('WEB_SEARCH_BURST', 10), clock)
+
+        # All of the below is only touched on the client loop
+        self._cache = OrderedDict()   # key -> (answer or None, expires_at)
+        self._inflight = {}           # key -> Task of the request for that query
+        self._session = None
+        self.stats = Counter()
+
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # ------------------------------------------------------------------ loop
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None or self._loop.is_closed():
+                started = threading.Event()
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run_loop, args=(self._loop, started),
+                                                name='web-search', daemon=True)
+                self._thread.start()
+                started.wait()
+            return self._loop
+
+    @staticmethod
+    def _run_loop(loop, started):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(started.set)
+        loop.run_forever()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    # ------------------------------------------------------------------ lookup (client loop)
+
+    def _cached(self, key: str):
+        """(True, answer-or-None) for a live cache entry, else (False, None)"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return False, None
+        answer, expires_at = entry
+        if expires_at <= self.clock():
+            del self._cache[key]
+            return False, None
+        self._cache.move_to_end(key)
+        return True, answer
+
+    def _remember(self, key: str, answer: Optional[str]):
+        ttl = self.ttl if answer else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._cache[key] = (answer, self.clock() + ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _lookup(self, query: str) -> Optional[str]:
+        key = normalise_phrase(query)
+        if not key:
+            return None
+        found, answer = self._cached(key)
+        if found:
+            self.stats['hits' if answer else 'negative_hits'] += 1
+            return answer
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+        else:
+            delay = self._limiter.reserve(max_wait=self.budget)
+            if delay is None:
+                self.stats['rate_limited'] += 1
+                logger.warning(f"⚠️ [WEB SEARCH] Rate limited, skipping: {query}")
+                return None
+            task = self._inflight[key] = asyncio.get_running_loop().create_task(self._fetch(key, query, delay))
+        # shield: a caller giving up (budget) does not cancel the request others may share
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str, query: str, delay: float) -> Optional[str]:
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            params = {'q': query, 'format': 'json', 'no_html': 1, 'skip_disambig': 1}
+            started = time.perf_counter()
+            async with self._get_session().get(self.url, params=params) as response:
+                if response.status != 200:
+                    self.stats['errors'] += 1
+                    logger.warning(f"⚠️ [WEB SEARCH] HTTP {response.status} for: {query}")
+                    return None
+                data = await response.json(content_type=None)
+            answer = parse_instant_answer(data if isinstance(data, dict) else {})
+            self.stats['requests'] += 1
+            logger.info(f"🔍 [WEB SEARCH] {'Answer' if answer else 'No answer'} for '{query}' "
+                        f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+            self._remember(key, answer)
+            return answer
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"❌ [WEB SEARCH] Request failed: {e!r}")
+            return None
+        finally:
+            self._inflight.pop(key, None)
+
+    # ------------------------------------------------------------------ public
+
+    def submit(self, query: str) -> concurrent.futures.Future:
+        """Future of the query's answer (None = no answer), resolved on the client loop"""
+        return asyncio.run_coroutine_threadsafe(self._lookup(query), self._ensure_loop())
+
+    def search(self, query: str, budget: float = None) -> Optional[str]:
+        """Answer or None, waiting at most the budget (seconds); for sync callers (not on an event loop)"""
+        future = self.submit(query)
+        try:
+            return future.result(timeout=self.budget if budget is None else budget)
+        except concurrent.futures.TimeoutError:
+            self._over_budget(query)
+            return None
+
+    async def asearch(self, query: str, budget: float = None) -> Optional[str]:
+        """search() for async callers: awaits the answer without blocking the caller's event loop"""
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.submit(query)),
+                                          self.budget if budget is None else budget)
+        except asyncio.TimeoutError:
+            self._over_budget(query)
+            return None
+
+    def _over_budget(self, query: str):
+        self._loop.call_soon_threadsafe(self.stats.update, ['over_budget'])
+        logger.warning(f"⏱️ [WEB SEARCH] Over the {self.budget * 1000:.0f} ms budget, answering without: {query}")
+
+    def get_stats(self) -> dict:
+        if self._loop is None or self._loop.is_closed():
+            return dict(self.stats)
+
+        async def snapshot():
+            return {**self.stats, 'cached': len(self._cache), 'in_flight': len(self._inflight)}
+        return asyncio.run_coroutine_threadsafe(snapshot(), self._loop).result(5)
+
+    def close(self):
+        """Close the session and stop the loop thread (tests, shutdown)"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+
+        async def shutdown():
+            for task in list(self._inflight.values()):
+                task.cancel()
+            if self._session is not None:
+                await self._session.close()
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(5)
+        loop.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_web_search_client() -> WebSearchClient:
+    """This process's WebSearchClient (its loop thread starts on the first search)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = WebSearchClient()
+        return _client
+
+
+def reset_web_search_client():
+    """Close and drop this process's client (tests)"""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
@@ -13,8 +13,11 @@ from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from twilio.twiml.voice_response import VoiceResponse, Connect, Stream
+from django.conf import settings
 import logging
 
+from HumeAiTwilio.audio import VoiceActivityDetector, ulaw_decode
+
 logger = logging.getLogger(__name__)
 
 @csrf_exempt  
@@ -70,7 +73,8 @@ class AudioStreamHandler:
                 'websocket': websocket,
                 'agent_speaking': False,
                 'customer_speaking': False,
-                'last_audio_time': None
+                'last_audio_time': None,
+                'vad': VoiceActivityDetector(sample_rate=8000),  # Twilio media is 8kHz µ-law
             }
             
             async for message in websocket:
@@ -103,8 +107,8 @@ class AudioStreamHandler:
                     # Decode audio (Twilio sends mulaw encoded audio)
                     audio_data = base64.b64decode(payload)
                     
-                    # Detect voice activity (simplified)
-                    voice_detected = self.detect_voice_activity(audio_data)
+                    # Detect voice activity (onset of caller speech)
+                    voice_detected = self.detect_voice_activity(audio_data, call_sid)
                     
                     # Check for interruption
                     if voice_detected and self.active_streams[call_sid]['agent_speaking']:
@@ -117,26 +121,27 @@ class AudioStreamHandler:
         except Exception as e:
             print(f"❌ Audio processing error: {e}")
     
-    def detect_voice_activity(self, audio_data):
+    def detect_voice_activity(self, audio_data, call_sid=None):
         """
-        Simple voice activity detection
+        Voice activity detection on decoded PCM (energy + zero-crossing rate + hangover)
+        
+        Returns True on the frame that confirms the start of caller speech.
         """
         try:
-            # Convert audio to amplitude analysis
-            import numpy as np
-            
-            # Convert mulaw to linear PCM (simplified)
-            audio_array = np.frombuffer(audio_data, dtype=np.uint8)
+            # The detector carries state across frames, so it must outlive this call
+            stream = self.active_streams.setdefault(call_sid, {})
+            if 'vad' not in stream:
+                stream['vad'] = VoiceActivityDetector(sample_rate=8000)
+            vad = stream['vad']
             
-            # Calculate RMS (Root Mean Square) for volume detection
-            rms = np.sqrt(np.mean(audio_array.astype(float) ** 2))
+            # µ-law bytes must be decoded to linear PCM before measuring energy
+            event = vad.process(ulaw_decode(audio_data).astype('float32'))
+            stream['customer_speaking'] = vad.speaking
+            return event == 'onset'
             
-            # Voice detected if RMS above threshold
-            return rms > self.interrupt_threshold * 255
-            
-        except:
-            # Fallback: basic volume check
-            return len(audio_data) > 0 and max(audio_data) > 50
+        except Exception as e:
+            logger.error(f"VAD error: {e}")
+            return False
     
     async def trigger_interrupt(self, call_sid):
         """
@@ -149,13 +154,16 @@ class AudioStreamHandler:
             self.active_streams[call_sid]['agent_speaking'] = False
             self.active_streams[call_sid]['customer_speaking'] = True
             
-            # Send interrupt signal to webhook (via HTTP request)
+            # Send interrupt signal to webhook (via HTTP request) without blocking the event loop
             import requests
             
-            interrupt_url = f"https://your-domain.com/calls/webhook/?interrupt=true&CallSid={call_sid}"
+            interrupt_url = f"{settings.BASE_URL.rstrip('/')}/calls/webhook/?interrupt=true&CallSid={call_sid}"
             
             # Trigger interrupt handling in main webhook
-            requests.post(interrupt_url, data={'SpeechResult': 'INTERRUPT_DETECTED'})
+            await asyncio.to_thread(
+                requests.post, interrupt_url,
+                data={'SpeechResult': 'INTERRUPT_DETECTED'}, timeout=5
+            )
             
             print(f"✅ Interrupt signal sent for call {call_sid[:8]}")
             
@@ -333,6 +333,12 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'agents.tasks.update_customer_priorities',
         'schedule': crontab(hour=1, minute=0),  # Daily at 1 AM
     },
+    
+    # Re-queue post-call pipeline runs a restart left behind
+    'recover-post-call-runs': {
+        'task': 'HumeAiTwilio.tasks.recover_post_call_runs',
+        'schedule': crontab(minute='*/10'),  # Every 10 minutes
+    },
 }
 
 # HumeAI Configuration
@@ -351,6 +357,77 @@ VONAGE_API_KEY = config('VONAGE_API_KEY', default='')
 VONAGE_API_SECRET = config('VONAGE_API_SECRET', default='')
 VONAGE_PHONE_NUMBER = config('VONAGE_PHONE_NUMBER', default='')
 
+# Live call audio DSP execution: inline (on the event loop), thread, or process
+AUDIO_DSP_MODE = config('AUDIO_DSP_MODE', default='inline')
+AUDIO_DSP_WORKERS = config('AUDIO_DSP_WORKERS', default=2, cast=int)
+
+# Pre-warmed HumeAI EVI sessions: opened by initiate_call while the phone rings
+HUME_POOL_ENABLED = config('HUME_POOL_ENABLED', default=True, cast=bool)
+HUME_POOL_TTL_SECONDS = config('HUME_POOL_TTL_SECONDS', default=45.0, cast=float)
+HUME_POOL_MAX_IDLE = config('HUME_POOL_MAX_IDLE', default=4, cast=int)
+
+# Write-behind ConversationLog buffer: bulk_create per call on size or age
+CONVERSATION_BUFFER_MAX_ROWS = config('CONVERSATION_BUFFER_MAX_ROWS', default=25, cast=int)
+CONVERSATION_BUFFER_MAX_DELAY = config('CONVERSATION_BUFFER_MAX_DELAY', default=2.0, cast=float)
+
+# Live per-call ConversationAnalytics snapshot cadence
+ANALYTICS_SNAPSHOT_SECONDS = config('ANALYTICS_SNAPSHOT_SECONDS', default=10.0, cast=float)
+
+# ConversationLog.emotion_vector precision: float16 (96 bytes/event) or float32 (192)
+EMOTION_VECTOR_DTYPE = config('EMOTION_VECTOR_DTYPE', default='float16')
+
+# Which HumeAI emotion frames become ConversationLog rows: all, utterance, rate or change
+EMOTION_RETENTION_POLICY = config('EMOTION_RETENTION_POLICY', default='change')
+EMOTION_RETENTION_INTERVAL = config('EMOTION_RETENTION_INTERVAL', default=1.0, cast=float)  # rate: seconds per row
+EMOTION_RETENTION_DELTA = config('EMOTION_RETENTION_DELTA', default=0.15, cast=float)       # change: top-score delta
+
+# Returning-customer context (CallerContext) read at call connect
+CALLER_CONTEXT_RECENT_CALLS = config('CALLER_CONTEXT_RECENT_CALLS', default=3, cast=int)
+CALLER_CONTEXT_CACHE_SECONDS = config('CALLER_CONTEXT_CACHE_SECONDS', default=86400, cast=int)
+
+# Post-call pipeline (transcript -> analytics -> CLARIFIES -> learning -> scheduling)
+POST_CALL_EXECUTOR = config('POST_CALL_EXECUTOR', default='celery')  # celery or local (in-process)
+POST_CALL_MAX_RETRIES = config('POST_CALL_MAX_RETRIES', default=5, cast=int)
+POST_CALL_TRANSCRIPT_WAIT = config('POST_CALL_TRANSCRIPT_WAIT', default=120, cast=int)  # seconds to wait for the consumer's final transcript
+POST_CALL_LEASE_SECONDS = config('POST_CALL_LEASE_SECONDS', default=600, cast=int)      # reclaim runs from dead workers
+POST_CALL_SCHEDULING = config('POST_CALL_SCHEDULING', default=False, cast=bool)         # auto-schedule the next call
+
+# Recomputing analytics for historical calls (manage.py recompute_analytics / analytics/recompute/ API)
+ANALYTICS_RECOMPUTE_WORKERS = config('ANALYTICS_RECOMPUTE_WORKERS', default=4, cast=int)        # process pool size
+ANALYTICS_RECOMPUTE_BATCH_SIZE = config('ANALYTICS_RECOMPUTE_BATCH_SIZE', default=200, cast=int)  # calls per transaction
+
+# Learned-knowledge search (BM25 index per process, see HumeAiTwilio/knowledge_index.py)
+KNOWLEDGE_INDEX_SYNC_SECONDS = config('KNOWLEDGE_INDEX_SYNC_SECONDS', default=30, cast=int)  # pick up other workers' rows
+KNOWLEDGE_MIN_COVERAGE = config('KNOWLEDGE_MIN_COVERAGE', default=0.5, cast=float)          # query share a match must cover
+
+# KnowledgeManager backend: auto (ChromaDB if installed, else django_db) | chromadb | numpy | django_db
+KNOWLEDGE_BACKEND = config('KNOWLEDGE_BACKEND', default='auto')
+KNOWLEDGE_VECTOR_DIR = config('KNOWLEDGE_VECTOR_DIR', default=str(BASE_DIR / 'agent_knowledge_db' / 'vectors'))
+KNOWLEDGE_VECTOR_DTYPE = config('KNOWLEDGE_VECTOR_DTYPE', default='float32')               # or int8 (4x smaller)
+KNOWLEDGE_VECTOR_IVF_MIN = config('KNOWLEDGE_VECTOR_IVF_MIN', default=20000, cast=int)      # brute force below this
+KNOWLEDGE_VECTOR_NPROBE = config('KNOWLEDGE_VECTOR_NPROBE', default=8, cast=int)           # IVF lists per query
+KNOWLEDGE_VECTOR_DELTA_MAX = config('KNOWLEDGE_VECTOR_DELTA_MAX', default=5000, cast=int)  # rows before a rebuild
+KNOWLEDGE_PARTITION_IDLE_SECONDS = config('KNOWLEDGE_PARTITION_IDLE_SECONDS', default=900, cast=int)  # drop unused agent indexes
+KNOWLEDGE_PARTITION_MAX = config('KNOWLEDGE_PARTITION_MAX', default=200, cast=int)  # loaded agent partitions per process
+
+# Web search fallback for unanswered questions (HumeAiTwilio/web_search.py)
+WEB_SEARCH_URL = config('WEB_SEARCH_URL', default='https://api.duckduckgo.com/')
+WEB_SEARCH_BUDGET_MS = config('WEB_SEARCH_BUDGET_MS', default=1500, cast=float)    # longest a turn waits for an answer
+WEB_SEARCH_TIMEOUT = config('WEB_SEARCH_TIMEOUT', default=5.0, cast=float)         # request timeout (finishes in background)
+WEB_SEARCH_CACHE_TTL = config('WEB_SEARCH_CACHE_TTL', default=86400, cast=int)     # seconds an answer is cached
+WEB_SEARCH_NEGATIVE_TTL = config('WEB_SEARCH_NEGATIVE_TTL', default=3600, cast=int)  # seconds "no answer" is cached
+WEB_SEARCH_CACHE_SIZE = config('WEB_SEARCH_CACHE_SIZE', default=5000, cast=int)    # cached queries per process
+WEB_SEARCH_RATE = config('WEB_SEARCH_RATE', default=5.0, cast=float)               # requests per second per process
+WEB_SEARCH_BURST = config('WEB_SEARCH_BURST', default=10, cast=int)                # token bucket size
+WEB_SEARCH_MAX_CONNECTIONS = config('WEB_SEARCH_MAX_CONNECTIONS', default=8, cast=int)  # pooled keep-alive connections
+
+# Shared sentence-embedding model (HumeAiTwilio/embeddings.py), loaded on first use
+EMBEDDING_MODEL = config('EMBEDDING_MODEL', default='sentence-transformers/all-MiniLM-L6-v2')
+EMBEDDING_BATCH_SIZE = config('EMBEDDING_BATCH_SIZE', default=32, cast=int)                # texts per encode()
+EMBEDDING_BATCH_WAIT_MS = config('EMBEDDING_BATCH_WAIT_MS', default=5, cast=float)         # micro-batch window
+EMBEDDING_CACHE_SIZE = config('EMBEDDING_CACHE_SIZE', default=10000, cast=int)             # in-process LRU entries
+EMBEDDING_CACHE_DIR = config('EMBEDDING_CACHE_DIR', default=str(BASE_DIR / 'agent_knowledge_db' / 'embeddings'))  # '' = off
+
 # Voice Provider Selection (twilio or vonage)
 VOICE_PROVIDER = config('VOICE_PROVIDER', default='twilio')
 